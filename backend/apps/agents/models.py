@@ -12,7 +12,7 @@ class Agent(models.Model):
     description = models.TextField(blank=True)
     
     # Agent configuration
-    llm_provider = models.CharField(max_length=50, default='ollama')  # openai, ollama
+    llm_provider = models.CharField(max_length=50, default='ollama')  # ollama, openai, vllm
     model = models.CharField(max_length=100, default='mistral:7b')
     temperature = models.FloatField(default=0.7)
     max_tokens = models.IntegerField(default=2000)
@@ -0,0 +1,31 @@
+"""Middleware for API diagnostics."""
+from django.db import connection
+
+from core.bruno_integration.db_reads import QueryCounter, query_counter
+
+
+class QueryCountMiddleware:
+    """
+    Add an X-DB-Queries header with the number of SQL queries a request ran.
+
+    Used by the chat load benchmark to report queries per turn. Counting goes
+    through a connection execute wrapper, so it works without DEBUG query
+    logging. Reads that ``parallel_read`` runs on worker threads are counted
+    as well; other ORM calls made off the request thread are not.
+    """
+
+    header = 'X-DB-Queries'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        token = query_counter.set(counter)
+        try:
+            with connection.execute_wrapper(counter):
+                response = self.get_response(request)
+        finally:
+            query_counter.reset(token)
+        response[self.header] = str(counter.count)
+        return response
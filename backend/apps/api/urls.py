@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from .views import UserViewSet, AgentViewSet, ConversationViewSet, MessageViewSet, TimerViewSet
 from .auth_views import register, login, refresh_token, logout
 
@@ -22,6 +23,76 @@ def health_check(request):
         'service': 'Bruno PA API'
     })
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def llm_stats(request):
+    """LLM client runtime statistics (staff only)"""
+    from core.bruno_integration.http_sessions import session_manager
+    from core.bruno_integration.event_loop import llm_loop
+    from core.bruno_integration.llm_cache import response_cache
+    from core.bruno_integration.single_flight import single_flight
+    from core.bruno_integration.llm_scheduler import llm_scheduler
+    from core.bruno_integration.ollama_pool import ollama_pool
+    from core.bruno_integration.hedging import hedge_policy
+    from core.bruno_integration.micro_batcher import micro_batcher
+    from core.bruno_integration.openai_client import openai_scheduler
+    from core.bruno_integration.prompt_engine import prompt_engine
+    from core.services.model_router import model_router
+    from core.bruno_integration.embeddings import embedding_service
+    from core.services.load_shedder import load_shedder
+    from core.bruno_integration.conversation_summary import conversation_summarizer
+    from core.bruno_integration.semantic_recall import semantic_recall
+    from core.services import chat_service
+    
+    return Response({
+        'http_sessions': session_manager.stats(),
+        'event_loop': llm_loop.stats(),
+        'response_cache': response_cache.stats(),
+        'single_flight': single_flight.stats(),
+        'scheduler': llm_scheduler.stats(),
+        'openai_scheduler': openai_scheduler.stats(),
+        'ollama_pool': ollama_pool.stats(),
+        'hedging': hedge_policy.stats(),
+        'micro_batching': micro_batcher.stats(),
+        'prompt_engine': prompt_engine.stats(),
+        'model_router': model_router.stats(),
+        'embeddings': embedding_service.stats(),
+        'load_shedding': load_shedder.stats(),
+        'intent_router': chat_service.intent_router.stats(),
+        'summaries': conversation_summarizer.stats(),
+        'recall': semantic_recall.stats(),
+        'tools': chat_service.ability_manager.stats(),
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def llm_models(request):
+    """Models currently loaded on each Ollama host (staff only)"""
+    from asgiref.sync import async_to_sync
+    from core.bruno_integration.model_warmer import model_warmer
+    
+    return Response({
+        'keep_alive': model_warmer.keep_alive,
+        'wanted': model_warmer.wanted_models(),
+        'resident': async_to_sync(model_warmer.resident)(),
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def llm_telemetry(request):
+    """Average generation timings per model and day (staff only)"""
+    from apps.chat.models import GenerationTelemetry
+    
+    try:
+        days = min(max(int(request.query_params.get('days', 7)), 1), 90)
+    except ValueError:
+        days = 7
+    summary = GenerationTelemetry.daily_summary(days=days, model=request.query_params.get('model'))
+    
+    return Response([
+        {**row, 'day': row['day'].isoformat()} for row in summary
+    ])
+
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
 router.register(r'agents', AgentViewSet, basename='agent')
@@ -36,6 +107,11 @@ urlpatterns = [
     # Health check endpoint
     path('health/', health_check, name='health_check'),
     
+    # LLM runtime statistics
+    path('llm/stats/', llm_stats, name='llm_stats'),
+    path('llm/telemetry/', llm_telemetry, name='llm_telemetry'),
+    path('llm/models/', llm_models, name='llm_models'),
+    
     # Authentication endpoints
     path('auth/register/', register, name='register'),
     path('auth/login/', login, name='login'),
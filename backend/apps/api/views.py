@@ -108,6 +108,15 @@ class ConversationViewSet(viewsets.ModelViewSet):
         # is_task_command is now deprecated - we'll use LLM detection instead
         # But keep for backward compatibility
         is_task_command_override = request.data.get('is_task_command', None)
+        # Optional client-chosen ID; when present, token deltas are pushed to the
+        # user's WebSocket as chat_delta events while the reply is generated
+        stream_id = request.data.get('stream_id') or None
+        
+        if stream_id is not None and (not isinstance(stream_id, str) or len(stream_id) > 64):
+            return Response(
+                {'error': 'stream_id must be a string of at most 64 characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         if not content:
             return Response(
@@ -123,9 +132,19 @@ class ConversationViewSet(viewsets.ModelViewSet):
             conversation=conversation,
             content=content,
             is_response_to_proactive=is_response_to_proactive,
-            is_task_command_override=is_task_command_override
+            is_task_command_override=is_task_command_override,
+            stream_id=stream_id
         )
         
+        # The LLM is saturated and the message was not stored; ask the client to resend later
+        if 'shed' in result and 'assistant_message' not in result:
+            response = Response(
+                {'error': 'The assistant is busy, please try again shortly.', 'retry_after': result['shed']['retry_after']},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            response['Retry-After'] = str(result['shed']['retry_after'])
+            return response
+        
         # Format response
         response_data = {
             'user_message': MessageSerializer(result['user_message']).data,
@@ -133,6 +152,14 @@ class ConversationViewSet(viewsets.ModelViewSet):
             'success': result['success']
         }
         
+        if stream_id:
+            response_data['stream_id'] = stream_id
+        
+        if 'shed' in result:
+            # Answered with the busy reply instead of the LLM
+            response_data['degraded'] = True
+            response_data['retry_after'] = result['shed']['retry_after']
+        
         if not result['success']:
             response_data['error'] = result.get('error')
             return Response(response_data, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Conversation, Message
+from .models import Conversation, GenerationTelemetry, Message
 
 
 @admin.register(Conversation)
@@ -20,3 +20,10 @@ class MessageAdmin(admin.ModelAdmin):
     def content_preview(self, obj):
         return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
     content_preview.short_description = 'Content'
+
+
+@admin.register(GenerationTelemetry)
+class GenerationTelemetryAdmin(admin.ModelAdmin):
+    list_display = ['message', 'model', 'ttft_ms', 'prefill_ms', 'decode_ms', 'load_ms', 'total_ms', 'created_at']
+    list_filter = ['model', 'created_at']
+    ordering = ['-created_at']
@@ -7,6 +7,7 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from apps.chat.models import Conversation, Message
 from apps.accounts.models import User
+from core.services.stream_cancellation import request_cancel
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +35,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
         
+        # Streams started from this connection, cancelled if it goes away
+        self.watched_streams = set()
+        
         # Join user-specific channel
         self.room_group_name = f'chat_{self.user.id}'
         
@@ -60,6 +64,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
             logger.info(f"WebSocket disconnected for user {self.user.id}")
+        
+        # Nobody is left to read these replies; stop generating them
+        for stream_id in getattr(self, 'watched_streams', ()):
+            await request_cancel(str(self.user.id), stream_id, self.channel_layer)
     
     async def receive(self, text_data):
         """
@@ -79,6 +87,17 @@ class ChatConsumer(AsyncWebsocketConsumer):
             elif message_type == 'check_proactive':
                 # Manual check for proactive messages
                 await self.check_and_send_proactive()
+            elif message_type == 'watch_stream':
+                # The client sent a message whose reply streams to this connection
+                stream_id = data.get('stream_id')
+                if isinstance(stream_id, str) and 0 < len(stream_id) <= 64:
+                    self.watched_streams.add(stream_id)
+            elif message_type == 'cancel_stream':
+                # The client wants a streaming reply stopped
+                stream_id = data.get('stream_id')
+                if isinstance(stream_id, str) and 0 < len(stream_id) <= 64:
+                    self.watched_streams.discard(stream_id)
+                    await request_cancel(str(self.user.id), stream_id, self.channel_layer)
             
         except json.JSONDecodeError:
             logger.error("Invalid JSON received on WebSocket")
@@ -103,6 +122,22 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'message': event['message']
         }))
     
+    async def chat_delta(self, event):
+        """
+        Handle streamed assistant output (token deltas, then a final done event).
+        """
+        if event.get('done'):
+            self.watched_streams.discard(event['stream_id'])
+        
+        await self.send(text_data=json.dumps({
+            'type': 'chat_delta',
+            'stream_id': event['stream_id'],
+            'sequence': event.get('sequence', 0),
+            'delta': event.get('delta', ''),
+            'done': event.get('done', False),
+            'message': event.get('message')
+        }))
+    
     async def proactivity_update(self, event):
         """
         Handle proactivity level update event.
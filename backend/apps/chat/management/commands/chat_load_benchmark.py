@@ -0,0 +1,255 @@
+"""
+Management command to load test the chat hot path of a running backend.
+
+Simulates N users who each log in, open the chat WebSocket and send messages
+through ConversationViewSet.send_message, then reports throughput, latency
+percentiles and DB queries per turn. Pair it with the fake_ollama command to
+benchmark without a GPU:
+
+    python manage.py fake_ollama --port 11435
+    OLLAMA_BASE_URL=http://127.0.0.1:11435 daphne config.asgi:application
+    python manage.py chat_load_benchmark --users 20 --turns 5
+"""
+import asyncio
+import json
+import math
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import aiohttp
+from django.core.management.base import BaseCommand, CommandError
+
+
+PROMPTS = [
+    "Hi! How is your day going?",
+    "Can you suggest something quick for dinner tonight?",
+    "What's a good way to stay focused while working from home?",
+    "Tell me a fun fact about octopuses.",
+    "I'm planning a weekend hike, any tips?",
+    "Summarise what we talked about so far.",
+]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of ``values`` (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Command(BaseCommand):
+    help = 'Load test send_message and the chat WebSocket with simulated users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Backend URL (default: http://127.0.0.1:8000)')
+        parser.add_argument('--users', type=int, default=10, help='Concurrent simulated users (default: 10)')
+        parser.add_argument('--turns', type=int, default=5, help='Messages each user sends (default: 5)')
+        parser.add_argument('--think-time', type=float, default=0.0, help='Seconds a user waits between turns (default: 0)')
+        parser.add_argument('--no-websocket', action='store_true', help='Only use the REST endpoint (no streamed replies)')
+        parser.add_argument('--email-prefix', default='bench', help='Benchmark accounts are <prefix>-<n>@example.com')
+        parser.add_argument('--password', default='bench-password-123', help='Password for benchmark accounts')
+        parser.add_argument('--timeout', type=float, default=60.0, help='Per-turn timeout in seconds (default: 60)')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['turns'] < 1:
+            raise CommandError('--users and --turns must be at least 1')
+
+        report = asyncio.run(self._run(options))
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print_report(report)
+
+    async def _run(self, options) -> Dict:
+        base_url = options['base_url'].rstrip('/')
+        self.api_url = f"{base_url}/api"
+        self.ws_url = base_url.replace('http', 'ws', 1) + '/ws/chat/'
+        self.options = options
+        self.turns: List[Dict] = []
+        self.setup_errors: List[str] = []
+
+        timeout = aiohttp.ClientTimeout(total=options['timeout'])
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            started = time.monotonic()
+            await asyncio.gather(*(self._simulate_user(session, i) for i in range(options['users'])))
+            elapsed = time.monotonic() - started
+
+        return self._summarise(elapsed)
+
+    async def _simulate_user(self, session: aiohttp.ClientSession, index: int) -> None:
+        """Log one user in and send their messages one after another."""
+        try:
+            token = await self._authenticate(session, index)
+            headers = {'Authorization': f'Bearer {token}'}
+            async with session.get(f"{self.api_url}/conversations/get_or_create/", headers=headers) as response:
+                response.raise_for_status()
+                conversation_id = (await response.json())['conversation']['id']
+        except Exception as e:
+            self.setup_errors.append(f"user {index}: {e}")
+            return
+
+        streams: Dict[str, Dict] = {}
+        ws = None
+        reader = None
+        if not self.options['no_websocket']:
+            try:
+                ws = await session.ws_connect(f"{self.ws_url}?token={token}", heartbeat=30)
+                reader = asyncio.ensure_future(self._read_stream_events(ws, streams))
+            except Exception as e:
+                self.setup_errors.append(f"user {index} websocket: {e}")
+                return
+
+        try:
+            for turn in range(self.options['turns']):
+                content = PROMPTS[(index + turn) % len(PROMPTS)]
+                self.turns.append(await self._send_turn(session, headers, conversation_id, content, ws, streams))
+                if self.options['think_time']:
+                    await asyncio.sleep(self.options['think_time'])
+        finally:
+            if reader:
+                reader.cancel()
+            if ws:
+                await ws.close()
+
+    async def _authenticate(self, session: aiohttp.ClientSession, index: int) -> str:
+        """Log in a benchmark account, registering it on first use."""
+        credentials = {
+            'email': f"{self.options['email_prefix']}-{index}@example.com",
+            'password': self.options['password'],
+        }
+        async with session.post(f"{self.api_url}/auth/login/", json=credentials) as response:
+            if response.status == 200:
+                return (await response.json())['access_token']
+
+        registration = {**credentials, 'name': f"Benchmark User {index}"}
+        async with session.post(f"{self.api_url}/auth/register/", json=registration) as response:
+            if response.status != 201:
+                raise CommandError(f"Could not register {credentials['email']}: {await response.text()}")
+            return (await response.json())['access_token']
+
+    async def _read_stream_events(self, ws: aiohttp.ClientWebSocketResponse, streams: Dict[str, Dict]) -> None:
+        """Record first-delta and done times for the user's streams."""
+        async for message in ws:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                continue
+            data = json.loads(message.data)
+            if data.get('type') != 'chat_delta':
+                continue
+            stream = streams.get(data.get('stream_id'))
+            if stream is None:
+                continue
+            if data.get('delta') and stream['first_delta'] is None:
+                stream['first_delta'] = time.monotonic()
+            if data.get('done'):
+                stream['done'].set()
+
+    async def _send_turn(
+        self,
+        session: aiohttp.ClientSession,
+        headers: Dict[str, str],
+        conversation_id: str,
+        content: str,
+        ws: Optional[aiohttp.ClientWebSocketResponse],
+        streams: Dict[str, Dict]
+    ) -> Dict:
+        """Send one message and time it."""
+        payload = {'content': content}
+        stream = None
+        if ws is not None:
+            stream_id = uuid.uuid4().hex
+            stream = {'first_delta': None, 'done': asyncio.Event()}
+            streams[stream_id] = stream
+            payload['stream_id'] = stream_id
+            await ws.send_json({'type': 'watch_stream', 'stream_id': stream_id})
+
+        turn = {'ok': False, 'status': None, 'latency': None, 'first_delta': None, 'queries': None}
+        started = time.monotonic()
+        try:
+            url = f"{self.api_url}/conversations/{conversation_id}/send_message/"
+            async with session.post(url, json=payload, headers=headers) as response:
+                await response.read()
+                turn['status'] = response.status
+                turn['ok'] = response.status == 200
+                queries = response.headers.get('X-DB-Queries')
+                turn['queries'] = int(queries) if queries is not None else None
+            turn['latency'] = time.monotonic() - started
+
+            if stream is not None and turn['ok']:
+                # The done event normally arrives just before the HTTP response
+                await asyncio.wait_for(stream['done'].wait(), timeout=5)
+        except asyncio.TimeoutError:
+            turn['status'] = turn['status'] or 'timeout'
+        except aiohttp.ClientError as e:
+            turn['status'] = type(e).__name__
+        finally:
+            if stream is not None:
+                streams.pop(payload['stream_id'], None)
+                if stream['first_delta'] is not None:
+                    turn['first_delta'] = stream['first_delta'] - started
+        return turn
+
+    def _summarise(self, elapsed: float) -> Dict:
+        """Aggregate per-turn measurements."""
+        ok = [t for t in self.turns if t['ok']]
+        latencies = [t['latency'] for t in ok]
+        first_deltas = [t['first_delta'] for t in ok if t['first_delta'] is not None]
+        queries = [t['queries'] for t in ok if t['queries'] is not None]
+        statuses: Dict[str, int] = {}
+        for t in self.turns:
+            if not t['ok']:
+                statuses[str(t['status'])] = statuses.get(str(t['status']), 0) + 1
+
+        def spread(values: List[float]) -> Dict[str, Optional[float]]:
+            return {f"p{p}": percentile(values, p) for p in (50, 95, 99)}
+
+        return {
+            'users': self.options['users'],
+            'turns_per_user': self.options['turns'],
+            'elapsed_seconds': round(elapsed, 3),
+            'turns_completed': len(ok),
+            'turns_failed': len(self.turns) - len(ok),
+            'failures_by_status': statuses,
+            'setup_errors': self.setup_errors,
+            'throughput_turns_per_second': round(len(ok) / elapsed, 3) if elapsed else 0.0,
+            'latency_seconds': spread(latencies),
+            'first_delta_seconds': spread(first_deltas),
+            'db_queries_per_turn': {
+                'mean': round(sum(queries) / len(queries), 2) if queries else None,
+                **spread(queries),
+            },
+        }
+
+    def _print_report(self, report: Dict) -> None:
+        def fmt(value, unit='s'):
+            if value is None:
+                return 'n/a'
+            return f"{value * 1000:.0f}ms" if unit == 's' else f"{value:g}"
+
+        self.stdout.write('=' * 50)
+        self.stdout.write(
+            f"{report['users']} users x {report['turns_per_user']} turns in {report['elapsed_seconds']}s"
+        )
+        style = self.style.SUCCESS if not report['turns_failed'] else self.style.WARNING
+        self.stdout.write(style(
+            f"Completed {report['turns_completed']}, failed {report['turns_failed']} "
+            f"{report['failures_by_status'] or ''}".rstrip()
+        ))
+        self.stdout.write(f"Throughput: {report['throughput_turns_per_second']} turns/s")
+        for label, key in (('Latency', 'latency_seconds'), ('First delta', 'first_delta_seconds')):
+            spread = report[key]
+            self.stdout.write(
+                f"{label}: p50 {fmt(spread['p50'])}  p95 {fmt(spread['p95'])}  p99 {fmt(spread['p99'])}"
+            )
+        queries = report['db_queries_per_turn']
+        self.stdout.write(
+            f"DB queries/turn: mean {fmt(queries['mean'], '')}  p95 {fmt(queries['p95'], '')}"
+            + ('' if queries['mean'] is not None else ' (enable apps.api.middleware.QueryCountMiddleware)')
+        )
+        for error in report['setup_errors']:
+            self.stdout.write(self.style.ERROR(error))
@@ -0,0 +1,67 @@
+"""
+Management command to run a local fake Ollama server for load testing.
+
+It also serves the OpenAI-compatible /v1 API, so agents using the openai or
+vllm provider can be benchmarked with OPENAI_BASE_URL=http://127.0.0.1:11435/v1.
+"""
+from django.core.management.base import BaseCommand
+from core.bruno_integration.fake_ollama import FakeOllama
+
+
+class Command(BaseCommand):
+    help = 'Run a fake Ollama server with configurable latency, speed and error rate'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interface to bind (default: 127.0.0.1)')
+        parser.add_argument('--port', type=int, default=11435, help='Port to listen on (default: 11435)')
+        parser.add_argument(
+            '--prefill-ms',
+            type=float,
+            default=50,
+            help='Fixed delay before the first token, in milliseconds (default: 50)',
+        )
+        parser.add_argument(
+            '--load-ms',
+            type=float,
+            default=0,
+            help='Extra delay for the first call of each model, in milliseconds (default: 0)',
+        )
+        parser.add_argument(
+            '--prefill-tps',
+            type=float,
+            default=2000,
+            help='Prompt tokens processed per second; 0 ignores prompt size (default: 2000)',
+        )
+        parser.add_argument(
+            '--tokens-per-second',
+            type=float,
+            default=50,
+            help='Generated tokens per second; 0 answers instantly (default: 50)',
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0.0,
+            help='Fraction of requests failing with HTTP 500 (default: 0)',
+        )
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for simulated errors')
+
+    def handle(self, *args, **options):
+        fake = FakeOllama(
+            prefill_latency=options['prefill_ms'] / 1000,
+            load_latency=options['load_ms'] / 1000,
+            prefill_tokens_per_second=options['prefill_tps'],
+            tokens_per_second=options['tokens_per_second'],
+            error_rate=options['error_rate'],
+            seed=options['seed'],
+        )
+        url = f"http://{options['host']}:{options['port']}"
+        self.stdout.write(self.style.SUCCESS(f'Fake Ollama listening on {url}'))
+        self.stdout.write(f'Point the backend at it with OLLAMA_BASE_URL={url}')
+        try:
+            fake.run(host=options['host'], port=options['port'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.WARNING(
+            f"Stopped after {fake.counters['requests']} requests ({fake.counters['errors']} simulated errors)"
+        ))
@@ -0,0 +1,50 @@
+"""
+Management command to embed every user's past messages for semantic recall.
+The vectors are stored in the embeddings table, so chat workers build their
+per-user indexes from it without calling Ollama.
+"""
+import asyncio
+import time
+from django.core.management.base import BaseCommand
+from core.bruno_integration.semantic_recall import semantic_recall
+
+
+class Command(BaseCommand):
+    help = 'Backfill message embeddings for semantic recall'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='users',
+            help='Index only this user ID (repeatable); defaults to every user with a conversation',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=512,
+            help='Messages read and embedded per step (default: 512)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            asyncio.run(self._run(options))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Stopping history indexing'))
+
+    async def _run(self, options):
+        from asgiref.sync import sync_to_async
+
+        users = options['users'] or await sync_to_async(semantic_recall.store.users)()
+        self.stdout.write(f'Indexing the history of {len(users)} users')
+
+        for user_id in users:
+            started = time.monotonic()
+            try:
+                indexed = await semantic_recall.index_user(user_id, batch_size=options['batch_size'])
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'  {user_id}: {e}'))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f'  {user_id}: {indexed} messages in {time.monotonic() - started:.1f}s'
+            ))
@@ -0,0 +1,108 @@
+"""
+Management command to benchmark semantic recall search latency per user index size.
+
+Builds a VectorIndex of synthetic embeddings (messages clustered around a
+number of topics, like a real history) for each size and measures exact and
+approximate top-k search latency and the approximate search's recall against
+the exact result. No database or Ollama is needed:
+
+    python manage.py recall_benchmark --sizes 10000,1000000
+
+One million 768-dimensional vectors take about 3 GB of memory.
+"""
+import json
+import time
+from typing import Dict, List
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.chat.management.commands.chat_load_benchmark import percentile
+from core.bruno_integration.semantic_recall import VectorIndex, np
+
+
+class Command(BaseCommand):
+    help = 'Benchmark exact and approximate semantic recall search at several index sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,1000000', help='Comma-separated index sizes (default: 10000,1000000)')
+        parser.add_argument('--dimensions', type=int, default=768, help='Vector dimensions (default: 768, nomic-embed-text)')
+        parser.add_argument('--queries', type=int, default=200, help='Searches per size (default: 200)')
+        parser.add_argument('--k', type=int, default=4, help='Results per search (default: 4)')
+        parser.add_argument('--nprobe', type=int, default=16, help='Inverted lists scored per approximate search (default: 16)')
+        parser.add_argument('--topics', type=int, default=2000, help='Topic clusters in the synthetic history (default: 2000)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('The recall benchmark needs NumPy (pip install numpy)')
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes must be comma-separated integers')
+
+        rng = np.random.default_rng(options['seed'])
+        topics = rng.standard_normal((options['topics'], options['dimensions']), dtype=np.float32)
+        report = [self._benchmark(size, topics, rng, options) for size in sizes]
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print_report(report)
+
+    def _benchmark(self, size: int, topics, rng, options) -> Dict:
+        """Build an index of ``size`` vectors and time searches against it."""
+        self.stderr.write(f'Building index of {size} vectors...')
+        index = VectorIndex(ann_threshold=size, nprobe=options['nprobe'], capacity=size, seed=options['seed'])
+        started = time.perf_counter()
+        for start in range(0, size, 100000):
+            count = min(100000, size - start)
+            index.add(range(start, start + count), self._messages(topics, rng, count))
+        build_seconds = time.perf_counter() - started
+
+        queries = self._messages(topics, rng, options['queries'])
+        exact_ms: List[float] = []
+        approximate_ms: List[float] = []
+        found = 0
+        for query in queries:
+            started = time.perf_counter()
+            expected = index.search(query, options['k'], exact=True)
+            exact_ms.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            hits = index.search(query, options['k'])
+            approximate_ms.append((time.perf_counter() - started) * 1000)
+            found += len({key for key, _ in hits} & {key for key, _ in expected})
+
+        def spread(values: List[float]) -> Dict[str, float]:
+            return {f"p{p}": round(percentile(values, p), 2) for p in (50, 95, 99)}
+
+        return {
+            'vectors': size,
+            'dimensions': options['dimensions'],
+            'memory_mb': round(index.nbytes / 2 ** 20),
+            'build_seconds': round(build_seconds, 2),
+            'exact_ms': spread(exact_ms),
+            'approximate_ms': spread(approximate_ms),
+            'nprobe': options['nprobe'],
+            'recall_at_k': round(found / (options['k'] * len(queries)), 3),
+        }
+
+    @staticmethod
+    def _messages(topics, rng, count: int):
+        """Synthetic message embeddings: a random topic plus noise."""
+        vectors = topics[rng.integers(0, len(topics), count)]
+        vectors += rng.standard_normal(vectors.shape, dtype=np.float32) * 0.6
+        return vectors
+
+    def _print_report(self, report: List[Dict]) -> None:
+        self.stdout.write('=' * 50)
+        for row in report:
+            self.stdout.write(self.style.SUCCESS(
+                f"{row['vectors']} vectors x {row['dimensions']}d "
+                f"({row['memory_mb']} MB, built in {row['build_seconds']}s)"
+            ))
+            for name in ('exact_ms', 'approximate_ms'):
+                spread = row[name]
+                self.stdout.write(f"  {name[:-3]:<12} p50={spread['p50']}ms p95={spread['p95']}ms p99={spread['p99']}ms")
+            self.stdout.write(f"  recall@k     {row['recall_at_k']} (nprobe={row['nprobe']})")
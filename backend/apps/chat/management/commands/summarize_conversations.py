@@ -0,0 +1,77 @@
+"""
+Management command to fold older messages into each conversation's rolling summary.
+Runs once by default; with --loop it keeps summarizing new messages in the
+background. Run a single instance so two runs never fold the same messages.
+"""
+import asyncio
+from django.core.management.base import BaseCommand
+from core.bruno_integration.conversation_summary import conversation_summarizer
+
+
+class Command(BaseCommand):
+    help = 'Summarize older conversation messages into hierarchical rolling summaries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep summarizing new messages instead of running once',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=300,
+            help='Seconds between runs with --loop (default: 300)',
+        )
+        parser.add_argument(
+            '--conversation',
+            action='append',
+            dest='conversations',
+            help='Summarize only this conversation ID (repeatable)',
+        )
+        parser.add_argument(
+            '--max-chunks',
+            type=int,
+            default=None,
+            help=f'Message chunks to fold per conversation and run '
+                 f'(default: {conversation_summarizer.max_chunks_per_run})',
+        )
+
+    def handle(self, *args, **options):
+        if not conversation_summarizer.enabled:
+            self.stdout.write(self.style.WARNING('Conversation summaries are disabled (CHAT_SUMMARY_ENABLED)'))
+            return
+        try:
+            asyncio.run(self._run(options))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Stopping conversation summarizer'))
+
+    async def _run(self, options):
+        while True:
+            try:
+                if options['conversations']:
+                    results = {
+                        conversation_id: await conversation_summarizer.summarize(
+                            conversation_id, options['max_chunks']
+                        )
+                        for conversation_id in options['conversations']
+                    }
+                else:
+                    results = await conversation_summarizer.summarize_due(options['max_chunks'])
+                self._report(results)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Error summarizing conversations: {e}'))
+
+            if not options['loop']:
+                break
+            await asyncio.sleep(options['interval'])
+
+    def _report(self, results):
+        changed = {key: result for key, result in results.items() if result['chunks']}
+        if not changed:
+            self.stdout.write('No conversations to summarize')
+        for conversation_id, result in changed.items():
+            self.stdout.write(self.style.SUCCESS(
+                f"  {conversation_id}: {result['messages']} messages folded into "
+                f"{result['chunks']} nodes, {result['merges']} merges"
+            ))
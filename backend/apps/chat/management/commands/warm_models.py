@@ -0,0 +1,63 @@
+"""
+Management command to preload the models agents use and keep them loaded.
+Runs once by default (e.g. at startup); with --loop it keeps refreshing them
+before Ollama's keep_alive expires.
+"""
+import asyncio
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from core.bruno_integration.model_warmer import model_warmer
+
+
+class Command(BaseCommand):
+    help = 'Preload agent and classifier models on every Ollama host and keep them resident'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep refreshing the models instead of warming them once',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=None,
+            help=f'Seconds between refreshes with --loop (default: {model_warmer.refresh_interval:g})',
+        )
+        parser.add_argument(
+            '--model',
+            action='append',
+            dest='models',
+            help='Warm only this model (repeatable); defaults to all agent models and the classifier model',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            asyncio.run(self._run(options))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Stopping model warmer'))
+
+    async def _run(self, options):
+        interval = options['interval'] or model_warmer.refresh_interval
+
+        while True:
+            models = options['models'] or await sync_to_async(model_warmer.wanted_models)()
+            self.stdout.write(f"Warming {', '.join(models) or 'no models'} (keep_alive={model_warmer.keep_alive})")
+
+            try:
+                results = await model_warmer.refresh(models)
+                self._report(results)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Error warming models: {e}'))
+
+            if not options['loop']:
+                break
+            await asyncio.sleep(interval)
+
+    def _report(self, results):
+        if not results:
+            self.stdout.write(self.style.WARNING('No healthy Ollama hosts to warm'))
+        for url, states in results.items():
+            for model, state in states.items():
+                style = self.style.ERROR if state.startswith('failed') else self.style.SUCCESS
+                self.stdout.write(style(f'  {url} {model}: {state}'))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_timer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationTelemetry',
+            fields=[
+                ('message', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='telemetry', serialize=False, to='chat.message')),
+                ('model', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('load_ms', models.PositiveIntegerField(blank=True, help_text='Time spent loading the model', null=True)),
+                ('prompt_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('prefill_ms', models.PositiveIntegerField(blank=True, help_text='Prompt evaluation time', null=True)),
+                ('completion_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('decode_ms', models.PositiveIntegerField(blank=True, help_text='Generation time', null=True)),
+                ('ttft_ms', models.PositiveIntegerField(blank=True, help_text='Time to first streamed token', null=True)),
+                ('detection_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('context_ms', models.PositiveIntegerField(blank=True, help_text='History and memory assembly', null=True)),
+                ('generation_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('persistence_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('total_ms', models.PositiveIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'generation_telemetry',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['model', 'created_at'], name='generation__model_86e44c_idx'), models.Index(fields=['created_at'], name='generation__created_0de03f_idx')],
+            },
+        ),
+    ]
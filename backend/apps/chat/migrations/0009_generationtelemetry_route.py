@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_generationtelemetry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationtelemetry',
+            name='escalated',
+            field=models.BooleanField(default=False, help_text='Regenerated with the full model'),
+        ),
+        migrations.AddField(
+            model_name='generationtelemetry',
+            name='route',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0009_generationtelemetry_route'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Embedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('content_hash', models.CharField(help_text='SHA-256 of the embedded text', max_length=64)),
+                ('dimensions', models.PositiveIntegerField()),
+                ('vector', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'embeddings',
+                'unique_together': {('model', 'content_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0010_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationtelemetry',
+            name='abilities_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Timer and notes checks', null=True),
+        ),
+        migrations.AddField(
+            model_name='generationtelemetry',
+            name='history_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='History fetch (overlaps abilities)', null=True),
+        ),
+        migrations.AddField(
+            model_name='generationtelemetry',
+            name='memories_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Memory fetch (overlaps history)', null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:25
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0011_generationtelemetry_stage_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationSummary',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('level', models.PositiveSmallIntegerField(default=1)),
+                ('content', models.TextField()),
+                ('message_count', models.PositiveIntegerField(help_text='Messages covered by this node')),
+                ('start_at', models.DateTimeField(help_text='Creation time of the first covered message')),
+                ('end_at', models.DateTimeField(help_text='Creation time of the last covered message')),
+                ('model', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='chat.conversation')),
+            ],
+            options={
+                'db_table': 'conversation_summaries',
+                'ordering': ['start_at'],
+                'indexes': [models.Index(fields=['conversation', 'level', 'start_at'], name='conversatio_convers_e97ffb_idx')],
+            },
+        ),
+    ]
@@ -486,3 +486,144 @@ class Message(models.Model):
     
     def __str__(self):
         return f"{self.role}: {self.content[:50]}..."
+
+
+class GenerationTelemetry(models.Model):
+    """
+    Timings of the turn that produced an assistant message.
+    
+    Durations are whole milliseconds. Load, prefill and decode times and the
+    token counts come from Ollama; time to first token and the stage timings
+    are measured by the backend. Fields are null when a stage did not run
+    (e.g. cached replies or timer/notes commands).
+    """
+    
+    message = models.OneToOneField(
+        Message,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='telemetry'
+    )
+    model = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    # Model router decision ('<tier>:<reason>'), empty when routing is off
+    route = models.CharField(max_length=50, blank=True, default='')
+    escalated = models.BooleanField(default=False, help_text='Regenerated with the full model')
+    
+    # Reported by Ollama
+    load_ms = models.PositiveIntegerField(null=True, blank=True, help_text='Time spent loading the model')
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True)
+    prefill_ms = models.PositiveIntegerField(null=True, blank=True, help_text='Prompt evaluation time')
+    completion_tokens = models.PositiveIntegerField(null=True, blank=True)
+    decode_ms = models.PositiveIntegerField(null=True, blank=True, help_text='Generation time')
+    
+    # Measured by the backend
+    ttft_ms = models.PositiveIntegerField(null=True, blank=True, help_text='Time to first streamed token')
+    detection_ms = models.PositiveIntegerField(null=True, blank=True)
+    context_ms = models.PositiveIntegerField(null=True, blank=True, help_text='History and memory assembly')
+    abilities_ms = models.PositiveIntegerField(null=True, blank=True, help_text='Timer and notes checks')
+    history_ms = models.PositiveIntegerField(null=True, blank=True, help_text='History fetch (overlaps abilities)')
+    memories_ms = models.PositiveIntegerField(null=True, blank=True, help_text='Memory fetch (overlaps history)')
+    generation_ms = models.PositiveIntegerField(null=True, blank=True)
+    persistence_ms = models.PositiveIntegerField(null=True, blank=True)
+    total_ms = models.PositiveIntegerField(null=True, blank=True)
+    
+    STAGE_FIELDS = [
+        'load_ms', 'prompt_tokens', 'prefill_ms', 'completion_tokens', 'decode_ms',
+        'ttft_ms', 'detection_ms', 'context_ms', 'abilities_ms', 'history_ms', 'memories_ms',
+        'generation_ms', 'persistence_ms', 'total_ms',
+    ]
+    
+    class Meta:
+        db_table = 'generation_telemetry'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['model', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.model}: {self.total_ms}ms"
+    
+    @classmethod
+    def daily_summary(cls, days: int = 7, model: str = None):
+        """
+        Average timings per model and day.
+        
+        Args:
+            days: How many days back to include
+            model: Only include this model
+            
+        Returns:
+            Values queryset of dicts with day, model, turns and avg_<field> for each timing
+        """
+        from datetime import timedelta
+        from django.db.models import Avg, Count
+        from django.db.models.functions import TruncDate
+        from django.utils import timezone
+        
+        queryset = cls.objects.filter(created_at__gte=timezone.now() - timedelta(days=days))
+        if model:
+            queryset = queryset.filter(model=model)
+        
+        return (
+            queryset
+            .annotate(day=TruncDate('created_at'))
+            .values('day', 'model')
+            .annotate(turns=Count('message'), **{f"avg_{name}": Avg(name) for name in cls.STAGE_FIELDS})
+            .order_by('-day', 'model')
+        )
+
+
+class Embedding(models.Model):
+    """
+    Embedding vector of a piece of text, keyed by model and content hash.
+    
+    Vectors are stored as little-endian float32 bytes (4 bytes per dimension),
+    so identical texts (memories, messages, notes) are embedded only once.
+    """
+    
+    model = models.CharField(max_length=100)
+    content_hash = models.CharField(max_length=64, help_text='SHA-256 of the embedded text')
+    dimensions = models.PositiveIntegerField()
+    vector = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'embeddings'
+        unique_together = [['model', 'content_hash']]
+    
+    def __str__(self):
+        return f"{self.model}: {self.content_hash[:12]} ({self.dimensions}d)"
+
+
+class ConversationSummary(models.Model):
+    """
+    One node of a conversation's rolling summary.
+    
+    Level 1 nodes summarize a run of consecutive messages; when a level holds
+    too many nodes, its oldest ones are merged into a node one level up. In
+    start order the nodes cover everything from the first message up to
+    ``end_at`` of the newest node, coarser the further back they reach.
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='summaries')
+    level = models.PositiveSmallIntegerField(default=1)
+    content = models.TextField()
+    message_count = models.PositiveIntegerField(help_text='Messages covered by this node')
+    start_at = models.DateTimeField(help_text='Creation time of the first covered message')
+    end_at = models.DateTimeField(help_text='Creation time of the last covered message')
+    model = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'conversation_summaries'
+        ordering = ['start_at']
+        indexes = [
+            models.Index(fields=['conversation', 'level', 'start_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.conversation_id} L{self.level}: {self.start_at:%Y-%m-%d} - {self.end_at:%Y-%m-%d}"
@@ -0,0 +1,83 @@
+"""
+Unit tests for per-message generation telemetry.
+"""
+import pytest
+from datetime import timedelta
+from django.utils import timezone
+from apps.chat.models import GenerationTelemetry, Message
+from core.services.message_service import MessageService
+
+
+def _assistant_message(conversation, model='mistral:7b'):
+    return Message.objects.create(conversation=conversation, role='assistant', content='hi', model=model)
+
+
+@pytest.mark.django_db
+class TestRecordTelemetry:
+    """Test storing the timings of a turn."""
+
+    def test_merges_llm_and_stage_timings(self, test_conversation):
+        """LLM timings and service stage timings end up on one row."""
+        message = _assistant_message(test_conversation)
+        response = {
+            'content': 'hi',
+            'timings': {
+                'load_ms': 1200, 'prefill_ms': 80, 'decode_ms': 900, 'prompt_tokens': 312,
+                'completion_tokens': 45, 'ttft_ms': 1310, 'context_ms': 12, 'generation_ms': 2210,
+            },
+        }
+
+        telemetry = MessageService().record_telemetry(
+            message, response, {'detection_ms': 150, 'persistence_ms': 9, 'total_ms': 2400}
+        )
+
+        telemetry.refresh_from_db()
+        assert message.telemetry == telemetry
+        assert telemetry.model == 'mistral:7b'
+        assert telemetry.load_ms == 1200
+        assert telemetry.ttft_ms == 1310
+        assert telemetry.detection_ms == 150
+        assert telemetry.total_ms == 2400
+
+    def test_missing_timings_stay_null(self, test_conversation):
+        """Replies that never reached the LLM only get the stages that ran."""
+        message = _assistant_message(test_conversation)
+
+        telemetry = MessageService().record_telemetry(
+            message, {'content': 'Timer set.'}, {'detection_ms': None, 'persistence_ms': 5, 'total_ms': 40}
+        )
+
+        assert telemetry.prefill_ms is None
+        assert telemetry.detection_ms is None
+        assert telemetry.total_ms == 40
+
+    def test_disabled_by_setting(self, test_conversation, settings):
+        """No row is written when telemetry is turned off."""
+        settings.CHAT_TELEMETRY_ENABLED = False
+        message = _assistant_message(test_conversation)
+
+        assert MessageService().record_telemetry(message, {}, {'total_ms': 1}) is None
+        assert not GenerationTelemetry.objects.exists()
+
+
+@pytest.mark.django_db
+class TestDailySummary:
+    """Test aggregating telemetry by model and day."""
+
+    def test_groups_by_model_and_day(self, test_conversation):
+        """Averages are computed per model for each day."""
+        for model, total in [('mistral:7b', 1000), ('mistral:7b', 3000), ('llama3:8b', 500)]:
+            GenerationTelemetry.objects.create(
+                message=_assistant_message(test_conversation, model), model=model, total_ms=total
+            )
+        old = GenerationTelemetry.objects.create(
+            message=_assistant_message(test_conversation), model='mistral:7b', total_ms=9000
+        )
+        GenerationTelemetry.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=30))
+
+        rows = {row['model']: row for row in GenerationTelemetry.daily_summary(days=7)}
+
+        assert rows['mistral:7b']['turns'] == 2
+        assert rows['mistral:7b']['avg_total_ms'] == 2000
+        assert rows['llama3:8b']['turns'] == 1
+        assert list(GenerationTelemetry.daily_summary(days=7, model='llama3:8b'))[0]['avg_total_ms'] == 500
@@ -4,7 +4,7 @@ Django base settings for Bruno PA project.
 
 import os
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -118,6 +118,11 @@ else:
             }
         }
 
+# Seconds a DB connection is kept for reuse (0: closed after every request). Parallel
+# reads (CHAT_PARALLEL_DB_READS) would otherwise open a connection per read
+DATABASES['default']['CONN_MAX_AGE'] = config('DB_CONN_MAX_AGE', default=60, cast=int)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -193,10 +198,165 @@ JWT_REFRESH_TOKEN_EXPIRE_DAYS = config('JWT_REFRESH_TOKEN_EXPIRE_DAYS', default=
 
 # LLM Provider Settings
 OPENAI_API_KEY = config('OPENAI_API_KEY', default='')
+# OpenAI-compatible chat completions endpoint for agents with llm_provider 'openai'
+# or 'vllm' (OpenAI itself, or a self-hosted vLLM/TGI/llama.cpp server)
+OPENAI_BASE_URL = config('OPENAI_BASE_URL', default='https://api.openai.com/v1')
+OPENAI_REQUEST_TIMEOUT = config('OPENAI_REQUEST_TIMEOUT', default=120.0, cast=float)
+# Concurrent calls per process; continuous-batching servers take many more than Ollama
+OPENAI_MAX_CONCURRENCY = config('OPENAI_MAX_CONCURRENCY', default=32, cast=int)
 OLLAMA_BASE_URL = config('OLLAMA_BASE_URL', default='http://localhost:11434')
+# Comma-separated Ollama hosts to balance across (defaults to OLLAMA_BASE_URL)
+OLLAMA_BASE_URLS = config('OLLAMA_BASE_URLS', default=OLLAMA_BASE_URL, cast=Csv())
+# Keep a conversation on the same host so its KV cache stays warm
+OLLAMA_STICKY_ROUTING = config('OLLAMA_STICKY_ROUTING', default=True, cast=bool)
+OLLAMA_HEALTH_CHECK_INTERVAL = config('OLLAMA_HEALTH_CHECK_INTERVAL', default=30.0, cast=float)
+# Upper bound for a single Ollama generation, in seconds
+OLLAMA_REQUEST_TIMEOUT = config('OLLAMA_REQUEST_TIMEOUT', default=120.0, cast=float)
 DEFAULT_LLM_PROVIDER = config('DEFAULT_LLM_PROVIDER', default='openai')
 DEFAULT_MODEL = config('DEFAULT_MODEL', default='gpt-4')
 
+# Ollama HTTP connection pooling (one keep-alive session per event loop)
+OLLAMA_CONNECTION_LIMIT = config('OLLAMA_CONNECTION_LIMIT', default=100, cast=int)
+OLLAMA_CONNECTION_LIMIT_PER_HOST = config('OLLAMA_CONNECTION_LIMIT_PER_HOST', default=20, cast=int)
+OLLAMA_DNS_CACHE_TTL = config('OLLAMA_DNS_CACHE_TTL', default=300, cast=int)
+OLLAMA_KEEPALIVE_TIMEOUT = config('OLLAMA_KEEPALIVE_TIMEOUT', default=60.0, cast=float)
+
+# Ollama API usage: 'chat' sends native roles to /api/chat, 'generate' flattens to /api/generate
+OLLAMA_API_MODE = config('OLLAMA_API_MODE', default='chat')
+# How long Ollama keeps a model loaded after each call
+OLLAMA_KEEP_ALIVE = config('OLLAMA_KEEP_ALIVE', default='30m')
+# Seconds between warm_models refreshes (0 = half of OLLAMA_KEEP_ALIVE)
+OLLAMA_WARM_INTERVAL = config('OLLAMA_WARM_INTERVAL', default=0.0, cast=float)
+# Model used for command detection (kept warm alongside the agents' models)
+LLM_CLASSIFIER_MODEL = config('LLM_CLASSIFIER_MODEL', default='mistral:7b')
+# Reuse Ollama's KV context per conversation so each turn only prefills the new message
+# (plus memories, summary or recalled messages the context does not hold yet). Contexts
+# are kept per worker process; a turn served by another process gets a full prompt
+OLLAMA_REUSE_CONTEXT = config('OLLAMA_REUSE_CONTEXT', default=False, cast=bool)
+OLLAMA_CONTEXT_MAX_TOKENS = config('OLLAMA_CONTEXT_MAX_TOKENS', default=8192, cast=int)
+
+# LLM response cache for low-temperature calls (in-process LRU + optional shared Redis tier)
+LLM_CACHE_MAX_ENTRIES = config('LLM_CACHE_MAX_ENTRIES', default=1024, cast=int)
+LLM_CACHE_TTL = config('LLM_CACHE_TTL', default=3600, cast=int)
+LLM_CACHE_MAX_TEMPERATURE = config('LLM_CACHE_MAX_TEMPERATURE', default=0.2, cast=float)
+LLM_CACHE_REDIS_URL = config('LLM_CACHE_REDIS_URL', default='')
+
+# Single-flight: identical concurrent LLM requests share one upstream call
+LLM_SINGLE_FLIGHT = config('LLM_SINGLE_FLIGHT', default=True, cast=bool)
+# Optional Redis URL to also deduplicate across worker processes
+LLM_SINGLE_FLIGHT_REDIS_URL = config('LLM_SINGLE_FLIGHT_REDIS_URL', default='')
+LLM_SINGLE_FLIGHT_LOCK_TTL = config('LLM_SINGLE_FLIGHT_LOCK_TTL', default=120.0, cast=float)
+
+# LLM scheduler: concurrent Ollama calls per process (interactive > classifier > background).
+# Requests only queue behind others of the same process, so priorities and per-user
+# fairness need threaded or ASGI workers (deployment/gunicorn.conf.py runs gthread)
+LLM_MAX_CONCURRENCY = config('LLM_MAX_CONCURRENCY', default=4, cast=int)
+
+# Time budget for answering one chat message (keep below the gunicorn worker timeout)
+CHAT_RESPONSE_DEADLINE = config('CHAT_RESPONSE_DEADLINE', default=25.0, cast=float)
+
+# Hedged classifier calls: duplicate a slow call on a second Ollama host
+LLM_HEDGE_REQUESTS = config('LLM_HEDGE_REQUESTS', default=False, cast=bool)
+LLM_HEDGE_PERCENTILE = config('LLM_HEDGE_PERCENTILE', default=0.95, cast=float)
+# Hedge delay in seconds until enough latencies are known for the percentile
+LLM_HEDGE_DEFAULT_DELAY = config('LLM_HEDGE_DEFAULT_DELAY', default=0.5, cast=float)
+
+# Micro-batching: concurrent command detections share one LLM call under load
+LLM_BATCH_CLASSIFIERS = config('LLM_BATCH_CLASSIFIERS', default=True, cast=bool)
+LLM_BATCH_WINDOW_MS = config('LLM_BATCH_WINDOW_MS', default=5.0, cast=float)
+LLM_BATCH_MAX_SIZE = config('LLM_BATCH_MAX_SIZE', default=8, cast=int)
+
+# Embeddings: Ollama /api/embed model, texts per request and the in-process vector cache
+EMBEDDING_MODEL = config('EMBEDDING_MODEL', default='nomic-embed-text')
+EMBEDDING_BATCH_SIZE = config('EMBEDDING_BATCH_SIZE', default=64, cast=int)
+EMBEDDING_BATCH_WINDOW_MS = config('EMBEDDING_BATCH_WINDOW_MS', default=5.0, cast=float)
+EMBEDDING_CACHE_SIZE = config('EMBEDDING_CACHE_SIZE', default=5000, cast=int)
+# Store vectors in the embeddings table so every worker reuses them
+EMBEDDING_PERSIST = config('EMBEDDING_PERSIST', default=True, cast=bool)
+
+# Prompt token budget per chat turn (system prompt, message, memories, then recent history)
+LLM_PROMPT_TOKEN_BUDGET = config('LLM_PROMPT_TOKEN_BUDGET', default=3072, cast=int)
+# Longer messages and memories are truncated to this many tokens
+LLM_MAX_MESSAGE_TOKENS = config('LLM_MAX_MESSAGE_TOKENS', default=1024, cast=int)
+# Candidates fetched for the budget to choose from
+LLM_CONTEXT_HISTORY_LIMIT = config('LLM_CONTEXT_HISTORY_LIMIT', default=50, cast=int)
+LLM_CONTEXT_MEMORY_LIMIT = config('LLM_CONTEXT_MEMORY_LIMIT', default=20, cast=int)
+
+# Store per-turn generation timings with each assistant message (GenerationTelemetry)
+CHAT_TELEMETRY_ENABLED = config('CHAT_TELEMETRY_ENABLED', default=True, cast=bool)
+
+# Speculative replies while the command detector runs: 'off', 'context' (assemble
+# history and memories meanwhile) or 'generate' (also start a conversational reply)
+CHAT_SPECULATION = config('CHAT_SPECULATION', default='context')
+
+# Fetch history and memories on worker threads so they overlap each other and the
+# timer/notes checks (off: every ORM call of a turn runs on the request thread)
+CHAT_PARALLEL_DB_READS = config('CHAT_PARALLEL_DB_READS', default=True, cast=bool)
+
+# Rolling conversation summaries (summarize_conversations command): messages older than
+# the newest CHAT_SUMMARY_KEEP_RECENT are folded, CHUNK_MESSAGES at a time, into summary
+# nodes; FANOUT nodes of a level are merged one level up. The prompt carries up to
+# CHAT_SUMMARY_PROMPT_TOKENS of summary in place of the covered history
+CHAT_SUMMARY_ENABLED = config('CHAT_SUMMARY_ENABLED', default=True, cast=bool)
+# Model writing the summaries; empty uses each conversation's agent model
+CHAT_SUMMARY_MODEL = config('CHAT_SUMMARY_MODEL', default='')
+CHAT_SUMMARY_KEEP_RECENT = config('CHAT_SUMMARY_KEEP_RECENT', default=20, cast=int)
+CHAT_SUMMARY_CHUNK_MESSAGES = config('CHAT_SUMMARY_CHUNK_MESSAGES', default=20, cast=int)
+CHAT_SUMMARY_FANOUT = config('CHAT_SUMMARY_FANOUT', default=4, cast=int)
+CHAT_SUMMARY_NODE_TOKENS = config('CHAT_SUMMARY_NODE_TOKENS', default=150, cast=int)
+CHAT_SUMMARY_PROMPT_TOKENS = config('CHAT_SUMMARY_PROMPT_TOKENS', default=768, cast=int)
+
+# Semantic recall: past messages similar to the new one (from a per-user vector index
+# over EMBEDDING_MODEL vectors) are added to the prompt. Indexes switch from exact
+# NumPy search to an inverted file (CHAT_RECALL_NPROBE lists searched) at
+# CHAT_RECALL_ANN_THRESHOLD messages; recall is skipped after CHAT_RECALL_TIMEOUT seconds
+CHAT_RECALL_ENABLED = config('CHAT_RECALL_ENABLED', default=False, cast=bool)
+CHAT_RECALL_TOP_K = config('CHAT_RECALL_TOP_K', default=4, cast=int)
+CHAT_RECALL_MIN_SCORE = config('CHAT_RECALL_MIN_SCORE', default=0.5, cast=float)
+CHAT_RECALL_PROMPT_TOKENS = config('CHAT_RECALL_PROMPT_TOKENS', default=512, cast=int)
+CHAT_RECALL_ANN_THRESHOLD = config('CHAT_RECALL_ANN_THRESHOLD', default=20000, cast=int)
+CHAT_RECALL_NPROBE = config('CHAT_RECALL_NPROBE', default=16, cast=int)
+# User indexes kept in memory per process
+CHAT_RECALL_MAX_USERS = config('CHAT_RECALL_MAX_USERS', default=32, cast=int)
+CHAT_RECALL_TIMEOUT = config('CHAT_RECALL_TIMEOUT', default=1.0, cast=float)
+
+# Tool calling: the model may call the registered abilities (time, calculator,
+# web search) for up to CHAT_TOOLS_MAX_STEPS steps per reply; the calls of a step
+# run concurrently, each cut off after CHAT_TOOL_TIMEOUT seconds, and results of
+# idempotent abilities are reused for CHAT_TOOL_CACHE_TTL seconds. The model must
+# support tools (e.g. llama3.1, qwen2.5, mistral-nemo).
+# Trade-off: every step is streamed and shared through single-flight, and the tool
+# loop only continues when a step's stream ends with tool calls, so replies that
+# need no tool stream as before. But each turn goes to /api/chat with the tool
+# schemas in the prompt (more prompt tokens), so OLLAMA_REUSE_CONTEXT has no effect,
+# and any text a model sends along with its tool calls is streamed too
+CHAT_TOOLS_ENABLED = config('CHAT_TOOLS_ENABLED', default=False, cast=bool)
+CHAT_TOOLS_MAX_STEPS = config('CHAT_TOOLS_MAX_STEPS', default=3, cast=int)
+CHAT_TOOL_TIMEOUT = config('CHAT_TOOL_TIMEOUT', default=5.0, cast=float)
+CHAT_TOOL_CACHE_TTL = config('CHAT_TOOL_CACHE_TTL', default=300.0, cast=float)
+
+# Cascade routing: easy turns (greetings, acknowledgements, task confirmations,
+# short messages in short conversations) go to this smaller model; empty = off
+CHAT_CASCADE_SMALL_MODEL = config('CHAT_CASCADE_SMALL_MODEL', default='')
+CHAT_CASCADE_MAX_WORDS = config('CHAT_CASCADE_MAX_WORDS', default=12, cast=int)
+CHAT_CASCADE_MAX_HISTORY = config('CHAT_CASCADE_MAX_HISTORY', default=20, cast=int)
+# Regenerate with the agent's model when the small model fails or replies empty
+CHAT_CASCADE_ESCALATE = config('CHAT_CASCADE_ESCALATE', default=True, cast=bool)
+
+# Load shedding: while the LLM is saturated (deep scheduler queue, too many turns in
+# flight or slow recent turns) only timer and notes commands are processed; other
+# messages get a busy reply ('busy') or a 503 with Retry-After ('503').
+# The queue depth is per worker process. With LOAD_SHEDDING_REDIS_URL the in-flight
+# count and latency average are shared by all processes; without it latency is
+# averaged per process and LOAD_SHEDDING_MAX_IN_FLIGHT is not applied
+LOAD_SHEDDING_ENABLED = config('LOAD_SHEDDING_ENABLED', default=True, cast=bool)
+LOAD_SHEDDING_MAX_QUEUE = config('LOAD_SHEDDING_MAX_QUEUE', default=8, cast=int)
+LOAD_SHEDDING_MAX_LATENCY_MS = config('LOAD_SHEDDING_MAX_LATENCY_MS', default=15000, cast=int)
+LOAD_SHEDDING_MAX_IN_FLIGHT = config('LOAD_SHEDDING_MAX_IN_FLIGHT', default=0, cast=int)
+LOAD_SHEDDING_REDIS_URL = config('LOAD_SHEDDING_REDIS_URL', default='')
+LOAD_SHEDDING_RETRY_AFTER = config('LOAD_SHEDDING_RETRY_AFTER', default=10, cast=int)
+LOAD_SHEDDING_RESPONSE = config('LOAD_SHEDDING_RESPONSE', default='busy')
+
 # Bruno Integration Settings
 BRUNO_LOG_LEVEL = config('BRUNO_LOG_LEVEL', default='INFO')
 
@@ -16,6 +16,9 @@ INSTALLED_APPS += [
 
 MIDDLEWARE.insert(0, 'debug_toolbar.middleware.DebugToolbarMiddleware')
 
+# Report SQL queries per request in X-DB-Queries (read by chat_load_benchmark)
+MIDDLEWARE.append('apps.api.middleware.QueryCountMiddleware')
+
 INTERNAL_IPS = [
     '127.0.0.1',
     'localhost',
@@ -3,17 +3,21 @@ Bruno Integration - Main integration module
 """
 from .bruno_core import BrunoAgent, AgentConfig
 from .bruno_llm import OllamaClient, LLMFactory
+from .openai_client import OpenAICompatibleClient
 from .bruno_memory import MemoryManager, DjangoMemoryBackend
 from .bruno_abilities import AbilityManager, Ability, create_default_abilities
+from .embeddings import EmbeddingService
 
 __all__ = [
     'BrunoAgent',
     'AgentConfig',
     'OllamaClient',
     'LLMFactory',
+    'OpenAICompatibleClient',
     'MemoryManager',
     'DjangoMemoryBackend',
     'AbilityManager',
     'Ability',
     'create_default_abilities',
+    'EmbeddingService',
 ]
@@ -1,9 +1,16 @@
 """
 Bruno Abilities - Agent capabilities and tool usage
 """
-from typing import Dict, List, Optional, Any, Callable
-import logging
+from typing import Dict, List, Optional, Any, Callable, Tuple
+from collections import OrderedDict
+import ast
+import asyncio
 import inspect
+import json
+import logging
+import operator
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +23,9 @@ class Ability:
         name: str,
         description: str,
         function: Callable,
-        parameters: Optional[Dict[str, Any]] = None
+        parameters: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        idempotent: bool = False
     ):
         """
         Initialize an ability.
@@ -26,19 +35,25 @@ class Ability:
             description: Description of what the ability does
             function: The function to execute
             parameters: JSON schema describing parameters
+            timeout: Seconds a model-requested call may take (defaults to the
+                manager's tool timeout)
+            idempotent: The result depends only on the arguments, so it may be
+                cached and shared between identical calls
         """
         self.name = name
         self.description = description
         self.function = function
         self.parameters = parameters or {}
+        self.timeout = timeout
+        self.idempotent = idempotent
     
     async def execute(self, **kwargs) -> Any:
-        """Execute the ability with given parameters."""
+        """Execute the ability with given parameters (blocking functions run in a thread)."""
         try:
             if inspect.iscoroutinefunction(self.function):
                 result = await self.function(**kwargs)
             else:
-                result = self.function(**kwargs)
+                result = await asyncio.to_thread(self.function, **kwargs)
             
             logger.info(f"Executed ability '{self.name}' successfully")
             return result
@@ -53,16 +68,72 @@ class Ability:
             "description": self.description,
             "parameters": self.parameters
         }
+    
+    def to_tool(self) -> Dict[str, Any]:
+        """Convert ability to a function tool for the chat APIs' ``tools`` field."""
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": self.parameters or {"type": "object", "properties": {}}
+            }
+        }
 
 
 class AbilityManager:
-    """Manages agent abilities and tool usage."""
+    """
+    Manages agent abilities and tool usage.
+    
+    ``execute_calls`` runs the abilities a model requested in one step
+    concurrently, each bounded by its timeout, so a step costs as long as its
+    slowest call rather than the sum. Identical calls in a step run once, and
+    results of idempotent abilities are kept for ``cache_ttl`` seconds. The
+    schemas sent with every tool-enabled LLM call are built once and rebuilt
+    only when an ability is registered.
+    
+    The lock guards the registered abilities, the two schema caches, the
+    result cache and the counters.
+    """
     
-    def __init__(self):
-        """Initialize ability manager."""
+    def __init__(
+        self,
+        default_timeout: float = 5.0,
+        cache_ttl: float = 300.0,
+        max_cached_results: int = 256
+    ):
+        """
+        Initialize ability manager.
+        
+        Args:
+            default_timeout: Seconds a model-requested call may take unless its
+                ability sets its own timeout
+            cache_ttl: Seconds idempotent results are reused (0 disables caching)
+            max_cached_results: Idempotent results to keep
+        """
         self.abilities: Dict[str, Ability] = {}
+        self.default_timeout = default_timeout
+        self.cache_ttl = cache_ttl
+        self.max_cached_results = max_cached_results
+        self._schema: Optional[List[Dict[str, Any]]] = None
+        self._tools: Optional[List[Dict[str, Any]]] = None
+        self._results: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "steps": 0, "calls": 0, "deduplicated": 0, "cache_hits": 0, "timeouts": 0, "errors": 0
+        }
         logger.info("Initialized AbilityManager")
     
+    @classmethod
+    def from_settings(cls) -> 'AbilityManager':
+        """Create an ability manager configured from Django settings."""
+        from django.conf import settings
+        
+        return cls(
+            default_timeout=getattr(settings, 'CHAT_TOOL_TIMEOUT', 5.0),
+            cache_ttl=getattr(settings, 'CHAT_TOOL_CACHE_TTL', 300.0),
+        )
+    
     def register_ability(self, ability: Ability) -> None:
         """
         Register a new ability.
@@ -70,7 +141,13 @@ class AbilityManager:
         Args:
             ability: Ability instance to register
         """
-        self.abilities[ability.name] = ability
+        with self._lock:
+            self.abilities[ability.name] = ability
+            self._schema = None
+            self._tools = None
+            self._results = OrderedDict(
+                (key, value) for key, value in self._results.items() if key[0] != ability.name
+            )
         logger.info(f"Registered ability: {ability.name}")
     
     def register_function(
@@ -78,7 +155,9 @@ class AbilityManager:
         name: str,
         description: str,
         function: Callable,
-        parameters: Optional[Dict[str, Any]] = None
+        parameters: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        idempotent: bool = False
     ) -> None:
         """
         Register a function as an ability.
@@ -88,8 +167,10 @@ class AbilityManager:
             description: Description of what it does
             function: The function to execute
             parameters: JSON schema for parameters
+            timeout: Seconds a model-requested call may take
+            idempotent: Whether results may be cached (see Ability)
         """
-        ability = Ability(name, description, function, parameters)
+        ability = Ability(name, description, function, parameters, timeout, idempotent)
         self.register_ability(ability)
     
     async def execute_ability(
@@ -113,9 +194,112 @@ class AbilityManager:
         ability = self.abilities[ability_name]
         return await ability.execute(**kwargs)
     
+    async def execute_calls(self, calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Run the ability calls a model requested in one step, concurrently.
+        
+        Failures never raise: an unknown ability, bad arguments, an error or
+        a timeout becomes an error message in that call's result, which the
+        model sees like any other result.
+        
+        Args:
+            calls: Tool calls with 'id', 'name' and 'arguments' (a dict)
+            
+        Returns:
+            One dict per call, in order, with 'id', 'name' and 'content'
+        """
+        runs: Dict[Tuple[str, str], "asyncio.Future[str]"] = {}
+        keys = []
+        for call in calls:
+            key = (call["name"], self._arguments_key(call.get("arguments")))
+            if key not in runs:
+                runs[key] = asyncio.ensure_future(self._run_call(call["name"], call.get("arguments"), key))
+            keys.append(key)
+        
+        with self._lock:
+            self._counters["steps"] += 1
+            self._counters["calls"] += len(calls)
+            self._counters["deduplicated"] += len(calls) - len(runs)
+        
+        await asyncio.gather(*runs.values())
+        
+        return [
+            {"id": call.get("id"), "name": call["name"], "content": runs[key].result()}
+            for call, key in zip(calls, keys)
+        ]
+    
+    async def _run_call(self, name: str, arguments: Any, key: Tuple[str, str]) -> str:
+        """Execute one call with its timeout, serving idempotent results from the cache."""
+        ability = self.abilities.get(name)
+        if ability is None:
+            self._count("errors")
+            return f"Error: unknown ability '{name}'"
+        if not isinstance(arguments, dict):
+            self._count("errors")
+            return f"Error: arguments for '{name}' must be a JSON object"
+        
+        cacheable = ability.idempotent and self.cache_ttl > 0
+        if cacheable:
+            cached = self._cached(key)
+            if cached is not None:
+                return cached
+        
+        timeout = ability.timeout or self.default_timeout
+        try:
+            result = await asyncio.wait_for(ability.execute(**arguments), timeout or None)
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            logger.warning(f"Ability '{name}' timed out after {timeout:.1f}s")
+            return f"Error: '{name}' did not finish within {timeout:g} seconds"
+        except Exception as e:
+            self._count("errors")
+            return f"Error running '{name}': {e}"
+        
+        content = result if isinstance(result, str) else json.dumps(result, default=str)
+        if cacheable:
+            with self._lock:
+                self._results[key] = (time.monotonic() + self.cache_ttl, content)
+                self._results.move_to_end(key)
+                while len(self._results) > self.max_cached_results:
+                    self._results.popitem(last=False)
+        return content
+    
+    def _cached(self, key: Tuple[str, str]) -> Optional[str]:
+        """An unexpired idempotent result, or None."""
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                return None
+            expires, content = entry
+            if expires <= time.monotonic():
+                del self._results[key]
+                return None
+            self._results.move_to_end(key)
+            self._counters["cache_hits"] += 1
+            return content
+    
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+    
+    @staticmethod
+    def _arguments_key(arguments: Any) -> str:
+        """Canonical form of a call's arguments (key order does not matter)."""
+        return json.dumps(arguments, sort_keys=True, default=str)
+    
     def get_abilities_schema(self) -> List[Dict[str, Any]]:
-        """Get schema of all registered abilities."""
-        return [ability.to_dict() for ability in self.abilities.values()]
+        """Get schema of all registered abilities (built once per set of abilities)."""
+        with self._lock:
+            if self._schema is None:
+                self._schema = [ability.to_dict() for ability in self.abilities.values()]
+            return self._schema
+    
+    def get_tools_schema(self) -> List[Dict[str, Any]]:
+        """Get all abilities as function tools for an LLM call (built once per set of abilities)."""
+        with self._lock:
+            if self._tools is None:
+                self._tools = [ability.to_tool() for ability in self.abilities.values()]
+            return self._tools
     
     def list_abilities(self) -> List[str]:
         """List names of all registered abilities."""
@@ -124,11 +308,22 @@ class AbilityManager:
     def get_ability(self, name: str) -> Optional[Ability]:
         """Get an ability by name."""
         return self.abilities.get(name)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return tool call counters."""
+        with self._lock:
+            return {
+                **self._counters,
+                "abilities": len(self.abilities),
+                "cached_results": len(self._results),
+                "default_timeout": self.default_timeout,
+                "cache_ttl": self.cache_ttl,
+            }
 
 
 # Built-in abilities
 def search_web(query: str) -> str:
-    """Search the web for information (placeholder)."""
+    """Search the web for information (placeholder, not registered as a tool)."""
     logger.info(f"Web search requested: {query}")
     return f"Search results for '{query}' would appear here. (Not implemented yet)"
 
@@ -140,15 +335,49 @@ def get_current_time() -> str:
     return now.strftime("%Y-%m-%d %H:%M:%S")
 
 
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+# Bounds that keep a single power well under a millisecond
+MAX_EXPONENT = 100
+MAX_POWER_BASE = 10 ** 6
+
+
+def _evaluate(node: ast.AST) -> float:
+    """Evaluate an arithmetic AST node, rejecting anything else."""
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        return _UNARY_OPS[type(node.op)](_evaluate(node.operand))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        left = _evaluate(node.left)
+        right = _evaluate(node.right)
+        if isinstance(node.op, ast.Pow) and (
+            abs(right) > MAX_EXPONENT or abs(left) > MAX_POWER_BASE
+        ):
+            raise ValueError("exponent too large")
+        return _BINARY_OPS[type(node.op)](left, right)
+    raise ValueError("unsupported expression")
+
+
 def calculate(expression: str) -> str:
     """Safely evaluate a mathematical expression."""
     try:
-        # Only allow safe mathematical operations
-        allowed_chars = set("0123456789+-*/(). ")
-        if not all(c in allowed_chars for c in expression):
-            return "Error: Invalid characters in expression"
-        
-        result = eval(expression, {"__builtins__": {}}, {})
+        # Only numbers and arithmetic operators; powers are bounded so a
+        # model-requested call cannot tie up a worker thread
+        result = _evaluate(ast.parse(expression, mode="eval"))
         return str(result)
     except Exception as e:
         return f"Error calculating: {str(e)}"
@@ -156,7 +385,7 @@ def calculate(expression: str) -> str:
 
 def create_default_abilities() -> AbilityManager:
     """Create an ability manager with default abilities."""
-    manager = AbilityManager()
+    manager = AbilityManager.from_settings()
     
     # Register built-in abilities
     manager.register_function(
@@ -170,6 +399,7 @@ def create_default_abilities() -> AbilityManager:
         name="calculate",
         description="Calculate a mathematical expression",
         function=calculate,
+        idempotent=True,
         parameters={
             "type": "object",
             "properties": {
@@ -182,20 +412,4 @@ def create_default_abilities() -> AbilityManager:
         }
     )
     
-    manager.register_function(
-        name="search_web",
-        description="Search the web for information",
-        function=search_web,
-        parameters={
-            "type": "object",
-            "properties": {
-                "query": {
-                    "type": "string",
-                    "description": "Search query"
-                }
-            },
-            "required": ["query"]
-        }
-    )
-    
     return manager
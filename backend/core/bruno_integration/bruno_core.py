@@ -1,9 +1,19 @@
 """
 Bruno Core - Core agent functionality
 """
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Awaitable, Callable, Tuple
 from dataclasses import dataclass
+from datetime import datetime
+import asyncio
 import logging
+import time
+
+from .context_budget import (
+    ContextBuilder, ContextReport, context_builder as default_context_builder, log_context_report
+)
+from .deadlines import Deadline, DeadlineExceeded
+from .intent_router import Intent, IntentRouter
+from .prompt_engine import TASK_COMMAND_INSTRUCTION
 
 logger = logging.getLogger(__name__)
 
@@ -19,15 +29,62 @@ class AgentConfig:
     llm_provider: str = "ollama"
 
 
+class _DeltaGate:
+    """Holds streamed deltas back until ``open()``, then passes them through."""
+    
+    def __init__(self, on_delta: Callable[[str], Awaitable[None]]):
+        self.on_delta = on_delta
+        self.buffer: List[str] = []
+        self.is_open = False
+    
+    async def send(self, text: str) -> None:
+        if self.is_open:
+            await self.on_delta(text)
+        else:
+            self.buffer.append(text)
+    
+    async def open(self) -> None:
+        """Flush held deltas in order; later ones are sent directly."""
+        while self.buffer:
+            await self.on_delta(self.buffer.pop(0))
+        self.is_open = True
+
+
 class BrunoAgent:
     """Core Bruno AI Agent."""
     
-    def __init__(self, config: AgentConfig, llm_client, memory_manager=None, notes_ability=None, timer_ability=None):
+    def __init__(
+        self,
+        config: AgentConfig,
+        llm_client,
+        memory_manager=None,
+        notes_ability=None,
+        timer_ability=None,
+        context_builder: Optional[ContextBuilder] = None,
+        model_router=None,
+        intent_router: Optional[IntentRouter] = None,
+        summarizer=None,
+        recall=None,
+        tools=None,
+        max_tool_steps: int = 3
+    ):
         self.config = config
+        self.context_builder = context_builder or default_context_builder
         self.llm_client = llm_client
         self.memory_manager = memory_manager
         self.notes_ability = notes_ability
         self.timer_ability = timer_ability
+        # Decides which ability (if any) a message is for and dispatches to it
+        self.intent_router = intent_router or IntentRouter(timer_ability, notes_ability)
+        # Optional cascade router (core.services.model_router) picking a model per turn
+        self.model_router = model_router
+        # Optional rolling summarizer (conversation_summary) standing in for older history
+        self.summarizer = summarizer
+        # Optional semantic recall (semantic_recall) adding relevant past turns
+        self.recall = recall
+        # Optional ability manager (bruno_abilities) whose abilities the model may call
+        self.tools = tools
+        self.max_tool_steps = max_tool_steps
         logger.info(f"Initialized BrunoAgent: {config.name} with {config.llm_provider}/{config.model}")
     
     async def process_message(
@@ -35,7 +92,11 @@ class BrunoAgent:
         user_message: str,
         conversation_id: str,
         user_id: str = None,
-        context: Optional[Dict[str, Any]] = None
+        context: Optional[Dict[str, Any]] = None,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+        deadline: Optional[Deadline] = None,
+        task_decision: Optional[Awaitable[bool]] = None,
+        speculate_generation: bool = False
     ) -> Dict[str, Any]:
         """
         Process a user message and generate a response.
@@ -44,126 +105,136 @@ class BrunoAgent:
             user_message: The user's input message
             conversation_id: ID of the conversation
             user_id: ID of the user (for notes functionality)
-            context: Additional context for the conversation
+            context: Additional context for the conversation; "intent" may
+                hold the intent router's classification of the message, so it
+                is not classified again
+            on_delta: Optional coroutine receiving text deltas as the LLM streams
+            deadline: Time budget for the reply, passed on to the LLM call
+            task_decision: Awaitable resolving to whether the message is a task
+                command, used instead of context["is_task_command"] while the
+                command detector is still running; context is assembled meanwhile
+            speculate_generation: With task_decision, start a conversational reply
+                before the decision arrives (its deltas are held back until then)
             
         Returns:
-            Dict containing response, tokens used, and metadata
+            Dict containing response, tokens used, and metadata; 'model' is the
+            model that answered. 'timings' holds abilities_ms and, for LLM
+            replies, the LLM client's timings plus history_ms, memories_ms,
+            summary_ms and recall_ms (when configured), context_ms (all
+            assembly until generation starts) and generation_ms. 'route' has
+            the model router's decision when one is configured; 'tools' lists
+            the abilities the model called
         """
         try:
-            # Check if this is a timer command first
-            if self.timer_ability and user_id:
-                timer_response = await self.timer_ability.handle_timer_command(
-                    user_id=user_id,
-                    conversation_id=conversation_id,
-                    command=user_message
-                )
-                if timer_response:
-                    # This was a timer command - return timer response
-                    return {
-                        "content": timer_response,
-                        "model": self.config.model,
-                        "tokens_used": 0,
-                        "success": True,
-                        "is_timer_response": True
-                    }
+            context_started = time.monotonic()
+            stage_timings: Dict[str, int] = {}
             
-            # Check if this is a notes command
-            if self.notes_ability and user_id:
-                notes_response = await self.notes_ability.handle_notes_command(
-                    user_id=user_id,
-                    conversation_id=conversation_id,
-                    command=user_message
+            # History and memories are fetched while the abilities check the
+            # message; with a pending task decision this also overlaps the
+            # command detector, so memories are fetched for it as well
+            is_task_command = bool(context and context.get("is_task_command", False))
+            fetch = asyncio.ensure_future(self._load_context(
+                user_message, conversation_id, user_id,
+                with_memories=task_decision is not None or not is_task_command,
+                timings=stage_timings
+            ))
+            try:
+                ability_response = await self._run_abilities(
+                    user_message, conversation_id, user_id, context.get("intent") if context else None
                 )
-                if notes_response:
-                    # This was a notes command - return notes response
-                    return {
-                        "content": notes_response,
-                        "model": self.config.model,
-                        "tokens_used": 0,
-                        "success": True,
-                        "is_notes_response": True
-                    }
+            except BaseException:
+                fetch.cancel()
+                raise
+            stage_timings["abilities_ms"] = round((time.monotonic() - context_started) * 1000)
             
-
-            # Get conversation history from memory if available
-            conversation_history = []
-            if self.memory_manager:
-                conversation_history = await self.memory_manager.get_history(
-                    conversation_id, limit=10
-                )
+            if ability_response:
+                # The message was a timer or notes command; the context is not needed
+                fetch.cancel()
+                await asyncio.gather(fetch, return_exceptions=True)
+                return {
+                    **ability_response,
+                    "model": self.config.model,
+                    "tokens_used": 0,
+                    "success": True,
+                    "timings": {"abilities_ms": stage_timings["abilities_ms"]}
+                }
             
-            logger.info(f"Conversation history retrieved: {len(conversation_history)} messages for {conversation_id}")
-            for i, msg in enumerate(conversation_history):
-                logger.info(f"  History {i+1}: [{msg['role']}] {msg['content'][:50]}...")
+            history, memories, format_memories, summary, recalled = await fetch
             
-            # Build messages for LLM
-            system_prompt = self.config.system_prompt
-            
-            # For task commands, prepend instruction for concise response
-            is_task_command = context and context.get("is_task_command", False)
-            if is_task_command:
-                logger.info("🔍 Task command detected - using concise response mode")
-                system_prompt = (
-                    "**CRITICAL INSTRUCTION: This is a TASK COMMAND (timer/reminder/note). "
-                    "You MUST respond with EXACTLY ONE SHORT sentence confirming the task. "
-                    "Example: 'Timer set for 4 minutes.' or '4-minute timer started.' "
-                    "DO NOT add any conversational text, questions, or additional commentary. "
-                    "JUST confirm the task action in 5-10 words maximum.**\n\n"
-                    + system_prompt
+            def build(is_task_command: bool):
+                # Fill the prompt budget: system prompt, current message, memories, the summary
+                # of older turns, recalled past turns, recent history.
+                # Task commands add a concise-response instruction after the history so the
+                # agent's prefix stays identical across turns
+                if is_task_command:
+                    logger.info("🔍 Task command detected - using concise response mode")
+                route = None
+                if self.model_router:
+                    route = self.model_router.route(
+                        user_message, self.config.model,
+                        history_depth=len(history), is_task_command=is_task_command
+                    )
+                model = route.model if route else self.config.model
+                messages, report = self.context_builder.build(
+                    model=model,
+                    system_prompt=self.config.system_prompt,
+                    user_message=user_message,
+                    memories=[] if is_task_command else memories,
+                    history=history,
+                    format_memories=format_memories,
+                    instruction=TASK_COMMAND_INSTRUCTION if is_task_command else None,
+                    summary=None if is_task_command or summary is None else summary.text,
+                    recalled=None if is_task_command or not recalled else self.recall.format(recalled, model)
                 )
+                log_context_report(conversation_id, report)
+                return messages, report, route
             
-            messages = [
-                {"role": "system", "content": system_prompt}
-            ]
-            
-            # Inject long-term memories into context if available (skip for task commands)
-            if user_id and not is_task_command:
-                from core.bruno_integration.memory_extraction import memory_extractor
-                memory_context = await memory_extractor.format_memories_for_context(user_id, limit=10)
-                if memory_context:
-                    messages.append({
-                        "role": "system",
-                        "content": memory_context
-                    })
-                    logger.info(f"Injected long-term memories into context for user {user_id}")
-            
-            # Add conversation history (excluding the last user message if it matches current input)
-            # This prevents duplicate messages when the current user message is already in history
-            for msg in conversation_history:
-                # Skip if this is the current user message (already in DB before this function is called)
-                if msg["role"] == "user" and msg["content"] == user_message:
-                    continue
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
-            
-            # Add current user message (might be duplicate from history, but we ensure uniqueness above)
-            messages.append({
-                "role": "user",
-                "content": user_message
-            })
-            
-            logger.info(f"Total messages being sent to LLM: {len(messages)}")
-            
-            # Generate response using LLM
-            response = await self.llm_client.generate(
-                messages=messages,
-                model=self.config.model,
-                temperature=self.config.temperature,
-                max_tokens=self.config.max_tokens
-            )
+            if task_decision is not None and speculate_generation:
+                response, context_report, route, generation_started = await self._generate_speculatively(
+                    task_decision, build, conversation_id, user_id, on_delta, deadline
+                )
+            else:
+                if task_decision is not None:
+                    is_task_command = await task_decision
+                messages, context_report, route = build(is_task_command)
+                generation_started = time.monotonic()
+                response = await self._generate(messages, route, conversation_id, user_id, on_delta, deadline)
             
             # Note: Messages are saved to database by views.py, not here
             # Memory manager only reads from database for conversation history
             
-            return {
+            result = {
                 "content": response["content"],
-                "model": self.config.model,
+                "model": response["model"],
                 "tokens_used": response.get("tokens_used", 0),
+                "prompt_tokens": context_report.total_tokens,
+                "timings": {
+                    **response.get("timings", {}),
+                    **stage_timings,
+                    "context_ms": round((generation_started - context_started) * 1000),
+                    "generation_ms": round((time.monotonic() - generation_started) * 1000)
+                },
                 "success": True
             }
+            if response.get("tools"):
+                result["tools"] = response["tools"]
+            if route:
+                result["route"] = {
+                    "tier": route.tier,
+                    "reason": route.reason,
+                    "escalated": response["model"] != route.model
+                }
+            return result
             
+        except DeadlineExceeded as e:
+            logger.warning(f"Reply for conversation {conversation_id} ran out of time: {e}")
+            return {
+                "content": "I'm sorry, that took too long to answer. Please try again.",
+                "model": self.config.model,
+                "tokens_used": 0,
+                "success": False,
+                "error": str(e)
+            }
         except Exception as e:
             logger.error(f"Error processing message: {str(e)}", exc_info=True)
             return {
@@ -174,6 +245,314 @@ class BrunoAgent:
                 "error": str(e)
             }
     
+    async def _run_abilities(
+        self,
+        user_message: str,
+        conversation_id: str,
+        user_id: Optional[str],
+        intent: Optional[Intent] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Let the timer or notes ability claim the message, via the intent router.
+        
+        Args:
+            intent: The router's classification if the caller already has it
+        
+        Returns:
+            Partial response with 'content' and is_timer_response or
+            is_notes_response, or None if neither ability claimed the message
+        """
+        return await self.intent_router.dispatch(user_message, conversation_id, user_id, intent)
+    
+    async def _load_context(
+        self,
+        user_message: str,
+        conversation_id: str,
+        user_id: Optional[str],
+        with_memories: bool = True,
+        timings: Optional[Dict[str, int]] = None
+    ) -> Tuple[List[Dict[str, str]], List[Any], Optional[Callable], Any, List[Dict[str, Any]]]:
+        """
+        Fetch the candidates the context builder chooses from.
+        
+        History, memories, the conversation summary and past messages related
+        to this one are fetched concurrently. History the summary already
+        covers is left out.
+        
+        Args:
+            timings: Receives history_ms, memories_ms, summary_ms and recall_ms
+        
+        Returns:
+            Tuple of (history, memories, format_memories, summary, recalled), where
+            summary is a RollingSummary or None and recalled a list of messages
+        """
+        timings = timings if timings is not None else {}
+        
+        async def timed(name: str, fetch: Awaitable[Any]) -> Any:
+            started = time.monotonic()
+            try:
+                return await fetch
+            finally:
+                timings[name] = round((time.monotonic() - started) * 1000)
+        
+        async def nothing() -> List[Any]:
+            return []
+        
+        async def no_summary() -> None:
+            return None
+        
+        # Conversation history (the context builder decides how much of it
+        # fits in the prompt) and long-term memories, most important first
+        # (skipped for task commands)
+        memory_extractor = None
+        if user_id and with_memories:
+            from core.bruno_integration.memory_extraction import memory_extractor
+        
+        history_fetch = asyncio.ensure_future(timed("history_ms", self.memory_manager.get_history(
+            conversation_id, limit=self.context_builder.history_limit
+        )) if self.memory_manager else nothing())
+        fetches = [
+            history_fetch,
+            asyncio.ensure_future(timed("memories_ms", memory_extractor.get_relevant_memories(
+                user_id, limit=self.context_builder.memory_limit
+            )) if memory_extractor else nothing()),
+            asyncio.ensure_future(timed("summary_ms", self.summarizer.load(conversation_id))
+                                  if self.summarizer else no_summary()),
+            # Recent turns are in the history already
+            asyncio.ensure_future(timed("recall_ms", self.recall.recall(
+                user_id, user_message, history=history_fetch
+            )) if self.recall and user_id and with_memories else nothing()),
+        ]
+        try:
+            conversation_history, memories, summary, recalled = await asyncio.gather(*fetches)
+        except BaseException:
+            # gather leaves the other fetch running when one fails
+            for fetch in fetches:
+                fetch.cancel()
+            raise
+        format_memories = memory_extractor.format_memories if memory_extractor else None
+        
+        logger.info(f"Conversation history retrieved: {len(conversation_history)} messages for {conversation_id}")
+        
+        if summary is not None:
+            covered_until = summary.covered_until
+            conversation_history = [
+                msg for msg in conversation_history
+                if "timestamp" not in msg or datetime.fromisoformat(msg["timestamp"]) > covered_until
+            ]
+        
+        # Exclude the current user message from history (already in DB before
+        # this function is called) so it is not sent twice
+        history = [
+            {"role": msg["role"], "content": msg["content"]}
+            for msg in conversation_history
+            if not (msg["role"] == "user" and msg["content"] == user_message)
+        ]
+        return history, memories, format_memories, summary, recalled
+    
+    async def _generate(
+        self,
+        messages: List[Dict[str, str]],
+        route,
+        conversation_id: str,
+        user_id: Optional[str],
+        on_delta: Optional[Callable[[str], Awaitable[None]]],
+        deadline: Optional[Deadline]
+    ) -> Dict[str, Any]:
+        """
+        Generate the reply with the routed model (the agent's model without a router).
+        
+        A small-model reply that fails or comes back empty before anything was
+        streamed is regenerated with the full model when the router allows it.
+        
+        Returns:
+            LLM response, with 'model' set to the model that produced it
+        """
+        model = route.model if route else self.config.model
+        streamed = False
+        
+        async def relay(text: str) -> None:
+            nonlocal streamed
+            streamed = True
+            await on_delta(text)
+        
+        try:
+            response = await self._call_model(
+                messages, model, conversation_id, user_id, relay if on_delta else None, deadline
+            )
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            if not route or streamed or not self.model_router.should_escalate(route, None):
+                raise
+            logger.warning(f"Small model {model} failed for conversation {conversation_id}: {e}")
+        else:
+            if not route or streamed or not self.model_router.should_escalate(route, response):
+                return response
+        
+        return await self._call_model(
+            messages, route.full_model, conversation_id, user_id, on_delta, deadline
+        )
+    
+    async def _call_model(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        conversation_id: str,
+        user_id: Optional[str],
+        on_delta: Optional[Callable[[str], Awaitable[None]]],
+        deadline: Optional[Deadline]
+    ) -> Dict[str, Any]:
+        """Call the LLM client with one model and record its latency with the router."""
+        started = time.monotonic()
+        if self.tools and self.tools.abilities:
+            response = await self._call_with_tools(messages, model, conversation_id, user_id, on_delta, deadline)
+        else:
+            response = await self.llm_client.generate(
+                messages=messages,
+                model=model,
+                temperature=self.config.temperature,
+                max_tokens=self.config.max_tokens,
+                on_delta=on_delta,
+                conversation_id=conversation_id,
+                user_id=user_id,
+                deadline=deadline
+            )
+        if self.model_router:
+            self.model_router.record(model, round((time.monotonic() - started) * 1000))
+        return {**response, "model": model}
+    
+    async def _call_with_tools(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        conversation_id: str,
+        user_id: Optional[str],
+        on_delta: Optional[Callable[[str], Awaitable[None]]],
+        deadline: Optional[Deadline]
+    ) -> Dict[str, Any]:
+        """
+        Let the model call abilities before it answers.
+        
+        Every step offers the abilities as tools and is streamed, so a reply
+        that needs no tool reaches the user as fast as without tools (and
+        identical steps still share a generation through single-flight). Only
+        when a step's stream ends with tool calls do they run, concurrently,
+        with their results appended for the next step. After max_tool_steps
+        the model answers without tools.
+        
+        Returns:
+            LLM response with 'tokens_used' summed over the steps, 'tools'
+            listing the calls made and 'tools_ms' in its timings; 'content'
+            joins the text of all steps, as streamed
+        """
+        schema = self.tools.get_tools_schema()
+        tokens_used = 0
+        tools_ms = 0
+        called: List[str] = []
+        # Text a model sends along with its tool calls was streamed too
+        streamed: List[str] = []
+        
+        for _ in range(self.max_tool_steps):
+            response = await self.llm_client.generate(
+                messages=messages,
+                model=model,
+                temperature=self.config.temperature,
+                max_tokens=self.config.max_tokens,
+                on_delta=on_delta,
+                conversation_id=conversation_id,
+                user_id=user_id,
+                deadline=deadline,
+                tools=schema
+            )
+            tokens_used += response.get("tokens_used", 0)
+            calls = response.get("tool_calls")
+            if not calls:
+                break
+            streamed.append(response.get("content", ""))
+            
+            started = time.monotonic()
+            results = await self.tools.execute_calls(calls)
+            tools_ms += round((time.monotonic() - started) * 1000)
+            called.extend(call["name"] for call in calls)
+            logger.info(f"Ran {len(calls)} tool call(s) for conversation {conversation_id}: {', '.join(c['name'] for c in calls)}")
+            messages = [
+                *messages,
+                {"role": "assistant", "content": response.get("content", ""), "tool_calls": calls},
+                *({"role": "tool", "content": r["content"], "tool_call_id": r["id"], "name": r["name"]} for r in results)
+            ]
+        else:
+            response = await self.llm_client.generate(
+                messages=messages,
+                model=model,
+                temperature=self.config.temperature,
+                max_tokens=self.config.max_tokens,
+                on_delta=on_delta,
+                conversation_id=conversation_id,
+                user_id=user_id,
+                deadline=deadline
+            )
+            tokens_used += response.get("tokens_used", 0)
+        
+        return {
+            **response,
+            "content": "".join(streamed) + response.get("content", ""),
+            "tokens_used": tokens_used,
+            "tools": called,
+            "timings": {**response.get("timings", {}), "tools_ms": tools_ms}
+        }
+    
+    async def _generate_speculatively(
+        self,
+        task_decision: Awaitable[bool],
+        build: Callable[[bool], Tuple[List[Dict[str, str]], ContextReport, Any]],
+        conversation_id: str,
+        user_id: Optional[str],
+        on_delta: Optional[Callable[[str], Awaitable[None]]],
+        deadline: Optional[Deadline]
+    ) -> Tuple[Dict[str, Any], ContextReport, Any, float]:
+        """
+        Start a conversational reply before the task decision is known.
+        
+        Deltas are held back until the decision arrives. If the message turns
+        out to be a task command the speculative reply is cancelled and a
+        concise one is generated instead.
+        
+        Returns:
+            Tuple of (LLM response, context report, route, generation start time)
+        """
+        messages, report, route = build(False)
+        generation_started = time.monotonic()
+        gate = _DeltaGate(on_delta) if on_delta else None
+        attempt = asyncio.ensure_future(self._generate(
+            messages, route, conversation_id, user_id, gate.send if gate else None, deadline
+        ))
+        
+        decided = False
+        try:
+            is_task_command = await task_decision
+            decided = True
+        finally:
+            if not decided:
+                # Let the speculative call finish cancelling (closing its stream)
+                # before the decision's error propagates
+                attempt.cancel()
+                await asyncio.gather(attempt, return_exceptions=True)
+        
+        if not is_task_command:
+            if gate:
+                await gate.open()
+            return await attempt, report, route, generation_started
+        
+        logger.info(f"Discarding speculative reply for conversation {conversation_id}: task command")
+        attempt.cancel()
+        await asyncio.gather(attempt, return_exceptions=True)
+        
+        messages, report, route = build(True)
+        generation_started = time.monotonic()
+        response = await self._generate(messages, route, conversation_id, user_id, on_delta, deadline)
+        return response, report, route, generation_started
+    
     def update_config(self, **kwargs):
         """Update agent configuration."""
         for key, value in kwargs.items():
@@ -1,20 +1,103 @@
 """
 Bruno LLM - Language model integration with Ollama support
 """
-from typing import Dict, List, Optional, Any
-import aiohttp
+from typing import Dict, List, Optional, Any, AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 import json
+import time
+from dataclasses import dataclass
+
+import aiohttp
+
+from .context_store import ConversationContextStore
+from .deadlines import Deadline, DeadlineExceeded
+from .hedging import HedgePolicy, hedge_policy as default_hedge_policy
+from .http_sessions import SessionManager, session_manager as default_session_manager
+from .json_stream import JsonValueScanner
+from .llm_cache import ResponseCache, make_request_key, response_cache as default_response_cache
+from .llm_scheduler import LLMScheduler, Priority, llm_scheduler as default_scheduler
+from .ollama_pool import OllamaPool, ollama_pool as default_pool
+from .prompt_engine import PromptEngine
+from .single_flight import SingleFlight, single_flight as default_single_flight
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class OllamaRequest:
+    """A prepared Ollama API call."""
+    path: str
+    payload: Dict[str, Any]
+
+
 class OllamaClient:
     """Client for Ollama LLM API."""
     
-    def __init__(self, base_url: str = "http://localhost:11434"):
-        self.base_url = base_url.rstrip('/')
-        logger.info(f"Initialized OllamaClient with base_url: {self.base_url}")
+    API_MODES = ('generate', 'chat')
+    
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        session_manager: Optional[SessionManager] = None,
+        api_mode: str = "generate",
+        keep_alive: Optional[str] = None,
+        context_store: Optional[ConversationContextStore] = None,
+        response_cache: Optional[ResponseCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        scheduler: Optional[LLMScheduler] = None,
+        pool: Optional[OllamaPool] = None,
+        request_timeout: Optional[float] = None,
+        hedge_policy: Optional[HedgePolicy] = None
+    ):
+        """
+        Initialize Ollama client.
+        
+        Args:
+            base_url: Single Ollama server URL; when neither this nor ``pool`` is
+                given, calls are routed across the shared pool of configured hosts
+            session_manager: Pool providing HTTP sessions (defaults to the shared pool)
+            api_mode: 'generate' flattens messages into one prompt for /api/generate,
+                'chat' sends native roles to /api/chat
+            keep_alive: How long Ollama keeps the model loaded after a call (e.g. '30m')
+            context_store: When given, the KV ``context`` Ollama returns is stored per
+                conversation and reused so later turns only prefill the new message
+                (and the memories, summary or recall the context lacks)
+            response_cache: Cache used by ``generate(cache=True)`` (defaults to the shared cache)
+            single_flight: Group coalescing identical concurrent calls (defaults to the shared group)
+            scheduler: Scheduler bounding concurrent Ollama calls (defaults to the shared scheduler)
+            pool: Pool of Ollama hosts to route calls across
+            request_timeout: Upper bound in seconds for a single generation (defaults
+                to OLLAMA_REQUEST_TIMEOUT); a caller's deadline can only shorten it
+            hedge_policy: Policy for ``generate(hedge=True)`` (defaults to the shared policy)
+        """
+        if api_mode not in self.API_MODES:
+            raise ValueError(f"Unsupported Ollama API mode: {api_mode}")
+        
+        self.session_manager = session_manager or default_session_manager
+        if pool is not None:
+            self.pool = pool
+        elif base_url:
+            self.pool = OllamaPool([base_url], health_check_interval=0, session_manager=self.session_manager)
+        else:
+            self.pool = default_pool
+        self.base_url = self.pool.primary_url
+        self.api_mode = api_mode
+        self.keep_alive = keep_alive
+        self.context_store = context_store
+        self.response_cache = response_cache or default_response_cache
+        self.single_flight = single_flight or default_single_flight
+        self.scheduler = scheduler or default_scheduler
+        self.hedge_policy = hedge_policy or default_hedge_policy
+        if request_timeout is None:
+            from django.conf import settings
+            request_timeout = getattr(settings, 'OLLAMA_REQUEST_TIMEOUT', 120.0)
+        self.request_timeout = request_timeout
+        logger.info(
+            f"Initialized OllamaClient with {len(self.pool.backends)} backend(s), "
+            f"primary {self.base_url} (mode: {api_mode})"
+        )
     
     async def generate(
         self,
@@ -22,7 +105,16 @@ class OllamaClient:
         model: str = "mistral:7b",
         temperature: float = 0.7,
         max_tokens: int = 2000,
-        stream: bool = False
+        stream: bool = False,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+        conversation_id: Optional[str] = None,
+        cache: bool = False,
+        priority: Priority = Priority.INTERACTIVE,
+        user_id: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        hedge: bool = False,
+        json_mode: bool = False,
+        tools: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """
         Generate a response using Ollama.
@@ -33,92 +125,584 @@ class OllamaClient:
             temperature: Sampling temperature (0-1)
             max_tokens: Maximum tokens to generate
             stream: Whether to stream the response
+            on_delta: Optional coroutine called with each text delta while streaming
+                (implies stream=True)
+            conversation_id: Conversation the call belongs to (enables context reuse)
+            cache: Serve/store the response from the response cache; only honoured
+                for low-temperature calls that do not reuse a KV context
+            priority: Scheduling class of the call (see LLMScheduler)
+            user_id: User the call is made for, used for fair queuing
+            deadline: Time budget of the request this call is part of; the call is
+                cancelled and DeadlineExceeded raised when it runs out
+            hedge: Send a duplicate to a second host if the call is slower than usual
+                (non-streaming calls only, and only when hedging is enabled)
+            json_mode: Constrain the output to JSON (Ollama's format mode) and stream
+                it, closing the stream as soon as one complete JSON object has
+                arrived so Ollama stops decoding; hedged calls get format mode only
+            tools: Function tools the model may call (AbilityManager.get_tools_schema);
+                such calls go to /api/chat (so no KV context is reused) and are
+                streamed like any other call when on_delta or stream is given
             
         Returns:
-            Dict with 'content', 'tokens_used', and other metadata
+            Dict with 'content', 'tokens_used', and other metadata; calls that
+            reached Ollama also carry 'timings' (see _timings), plus 'ttft_ms'
+            when streamed; 'stopped_early' is set when json_mode cut the stream;
+            'tool_calls' lists the calls the model requested ('id', 'name',
+            'arguments'), if any
+            
+        Raises:
+            DeadlineExceeded: If the deadline or request timeout passes first
         """
+        cache_key = None
+        # Tool steps run on /api/chat, where there is no KV context to reuse
+        reuses_context = bool(conversation_id and self.context_store) and not self._uses_tools(messages, tools)
+        if cache and self.response_cache.is_cacheable(temperature) and not reuses_context:
+            cache_key = self._cache_key(messages, model, temperature, max_tokens, json_mode, tools)
+            cached = await self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"LLM cache hit for model {model}")
+                if on_delta:
+                    await on_delta(cached["content"])
+                # Timings describe the original call, not this one
+                cached = {key: value for key, value in cached.items() if key != "timings"}
+                return {**cached, "tokens_used": 0, "cached": True}
+        
+        # Identical concurrent calls share one upstream generation
+        flight_key = None
+        if self.single_flight.enabled and not reuses_context:
+            flight_key = cache_key or self._cache_key(messages, model, temperature, max_tokens, json_mode, tools)
+        
+        timeout = deadline.timeout(self.request_timeout) if deadline else self.request_timeout
+        if deadline and deadline.expired:
+            raise DeadlineExceeded(f"Deadline passed before calling {model}")
+        
         try:
-            # Convert messages to Ollama format
-            prompt = self._messages_to_prompt(messages)
-            
-            payload = {
-                "model": model,
-                "prompt": prompt,
-                "temperature": temperature,
-                "options": {
-                    "num_predict": max_tokens,
-                },
-                "stream": stream
-            }
-            
-            url = f"{self.base_url}/api/generate"
+            result = await asyncio.wait_for(
+                self._generate(
+                    messages, model, temperature, max_tokens, stream, on_delta, conversation_id, flight_key,
+                    priority, user_id, hedge, json_mode, tools
+                ),
+                timeout or None
+            )
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"Ollama call to {model} timed out after {timeout:.1f}s")
+        
+        if cache_key:
+            await self.response_cache.set(cache_key, result)
+        return result
+    
+    def _cache_key(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool = False,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> str:
+        """Key identifying a call for the response cache and single-flight."""
+        params: Dict[str, Any] = {"format": "json"} if json_mode else {}
+        if tools:
+            params["tools"] = tools
+        return make_request_key(model, messages, temperature, max_tokens, api_mode=self.api_mode, **params)
+    
+    async def get_cached(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look up the cached response ``generate(..., cache=True)`` would return.
+        
+        Returns:
+            Cached response dict, or None on a miss or for uncacheable temperatures
+        """
+        if not self.response_cache.is_cacheable(temperature):
+            return None
+        return await self.response_cache.get(self._cache_key(messages, model, temperature, max_tokens, json_mode))
+    
+    async def set_cached(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        result: Dict[str, Any],
+        json_mode: bool = False
+    ) -> None:
+        """Store a response obtained some other way (e.g. from a batch) for this call."""
+        if self.response_cache.is_cacheable(temperature):
+            await self.response_cache.set(
+                self._cache_key(messages, model, temperature, max_tokens, json_mode), result
+            )
+    
+    async def _generate(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        stream: bool,
+        on_delta: Optional[Callable[[str], Awaitable[None]]],
+        conversation_id: Optional[str],
+        flight_key: Optional[str] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        user_id: Optional[str] = None,
+        hedge: bool = False,
+        json_mode: bool = False,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Run a generation against Ollama (no caching), sharing it when flight_key is set."""
+        try:
+            hedged = hedge and self._can_hedge(conversation_id)
+            if stream or on_delta or (json_mode and not hedged):
+                def open_stream():
+                    return self.generate_stream(
+                        messages=messages,
+                        model=model,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        conversation_id=conversation_id,
+                        priority=priority,
+                        user_id=user_id,
+                        json_mode=json_mode,
+                        tools=tools
+                    )
+                
+                chunks = self.single_flight.stream(f"stream:{flight_key}", open_stream) if flight_key else open_stream()
+                
+                # Handle streaming response
+                full_response = ""
+                tokens_used = 0
+                timings: Dict[str, Optional[int]] = {}
+                stopped_early = False
+                tool_calls: List[Dict[str, Any]] = []
+                started = time.monotonic()
+                first_token = None
+                async for chunk in chunks:
+                    if chunk["content"]:
+                        if first_token is None:
+                            first_token = time.monotonic()
+                        full_response += chunk["content"]
+                        if on_delta:
+                            await on_delta(chunk["content"])
+                    if chunk["done"]:
+                        tokens_used = chunk.get("tokens_used", 0)
+                        timings = dict(chunk.get("timings", {}))
+                        stopped_early = chunk.get("stopped_early", False)
+                        tool_calls = chunk.get("tool_calls", [])
+                
+                if first_token is not None:
+                    timings["ttft_ms"] = round((first_token - started) * 1000)
+                
+                result = {
+                    "content": full_response,
+                    "model": model,
+                    "tokens_used": tokens_used,
+                    "timings": timings
+                }
+                if stopped_early:
+                    result["stopped_early"] = True
+                if tool_calls:
+                    result["tool_calls"] = tool_calls
+                return result
             
-            # Create a new session for each request to avoid event loop issues with async_to_sync
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise Exception(f"Ollama API error: {response.status} - {error_text}")
-                    
-                    if stream:
-                        # Handle streaming response
-                        full_response = ""
-                        async for line in response.content:
-                            if line:
-                                data = json.loads(line.decode('utf-8'))
-                                if 'response' in data:
-                                    full_response += data['response']
+            async def call(
+                tried: Optional[List[str]] = None,
+                chosen: Optional[asyncio.Event] = None
+            ) -> Dict[str, Any]:
+                request = self._build_request(
+                    messages, model, temperature, max_tokens, False, conversation_id, json_mode, tools
+                )
+                
+                async with self.scheduler.slot(priority, user_id):
+                    async with self._post(request, conversation_id, tried, chosen) as response:
+                        if response.status != 200:
+                            error_text = await response.text()
+                            raise Exception(f"Ollama API error: {response.status} - {error_text}")
                         
-                        return {
-                            "content": full_response,
-                            "model": model,
-                            "tokens_used": 0  # Ollama doesn't provide token count in streaming
-                        }
-                    else:
                         # Handle non-streaming response
                         data = await response.json()
-                        
-                        return {
-                            "content": data.get('response', ''),
-                            "model": model,
-                            "tokens_used": data.get('eval_count', 0)
-                        }
+                
+                content = self._extract_content(data)
+                if conversation_id and self.context_store:
+                    self.context_store.save(conversation_id, model, messages, content, data.get('context'))
+                
+                result = {
+                    "content": content,
+                    "model": model,
+                    "tokens_used": data.get('eval_count', 0),
+                    "timings": self._timings(data)
+                }
+                tool_calls = self._extract_tool_calls(data)
+                if tool_calls:
+                    result["tool_calls"] = tool_calls
+                return result
+            
+            async def run() -> Dict[str, Any]:
+                return await self._hedged(model, call) if hedged else await call()
+            
+            return await self.single_flight.do(flight_key, run) if flight_key else await run()
                     
         except Exception as e:
             logger.error(f"Error generating response with Ollama: {str(e)}", exc_info=True)
             raise
     
-    def _messages_to_prompt(self, messages: List[Dict[str, str]]) -> str:
-        """Convert messages array to a single prompt string."""
-        prompt_parts = []
+    async def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "mistral:7b",
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        conversation_id: Optional[str] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        user_id: Optional[str] = None,
+        json_mode: bool = False,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a response from Ollama as it is generated.
+        
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            model: Model name to use
+            temperature: Sampling temperature (0-1)
+            max_tokens: Maximum tokens to generate
+            conversation_id: Conversation the call belongs to (enables context reuse)
+            priority: Scheduling class of the call (see LLMScheduler)
+            user_id: User the call is made for, used for fair queuing
+            json_mode: Request JSON output and end the stream (closing the
+                connection, which stops Ollama) once a complete JSON object arrived
+            tools: Function tools the model may call (sent to /api/chat)
+            
+        Yields:
+            Dicts with 'content' (text delta) and 'done'; the final chunk also
+            carries 'tokens_used' and 'timings' ('stopped_early' when json_mode
+            ended the stream, 'tool_calls' when the model requested any)
+        """
+        request = self._build_request(
+            messages, model, temperature, max_tokens, True, conversation_id, json_mode, tools
+        )
+        full_response = ""
+        tool_calls: List[Dict[str, Any]] = []
+        scanner = JsonValueScanner() if json_mode else None
+        received = 0
+        
+        async with self.scheduler.slot(priority, user_id):
+            async with self._post(request, conversation_id) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise Exception(f"Ollama API error: {response.status} - {error_text}")
+                
+                # Ollama streams newline-delimited JSON objects
+                async for line in response.content:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    data = json.loads(line.decode('utf-8'))
+                    if data.get('error'):
+                        raise Exception(f"Ollama API error: {data['error']}")
+                    
+                    chunk = {
+                        "content": self._extract_content(data),
+                        "done": bool(data.get('done', False))
+                    }
+                    received += 1
+                    
+                    end = scanner.feed(chunk["content"]) if scanner and not chunk["done"] else None
+                    if end is not None:
+                        # Everything after the JSON object would be thrown away; stop decoding it
+                        chunk["content"] = chunk["content"][:end]
+                        yield chunk
+                        response.close()
+                        logger.debug(f"Closed JSON stream from {model} after {received} chunks")
+                        yield {
+                            "content": "",
+                            "done": True,
+                            "tokens_used": received,
+                            "timings": {"completion_tokens": received},
+                            "stopped_early": True
+                        }
+                        break
+                    
+                    full_response += chunk["content"]
+                    # Ollama sends each complete tool call in one chunk
+                    tool_calls.extend(self._extract_tool_calls(data, first=len(tool_calls)))
+                    
+                    if chunk["done"]:
+                        chunk["tokens_used"] = data.get('eval_count', 0)
+                        chunk["timings"] = self._timings(data)
+                        if tool_calls:
+                            chunk["tool_calls"] = tool_calls
+                        if conversation_id and self.context_store:
+                            self.context_store.save(conversation_id, model, messages, full_response, data.get('context'))
+                    yield chunk
+                    
+                    if chunk["done"]:
+                        break
+    
+    def _can_hedge(self, conversation_id: Optional[str]) -> bool:
+        """Whether a call may be duplicated on a second host."""
+        if not self.hedge_policy.enabled or (conversation_id and self.context_store):
+            return False
+        return sum(1 for b in self.pool.backends if b.healthy) > 1
+    
+    async def _hedged(
+        self,
+        model: str,
+        call: Callable[[Optional[List[str]], Optional[asyncio.Event]], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Run ``call``, and if it is slower than the hedge delay, race a copy on another host.
+        
+        The delay starts once the primary attempt has a scheduler slot and a
+        host, so time spent queued is not mistaken for a slow host. No copy is
+        sent while other calls are queued for a slot, or when every healthy
+        host has been tried by the primary. Whichever attempt answers first
+        wins; the other is cancelled so the host stops generating for it.
+        """
+        started = time.monotonic()
+        primary_tried: List[str] = []
+        chosen = asyncio.Event()
+        tasks = [asyncio.ensure_future(call(primary_tried, chosen))]
+        self.hedge_policy.count("hedged_calls")
+        
+        try:
+            host_chosen = asyncio.ensure_future(chosen.wait())
+            try:
+                await asyncio.wait([tasks[0], host_chosen], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                host_chosen.cancel()
+            
+            if not tasks[0].done():
+                done, _ = await asyncio.wait(tasks, timeout=self.hedge_policy.delay(model))
+                others = [b for b in self.pool.backends if b.healthy and b.url not in primary_tried]
+                if not done and others and not self.scheduler.queue_depth():
+                    # A copy on a different host than the slow attempt
+                    self.hedge_policy.count("hedges_sent")
+                    tasks.append(asyncio.ensure_future(call(list(primary_tried))))
+            
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            self.hedge_policy.count("hedges_won")
+                        self.hedge_policy.record(model, time.monotonic() - started)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            # Let cancelled attempts release their slot and connection before returning
+            await asyncio.gather(*losers, return_exceptions=True)
+    
+    @asynccontextmanager
+    async def _post(
+        self,
+        request: OllamaRequest,
+        conversation_id: Optional[str] = None,
+        tried: Optional[List[str]] = None,
+        chosen: Optional[asyncio.Event] = None
+    ):
+        """
+        Send a request to a pool host, failing over to the next host if it is
+        unreachable or answers with a server error.
+        
+        Failover only happens before a response arrives; a host failing mid-stream
+        is marked down but the error reaches the caller.
+        
+        Args:
+            request: Prepared request
+            conversation_id: Conversation the call belongs to (for sticky routing)
+            tried: Hosts to avoid; hosts tried by this call are appended to it
+            chosen: Set once the first host has been picked
+        """
+        self.pool.maybe_check_health()
+        
+        # Pooled session for the running loop (safe across async_to_sync calls)
+        session = self.session_manager.get_session()
+        tried = [] if tried is None else tried
+        
+        while True:
+            backend = self.pool.choose(conversation_id, exclude=tried)
+            tried.append(backend.url)
+            if chosen is not None:
+                chosen.set()
+            try:
+                try:
+                    response = await session.post(f"{backend.url}{request.path}", json=request.payload)
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    self.pool.mark_down(backend, e)
+                    if len(tried) >= len(self.pool.backends):
+                        raise
+                    logger.warning(f"Ollama backend {backend.url} failed, trying another host")
+                    continue
+                
+                if response.status >= 500:
+                    # A failing host (out of memory, crashed runner) is treated like an unreachable one
+                    self.pool.mark_down(backend, Exception(f"HTTP {response.status}"))
+                    if len(tried) < len(self.pool.backends):
+                        response.release()
+                        logger.warning(f"Ollama backend {backend.url} answered {response.status}, trying another host")
+                        continue
+                
+                try:
+                    yield response
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    self.pool.mark_down(backend, e)
+                    raise
+                finally:
+                    response.release()
+                return
+            finally:
+                self.pool.release(backend)
+    
+    def _build_request(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        stream: bool,
+        conversation_id: Optional[str] = None,
+        json_mode: bool = False,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> OllamaRequest:
+        """Choose the endpoint for a call and build its request body."""
+        payload: Dict[str, Any] = {
+            "model": model,
+            "temperature": temperature,
+            "options": {
+                "num_predict": max_tokens,
+            },
+            "stream": stream
+        }
+        if json_mode:
+            payload["format"] = "json"
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+        
+        uses_tools = self._uses_tools(messages, tools)
         
-        for msg in messages:
-            role = msg.get('role', 'user')
-            content = msg.get('content', '')
+        if conversation_id and self.context_store and not uses_tools:
+            # /api/chat does not expose the KV context, so context reuse goes
+            # through /api/generate with the system prompt in its own field
+            system = "\n\n".join(m['content'] for m in messages if m.get('role') == 'system')
+            reusable = self.context_store.lookup(conversation_id, model, messages)
             
-            if role == 'system':
-                prompt_parts.append(f"System: {content}")
-            elif role == 'user':
-                prompt_parts.append(f"User: {content}")
-            elif role == 'assistant':
-                prompt_parts.append(f"Assistant: {content}")
+            if reusable:
+                logger.info(f"Reusing {len(reusable.tokens)} context tokens for conversation {conversation_id}")
+                payload["context"] = reusable.tokens
+                # Only the new messages (the turn, plus memories, summary or
+                # recall the context does not hold yet), rendered like a fresh prompt
+                payload["prompt"] = self._messages_to_prompt(reusable.messages)
+            else:
+                payload["system"] = system
+                payload["prompt"] = self._messages_to_prompt(
+                    [m for m in messages if m.get('role') != 'system']
+                )
+            return OllamaRequest(path="/api/generate", payload=payload)
+        
+        if self.api_mode == 'chat' or uses_tools:
+            payload["messages"] = [self._chat_message(m) for m in messages]
+            if tools:
+                payload["tools"] = tools
+            return OllamaRequest(path="/api/chat", payload=payload)
+        
+        # Convert messages to Ollama format
+        payload["prompt"] = self._messages_to_prompt(messages)
+        return OllamaRequest(path="/api/generate", payload=payload)
+    
+    @staticmethod
+    def _uses_tools(messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]]) -> bool:
+        """Whether a call offers tools or carries tool results, which only /api/chat supports."""
+        return bool(tools) or any(m.get('role') == 'tool' for m in messages)
+    
+    @staticmethod
+    def _chat_message(message: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a message, including tool calls and results, to /api/chat's format."""
+        converted = {"role": message.get('role', 'user'), "content": message.get('content', '')}
+        if message.get('tool_calls'):
+            converted["tool_calls"] = [
+                {"function": {"name": call["name"], "arguments": call["arguments"]}}
+                for call in message['tool_calls']
+            ]
+        if message.get('role') == 'tool':
+            converted["tool_name"] = message.get('name', '')
+        return converted
+    
+    @staticmethod
+    def _timings(data: Dict[str, Any]) -> Dict[str, Optional[int]]:
+        """
+        Convert Ollama's final response counters to whole milliseconds.
+        
+        Returns:
+            Dict with load_ms, prefill_ms, decode_ms, prompt_tokens and
+            completion_tokens (None where Ollama did not report them)
+        """
+        def ms(name: str) -> Optional[int]:
+            value = data.get(name)
+            return round(value / 1_000_000) if value is not None else None
         
-        prompt_parts.append("Assistant:")
-        return "\n\n".join(prompt_parts)
+        return {
+            "load_ms": ms('load_duration'),
+            "prefill_ms": ms('prompt_eval_duration'),
+            "decode_ms": ms('eval_duration'),
+            "prompt_tokens": data.get('prompt_eval_count'),
+            "completion_tokens": data.get('eval_count'),
+        }
+    
+    @staticmethod
+    def _extract_content(data: Dict[str, Any]) -> str:
+        """Get the generated text from an /api/generate or /api/chat response."""
+        if 'message' in data:
+            return data['message'].get('content', '')
+        return data.get('response', '')
+    
+    @staticmethod
+    def _extract_tool_calls(data: Dict[str, Any], first: int = 0) -> List[Dict[str, Any]]:
+        """
+        Get the tool calls from an /api/chat response (or stream chunk) as
+        dicts with 'id', 'name' and 'arguments'; calls without an ID are
+        numbered from ``first``.
+        """
+        calls = []
+        for i, call in enumerate((data.get('message') or {}).get('tool_calls') or [], first):
+            function = call.get('function') or {}
+            arguments = function.get('arguments') or {}
+            if isinstance(arguments, str):
+                try:
+                    arguments = json.loads(arguments)
+                except ValueError:
+                    pass
+            calls.append({"id": call.get('id') or f"call_{i}", "name": function.get('name', ''), "arguments": arguments})
+        return calls
+    
+    def _messages_to_prompt(self, messages: List[Dict[str, str]]) -> str:
+        """Convert messages array to a single prompt string."""
+        return PromptEngine.flatten(messages)
     
     async def list_models(self) -> List[str]:
         """List available Ollama models."""
         try:
             url = f"{self.base_url}/api/tags"
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        raise Exception(f"Failed to list models: {response.status}")
-                    
-                    data = await response.json()
-                    models = [model['name'] for model in data.get('models', [])]
-                    logger.info(f"Available Ollama models: {models}")
-                    return models
+            session = self.session_manager.get_session()
+            async with session.get(url) as response:
+                if response.status != 200:
+                    raise Exception(f"Failed to list models: {response.status}")
+                
+                data = await response.json()
+                models = [model['name'] for model in data.get('models', [])]
+                logger.info(f"Available Ollama models: {models}")
+                return models
                 
         except Exception as e:
             logger.error(f"Error listing Ollama models: {str(e)}", exc_info=True)
@@ -130,26 +714,29 @@ class OllamaClient:
             url = f"{self.base_url}/api/pull"
             payload = {"name": model}
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload) as response:
-                    if response.status != 200:
-                        raise Exception(f"Failed to pull model: {response.status}")
-                    
-                    logger.info(f"Successfully pulled model: {model}")
-                    return True
+            session = self.session_manager.get_session()
+            async with session.post(url, json=payload) as response:
+                if response.status != 200:
+                    raise Exception(f"Failed to pull model: {response.status}")
+                
+                logger.info(f"Successfully pulled model: {model}")
+                return True
                 
         except Exception as e:
             logger.error(f"Error pulling Ollama model: {str(e)}", exc_info=True)
             return False
     
     async def close(self):
-        """Close method for compatibility (no-op since we don't maintain a session)."""
-        pass
+        """Close the pooled session for the running event loop."""
+        await self.session_manager.close()
 
 
 class LLMFactory:
     """Factory for creating LLM clients."""
     
+    # Providers served by any /v1/chat/completions endpoint (OPENAI_BASE_URL)
+    OPENAI_COMPATIBLE_PROVIDERS = ('openai', 'vllm')
+    
     @staticmethod
     def create_client(provider: str, **kwargs) -> Any:
         """
@@ -157,13 +744,27 @@ class LLMFactory:
         
         Args:
             provider: LLM provider name ('ollama', 'openai', etc.)
-            **kwargs: Provider-specific configuration
+            **kwargs: Provider-specific configuration (for Ollama, ``base_url`` pins a
+                single host; otherwise the configured host pool is used; for
+                OpenAI-compatible providers, ``openai_base_url`` and ``openai_api_key``
+                override OPENAI_BASE_URL and OPENAI_API_KEY)
             
         Returns:
             LLM client instance
         """
         if provider.lower() == 'ollama':
-            base_url = kwargs.get('base_url', 'http://localhost:11434')
-            return OllamaClient(base_url=base_url)
+            return OllamaClient(
+                base_url=kwargs.get('base_url'),
+                pool=kwargs.get('pool'),
+                api_mode=kwargs.get('api_mode', 'generate'),
+                keep_alive=kwargs.get('keep_alive'),
+                context_store=kwargs.get('context_store')
+            )
+        elif provider.lower() in LLMFactory.OPENAI_COMPATIBLE_PROVIDERS:
+            from .openai_client import OpenAICompatibleClient
+            return OpenAICompatibleClient(
+                base_url=kwargs.get('openai_base_url'),
+                api_key=kwargs.get('openai_api_key')
+            )
         else:
             raise ValueError(f"Unsupported LLM provider: {provider}")
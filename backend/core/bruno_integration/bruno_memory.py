@@ -162,9 +162,9 @@ class DjangoMemoryBackend:
     ) -> List[Dict[str, Any]]:
         """Retrieve messages from Django database."""
         try:
-            from asgiref.sync import sync_to_async
+            from .db_reads import parallel_read
             
-            @sync_to_async
+            @parallel_read
             def _get():
                 queryset = self.message_model.objects.filter(
                     conversation_id=conversation_id
@@ -180,6 +180,7 @@ class DjangoMemoryBackend:
                 
                 return [
                     {
+                        "id": msg.id,
                         "role": msg.role,
                         "content": msg.content,
                         "timestamp": msg.created_at.isoformat(),
@@ -0,0 +1,376 @@
+"""
+Context Budget - Token-budgeted prompt assembly for chat turns
+"""
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass, field
+import logging
+import re
+
+if TYPE_CHECKING:
+    from .prompt_engine import PromptEngine
+
+logger = logging.getLogger(__name__)
+
+
+# Words and single punctuation/symbol characters, the units BPE tokenizers split on
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+TRUNCATION_MARKER = "\n[…]\n"
+
+
+class TokenEstimator:
+    """
+    Fast local token count estimate, tuned per model family.
+
+    Counts each punctuation or symbol character as one token and each word as
+    ``len(word) / chars_per_token`` tokens (at least one), which tracks the SentencePiece
+    and BPE vocabularies used by the Ollama models closely enough for budgeting
+    without loading a tokenizer. Every message also costs a few tokens for its
+    role markers.
+    """
+
+    # Average characters per word piece, by model name prefix
+    CHARS_PER_TOKEN = {
+        "llama": 4.0,
+        "mistral": 3.6,
+        "mixtral": 3.6,
+        "phi": 3.5,
+        "gemma": 4.2,
+        "qwen": 3.8,
+        "gpt": 4.0,
+    }
+    DEFAULT_CHARS_PER_TOKEN = 3.8
+    MESSAGE_OVERHEAD = 4
+
+    def chars_per_token(self, model: Optional[str]) -> float:
+        """Return the characters-per-token ratio used for ``model``."""
+        name = (model or "").lower().rsplit("/", 1)[-1]
+        for prefix, ratio in self.CHARS_PER_TOKEN.items():
+            if name.startswith(prefix):
+                return ratio
+        return self.DEFAULT_CHARS_PER_TOKEN
+
+    def estimate(self, text: str, model: Optional[str] = None) -> int:
+        """
+        Estimate the number of tokens in ``text``.
+
+        Args:
+            text: Text to measure
+            model: Model name used to pick the ratio
+
+        Returns:
+            Estimated token count
+        """
+        ratio = self.chars_per_token(model)
+        tokens = 0
+        for piece in _PIECES.findall(text):
+            tokens += max(1, round(len(piece) / ratio))
+        return tokens
+
+    def estimate_message(self, message: Dict[str, str], model: Optional[str] = None) -> int:
+        """Estimate the tokens a chat message costs, including role markers."""
+        return self.estimate(message["content"], model) + self.MESSAGE_OVERHEAD
+
+    def truncate(self, text: str, max_tokens: int, model: Optional[str] = None) -> str:
+        """
+        Shorten ``text`` to about ``max_tokens``, keeping its beginning and end.
+
+        Args:
+            text: Text to shorten
+            max_tokens: Token limit for the result
+            model: Model name used to pick the ratio
+
+        Returns:
+            ``text`` unchanged if it fits, otherwise its head and tail joined by a marker
+        """
+        if self.estimate(text, model) <= max_tokens:
+            return text
+
+        # Binary search the character count whose estimate fits
+        low, high = 0, len(text)
+        while low < high:
+            keep = (low + high + 1) // 2
+            head = text[:keep * 2 // 3]
+            tail = text[len(text) - (keep - len(head)):] if keep > len(head) else ""
+            if self.estimate(head + TRUNCATION_MARKER + tail, model) <= max_tokens:
+                low = keep
+            else:
+                high = keep - 1
+
+        head = text[:low * 2 // 3]
+        tail = text[len(text) - (low - len(head)):] if low > len(head) else ""
+        return head + TRUNCATION_MARKER + tail
+
+
+@dataclass
+class ContextReport:
+    """Token accounting for one assembled prompt."""
+    model: str
+    budget: int
+    system_tokens: int = 0
+    memory_tokens: int = 0
+    summary_tokens: int = 0
+    recall_tokens: int = 0
+    history_tokens: int = 0
+    message_tokens: int = 0
+    memories_used: int = 0
+    memories_dropped: int = 0
+    history_used: int = 0
+    history_dropped: int = 0
+    truncated: List[str] = field(default_factory=list)
+    segments: List[Any] = field(default_factory=list)
+
+    @property
+    def total_tokens(self) -> int:
+        return (
+            self.system_tokens + self.memory_tokens + self.summary_tokens
+            + self.recall_tokens + self.history_tokens + self.message_tokens
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the report as a plain dict for logging and metrics."""
+        return {
+            "model": self.model,
+            "budget": self.budget,
+            "total_tokens": self.total_tokens,
+            "system_tokens": self.system_tokens,
+            "memory_tokens": self.memory_tokens,
+            "summary_tokens": self.summary_tokens,
+            "recall_tokens": self.recall_tokens,
+            "history_tokens": self.history_tokens,
+            "message_tokens": self.message_tokens,
+            "memories_used": self.memories_used,
+            "memories_dropped": self.memories_dropped,
+            "history_used": self.history_used,
+            "history_dropped": self.history_dropped,
+            "truncated": list(self.truncated),
+            "segments": [segment.as_dict() for segment in self.segments],
+        }
+
+
+class ContextBuilder:
+    """
+    Fills a prompt token budget in priority order.
+
+    The system prompt always goes in. The current user message comes next and
+    is truncated only if it would not fit beside the system prompt. Memories
+    follow in the order given (most important first) while they fit, then
+    the conversation summary (capped at ``max_summary_tokens``) and the
+    recalled past messages (capped at ``max_recall_tokens``), then history is
+    added newest first until the budget runs out; the first history message
+    that does not fit ends the window so the model never sees a gap. Any
+    single memory, history or user message longer than ``max_message_tokens``
+    is truncated to that size first.
+
+    The chosen parts are laid out by the PromptEngine in a stable order
+    (system prompt, memories, summary, history, then the per-turn recall,
+    instruction and message) so consecutive turns share the longest possible
+    prefix.
+    """
+
+    def __init__(
+        self,
+        max_prompt_tokens: int = 3072,
+        max_message_tokens: int = 1024,
+        history_limit: int = 50,
+        memory_limit: int = 20,
+        max_summary_tokens: int = 768,
+        max_recall_tokens: int = 512,
+        estimator: Optional[TokenEstimator] = None,
+        engine: Optional['PromptEngine'] = None
+    ):
+        """
+        Initialize context builder.
+
+        Args:
+            max_prompt_tokens: Token budget for the whole prompt
+            max_message_tokens: Longest any single message may be before truncation
+            history_limit: History messages to fetch as candidates for the budget
+            memory_limit: Memories to fetch as candidates for the budget
+            max_summary_tokens: Most the conversation summary may take of the budget
+            max_recall_tokens: Most the recalled past messages may take of the budget
+            estimator: Token estimator (defaults to TokenEstimator())
+            engine: Prompt engine ordering and caching segments (defaults to the
+                shared engine, or one using ``estimator`` when that is given)
+        """
+        from .prompt_engine import PromptEngine, prompt_engine
+
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_message_tokens = max_message_tokens
+        self.history_limit = history_limit
+        self.memory_limit = memory_limit
+        self.max_summary_tokens = max_summary_tokens
+        self.max_recall_tokens = max_recall_tokens
+        self.estimator = estimator or TokenEstimator()
+        if engine is None:
+            engine = PromptEngine(self.estimator) if estimator else prompt_engine
+        self.engine = engine
+
+    @classmethod
+    def from_settings(cls) -> 'ContextBuilder':
+        """Create a context builder configured from Django settings."""
+        from django.conf import settings
+
+        return cls(
+            max_prompt_tokens=getattr(settings, 'LLM_PROMPT_TOKEN_BUDGET', 3072),
+            max_message_tokens=getattr(settings, 'LLM_MAX_MESSAGE_TOKENS', 1024),
+            history_limit=getattr(settings, 'LLM_CONTEXT_HISTORY_LIMIT', 50),
+            memory_limit=getattr(settings, 'LLM_CONTEXT_MEMORY_LIMIT', 20),
+            max_summary_tokens=getattr(settings, 'CHAT_SUMMARY_PROMPT_TOKENS', 768),
+            max_recall_tokens=getattr(settings, 'CHAT_RECALL_PROMPT_TOKENS', 512),
+        )
+
+    def build(
+        self,
+        model: str,
+        system_prompt: str,
+        user_message: str,
+        memories: Optional[List[Dict[str, Any]]] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+        format_memories: Optional[Callable[[List[Dict[str, Any]]], str]] = None,
+        instruction: Optional[str] = None,
+        summary: Optional[str] = None,
+        recalled: Optional[str] = None
+    ) -> Tuple[List[Dict[str, str]], ContextReport]:
+        """
+        Assemble the chat messages for one turn within the token budget.
+
+        Args:
+            model: Model the prompt is for (selects the token ratio)
+            system_prompt: System prompt, always included in full
+            user_message: The current user message
+            memories: Memory dicts with a ``value`` key, most important first
+            history: Earlier messages, oldest first
+            format_memories: Turns the selected memories into one system message
+            instruction: Per-turn system instruction (e.g. for task commands),
+                always included and placed right before the current message
+            summary: Rolling summary of the conversation before ``history``
+            recalled: Past messages relevant to this turn, from semantic recall
+
+        Returns:
+            Tuple of (messages, ContextReport); the report lists each segment's size
+        """
+        from .prompt_engine import PromptSegment
+
+        estimator = self.estimator
+        budget = self.max_prompt_tokens
+        report = ContextReport(model=model, budget=budget)
+
+        engine = self.engine
+        segments = [engine.prefix(system_prompt, model)]
+        if instruction:
+            segments.append(engine.instruction(instruction, model))
+        report.system_tokens = sum(segment.tokens for segment in segments)
+        if report.system_tokens > budget:
+            logger.warning(
+                f"System prompt alone is {report.system_tokens} tokens, over the {budget} token budget"
+            )
+
+        # Current message: capped per message and by what is left after the system prompt
+        room = max(budget - report.system_tokens - estimator.MESSAGE_OVERHEAD, 0)
+        limit = min(self.max_message_tokens, room)
+        content = estimator.truncate(user_message, limit, model)
+        if content != user_message:
+            report.truncated.append("message")
+        current = {"role": "user", "content": content}
+        report.message_tokens = estimator.estimate_message(current, model)
+        segments.append(PromptSegment("message", [current], report.message_tokens))
+        remaining = budget - report.system_tokens - report.message_tokens
+
+        # Memories, chosen most important first, rendered in a stable order
+        # as a single system message
+        if memories and format_memories:
+            selected = []
+            for memory in memories:
+                candidate = selected + [self._cap_memory(memory, model, report)]
+                tokens = estimator.estimate_message(
+                    {"role": "system", "content": format_memories(engine.order_memories(candidate))}, model
+                )
+                if tokens > remaining:
+                    break
+                selected = candidate
+                report.memory_tokens = tokens
+            report.memories_used = len(selected)
+            report.memories_dropped = len(memories) - len(selected)
+            if selected:
+                memory_message = {"role": "system", "content": format_memories(engine.order_memories(selected))}
+                segments.append(PromptSegment("memories", [memory_message], report.memory_tokens))
+                remaining -= report.memory_tokens
+
+        # Conversation summary and recalled messages, each shortened to its cap and what is left
+        for name, text, cap in (("summary", summary, self.max_summary_tokens),
+                                ("recall", recalled, self.max_recall_tokens)):
+            segment = self._capped(name, text, min(cap, remaining), model, report)
+            if segment:
+                segments.append(segment)
+                setattr(report, f"{name}_tokens", segment.tokens)
+                remaining -= segment.tokens
+
+        # History, newest first, stopping at the first message that does not fit
+        kept: List[Dict[str, str]] = []
+        history = history or []
+        for msg in reversed(history):
+            content = estimator.truncate(msg["content"], self.max_message_tokens, model)
+            entry = {"role": msg["role"], "content": content}
+            tokens = estimator.estimate_message(entry, model)
+            if tokens > remaining:
+                break
+            if content != msg["content"]:
+                report.truncated.append("history")
+            kept.append(entry)
+            remaining -= tokens
+            report.history_tokens += tokens
+        kept.reverse()
+        report.history_used = len(kept)
+        report.history_dropped = len(history) - len(kept)
+        if kept:
+            segments.append(PromptSegment("history", kept, report.history_tokens))
+
+        report.segments = engine.order(segments)
+        return engine.messages(report.segments), report
+
+    def _capped(self, name: str, text: Optional[str], max_tokens: int, model: str, report: ContextReport):
+        """A system segment holding ``text`` shortened to ``max_tokens``, or None."""
+        from .prompt_engine import PromptSegment
+
+        limit = max_tokens - self.estimator.MESSAGE_OVERHEAD
+        if not text or limit <= 0:
+            return None
+        content = self.estimator.truncate(text, limit, model)
+        if content != text:
+            report.truncated.append(name)
+        message = {"role": "system", "content": content}
+        return PromptSegment(name, [message], self.estimator.estimate_message(message, model))
+
+    def _cap_memory(self, memory: Dict[str, Any], model: str, report: ContextReport) -> Dict[str, Any]:
+        """Return ``memory`` with an over-long value truncated."""
+        value = str(memory.get("value", ""))
+        capped = self.estimator.truncate(value, self.max_message_tokens, model)
+        if capped == value:
+            return memory
+        if "memory" not in report.truncated:
+            report.truncated.append("memory")
+        return {**memory, "value": capped}
+
+
+def log_context_report(conversation_id: str, report: ContextReport) -> None:
+    """Log the size of an assembled prompt for capacity planning."""
+    logger.info(
+        f"Prompt for conversation {conversation_id} ({report.model}): "
+        f"{report.total_tokens}/{report.budget} tokens "
+        f"[system={report.system_tokens} memories={report.memory_tokens} "
+        f"({report.memories_used} used, {report.memories_dropped} dropped) "
+        f"summary={report.summary_tokens} recall={report.recall_tokens} "
+        f"history={report.history_tokens} ({report.history_used} used, {report.history_dropped} dropped) "
+        f"message={report.message_tokens}"
+        + (f" truncated={','.join(report.truncated)}" if report.truncated else "")
+        + "]"
+    )
+    logger.debug(
+        f"Prompt segments for conversation {conversation_id}: "
+        + " ".join(f"{s.name}={s.bytes}B/{s.tokens}t" for s in report.segments)
+    )
+
+
+# Global context builder
+context_builder = ContextBuilder.from_settings()
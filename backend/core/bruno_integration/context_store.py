@@ -0,0 +1,183 @@
+"""
+Context Store - Per-conversation Ollama KV context for incremental prefill
+"""
+from typing import Dict, List, Optional, Any, Set
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StoredContext:
+    """Ollama ``context`` tokens plus what is needed to prove they still apply."""
+    model: str
+    system_hash: str
+    last_user: str
+    last_reply: str
+    tokens: List[int]
+    # Hashes of the per-turn system messages (memories, summary, recall,
+    # instructions) the tokens already hold
+    included: Set[str] = field(default_factory=set)
+
+
+@dataclass
+class ReusableContext:
+    """Stored tokens for a turn and the messages to send on top of them."""
+    tokens: List[int]
+    messages: List[Dict[str, str]]
+
+
+class ConversationContextStore:
+    """
+    Remembers the ``context`` token array Ollama returns for each conversation.
+
+    On the next turn, the stored tokens can be sent back with only the new user
+    message so Ollama prefills just that message instead of the whole prompt.
+    A stored context is only reused when the model and the agent's system
+    prompt (the first system message) are unchanged and the conversation
+    history ends with the exchange the context was produced from; otherwise
+    the caller falls back to a full prompt.
+
+    The other system messages (memories, summary, recalled messages, task
+    instructions) change from turn to turn and do not invalidate the context:
+    the ones it does not hold yet are sent along with the new user message.
+
+    Contexts live in this process only; a turn served by another worker
+    process gets a full prompt.
+    """
+
+    def __init__(self, max_conversations: int = 1000, max_tokens: int = 8192):
+        """
+        Initialize context store.
+
+        Args:
+            max_conversations: Maximum number of conversations to keep (LRU)
+            max_tokens: Contexts longer than this are dropped and re-prefilled,
+                so the model's context window is never overrun
+        """
+        self.max_conversations = max_conversations
+        self.max_tokens = max_tokens
+        self._entries: "OrderedDict[str, StoredContext]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash(content: str) -> str:
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def _hash_system(cls, messages: List[Dict[str, str]]) -> str:
+        """Hash the agent's system prompt, which every stored context starts with."""
+        first = messages[0] if messages else {}
+        return cls._hash(first.get('content', '') if first.get('role') == 'system' else '')
+
+    @staticmethod
+    def _turn_context(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """The system messages after the system prompt, which may change every turn."""
+        start = 1 if messages and messages[0].get('role') == 'system' else 0
+        return [m for m in messages[start:] if m.get('role') == 'system']
+
+    def lookup(
+        self,
+        conversation_id: str,
+        model: str,
+        messages: List[Dict[str, str]]
+    ) -> Optional[ReusableContext]:
+        """
+        Return reusable context tokens for this turn, if any.
+
+        Args:
+            conversation_id: ID of the conversation
+            model: Model the turn will run on
+            messages: Full message list for the turn (last one is the new user message)
+
+        Returns:
+            The context tokens and the messages to send with them (system
+            messages the context lacks, then the new user message), or None
+            for a full prompt
+        """
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return None
+
+            history = [m for m in messages[:-1] if m.get('role') != 'system']
+            previous = history[-2:]
+            is_valid = (
+                entry.model == model
+                and entry.system_hash == self._hash_system(messages)
+                and len(previous) == 2
+                and previous[0].get('content') == entry.last_user
+                and previous[1].get('content') == entry.last_reply
+            )
+
+            if not is_valid:
+                # Conversation moved on without us (e.g. a timer reply) - start over
+                del self._entries[conversation_id]
+                return None
+
+            self._entries.move_to_end(conversation_id)
+            new_context = [
+                m for m in self._turn_context(messages)
+                if self._hash(m.get('content', '')) not in entry.included
+            ]
+            return ReusableContext(tokens=entry.tokens, messages=new_context + messages[-1:])
+
+    def save(
+        self,
+        conversation_id: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        reply: str,
+        tokens: Optional[List[int]]
+    ) -> None:
+        """
+        Store the context Ollama returned for a completed turn.
+
+        Args:
+            conversation_id: ID of the conversation
+            model: Model the turn ran on
+            messages: Message list of the turn (last one is the user message)
+            reply: Assistant reply that was generated
+            tokens: ``context`` array returned by Ollama
+        """
+        with self._lock:
+            if not tokens or len(tokens) > self.max_tokens:
+                self._entries.pop(conversation_id, None)
+                return
+
+            system_hash = self._hash_system(messages)
+            included = {self._hash(m.get('content', '')) for m in self._turn_context(messages)}
+            previous = self._entries.get(conversation_id)
+            if previous and previous.model == model and previous.system_hash == system_hash:
+                # The tokens grew from the previous context, so they still hold its messages
+                included |= previous.included
+
+            self._entries[conversation_id] = StoredContext(
+                model=model,
+                system_hash=system_hash,
+                last_user=messages[-1].get('content', ''),
+                last_reply=reply,
+                tokens=list(tokens),
+                included=included
+            )
+            self._entries.move_to_end(conversation_id)
+
+            while len(self._entries) > self.max_conversations:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, conversation_id: str) -> None:
+        """Forget the stored context for a conversation."""
+        with self._lock:
+            self._entries.pop(conversation_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return store size information."""
+        with self._lock:
+            return {
+                "conversations": len(self._entries),
+                "tokens": sum(len(e.tokens) for e in self._entries.values()),
+            }
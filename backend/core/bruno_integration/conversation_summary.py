@@ -0,0 +1,388 @@
+"""
+Conversation Summary - Hierarchical rolling summaries of the lifelong conversation
+"""
+from typing import Dict, List, Optional, Any
+from dataclasses import dataclass
+from datetime import datetime
+import logging
+import threading
+
+from .context_budget import TokenEstimator
+from .db_reads import parallel_read
+from .llm_scheduler import Priority
+
+logger = logging.getLogger(__name__)
+
+
+FOLD_INSTRUCTION = (
+    "You keep the long-term record of an ongoing conversation between a user and their AI companion. "
+    "Summarize the excerpt below in at most {words} words. Keep facts about the user, decisions, plans, "
+    "commitments and open questions; drop greetings and small talk. Write plain third-person prose "
+    "without a preamble."
+)
+
+MERGE_INSTRUCTION = (
+    "Below are consecutive summaries of one conversation between a user and their AI companion, oldest "
+    "first. Combine them into one summary of at most {words} words that keeps what still matters later: "
+    "facts about the user, decisions, plans and unresolved topics. Write plain third-person prose without "
+    "a preamble."
+)
+
+SUMMARY_HEADER = "Summary of the earlier conversation, oldest first:"
+
+
+@dataclass
+class RollingSummary:
+    """The summary part of a prompt: every node of a conversation, oldest first."""
+    nodes: List[Dict[str, Any]]
+
+    @property
+    def covered_until(self) -> datetime:
+        """Creation time of the last message the summary covers."""
+        return max(node["end_at"] for node in self.nodes)
+
+    @property
+    def message_count(self) -> int:
+        return sum(node["message_count"] for node in self.nodes)
+
+    @property
+    def text(self) -> str:
+        """The nodes rendered as one system message body."""
+        lines = [SUMMARY_HEADER]
+        for node in self.nodes:
+            start, end = f"{node['start_at']:%Y-%m-%d}", f"{node['end_at']:%Y-%m-%d}"
+            period = start if start == end else f"{start} to {end}"
+            lines.append(f"- {period}: {node['content']}")
+        return "\n".join(lines)
+
+
+class DjangoSummaryStore:
+    """Reads messages and keeps summary nodes in the ``conversation_summaries`` table."""
+
+    ROLES = ("user", "assistant")
+
+    def nodes(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """All summary nodes of a conversation, oldest first."""
+        from apps.chat.models import ConversationSummary
+
+        return list(
+            ConversationSummary.objects.filter(conversation_id=conversation_id)
+            .order_by('start_at')
+            .values('id', 'level', 'content', 'message_count', 'start_at', 'end_at')
+        )
+
+    def unsummarized(self, conversation_id: str, after: Optional[datetime], keep_recent: int, limit: int) -> List[Dict[str, Any]]:
+        """
+        The oldest messages not covered yet, leaving the newest ``keep_recent`` out.
+
+        Args:
+            conversation_id: ID of the conversation
+            after: ``end_at`` of the newest summary node, or None
+            keep_recent: Newest messages that stay verbatim
+            limit: Most messages to return
+        """
+        from apps.chat.models import Message
+
+        queryset = Message.objects.filter(conversation_id=conversation_id, role__in=self.ROLES)
+        if after is not None:
+            queryset = queryset.filter(created_at__gt=after)
+        available = min(queryset.count() - keep_recent, limit)
+        if available <= 0:
+            return []
+        return list(queryset.order_by('created_at').values('role', 'content', 'created_at')[:available])
+
+    def owner(self, conversation_id: str) -> Dict[str, Any]:
+        """The conversation's user and the provider and model of its agent."""
+        from apps.chat.models import Conversation
+
+        conversation = Conversation.objects.select_related('agent').get(id=conversation_id)
+        return {
+            "user_id": str(conversation.user_id),
+            "provider": conversation.agent.llm_provider,
+            "model": conversation.agent.model,
+        }
+
+    def add(self, conversation_id: str, node: Dict[str, Any], replaces: Optional[List[Any]] = None) -> None:
+        """Store a node, deleting the nodes it was merged from in the same transaction."""
+        from django.db import transaction
+        from apps.chat.models import ConversationSummary
+
+        with transaction.atomic():
+            ConversationSummary.objects.create(conversation_id=conversation_id, **node)
+            if replaces:
+                ConversationSummary.objects.filter(id__in=replaces).delete()
+
+    def due(self) -> List[str]:
+        """Conversations with messages newer than their summary."""
+        from django.db.models import Max, OuterRef, Q, Subquery, F
+        from apps.chat.models import Conversation, ConversationSummary
+
+        newest_node = ConversationSummary.objects.filter(conversation=OuterRef('pk')).order_by('-end_at')
+        queryset = Conversation.objects.annotate(
+            latest=Max('messages__created_at'),
+            summarized_until=Subquery(newest_node.values('end_at')[:1]),
+        ).filter(latest__isnull=False).filter(
+            Q(summarized_until__isnull=True) | Q(latest__gt=F('summarized_until'))
+        )
+        return [str(pk) for pk in queryset.values_list('id', flat=True)]
+
+
+class RollingSummarizer:
+    """
+    Keeps a hierarchical rolling summary of each conversation.
+
+    Every user has a single conversation for life, and the prompt only has
+    room for its recent turns. The summarizer folds older messages into
+    summary nodes incrementally: each run takes the messages after the newest
+    node (except the newest ``keep_recent``, which the prompt shows verbatim)
+    in runs of ``chunk_messages`` and summarizes every run once into a level
+    1 node. When a level holds more than ``fanout`` nodes, its oldest
+    ``fanout`` are merged into one node a level up, so the number of nodes
+    grows only logarithmically with the length of the conversation, and no
+    message or node is ever read by the LLM twice at the same level.
+
+    Summaries are written by the ``summarize_conversations`` management
+    command with background priority; chat turns only read the nodes, which
+    is one indexed query, and the prompt carries them within a fixed token
+    budget (see ContextBuilder) in place of the covered history.
+    """
+
+    # Longest a single message may be in the excerpt sent for folding
+    MAX_EXCERPT_MESSAGE_TOKENS = 256
+
+    def __init__(
+        self,
+        llm_client=None,
+        model: str = "",
+        enabled: bool = True,
+        chunk_messages: int = 20,
+        keep_recent: int = 20,
+        fanout: int = 4,
+        summary_tokens: int = 150,
+        max_chunks_per_run: int = 10,
+        store: Optional[DjangoSummaryStore] = None,
+        estimator: Optional[TokenEstimator] = None
+    ):
+        """
+        Initialize rolling summarizer.
+
+        Args:
+            llm_client: Client writing the summaries (defaults to one per agent provider)
+            model: Model writing the summaries; empty uses the conversation's agent model
+            enabled: When False chat turns get no summary and nothing is summarized
+            chunk_messages: Messages folded into one level 1 node
+            keep_recent: Newest messages never folded, left to the prompt's history
+            fanout: Nodes a level may hold before its oldest are merged one level up
+            summary_tokens: Length limit of each node
+            max_chunks_per_run: Level 1 nodes written per conversation and run
+            store: Where messages are read and nodes kept (defaults to the database)
+            estimator: Token estimator used to shorten long messages
+        """
+        self.llm_client = llm_client
+        self.model = model
+        self.enabled = enabled
+        self.chunk_messages = max(chunk_messages, 1)
+        self.keep_recent = keep_recent
+        self.fanout = max(fanout, 2)
+        self.summary_tokens = summary_tokens
+        self.max_chunks_per_run = max_chunks_per_run
+        self.store = store or DjangoSummaryStore()
+        self.estimator = estimator or TokenEstimator()
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._active: set = set()
+        self._counters = {"loads": 0, "folds": 0, "messages_folded": 0, "merges": 0, "failures": 0}
+
+    @classmethod
+    def from_settings(cls) -> 'RollingSummarizer':
+        """Create a rolling summarizer configured from Django settings."""
+        from django.conf import settings
+
+        return cls(
+            model=getattr(settings, 'CHAT_SUMMARY_MODEL', ''),
+            enabled=getattr(settings, 'CHAT_SUMMARY_ENABLED', True),
+            chunk_messages=getattr(settings, 'CHAT_SUMMARY_CHUNK_MESSAGES', 20),
+            keep_recent=getattr(settings, 'CHAT_SUMMARY_KEEP_RECENT', 20),
+            fanout=getattr(settings, 'CHAT_SUMMARY_FANOUT', 4),
+            summary_tokens=getattr(settings, 'CHAT_SUMMARY_NODE_TOKENS', 150),
+        )
+
+    async def load(self, conversation_id: str) -> Optional[RollingSummary]:
+        """
+        The summary of a conversation for its next prompt.
+
+        Returns:
+            RollingSummary, or None if nothing has been summarized yet
+        """
+        nodes = await parallel_read(self.store.nodes)(conversation_id)
+        with self._lock:
+            self._counters["loads"] += 1
+        return RollingSummary(nodes) if nodes else None
+
+    async def summarize(self, conversation_id: str, max_chunks: Optional[int] = None) -> Dict[str, int]:
+        """
+        Fold a conversation's new messages into its summary.
+
+        Args:
+            conversation_id: ID of the conversation
+            max_chunks: Level 1 nodes to write at most (defaults to max_chunks_per_run)
+
+        Returns:
+            Dict with the number of messages folded and nodes written and merged
+        """
+        from asgiref.sync import sync_to_async
+
+        result = {"messages": 0, "chunks": 0, "merges": 0}
+        with self._lock:
+            if conversation_id in self._active:
+                return result
+            self._active.add(conversation_id)
+        try:
+            nodes = await sync_to_async(self.store.nodes)(conversation_id)
+            after = max((node["end_at"] for node in nodes), default=None)
+            limit = (max_chunks or self.max_chunks_per_run) * self.chunk_messages
+            messages = await sync_to_async(self.store.unsummarized)(conversation_id, after, self.keep_recent, limit)
+            chunks = [
+                messages[start:start + self.chunk_messages]
+                for start in range(0, len(messages) - self.chunk_messages + 1, self.chunk_messages)
+            ]
+            if not chunks:
+                return result
+
+            owner = await sync_to_async(self.store.owner)(conversation_id)
+            for chunk in chunks:
+                content = await self._complete(FOLD_INSTRUCTION, self._excerpt(chunk, owner), owner)
+                node = {
+                    "level": 1,
+                    "content": content,
+                    "message_count": len(chunk),
+                    "start_at": chunk[0]["created_at"],
+                    "end_at": chunk[-1]["created_at"],
+                    "model": self.model or owner["model"],
+                }
+                await sync_to_async(self.store.add)(conversation_id, node)
+                result["messages"] += len(chunk)
+                result["chunks"] += 1
+                result["merges"] += await self._merge(conversation_id, owner)
+            with self._lock:
+                self._counters["folds"] += result["chunks"]
+                self._counters["messages_folded"] += result["messages"]
+                self._counters["merges"] += result["merges"]
+            logger.info(
+                f"Summarized {result['messages']} messages of conversation {conversation_id} "
+                f"into {result['chunks']} nodes ({result['merges']} merges)"
+            )
+            return result
+        except Exception:
+            with self._lock:
+                self._counters["failures"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._active.discard(conversation_id)
+
+    async def summarize_due(self, max_chunks: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Summarize every conversation with messages newer than its summary.
+
+        Returns:
+            Results of summarize() by conversation ID, for conversations that changed
+        """
+        from asgiref.sync import sync_to_async
+
+        results = {}
+        for conversation_id in await sync_to_async(self.store.due)():
+            try:
+                result = await self.summarize(conversation_id, max_chunks)
+            except Exception as e:
+                logger.error(f"Error summarizing conversation {conversation_id}: {e}", exc_info=True)
+                continue
+            if result["chunks"]:
+                results[conversation_id] = result
+        return results
+
+    async def _merge(self, conversation_id: str, owner: Dict[str, Any]) -> int:
+        """Merge the oldest nodes of every level holding more than ``fanout``."""
+        from asgiref.sync import sync_to_async
+
+        merges = 0
+        level = 1
+        while True:
+            nodes = [node for node in await sync_to_async(self.store.nodes)(conversation_id) if node["level"] == level]
+            if len(nodes) <= self.fanout:
+                if not nodes:
+                    return merges
+                level += 1
+                continue
+            merged = nodes[:self.fanout]
+            text = "\n\n".join(node["content"] for node in merged)
+            parent = {
+                "level": level + 1,
+                "content": await self._complete(MERGE_INSTRUCTION, text, owner),
+                "message_count": sum(node["message_count"] for node in merged),
+                "start_at": merged[0]["start_at"],
+                "end_at": merged[-1]["end_at"],
+                "model": self.model or owner["model"],
+            }
+            await sync_to_async(self.store.add)(conversation_id, parent, [node["id"] for node in merged])
+            merges += 1
+
+    def _excerpt(self, messages: List[Dict[str, Any]], owner: Dict[str, Any]) -> str:
+        """Render messages as a transcript, shortening very long ones."""
+        model = self.model or owner["model"]
+        return "\n".join(
+            f"{message['role'].title()}: "
+            f"{self.estimator.truncate(message['content'], self.MAX_EXCERPT_MESSAGE_TOKENS, model)}"
+            for message in messages
+        )
+
+    async def _complete(self, instruction: str, text: str, owner: Dict[str, Any]) -> str:
+        """Ask the LLM for one summary node."""
+        model = self.model or owner["model"]
+        response = await self._client(owner["provider"]).generate(
+            messages=[
+                {"role": "system", "content": instruction.format(words=self.summary_tokens * 3 // 4)},
+                {"role": "user", "content": text},
+            ],
+            model=model,
+            temperature=0.2,
+            max_tokens=self.summary_tokens,
+            priority=Priority.BACKGROUND,
+            user_id=owner["user_id"],
+        )
+        content = (response.get("content") or "").strip()
+        if not content:
+            raise Exception(f"Empty summary from {model}")
+        return content
+
+    def _client(self, provider: str):
+        """The LLM client writing summaries for an agent provider."""
+        if self.llm_client is not None:
+            return self.llm_client
+        client = self._clients.get(provider)
+        if client is None:
+            from django.conf import settings
+            from .bruno_llm import LLMFactory
+
+            client = LLMFactory.create_client(
+                provider=provider,
+                api_mode=settings.OLLAMA_API_MODE,
+                keep_alive=settings.OLLAMA_KEEP_ALIVE
+            )
+            self._clients[provider] = client
+        return client
+
+    def stats(self) -> Dict[str, Any]:
+        """Return fold and merge counters."""
+        with self._lock:
+            return {
+                **self._counters,
+                "enabled": self.enabled,
+                "chunk_messages": self.chunk_messages,
+                "keep_recent": self.keep_recent,
+                "fanout": self.fanout,
+            }
+
+
+# Global rolling summarizer
+conversation_summarizer = RollingSummarizer.from_settings()
@@ -0,0 +1,74 @@
+"""
+DB Reads - Runs independent ORM reads in worker threads so they overlap
+"""
+from contextvars import ContextVar
+from typing import Any, Callable, Optional, TypeVar
+import functools
+import threading
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connection
+
+T = TypeVar('T')
+
+
+class QueryCounter:
+    """
+    Connection execute wrapper counting the SQL queries of one request.
+
+    Install it on the request thread's connection and set it as
+    ``query_counter``; reads that ``parallel_read`` moves to worker threads
+    install it on their own connections, so they are counted too.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+# Counter of the current request (set by QueryCountMiddleware), if any
+query_counter: ContextVar[Optional[QueryCounter]] = ContextVar('query_counter', default=None)
+
+
+def parallel_read(func: Callable[..., T]) -> Callable[..., Any]:
+    """
+    Like ``sync_to_async``, but the function may run alongside other DB calls.
+
+    ``sync_to_async`` is thread-sensitive by default, so every ORM call of a
+    request runs on the same thread, one after another, even when they are
+    awaited together. Functions wrapped here run on the shared worker pool
+    with their own connection instead. Use it only for queries that do not
+    depend on the request's uncommitted writes. The worker thread never sees
+    Django's request signals, so it releases its connection itself according
+    to CONN_MAX_AGE (set DB_CONN_MAX_AGE above 0, or every read opens a new
+    connection). Queries are added to the request's ``query_counter``.
+
+    With CHAT_PARALLEL_DB_READS off this is plain ``sync_to_async``.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        from django.conf import settings
+
+        if not getattr(settings, 'CHAT_PARALLEL_DB_READS', True):
+            return await sync_to_async(func)(*args, **kwargs)
+
+        counter = query_counter.get()
+
+        def run():
+            close_old_connections()
+            try:
+                if counter is None:
+                    return func(*args, **kwargs)
+                with connection.execute_wrapper(counter):
+                    return func(*args, **kwargs)
+            finally:
+                close_old_connections()
+
+        return await sync_to_async(run, thread_sensitive=False)()
+
+    return wrapper
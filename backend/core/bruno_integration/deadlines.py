@@ -0,0 +1,57 @@
+"""
+Deadlines - Time budgets passed down the chat pipeline to the LLM client
+"""
+from typing import Optional
+import time
+
+
+class DeadlineExceeded(TimeoutError):
+    """The time budget for a request ran out before the LLM answered."""
+
+
+class Deadline:
+    """
+    Absolute point in time by which a request must be answered.
+
+    Created once per incoming message and handed down to every LLM call made
+    for it, so classifier calls, context assembly and generation all share
+    one budget instead of each getting its own timeout.
+    """
+
+    def __init__(self, expires_at: float):
+        """
+        Initialize deadline.
+
+        Args:
+            expires_at: ``time.monotonic()`` value at which the deadline passes
+        """
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> 'Deadline':
+        """Create a deadline ``seconds`` from now."""
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        """Seconds left (never negative)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """
+        Timeout to use for the next operation.
+
+        Args:
+            cap: Upper bound, e.g. a per-call timeout
+
+        Returns:
+            The smaller of the time left and ``cap``
+        """
+        remaining = self.remaining()
+        return min(remaining, cap) if cap else remaining
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.3f}s)"
@@ -0,0 +1,307 @@
+"""
+Embeddings - Batched, deduplicated text embeddings with a float32 vector cache
+"""
+from typing import Dict, List, Optional, Any, Iterable
+from array import array
+from collections import OrderedDict
+import hashlib
+import logging
+import sys
+import threading
+import time
+
+import aiohttp
+from asgiref.sync import sync_to_async
+
+from .llm_scheduler import LLMScheduler, Priority, llm_scheduler as default_scheduler
+from .micro_batcher import BatchFailed, MicroBatcher
+from .ollama_pool import OllamaPool, ollama_pool as default_pool
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 of a text; identical texts share one vector."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def to_bytes(vector: array) -> bytes:
+    """Serialize a float32 vector as little-endian bytes."""
+    if sys.byteorder == 'big':
+        vector = array('f', vector)
+        vector.byteswap()
+    return vector.tobytes()
+
+
+def from_bytes(data: bytes) -> array:
+    """Deserialize little-endian float32 bytes."""
+    vector = array('f')
+    vector.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        vector.byteswap()
+    return vector
+
+
+class DjangoEmbeddingStore:
+    """Persists vectors in the ``embeddings`` table (apps.chat.models.Embedding)."""
+
+    def get_many(self, model: str, hashes: Iterable[str]) -> Dict[str, bytes]:
+        """Stored vectors for the given content hashes, as raw bytes."""
+        from apps.chat.models import Embedding
+
+        rows = Embedding.objects.filter(model=model, content_hash__in=list(hashes))
+        return {row.content_hash: bytes(row.vector) for row in rows.only('content_hash', 'vector')}
+
+    def put_many(self, model: str, vectors: Dict[str, bytes]) -> None:
+        """Store vectors; hashes that already exist are left alone."""
+        from apps.chat.models import Embedding
+
+        Embedding.objects.bulk_create(
+            [
+                Embedding(model=model, content_hash=key, dimensions=len(data) // 4, vector=data)
+                for key, data in vectors.items()
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class EmbeddingService:
+    """
+    Embeds texts with Ollama's ``/api/embed`` endpoint, as few times as possible.
+
+    Texts are keyed by content hash, so duplicates within a call, texts seen
+    earlier by this process (a warm LRU cache of float32 arrays) and texts
+    stored by any process (the ``embeddings`` table) are never sent to
+    Ollama again. The rest go out in batches of up to ``batch_size`` texts;
+    concurrent callers are packed into the same request by a micro-batcher.
+
+    Vectors are ``array('f')`` objects: 4 bytes per dimension in memory and
+    in the database. One instance serves every event loop in the process
+    (the long-lived loop of sync requests and the ASGI server's), so the LRU
+    cache and counters are guarded by a lock.
+    """
+
+    def __init__(
+        self,
+        model: str = "nomic-embed-text",
+        pool: Optional[OllamaPool] = None,
+        scheduler: Optional[LLMScheduler] = None,
+        batcher: Optional[MicroBatcher] = None,
+        store: Optional[DjangoEmbeddingStore] = None,
+        cache_size: int = 5000,
+        batch_size: int = 64,
+        request_timeout: float = 30.0
+    ):
+        """
+        Initialize embedding service.
+
+        Args:
+            model: Ollama embedding model
+            pool: Ollama hosts (defaults to the global pool)
+            scheduler: Admission control for Ollama calls (defaults to the global scheduler)
+            batcher: Packs concurrent requests together (a new MicroBatcher by default)
+            store: Persistent vector store (None keeps vectors in process only)
+            cache_size: Vectors kept in the in-process cache
+            batch_size: Maximum texts per request to Ollama
+            request_timeout: Seconds one embedding request may take
+        """
+        self.model = model
+        self.pool = pool or default_pool
+        self.scheduler = scheduler or default_scheduler
+        self.batcher = batcher or MicroBatcher()
+        self.store = store
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.request_timeout = request_timeout
+        self._cache: "OrderedDict[str, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "texts": 0,
+            "duplicates": 0,
+            "cache_hits": 0,
+            "store_hits": 0,
+            "embedded": 0,
+            "requests": 0,
+            "store_errors": 0,
+        }
+
+    @classmethod
+    def from_settings(cls) -> 'EmbeddingService':
+        """Create an embedding service configured from Django settings."""
+        from django.conf import settings
+
+        return cls(
+            model=getattr(settings, 'EMBEDDING_MODEL', 'nomic-embed-text'),
+            batcher=MicroBatcher(window=getattr(settings, 'EMBEDDING_BATCH_WINDOW_MS', 5) / 1000),
+            store=DjangoEmbeddingStore() if getattr(settings, 'EMBEDDING_PERSIST', True) else None,
+            cache_size=getattr(settings, 'EMBEDDING_CACHE_SIZE', 5000),
+            batch_size=getattr(settings, 'EMBEDDING_BATCH_SIZE', 64),
+        )
+
+    async def embed(
+        self,
+        texts: List[str],
+        priority: Priority = Priority.BACKGROUND,
+        user_id: Optional[str] = None
+    ) -> List[array]:
+        """
+        Get the embedding of each text.
+
+        Args:
+            texts: Texts to embed
+            priority: Scheduler class for any Ollama calls (CLASSIFIER on the chat path)
+            user_id: User the texts belong to (for fair queuing)
+
+        Returns:
+            One float32 vector per text, in order
+
+        Raises:
+            Exception: If Ollama could not embed the texts that were not cached
+        """
+        keys = [content_hash(text) for text in texts]
+        unique = dict(zip(keys, texts))
+        with self._lock:
+            self._counters["texts"] += len(texts)
+            self._counters["duplicates"] += len(texts) - len(unique)
+
+        vectors = self._cached(unique)
+        missing = [key for key in unique if key not in vectors]
+
+        if missing and self.store:
+            stored = await self._load(missing)
+            vectors.update(stored)
+            missing = [key for key in missing if key not in stored]
+
+        if missing:
+            fresh = await self._fetch([unique[key] for key in missing], priority, user_id)
+            embedded = dict(zip(missing, fresh))
+            self._remember(embedded)
+            vectors.update(embedded)
+            if self.store:
+                await self._save(embedded)
+
+        return [vectors[key] for key in keys]
+
+    async def embed_one(
+        self,
+        text: str,
+        priority: Priority = Priority.BACKGROUND,
+        user_id: Optional[str] = None
+    ) -> array:
+        """Get the embedding of one text (see embed)."""
+        return (await self.embed([text], priority, user_id))[0]
+
+    def _cached(self, unique: Dict[str, str]) -> Dict[str, array]:
+        """Vectors already in the in-process cache."""
+        found = {}
+        with self._lock:
+            for key in unique:
+                vector = self._cache.get(key)
+                if vector is not None:
+                    self._cache.move_to_end(key)
+                    found[key] = vector
+            self._counters["cache_hits"] += len(found)
+        return found
+
+    def _remember(self, vectors: Dict[str, array]) -> None:
+        """Add vectors to the in-process cache, evicting the least recently used."""
+        with self._lock:
+            for key, vector in vectors.items():
+                self._cache[key] = vector
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    async def _load(self, keys: List[str]) -> Dict[str, array]:
+        """Vectors persisted by any process; store errors count as misses."""
+        try:
+            stored = await sync_to_async(self.store.get_many)(self.model, keys)
+        except Exception as e:
+            logger.warning(f"Could not read stored embeddings: {e}")
+            with self._lock:
+                self._counters["store_errors"] += 1
+            return {}
+
+        vectors = {key: from_bytes(data) for key, data in stored.items()}
+        self._remember(vectors)
+        with self._lock:
+            self._counters["store_hits"] += len(vectors)
+        return vectors
+
+    async def _save(self, vectors: Dict[str, array]) -> None:
+        """Persist new vectors; a failure only costs a later re-embedding."""
+        try:
+            await sync_to_async(self.store.put_many)(
+                self.model, {key: to_bytes(vector) for key, vector in vectors.items()}
+            )
+        except Exception as e:
+            logger.warning(f"Could not store {len(vectors)} embeddings: {e}")
+            with self._lock:
+                self._counters["store_errors"] += 1
+
+    async def _fetch(self, texts: List[str], priority: Priority, user_id: Optional[str]) -> List[array]:
+        """Embed uncached texts in chunks, sharing requests with concurrent callers."""
+        async def run_batch(chunks: List[List[str]]) -> List[List[array]]:
+            flat = await self._request([text for chunk in chunks for text in chunk], priority, user_id)
+            results, start = [], 0
+            for chunk in chunks:
+                results.append(flat[start:start + len(chunk)])
+                start += len(chunk)
+            return results
+
+        vectors: List[array] = []
+        for start in range(0, len(texts), self.batch_size):
+            chunk = texts[start:start + self.batch_size]
+            try:
+                vectors.extend(await self.batcher.submit(f"embed:{self.model}", chunk, run_batch))
+            except BatchFailed:
+                vectors.extend(await self._request(chunk, priority, user_id))
+        return vectors
+
+    async def _request(self, texts: List[str], priority: Priority, user_id: Optional[str]) -> List[array]:
+        """One ``/api/embed`` call."""
+        backend = self.pool.choose()
+        session = self.pool.session_manager.get_session()
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+        started = time.monotonic()
+
+        try:
+            async with self.scheduler.slot(priority, user_id, cost=len(texts) / self.batch_size):
+                async with session.post(
+                    f"{backend.url}/api/embed",
+                    json={"model": self.model, "input": texts},
+                    timeout=timeout
+                ) as response:
+                    if response.status != 200:
+                        raise Exception(f"Embedding request failed: {response.status} - {await response.text()}")
+                    data = await response.json()
+        except aiohttp.ClientConnectionError as e:
+            self.pool.mark_down(backend, e)
+            raise
+        finally:
+            self.pool.release(backend)
+
+        embeddings = data.get("embeddings") or []
+        if len(embeddings) != len(texts):
+            raise Exception(f"Embedding request for {len(texts)} texts returned {len(embeddings)} vectors")
+
+        with self._lock:
+            self._counters["requests"] += 1
+            self._counters["embedded"] += len(texts)
+        logger.debug(f"Embedded {len(texts)} texts with {self.model} in {time.monotonic() - started:.2f}s")
+        return [array('f', values) for values in embeddings]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return dedup, cache and request counters."""
+        with self._lock:
+            return {
+                **self._counters,
+                "model": self.model,
+                "cached_vectors": len(self._cache),
+                "cache_size": self.cache_size,
+                "batching": self.batcher.stats(),
+            }
+
+
+# Global embedding service
+embedding_service = EmbeddingService.from_settings()
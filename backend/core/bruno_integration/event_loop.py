@@ -0,0 +1,146 @@
+"""
+Event Loop - One long-lived asyncio loop per process for sync callers
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import functools
+import logging
+import os
+import threading
+
+from asgiref.sync import SyncToAsync, async_to_sync
+
+logger = logging.getLogger(__name__)
+
+
+def close_on_shutdown(close: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+    """
+    Await ``close()`` when the running loop shuts down.
+
+    ``asyncio.run`` (which ``async_to_sync`` uses for its per-call loops)
+    cancels every remaining task before closing its loop, so the returned
+    task closes pooled sessions and Redis clients while their loop can still
+    run the shutdown. The caller must keep a reference to the task.
+
+    Args:
+        close: Coroutine factory releasing the resource
+    """
+    async def wait_then_close() -> None:
+        try:
+            await asyncio.get_running_loop().create_future()
+        finally:
+            await close()
+
+    return asyncio.get_running_loop().create_task(wait_then_close())
+
+
+class LoopThread:
+    """
+    Runs one event loop in a daemon thread for the lifetime of the process.
+
+    Under WSGI, ``async_to_sync`` runs every call on a brand-new loop, and
+    aiohttp sessions and Redis clients are bound to the loop that created
+    them, so no connection would outlive a call. ``async_to_sync`` calls
+    made through this class are scheduled on the long-lived loop instead
+    (the way an ASGI server's loop is used), so the pooled connections are
+    reused across calls and requests. The calling thread still serves the
+    call's ``sync_to_async`` work (ORM queries), exactly as with
+    ``async_to_sync``. This relies on asgiref's ``main_event_loop``
+    thread-local, which is not public API, so asgiref is pinned in
+    requirements/production.txt.
+
+    The loop is started on first use and again in a forked child process.
+    """
+
+    def __init__(self, name: str = "llm-event-loop"):
+        """
+        Initialize loop thread.
+
+        Args:
+            name: Name of the thread running the loop
+        """
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The running long-lived loop, started if needed."""
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._start()
+            return self._loop
+
+    def _start(self) -> None:
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run() -> None:
+            asyncio.set_event_loop(loop)
+            loop.call_soon(started.set)
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+        self._thread.start()
+        started.wait()
+        self._loop = loop
+        self._pid = os.getpid()
+        logger.info(f"Started long-lived event loop in thread {self.name}")
+
+    def async_to_sync(self, async_fn: Callable[..., Awaitable[Any]]) -> Callable[..., Any]:
+        """
+        Like ``asgiref.sync.async_to_sync``, but run on the long-lived loop.
+
+        Must be called from a thread without a running event loop.
+        """
+        @functools.wraps(async_fn)
+        def call(*args: Any, **kwargs: Any) -> Any:
+            loop = self.loop
+            # async_to_sync schedules onto the "main" loop recorded here (set
+            # by sync_to_async threads) and idles this thread meanwhile
+            local = SyncToAsync.threadlocal
+            previous = (getattr(local, "main_event_loop", None), getattr(local, "main_event_loop_pid", None))
+            local.main_event_loop = loop
+            local.main_event_loop_pid = self._pid
+            with self._lock:
+                self._calls += 1
+            try:
+                return async_to_sync(async_fn)(*args, **kwargs)
+            finally:
+                local.main_event_loop, local.main_event_loop_pid = previous
+
+        return call
+
+    def stop(self) -> None:
+        """Cancel the loop's tasks (closing pooled connections) and stop its thread."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or self._pid != os.getpid():
+            return
+
+        async def shutdown() -> None:
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return whether the loop is running and how many calls it served."""
+        with self._lock:
+            return {
+                "running": self._loop is not None and self._pid == os.getpid(),
+                "calls": self._calls,
+            }
+
+
+# Global long-lived loop for the sync (WSGI) request path
+llm_loop = LoopThread()
@@ -0,0 +1,345 @@
+"""
+Fake Ollama - Local stand-in server for load tests and benchmarks
+"""
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+from .context_budget import TokenEstimator
+from .model_warmer import parse_keep_alive
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_REPLY = (
+    "Sure, here is a short answer from the benchmark server. It streams a few "
+    "sentences at a steady rate so the chat pipeline has something realistic "
+    "to relay to the client."
+)
+
+# Classifier prompts ask for JSON; answer them with a plain chat classification
+DEFAULT_JSON_REPLY = json.dumps({"is_command": False, "command_type": "other", "confidence": 0.9})
+
+FAKE_OLLAMA_KEY = web.AppKey('fake_ollama', object)
+
+
+class FakeOllama:
+    """
+    aiohttp app imitating the parts of the Ollama API the backend uses.
+
+    Serves ``/api/generate``, ``/api/chat`` (both streaming and not),
+    ``/api/tags``, ``/api/ps``, ``/api/embeddings`` and ``/api/embed``, plus
+    the OpenAI-compatible ``/v1/chat/completions`` (JSON or server-sent
+    events) and ``/v1/models`` served by continuous-batching servers. The
+    first call for a model, and the first after its ``keep_alive`` ran out,
+    also waits ``load_latency`` to imitate a cold model load; a generate call
+    without a prompt only loads the model, as in Ollama. Each
+    generation waits ``prefill_latency`` plus the prompt size over ``prefill_tokens_per_second``
+    before the first token, then emits the reply at ``tokens_per_second``.
+    A share of requests given by ``error_rate`` fails with HTTP 500, which
+    lets failover, retries and error paths be exercised without a GPU.
+    """
+
+    def __init__(
+        self,
+        prefill_latency: float = 0.05,
+        load_latency: float = 0.0,
+        prefill_tokens_per_second: float = 2000.0,
+        tokens_per_second: float = 50.0,
+        error_rate: float = 0.0,
+        reply: str = DEFAULT_REPLY,
+        json_reply: str = DEFAULT_JSON_REPLY,
+        models: Optional[List[str]] = None,
+        embedding_dimensions: int = 384,
+        seed: Optional[int] = None
+    ):
+        """
+        Initialize fake Ollama.
+
+        Args:
+            prefill_latency: Fixed seconds before the first token
+            load_latency: Extra seconds for the first call of each model
+            prefill_tokens_per_second: Prompt processing speed (0 disables the size-based delay)
+            tokens_per_second: Generation speed (0 emits the reply at once)
+            error_rate: Fraction of requests answered with HTTP 500
+            reply: Text generated for chat prompts
+            json_reply: Text generated when the request asks for JSON
+            models: Model names reported by /api/tags
+            embedding_dimensions: Length of returned embedding vectors
+            seed: Seed for the error-rate random generator
+        """
+        self.prefill_latency = prefill_latency
+        self.load_latency = load_latency
+        self._loaded: Dict[str, Optional[float]] = {}
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.reply = reply
+        self.json_reply = json_reply
+        self.models = models or ["mistral:7b"]
+        self.embedding_dimensions = embedding_dimensions
+        self.estimator = TokenEstimator()
+        self._random = random.Random(seed)
+        self.counters = {"requests": 0, "errors": 0, "disconnects": 0, "prompt_tokens": 0, "generated_tokens": 0}
+
+    def make_app(self) -> web.Application:
+        """Build the aiohttp application."""
+        app = web.Application()
+        app[FAKE_OLLAMA_KEY] = self
+        app.router.add_post('/api/generate', self._generate)
+        app.router.add_post('/api/chat', self._chat)
+        app.router.add_get('/api/tags', self._tags)
+        app.router.add_get('/api/ps', self._ps)
+        app.router.add_post('/api/embeddings', self._embeddings)
+        app.router.add_post('/api/embed', self._embed)
+        app.router.add_post('/v1/chat/completions', self._chat_completions)
+        app.router.add_get('/v1/models', self._openai_models)
+        return app
+
+    def run(self, host: str = '127.0.0.1', port: int = 11434) -> None:
+        """Serve until interrupted."""
+        web.run_app(self.make_app(), host=host, port=port, print=None)
+
+    async def _generate(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        prompt = f"{payload.get('system', '')}\n{payload.get('prompt', '')}"
+        return await self._respond(request, payload, prompt, chat=False)
+
+    async def _chat(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        prompt = "\n".join(m.get('content', '') for m in payload.get('messages', []))
+        return await self._respond(request, payload, prompt, chat=True)
+
+    async def _tags(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "models": [{"name": name, "model": name, "size": 0} for name in self.models]
+        })
+
+    async def _ps(self, request: web.Request) -> web.Response:
+        """Models currently loaded and when they expire."""
+        now = time.time()
+        models = []
+        for name, expires in self._loaded.items():
+            if expires is not None and expires <= now:
+                continue
+            expires_at = datetime.fromtimestamp(expires, timezone.utc) if expires else datetime(2318, 1, 1, tzinfo=timezone.utc)
+            models.append({
+                "name": name,
+                "model": name,
+                "expires_at": expires_at.isoformat().replace("+00:00", "Z"),
+                "size_vram": 0,
+            })
+        return web.json_response({"models": models})
+
+    async def _embeddings(self, request: web.Request) -> web.Response:
+        """Legacy single-text endpoint."""
+        payload = await request.json()
+        if self._fails():
+            return self._error()
+        return web.json_response({"embedding": self._vector(payload.get('prompt', ''))})
+
+    async def _embed(self, request: web.Request) -> web.Response:
+        """Batch endpoint; ``input`` is a string or a list of strings."""
+        payload = await request.json()
+        if self._fails():
+            return self._error()
+        texts = payload.get('input', '')
+        if isinstance(texts, str):
+            texts = [texts]
+        return web.json_response({
+            "model": payload.get('model'),
+            "embeddings": [self._vector(text) for text in texts]
+        })
+
+    async def _respond(
+        self,
+        request: web.Request,
+        payload: Dict[str, Any],
+        prompt: str,
+        chat: bool
+    ) -> web.StreamResponse:
+        """Answer a generation request after simulated prefill and decode."""
+        if self._fails():
+            return self._error()
+
+        model = payload.get('model', self.models[0])
+        prompt_tokens = self.estimator.estimate(prompt, model)
+        wants_json = bool(payload.get('format')) or 'JSON' in prompt
+        text = self.json_reply if wants_json else self.reply
+        limit = (payload.get('options') or {}).get('num_predict')
+        pieces = self._pieces(text, limit)
+
+        started = time.monotonic()
+        expires = self._loaded.get(model, 0)
+        if expires is not None and expires <= time.time():
+            await asyncio.sleep(self.load_latency)
+        keep_alive = parse_keep_alive(payload.get('keep_alive', '5m'))
+        self._loaded[model] = None if keep_alive is None else time.time() + keep_alive
+        loaded = time.monotonic()
+
+        if not prompt.strip():
+            # Load-only request (warm-up)
+            return web.json_response({
+                **self._content("", chat),
+                "model": model,
+                "done": True,
+                "done_reason": "load",
+                "load_duration": int((loaded - started) * 1e9),
+            })
+
+        self.counters["prompt_tokens"] += prompt_tokens
+        self.counters["generated_tokens"] += len(pieces)
+        await asyncio.sleep(self._prefill_delay(prompt_tokens))
+        prefilled = time.monotonic()
+
+        def final(body: Dict[str, Any], decoded: float) -> Dict[str, Any]:
+            body.update({
+                "model": model,
+                "done": True,
+                "done_reason": "stop",
+                "prompt_eval_count": prompt_tokens,
+                "eval_count": len(pieces),
+                "load_duration": int((loaded - started) * 1e9),
+                "prompt_eval_duration": int((prefilled - loaded) * 1e9),
+                "eval_duration": int((decoded - prefilled) * 1e9),
+                "total_duration": int((time.monotonic() - started) * 1e9),
+            })
+            if not chat:
+                body["context"] = list(range(prompt_tokens + len(pieces)))
+            return body
+
+        if not payload.get('stream', True):
+            await asyncio.sleep(self._decode_delay(len(pieces)))
+            return web.json_response(final(self._content(text, chat), time.monotonic()))
+
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+        step = self._decode_delay(1)
+        try:
+            for piece in pieces:
+                await asyncio.sleep(step)
+                chunk = self._content(piece, chat)
+                chunk.update({"model": model, "done": False})
+                await response.write((json.dumps(chunk) + "\n").encode('utf-8'))
+            done = final(self._content("", chat), time.monotonic())
+            await response.write((json.dumps(done) + "\n").encode('utf-8'))
+            await response.write_eof()
+        except (ConnectionResetError, asyncio.CancelledError):
+            # Client went away; like Ollama, stop generating
+            self.counters["disconnects"] += 1
+            raise
+        return response
+
+    async def _openai_models(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "object": "list",
+            "data": [{"id": name, "object": "model", "owned_by": "fake"} for name in self.models]
+        })
+
+    async def _chat_completions(self, request: web.Request) -> web.StreamResponse:
+        """OpenAI-style chat completion; models are always loaded, as on a batching server."""
+        payload = await request.json()
+        if self._fails():
+            return self._error()
+
+        model = payload.get('model', self.models[0])
+        prompt = "\n".join(m.get('content', '') for m in payload.get('messages', []))
+        prompt_tokens = self.estimator.estimate(prompt, model)
+        wants_json = (payload.get('response_format') or {}).get('type') == 'json_object' or 'JSON' in prompt
+        pieces = self._pieces(self.json_reply if wants_json else self.reply, payload.get('max_tokens'))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(pieces),
+            "total_tokens": prompt_tokens + len(pieces),
+        }
+        self.counters["prompt_tokens"] += prompt_tokens
+        self.counters["generated_tokens"] += len(pieces)
+        completion_id = f"chatcmpl-{self.counters['requests']}"
+        await asyncio.sleep(self._prefill_delay(prompt_tokens))
+
+        if not payload.get('stream'):
+            await asyncio.sleep(self._decode_delay(len(pieces)))
+            return web.json_response({
+                "id": completion_id,
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(pieces)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        def event(choices: List[Dict[str, Any]], **extra: Any) -> bytes:
+            body = {"id": completion_id, "object": "chat.completion.chunk", "model": model, "choices": choices, **extra}
+            return f"data: {json.dumps(body)}\n\n".encode('utf-8')
+
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+        step = self._decode_delay(1)
+        try:
+            for piece in pieces:
+                await asyncio.sleep(step)
+                await response.write(event([{"index": 0, "delta": {"content": piece}, "finish_reason": None}]))
+            await response.write(event([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+            if (payload.get('stream_options') or {}).get('include_usage'):
+                await response.write(event([], usage=usage))
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+        except (ConnectionResetError, asyncio.CancelledError):
+            self.counters["disconnects"] += 1
+            raise
+        return response
+
+    def _fails(self) -> bool:
+        """Count a request and decide whether it should fail."""
+        self.counters["requests"] += 1
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.counters["errors"] += 1
+            return True
+        return False
+
+    def _error(self) -> web.Response:
+        return web.json_response({"error": "simulated failure"}, status=500)
+
+    def _prefill_delay(self, prompt_tokens: int) -> float:
+        size_delay = prompt_tokens / self.prefill_tokens_per_second if self.prefill_tokens_per_second else 0.0
+        return self.prefill_latency + size_delay
+
+    def _decode_delay(self, tokens: int) -> float:
+        return tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    @staticmethod
+    def _pieces(text: str, limit: Optional[int]) -> List[str]:
+        """Split text into word-sized "tokens" that concatenate back to it."""
+        words = text.split(" ")
+        pieces = [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+        if limit and limit > 0:
+            pieces = pieces[:limit]
+        return pieces
+
+    @staticmethod
+    def _content(text: str, chat: bool) -> Dict[str, Any]:
+        if chat:
+            return {"message": {"role": "assistant", "content": text}}
+        return {"response": text}
+
+    def _vector(self, text: str) -> List[float]:
+        """Deterministic unit-length embedding derived from the text."""
+        values = []
+        counter = 0
+        while len(values) < self.embedding_dimensions:
+            digest = hashlib.sha256(f"{counter}:{text}".encode('utf-8')).digest()
+            values.extend((byte - 127.5) / 127.5 for byte in digest)
+            counter += 1
+        values = values[:self.embedding_dimensions]
+        norm = sum(v * v for v in values) ** 0.5 or 1.0
+        return [v / norm for v in values]
@@ -0,0 +1,101 @@
+"""
+Hedging - Latency-percentile policy for hedged (duplicated) LLM requests
+"""
+from typing import Dict, Any
+from collections import deque
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class HedgePolicy:
+    """
+    Decides when a slow request should be duplicated on a second host.
+
+    Recent latencies are kept per key (the model name). A hedge is sent once
+    a call has been running longer than the configured percentile of those
+    latencies, so only the slowest few percent of calls are duplicated.
+    Until enough samples exist, ``default_delay`` is used.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        percentile: float = 0.95,
+        window: int = 200,
+        min_samples: int = 20,
+        default_delay: float = 0.5,
+        min_delay: float = 0.05
+    ):
+        """
+        Initialize hedge policy.
+
+        Args:
+            enabled: Whether callers asking for hedging get it
+            percentile: Latency percentile after which the hedge is sent (0-1)
+            window: Number of recent latencies kept per key
+            min_samples: Samples needed before the percentile is trusted
+            default_delay: Hedge delay in seconds until enough samples exist
+            min_delay: Lower bound on the hedge delay in seconds
+        """
+        self.enabled = enabled
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self._latencies: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "hedged_calls": 0,
+            "hedges_sent": 0,
+            "hedges_won": 0,
+        }
+
+    @classmethod
+    def from_settings(cls) -> 'HedgePolicy':
+        """Create a hedge policy configured from Django settings."""
+        from django.conf import settings
+
+        return cls(
+            enabled=getattr(settings, 'LLM_HEDGE_REQUESTS', False),
+            percentile=getattr(settings, 'LLM_HEDGE_PERCENTILE', 0.95),
+            default_delay=getattr(settings, 'LLM_HEDGE_DEFAULT_DELAY', 0.5),
+        )
+
+    def record(self, key: str, seconds: float) -> None:
+        """Record how long a completed call took."""
+        with self._lock:
+            samples = self._latencies.get(key)
+            if samples is None:
+                samples = self._latencies[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def delay(self, key: str) -> float:
+        """Seconds to wait before sending a hedge for a call with this key."""
+        with self._lock:
+            samples = sorted(self._latencies.get(key, ()))
+
+        if len(samples) < self.min_samples:
+            return self.default_delay
+
+        index = min(len(samples) - 1, int(len(samples) * self.percentile))
+        return max(self.min_delay, samples[index])
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hedge counters and the current delay per key."""
+        with self._lock:
+            counters = dict(self._counters)
+            keys = list(self._latencies)
+        counters["enabled"] = self.enabled
+        counters["delays"] = {key: round(self.delay(key), 3) for key in keys}
+        return counters
+
+
+# Global hedge policy
+hedge_policy = HedgePolicy.from_settings()
@@ -0,0 +1,134 @@
+"""
+HTTP Sessions - Pooled aiohttp sessions shared by the LLM clients
+"""
+from typing import Dict
+import asyncio
+import logging
+import threading
+import weakref
+
+import aiohttp
+
+from .event_loop import close_on_shutdown
+
+logger = logging.getLogger(__name__)
+
+
+class SessionManager:
+    """
+    Keeps one keep-alive ``aiohttp.ClientSession`` per event loop.
+
+    aiohttp sessions are bound to the loop they were created on. The sync
+    request path runs its calls on the process's long-lived loop
+    (``event_loop.llm_loop``) and ASGI code on the server loop, so in
+    practice there is one session per process. Other loops (a plain
+    ``async_to_sync`` call, ``asyncio.run`` in a management command) get
+    their own session, which is closed when that loop shuts down.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 20,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: float = 60.0
+    ):
+        """
+        Initialize session manager.
+
+        Args:
+            limit: Maximum number of open connections per session
+            limit_per_host: Maximum number of open connections per backend host
+            dns_cache_ttl: Seconds to cache DNS lookups for
+            keepalive_timeout: Seconds an idle connection is kept open
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._closers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self._created = 0
+
+    @classmethod
+    def from_settings(cls) -> 'SessionManager':
+        """Create a session manager configured from Django settings."""
+        from django.conf import settings
+
+        return cls(
+            limit=getattr(settings, 'OLLAMA_CONNECTION_LIMIT', 100),
+            limit_per_host=getattr(settings, 'OLLAMA_CONNECTION_LIMIT_PER_HOST', 20),
+            dns_cache_ttl=getattr(settings, 'OLLAMA_DNS_CACHE_TTL', 300),
+            keepalive_timeout=getattr(settings, 'OLLAMA_KEEPALIVE_TIMEOUT', 60.0),
+        )
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """
+        Get the pooled session for the running event loop, creating it if needed.
+
+        Must be called from a coroutine running on the loop that will use the session.
+        """
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            self._prune_closed_loops()
+
+            session = self._sessions.get(loop)
+            if session is None or session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    ttl_dns_cache=self.dns_cache_ttl,
+                    use_dns_cache=True,
+                    keepalive_timeout=self.keepalive_timeout,
+                )
+                session = aiohttp.ClientSession(connector=connector)
+                self._sessions[loop] = session
+                self._closers[loop] = close_on_shutdown(session.close)
+                self._created += 1
+                logger.debug(f"Created pooled HTTP session for loop {id(loop)}")
+
+            return session
+
+    def _prune_closed_loops(self) -> None:
+        """Forget sessions whose event loop has closed (they were closed on shutdown)."""
+        for loop in [loop for loop in self._sessions if loop.is_closed()]:
+            session = self._sessions.pop(loop)
+            self._closers.pop(loop, None)
+            if not session.closed:
+                # Only a loop closed without shutting down its tasks gets here
+                logger.warning(f"HTTP session of loop {id(loop)} was not closed before its loop")
+
+    async def close(self) -> None:
+        """Close the session belonging to the running event loop."""
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            session = self._sessions.pop(loop, None)
+            closer = self._closers.pop(loop, None)
+
+        if closer:
+            closer.cancel()
+            await asyncio.gather(closer, return_exceptions=True)
+        if session and not session.closed:
+            await session.close()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of live sessions (one per active event loop) and sessions ever created."""
+        with self._lock:
+            self._prune_closed_loops()
+            return {
+                "sessions": len(self._sessions),
+                "created": self._created,
+                "limit": self.limit,
+                "limit_per_host": self.limit_per_host,
+            }
+
+
+# Global session manager instance
+session_manager = SessionManager.from_settings()
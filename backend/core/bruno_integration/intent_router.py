@@ -0,0 +1,200 @@
+"""
+Intent Router - Deterministic first pass over chat messages before the LLM classifier
+"""
+from typing import Dict, Iterable, List, Optional, Any
+from dataclasses import dataclass
+import logging
+import re
+import threading
+
+from .notes_ability import NotesAbility, NotesState, notes_state as default_notes_state
+from .timer_ability import TIMER_PATTERNS
+
+logger = logging.getLogger(__name__)
+
+
+# Words and phrases that may make a message a command the abilities do not
+# recognise yet (e.g. "remind me to call mom at 5"); only these go to the LLM
+COMMAND_KEYWORDS = (
+    "timer", "timers", "alarm", "alarms", "countdown", "stopwatch",
+    "remind", "reminder", "reminders", "wake me",
+    "note", "notes", "jot down", "write down",
+    "todo", "to do", "to-do", "task", "tasks", "checklist",
+    "schedule", "calendar", "appointment",
+    "calculate", "convert",
+)
+
+_WORD = re.compile(r"[a-z0-9'-]+")
+
+
+class KeywordTrie:
+    """Word-level trie matching any of a set of one- or multi-word phrases."""
+
+    _END = ""
+
+    def __init__(self, phrases: Iterable[str]):
+        self.root: Dict[str, Any] = {}
+        for phrase in phrases:
+            node = self.root
+            for word in _WORD.findall(phrase.lower()):
+                node = node.setdefault(word, {})
+            node[self._END] = phrase
+
+    def find(self, words: List[str]) -> Optional[str]:
+        """The first phrase occurring in ``words``, or None."""
+        for start in range(len(words)):
+            node = self.root
+            for word in words[start:]:
+                node = node.get(word)
+                if node is None:
+                    break
+                if self._END in node:
+                    return node[self._END]
+        return None
+
+
+@dataclass
+class Intent:
+    """What the router made of a message."""
+    kind: str      # 'timer', 'notes', 'chat' or 'ambiguous'
+    reason: str
+
+    @property
+    def is_ability(self) -> bool:
+        """Whether an ability will answer the message."""
+        return self.kind in ("timer", "notes")
+
+    def detection_result(self) -> Optional[Dict[str, Any]]:
+        """
+        The verdict in CommandDetector's result format.
+
+        Returns:
+            None for ambiguous messages, which still need the LLM classifier
+        """
+        if self.kind == "ambiguous":
+            return None
+        return {
+            "is_command": self.is_ability,
+            "command_type": {"timer": "timer", "notes": "note"}.get(self.kind, "other"),
+            "confidence": 1.0,
+            "source": "intent_router",
+        }
+
+
+class IntentRouter:
+    """
+    Routes chat messages without the LLM whenever that is unambiguous.
+
+    Timer commands are recognised by the timer ability's compiled patterns,
+    notes commands by the notes entry phrases and the conversation's notes
+    mode. Messages containing none of the command keywords are plain chat.
+    Only what is left (a keyword but no recognised command) needs the LLM
+    command detector. Classifying a message takes microseconds.
+
+    The router also owns dispatch: a message classified as a timer or notes
+    command is handed to that ability, and nothing else reaches them.
+    """
+
+    def __init__(
+        self,
+        timer_ability=None,
+        notes_ability=None,
+        state: Optional[NotesState] = None,
+        keywords: Iterable[str] = COMMAND_KEYWORDS
+    ):
+        """
+        Initialize intent router.
+
+        Args:
+            timer_ability: TimerAbility answering timer commands
+            notes_ability: NotesAbility answering notes commands
+            state: Notes mode per conversation (defaults to the shared notes state)
+            keywords: Words and phrases that make a message possibly a command
+        """
+        self.timer_ability = timer_ability
+        self.notes_ability = notes_ability
+        self.state = state or default_notes_state
+        self.keywords = KeywordTrie(keywords)
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {"timer": 0, "notes": 0, "chat": 0, "ambiguous": 0}
+
+    def classify(self, message: str, conversation_id: Optional[str] = None) -> Intent:
+        """
+        Classify a message.
+
+        Args:
+            message: The user's message
+            conversation_id: Conversation the message belongs to (for notes mode)
+
+        Returns:
+            Intent for the message
+        """
+        intent = self._classify(message.lower().strip(), conversation_id)
+        with self._lock:
+            self._counters[intent.kind] += 1
+        logger.debug(f"Intent router: {intent.kind} ({intent.reason})")
+        return intent
+
+    def _classify(self, text: str, conversation_id: Optional[str]) -> Intent:
+        if self.timer_ability and any(pattern.search(text) for pattern in TIMER_PATTERNS):
+            return Intent("timer", "timer_pattern")
+        if self.notes_ability:
+            if NotesAbility.is_entry_command(text):
+                return Intent("notes", "notes_phrase")
+            if conversation_id and self.state.get_state(conversation_id)['in_notes_mode']:
+                return Intent("notes", "notes_mode")
+
+        keyword = self.keywords.find(_WORD.findall(text))
+        if keyword:
+            return Intent("ambiguous", f"keyword:{keyword}")
+        return Intent("chat", "no_keywords")
+
+    async def dispatch(
+        self,
+        message: str,
+        conversation_id: str,
+        user_id: Optional[str],
+        intent: Optional[Intent] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Let the ability the message is meant for answer it.
+
+        Args:
+            message: The user's message
+            conversation_id: ID of the conversation
+            user_id: ID of the user (abilities need one)
+            intent: Classification from classify(), computed if not given
+
+        Returns:
+            Partial response with 'content' and is_timer_response or
+            is_notes_response, or None if no ability answered
+        """
+        if not user_id:
+            return None
+        intent = intent or self.classify(message, conversation_id)
+
+        if intent.kind == "timer":
+            timer_response = await self.timer_ability.handle_timer_command(
+                user_id=user_id,
+                conversation_id=conversation_id,
+                command=message
+            )
+            if timer_response:
+                return {"content": timer_response, "is_timer_response": True}
+        elif intent.kind == "notes":
+            notes_response = await self.notes_ability.handle_notes_command(
+                user_id=user_id,
+                conversation_id=conversation_id,
+                command=message
+            )
+            if notes_response:
+                return {"content": notes_response, "is_notes_response": True}
+
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many messages were routed each way."""
+        with self._lock:
+            counters = dict(self._counters)
+        counters["llm_avoided"] = counters["timer"] + counters["notes"] + counters["chat"]
+        return counters
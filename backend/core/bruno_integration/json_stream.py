@@ -0,0 +1,63 @@
+"""
+JSON Stream - Finds the end of the first JSON value in streamed model output
+"""
+from typing import Optional
+
+
+class JsonValueScanner:
+    """
+    Incrementally scans streamed text for the first complete JSON object or array.
+
+    Classifier prompts ask for a single JSON object, but models often keep
+    going after it. Feeding each streamed delta to the scanner tells the
+    caller the moment the object is closed, so the stream can be dropped
+    instead of paying decode time for the chatter that follows. Text before
+    the opening brace is ignored; braces inside strings are not counted.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.started = False
+        self.complete = False
+        self.text = ""
+
+    def feed(self, delta: str) -> Optional[int]:
+        """
+        Consume the next piece of output.
+
+        Args:
+            delta: Newly streamed text
+
+        Returns:
+            Offset in ``delta`` just past the end of the JSON value once it is
+            complete, otherwise None
+        """
+        if self.complete:
+            return 0
+
+        for index, char in enumerate(delta):
+            if not self.started:
+                if char not in "{[":
+                    continue
+                self.started = True
+
+            self.text += char
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.complete = True
+                    return index + 1
+        return None
@@ -0,0 +1,210 @@
+"""
+LLM Cache - Response cache for deterministic (low-temperature) LLM calls
+"""
+from typing import Dict, List, Optional, Any
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from .redis_clients import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and case so trivially different prompts share a key."""
+    return " ".join(text.split()).casefold()
+
+
+def make_request_key(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    **params: Any
+) -> str:
+    """
+    Build a stable key for an LLM request.
+
+    Args:
+        model: Model name
+        messages: List of message dicts with 'role' and 'content'
+        temperature: Sampling temperature
+        max_tokens: Maximum tokens to generate
+        **params: Any other sampling parameters that change the output
+
+    Returns:
+        Hex digest identifying the request
+    """
+    material = {
+        "model": model,
+        "messages": [
+            # Tool steps differ only in the calls they carry
+            [m.get('role', 'user'), normalize_text(m.get('content', ''))]
+            + ([m['tool_calls']] if m.get('tool_calls') else [])
+            for m in messages
+        ],
+        "temperature": round(float(temperature), 3),
+        "max_tokens": max_tokens,
+        "params": params,
+    }
+    encoded = json.dumps(material, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache for LLM responses.
+
+    The first tier is an in-process LRU with a TTL; the optional second tier is
+    Redis, shared by all workers. Only calls at or below ``max_temperature`` are
+    cached, since only those are (close to) deterministic. Call sites opt in per
+    call with ``generate(..., cache=True)``.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: int = 3600,
+        redis_url: Optional[str] = None,
+        max_temperature: float = 0.2,
+        key_prefix: str = "llm:cache:"
+    ):
+        """
+        Initialize response cache.
+
+        Args:
+            max_entries: Maximum entries kept in process (LRU eviction)
+            ttl: Seconds an entry stays valid
+            redis_url: Redis URL for the shared tier (disabled when empty)
+            max_temperature: Highest sampling temperature that may be cached
+            key_prefix: Prefix for Redis keys
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.redis_url = redis_url
+        self.max_temperature = max_temperature
+        self.key_prefix = key_prefix
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "errors": 0,
+        }
+
+    @classmethod
+    def from_settings(cls) -> 'ResponseCache':
+        """Create a response cache configured from Django settings."""
+        from django.conf import settings
+
+        return cls(
+            max_entries=getattr(settings, 'LLM_CACHE_MAX_ENTRIES', 1024),
+            ttl=getattr(settings, 'LLM_CACHE_TTL', 3600),
+            redis_url=getattr(settings, 'LLM_CACHE_REDIS_URL', ''),
+            max_temperature=getattr(settings, 'LLM_CACHE_MAX_TEMPERATURE', 0.2),
+        )
+
+    def is_cacheable(self, temperature: float) -> bool:
+        """Whether a call with this temperature may be served from cache."""
+        return temperature <= self.max_temperature
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Request key from make_request_key()
+
+        Returns:
+            Cached response dict, or None on a miss
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return dict(value)
+                del self._entries[key]
+
+        redis = get_redis(self.redis_url)
+        if redis is not None:
+            try:
+                raw = await redis.get(self.key_prefix + key)
+                if raw is not None:
+                    value = json.loads(raw)
+                    self._store_local(key, value)
+                    with self._lock:
+                        self._counters["redis_hits"] += 1
+                    return dict(value)
+            except Exception as e:
+                logger.warning(f"LLM cache Redis lookup failed: {e}")
+                with self._lock:
+                    self._counters["errors"] += 1
+
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        """
+        Store a response in both tiers.
+
+        Args:
+            key: Request key from make_request_key()
+            value: JSON-serializable response dict
+            ttl: Optional TTL override in seconds
+        """
+        ttl = ttl or self.ttl
+        self._store_local(key, value, ttl)
+
+        with self._lock:
+            self._counters["stores"] += 1
+
+        redis = get_redis(self.redis_url)
+        if redis is not None:
+            try:
+                await redis.set(self.key_prefix + key, json.dumps(value), ex=ttl)
+            except Exception as e:
+                logger.warning(f"LLM cache Redis store failed: {e}")
+                with self._lock:
+                    self._counters["errors"] += 1
+
+    def _store_local(self, key: str, value: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        """Insert into the in-process LRU, evicting the oldest entries."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all in-process entries (the Redis tier expires on its own)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the in-process size."""
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._entries)
+
+        lookups = counters["hits"] + counters["redis_hits"] + counters["misses"]
+        counters["entries"] = size
+        counters["hit_rate"] = (
+            round((counters["hits"] + counters["redis_hits"]) / lookups, 4) if lookups else 0.0
+        )
+        return counters
+
+
+# Global response cache instance
+response_cache = ResponseCache.from_settings()
@@ -0,0 +1,255 @@
+"""
+LLM Scheduler - Bounded, priority-aware, per-user-fair admission to the LLM
+"""
+from typing import Dict, List, Optional, Any
+from contextlib import asynccontextmanager
+from enum import IntEnum
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Request classes, served strictly in this order."""
+    INTERACTIVE = 0   # chat replies a user is waiting for
+    CLASSIFIER = 1    # command detection / parsing on the chat path
+    BACKGROUND = 2    # proactive messages, memory extraction, warm-up
+
+
+class _Ticket:
+    """A queued request waiting for a slot."""
+
+    __slots__ = ('loop', 'future', 'priority', 'user_id', 'start_tag', 'enqueued_at', 'granted', 'cancelled')
+
+    def __init__(self, loop, future, priority, user_id, start_tag):
+        self.loop = loop
+        self.future = future
+        self.priority = priority
+        self.user_id = user_id
+        self.start_tag = start_tag
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+
+
+class _ClassQueue:
+    """Start-time fair queue for one priority class."""
+
+    def __init__(self):
+        self.heap: List[tuple] = []
+        self.virtual_time = 0.0
+        self.last_finish: Dict[str, float] = {}
+        self.depth = 0
+        self.active = 0
+        self.dispatched = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, waited: float) -> None:
+        self.dispatched += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+
+def _grant(future: asyncio.Future) -> None:
+    """Wake a queued request on its own loop, unless it gave up waiting."""
+    if not future.done():
+        future.set_result(True)
+
+
+class LLMScheduler:
+    """
+    Caps concurrent LLM requests and decides who goes next.
+
+    Classes are served in strict priority order (interactive before
+    classifier before background). Within a class, users are served by
+    start-time fair queuing: each request gets a virtual start tag of
+    ``max(class virtual time, user's previous finish tag)`` and finishes
+    ``cost / weight`` later, so a user with many queued requests only gets
+    their fair share while others are waiting.
+
+    Like the other LLM helpers, state is guarded by a thread lock and waiters
+    are woken with ``call_soon_threadsafe`` so callers on any event loop share
+    one per-process limit.
+
+    The queue is per process: priorities and fairness only order requests
+    served by the same process, so they need a server running many requests
+    per process (gunicorn's gthread workers, see deployment/gunicorn.conf.py,
+    or an ASGI server). Under single-request sync workers nothing ever queues.
+    """
+
+    def __init__(self, max_concurrency: int = 4, user_weights: Optional[Dict[str, float]] = None):
+        """
+        Initialize scheduler.
+
+        Args:
+            max_concurrency: Maximum LLM requests running at once in this process
+            user_weights: Optional per-user weights (default 1.0); higher gets more share
+        """
+        self.max_concurrency = max_concurrency
+        self.user_weights = user_weights or {}
+        self._classes = {priority: _ClassQueue() for priority in Priority}
+        self._active = 0
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, setting: str = 'LLM_MAX_CONCURRENCY', default: int = 4) -> 'LLMScheduler':
+        """
+        Create a scheduler configured from Django settings.
+
+        Args:
+            setting: Name of the setting holding the concurrency limit
+            default: Limit used when the setting is missing
+        """
+        from django.conf import settings
+
+        return cls(max_concurrency=getattr(settings, setting, default))
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        priority: Priority = Priority.INTERACTIVE,
+        user_id: Optional[str] = None,
+        cost: float = 1.0
+    ):
+        """
+        Hold one of the concurrency slots for the duration of the block.
+
+        Args:
+            priority: Request class
+            user_id: User the request is made for (anonymous requests share one bucket)
+            cost: Relative cost of the request for fair queuing
+        """
+        await self.acquire(priority, user_id, cost)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    async def acquire(
+        self,
+        priority: Priority = Priority.INTERACTIVE,
+        user_id: Optional[str] = None,
+        cost: float = 1.0
+    ) -> None:
+        """Wait until a slot is available for this request."""
+        priority = Priority(priority)
+        user_key = str(user_id) if user_id is not None else ''
+        queue = self._classes[priority]
+
+        with self._lock:
+            start_tag = max(queue.virtual_time, queue.last_finish.get(user_key, 0.0))
+            queue.last_finish[user_key] = start_tag + cost / self.user_weights.get(user_key, 1.0)
+
+            if self._active < self.max_concurrency and not self._has_waiters():
+                self._active += 1
+                queue.active += 1
+                queue.virtual_time = start_tag
+                queue.record_wait(0.0)
+                return
+
+            loop = asyncio.get_running_loop()
+            ticket = _Ticket(loop, loop.create_future(), priority, user_key, start_tag)
+            heapq.heappush(queue.heap, (start_tag, next(self._sequence), ticket))
+            queue.depth += 1
+
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = ticket.granted
+                if not granted:
+                    ticket.cancelled = True
+                    queue.depth -= 1
+            if granted:
+                # The slot was handed to us just as we gave up; pass it on
+                self.release(priority)
+            raise
+
+    def release(self, priority: Priority = Priority.INTERACTIVE) -> None:
+        """Return a slot and hand it to the next queued request, if any."""
+        with self._lock:
+            self._active -= 1
+            self._classes[Priority(priority)].active -= 1
+            self._dispatch()
+
+    def _has_waiters(self) -> bool:
+        return any(queue.depth for queue in self._classes.values())
+
+    def _dispatch(self) -> None:
+        """Grant free slots to queued requests (caller holds the lock)."""
+        while self._active < self.max_concurrency:
+            ticket = self._next_ticket()
+            if ticket is None:
+                return
+
+            queue = self._classes[ticket.priority]
+            ticket.granted = True
+            queue.depth -= 1
+            queue.active += 1
+            queue.virtual_time = ticket.start_tag
+            queue.record_wait(time.monotonic() - ticket.enqueued_at)
+            self._active += 1
+            self._prune(queue)
+
+            try:
+                ticket.loop.call_soon_threadsafe(_grant, ticket.future)
+            except RuntimeError:
+                # The waiter's loop is gone; reclaim the slot
+                logger.debug(f"Dropping {ticket.priority.name} request whose event loop closed")
+                self._active -= 1
+                queue.active -= 1
+
+    def _next_ticket(self) -> Optional[_Ticket]:
+        """Pop the next live ticket from the highest-priority non-empty class."""
+        for priority in Priority:
+            heap = self._classes[priority].heap
+            while heap:
+                _, _, ticket = heapq.heappop(heap)
+                if not ticket.cancelled:
+                    return ticket
+        return None
+
+    @staticmethod
+    def _prune(queue: _ClassQueue) -> None:
+        """Forget finish tags that no longer affect scheduling."""
+        if len(queue.last_finish) > 10000:
+            queue.last_finish = {
+                user: finish for user, finish in queue.last_finish.items()
+                if finish > queue.virtual_time
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, active requests and wait times per class."""
+        with self._lock:
+            classes = {}
+            for priority, queue in self._classes.items():
+                classes[priority.name.lower()] = {
+                    "queued": queue.depth,
+                    "active": queue.active,
+                    "dispatched": queue.dispatched,
+                    "wait_avg_ms": round(queue.wait_total / queue.dispatched * 1000, 1) if queue.dispatched else 0.0,
+                    "wait_max_ms": round(queue.wait_max * 1000, 1),
+                }
+            return {
+                "max_concurrency": self.max_concurrency,
+                "active": self._active,
+                "classes": classes,
+            }
+
+    def queue_depth(self, priority: Optional[Priority] = None) -> int:
+        """Number of queued requests, for one class or overall."""
+        with self._lock:
+            if priority is not None:
+                return self._classes[Priority(priority)].depth
+            return sum(queue.depth for queue in self._classes.values())
+
+
+# Global LLM scheduler instance
+llm_scheduler = LLMScheduler.from_settings()
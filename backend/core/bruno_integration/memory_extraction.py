@@ -6,6 +6,8 @@ import logging
 import re
 from asgiref.sync import sync_to_async
 
+from .db_reads import parallel_read
+
 logger = logging.getLogger(__name__)
 
 
@@ -214,7 +216,7 @@ class MemoryExtractor:
         Returns:
             List of relevant memories
         """
-        @sync_to_async
+        @parallel_read
         def get():
             from django.contrib.auth import get_user_model
             User = get_user_model()
@@ -262,7 +264,18 @@ class MemoryExtractor:
             Formatted string of memories
         """
         memories = await self.get_relevant_memories(user_id, limit=limit)
+        return self.format_memories(memories)
+    
+    def format_memories(self, memories: List[Dict[str, Any]]) -> str:
+        """
+        Format already retrieved memories as context string for LLM.
         
+        Args:
+            memories: Memories as returned by get_relevant_memories
+            
+        Returns:
+            Formatted string of memories, empty if there are none
+        """
         if not memories:
             return ""
         
@@ -0,0 +1,203 @@
+"""
+Micro Batcher - Packs concurrent small LLM requests into one call
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import threading
+
+from .single_flight import _call_soon, _deliver
+
+logger = logging.getLogger(__name__)
+
+
+class BatchFailed(Exception):
+    """The batch a request joined could not be answered; run the request on its own."""
+
+
+class _Batch:
+    """Requests collected for one upstream call."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.items: List[Any] = []
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, Optional[asyncio.Future]]] = []
+        self.full = loop.create_future()
+        self.closed = False
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests with the same key and answers them with one call.
+
+    Batching only kicks in under load: when no call for a key is running, a
+    request is sent straight away as a batch of one, so a quiet system pays
+    no extra latency. While a call is running, new requests wait up to
+    ``window`` seconds (or until ``max_batch`` requests have gathered) and
+    then go out together.
+
+    The first request of a batch runs it on its own event loop; the others
+    are handed their results with ``call_soon_threadsafe``, so requests from
+    different ``async_to_sync`` loops can share a batch. If the batch fails,
+    every other member gets BatchFailed and should retry on its own.
+    """
+
+    def __init__(self, enabled: bool = True, window: float = 0.005, max_batch: int = 8):
+        """
+        Initialize micro batcher.
+
+        Args:
+            enabled: When False every request runs as a batch of one immediately
+            window: Seconds a batch stays open for more requests
+            max_batch: Maximum requests per batch
+        """
+        self.enabled = enabled
+        self.window = window
+        self.max_batch = max_batch
+        self._open: Dict[str, _Batch] = {}
+        self._running: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "requests": 0,
+            "batches": 0,
+            "batched_requests": 0,
+            "failures": 0,
+        }
+
+    @classmethod
+    def from_settings(cls) -> 'MicroBatcher':
+        """Create a micro batcher configured from Django settings."""
+        from django.conf import settings
+
+        return cls(
+            enabled=getattr(settings, 'LLM_BATCH_CLASSIFIERS', True),
+            window=getattr(settings, 'LLM_BATCH_WINDOW_MS', 5) / 1000,
+            max_batch=getattr(settings, 'LLM_BATCH_MAX_SIZE', 8),
+        )
+
+    async def submit(
+        self,
+        key: str,
+        item: Any,
+        run_batch: Callable[[List[Any]], Awaitable[List[Any]]]
+    ) -> Any:
+        """
+        Get the result for ``item``, possibly as part of a larger batch.
+
+        Args:
+            key: Requests are only batched with others using the same key
+                (e.g. the task and model)
+            item: The request
+            run_batch: Coroutine factory answering a list of items with a list of
+                results in the same order; used if this request opens the batch
+
+        Returns:
+            The result for ``item``
+
+        Raises:
+            BatchFailed: If the batch this request joined failed
+        """
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            self._counters["requests"] += 1
+            batch = self._open.get(key) if self.enabled else None
+
+            if batch is not None and not batch.closed:
+                future = loop.create_future()
+                batch.items.append(item)
+                batch.waiters.append((loop, future))
+                if len(batch.items) >= self.max_batch:
+                    self._close(key, batch)
+                    _call_soon(batch.loop, _deliver, batch.full, True, None)
+                opener = False
+            else:
+                batch = _Batch(loop)
+                batch.items.append(item)
+                batch.waiters.append((loop, None))
+                wait = self.enabled and self.window > 0 and self._running.get(key, 0) > 0
+                if wait:
+                    self._open[key] = batch
+                else:
+                    batch.closed = True
+                opener = True
+
+        if not opener:
+            return await future
+
+        if wait:
+            try:
+                await asyncio.wait_for(asyncio.shield(batch.full), timeout=self.window)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                with self._lock:
+                    self._close(key, batch)
+                    waiters = list(batch.waiters[1:])
+                for waiter_loop, future in waiters:
+                    _call_soon(waiter_loop, _deliver, future, None, BatchFailed("Batch owner was cancelled"))
+                raise
+            with self._lock:
+                self._close(key, batch)
+
+        return await self._run(key, batch, run_batch)
+
+    def _close(self, key: str, batch: _Batch) -> None:
+        """Stop a batch from taking more requests (caller holds the lock)."""
+        batch.closed = True
+        if self._open.get(key) is batch:
+            del self._open[key]
+
+    async def _run(
+        self,
+        key: str,
+        batch: _Batch,
+        run_batch: Callable[[List[Any]], Awaitable[List[Any]]]
+    ) -> Any:
+        """Run a closed batch and hand each member its result."""
+        with self._lock:
+            items = list(batch.items)
+            waiters = list(batch.waiters)
+            self._running[key] = self._running.get(key, 0) + 1
+            self._counters["batches"] += 1
+            if len(items) > 1:
+                self._counters["batched_requests"] += len(items)
+
+        results, error = None, None
+        try:
+            results = await run_batch(items)
+            if len(results) != len(items):
+                raise ValueError(f"Batch of {len(items)} returned {len(results)} results")
+            return results[0]
+        except asyncio.CancelledError:
+            error = BatchFailed("Batch owner was cancelled")
+            raise
+        except Exception as e:
+            logger.warning(f"Batch of {len(items)} for {key} failed: {e}")
+            with self._lock:
+                self._counters["failures"] += 1
+            error = BatchFailed(str(e))
+            if len(items) > 1:
+                raise error from e
+            raise
+        finally:
+            with self._lock:
+                self._running[key] -= 1
+                if not self._running[key]:
+                    del self._running[key]
+            for index, (waiter_loop, future) in enumerate(waiters[1:], start=1):
+                result = results[index] if error is None else None
+                _call_soon(waiter_loop, _deliver, future, result, error)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request and batch counters."""
+        with self._lock:
+            counters = dict(self._counters)
+        counters["average_batch_size"] = (
+            round(counters["requests"] / counters["batches"], 2) if counters["batches"] else 0.0
+        )
+        return counters
+
+
+# Global micro batcher
+micro_batcher = MicroBatcher.from_settings()
@@ -0,0 +1,261 @@
+"""
+Model Warmer - Keeps the models agents use loaded on every Ollama host
+"""
+from typing import Dict, List, Optional, Any, Iterable
+from datetime import datetime, timezone
+import asyncio
+import logging
+import re
+import threading
+import time
+
+import aiohttp
+
+from .ollama_pool import OllamaBackend, OllamaPool, ollama_pool as default_pool
+
+logger = logging.getLogger(__name__)
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_keep_alive(value: Any) -> Optional[float]:
+    """
+    Convert an Ollama ``keep_alive`` value to seconds.
+
+    Args:
+        value: Seconds as a number, or a duration string such as "30m" or "1h30m"
+
+    Returns:
+        Seconds, or None if the model is kept loaded forever (negative values)
+
+    Raises:
+        ValueError: If the value cannot be parsed
+    """
+    if isinstance(value, (int, float)):
+        return None if value < 0 else float(value)
+
+    text = str(value).strip().lower()
+    try:
+        seconds = float(text)
+        return None if seconds < 0 else seconds
+    except ValueError:
+        pass
+
+    if text.startswith("-"):
+        return None
+    parts = _DURATION_PART.findall(text)
+    if not parts or "".join(number + unit for number, unit in parts) != text:
+        raise ValueError(f"Invalid keep_alive duration: {value!r}")
+    return sum(float(number) * _UNIT_SECONDS[unit] for number, unit in parts)
+
+
+class ModelWarmer:
+    """
+    Preloads models with ``keep_alive`` and reloads them before they expire.
+
+    Each refresh asks every healthy host which models it has resident
+    (``GET /api/ps``) and sends an empty ``/api/generate`` call, which makes
+    Ollama load the model and reset its expiry, for every wanted model that
+    is missing or would expire before the next refresh. Hosts that restart
+    are therefore re-warmed on the next cycle as well.
+
+    Refreshes run from the ``warm_models`` management command, once at
+    startup and then every ``refresh_interval`` seconds with ``--loop``.
+    """
+
+    def __init__(
+        self,
+        pool: Optional[OllamaPool] = None,
+        keep_alive: Any = "30m",
+        refresh_interval: Optional[float] = None,
+        load_timeout: float = 300.0,
+        extra_models: Optional[Iterable[str]] = None
+    ):
+        """
+        Initialize model warmer.
+
+        Args:
+            pool: Ollama hosts to warm (defaults to the global pool)
+            keep_alive: keep_alive sent with each warm-up call
+            refresh_interval: Seconds between refreshes; defaults to half of
+                keep_alive (10 minutes when models are kept forever)
+            load_timeout: Seconds a model load may take
+            extra_models: Models to keep warm besides the agents' (e.g. the classifier)
+        """
+        self.pool = pool or default_pool
+        self.keep_alive = keep_alive
+        keep_alive_seconds = parse_keep_alive(keep_alive)
+        if refresh_interval is None:
+            refresh_interval = keep_alive_seconds / 2 if keep_alive_seconds else 600.0
+        self.refresh_interval = refresh_interval
+        self.load_timeout = load_timeout
+        self.extra_models = [m for m in (extra_models or []) if m]
+        self._lock = threading.Lock()
+        self._resident: Dict[str, List[Dict[str, Any]]] = {}
+        self._counters = {"refreshes": 0, "loads": 0, "load_failures": 0}
+        self._last_refresh: Optional[float] = None
+
+    @classmethod
+    def from_settings(cls) -> 'ModelWarmer':
+        """Create a model warmer configured from Django settings."""
+        from django.conf import settings
+
+        return cls(
+            keep_alive=getattr(settings, 'OLLAMA_KEEP_ALIVE', '30m'),
+            refresh_interval=getattr(settings, 'OLLAMA_WARM_INTERVAL', None) or None,
+            extra_models=[
+                getattr(settings, 'LLM_CLASSIFIER_MODEL', 'mistral:7b'),
+                getattr(settings, 'CHAT_CASCADE_SMALL_MODEL', ''),
+            ],
+        )
+
+    def wanted_models(self) -> List[str]:
+        """
+        Models to keep warm: every active Ollama agent's model plus the extra models.
+
+        Must be called from a sync context (it queries the database).
+        """
+        from apps.agents.models import Agent
+
+        models = Agent.objects.filter(
+            is_active=True, llm_provider='ollama'
+        ).values_list('model', flat=True).distinct()
+        return sorted(set(models) | set(self.extra_models))
+
+    async def refresh(self, models: List[str]) -> Dict[str, Dict[str, str]]:
+        """
+        Warm every model that is not resident long enough on each healthy host.
+
+        Args:
+            models: Model names to keep loaded
+
+        Returns:
+            Dict mapping host URL to {model: "resident" | "loaded" | "failed: <reason>"}
+        """
+        backends = [b for b in self.pool.backends if b.healthy]
+        results = await asyncio.gather(*(self._refresh_backend(b, models) for b in backends))
+        with self._lock:
+            self._counters["refreshes"] += 1
+            self._last_refresh = time.time()
+        return {b.url: result for b, result in zip(backends, results)}
+
+    async def _refresh_backend(self, backend: OllamaBackend, models: List[str]) -> Dict[str, str]:
+        try:
+            resident = await self._list_resident(backend)
+        except Exception as e:
+            logger.warning(f"Could not list resident models on {backend.url}: {e}")
+            resident = []
+
+        # Anything expiring before the next refresh (plus slack for the load) is reloaded
+        horizon = time.time() + self.refresh_interval + 60
+        fresh = {
+            m["name"] for m in resident
+            if m["expires_at"] is None or m["expires_at"] > horizon
+        }
+
+        result = {}
+        for model in models:
+            if model in fresh:
+                result[model] = "resident"
+                continue
+            try:
+                await self.load(backend, model)
+                result[model] = "loaded"
+            except Exception as e:
+                with self._lock:
+                    self._counters["load_failures"] += 1
+                logger.warning(f"Warming {model} on {backend.url} failed: {e}")
+                result[model] = f"failed: {e}"
+
+        if any(state == "loaded" for state in result.values()):
+            try:
+                await self._list_resident(backend)
+            except Exception:
+                pass
+        return result
+
+    async def load(self, backend: OllamaBackend, model: str) -> None:
+        """Load ``model`` on ``backend`` and reset its keep_alive."""
+        session = self.pool.session_manager.get_session()
+        timeout = aiohttp.ClientTimeout(total=self.load_timeout)
+        payload = {"model": model, "keep_alive": self.keep_alive}
+        started = time.monotonic()
+
+        async with session.post(f"{backend.url}/api/generate", json=payload, timeout=timeout) as response:
+            if response.status != 200:
+                raise Exception(f"{response.status} - {await response.text()}")
+            await response.read()
+
+        with self._lock:
+            self._counters["loads"] += 1
+        logger.info(f"Warmed {model} on {backend.url} in {time.monotonic() - started:.1f}s")
+
+    async def resident(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Ask every host which models it has loaded.
+
+        Returns:
+            Dict mapping host URL to a list of {name, expires_at, size_vram};
+            expires_at is a Unix timestamp (None when kept forever)
+        """
+        results = await asyncio.gather(
+            *(self._list_resident(b) for b in self.pool.backends), return_exceptions=True
+        )
+        return {
+            b.url: [] if isinstance(r, Exception) else r
+            for b, r in zip(self.pool.backends, results)
+        }
+
+    async def _list_resident(self, backend: OllamaBackend) -> List[Dict[str, Any]]:
+        session = self.pool.session_manager.get_session()
+        timeout = aiohttp.ClientTimeout(total=self.pool.health_check_timeout)
+
+        async with session.get(f"{backend.url}/api/ps", timeout=timeout) as response:
+            if response.status != 200:
+                raise Exception(f"/api/ps returned {response.status}")
+            data = await response.json()
+
+        models = [
+            {
+                "name": m.get("name") or m.get("model"),
+                "expires_at": self._timestamp(m.get("expires_at")),
+                "size_vram": m.get("size_vram"),
+            }
+            for m in data.get("models", [])
+        ]
+        with self._lock:
+            self._resident[backend.url] = models
+        return models
+
+    @staticmethod
+    def _timestamp(value: Optional[str]) -> Optional[float]:
+        """Parse Ollama's RFC 3339 expiry (nanosecond precision) to a Unix timestamp."""
+        if not value:
+            return None
+        match = re.match(r"(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)?$", value)
+        if not match:
+            return None
+        base, fraction, zone = match.groups()
+        parsed = datetime.fromisoformat(base + (zone or "Z").replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        seconds = parsed.timestamp() + (float(f"0.{fraction}") if fraction else 0.0)
+        # Ollama reports far-future expiries for models kept forever
+        return None if parsed.year > 2200 else seconds
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters and the residency seen by the last refresh in this process."""
+        with self._lock:
+            return {
+                **self._counters,
+                "keep_alive": self.keep_alive,
+                "refresh_interval": self.refresh_interval,
+                "last_refresh": self._last_refresh,
+                "resident": {url: list(models) for url, models in self._resident.items()},
+            }
+
+
+# Global model warmer
+model_warmer = ModelWarmer.from_settings()
@@ -7,6 +7,9 @@ from asgiref.sync import sync_to_async
 
 logger = logging.getLogger(__name__)
 
+# Phrases that open notes mode from anywhere in a message
+NOTES_ENTRY_PHRASES = ('show notes', 'open notes', 'view notes')
+
 
 class NotesState:
     """Tracks the state of the notes interface for each conversation."""
@@ -74,7 +77,7 @@ class NotesAbility:
         
         # Check if user wants to enter notes mode
         # Match "show notes", "view notes", "open notes", or just "notes"
-        if any(phrase in command_lower for phrase in ['show notes', 'open notes', 'view notes']) or command_lower == 'notes':
+        if self.is_entry_command(command_lower):
             if not state['in_notes_mode']:
                 logger.info(f"📝 Entering notes mode")
                 notes_state.set_state(conversation_id, in_notes_mode=True, view='list')
@@ -99,6 +102,11 @@ class NotesAbility:
         logger.warning(f"📝 No handler found for view: {state['view']}")
         return None
     
+    @staticmethod
+    def is_entry_command(command_lower: str) -> bool:
+        """Whether a lowercased, stripped command opens notes mode."""
+        return any(phrase in command_lower for phrase in NOTES_ENTRY_PHRASES) or command_lower == 'notes'
+    
     async def _show_notes_list(self, user_id: str) -> str:
         """Show list of all user notes."""
         @sync_to_async
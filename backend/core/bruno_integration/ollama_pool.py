@@ -0,0 +1,250 @@
+"""
+Ollama Pool - Health-checked set of Ollama hosts with least-loaded, sticky routing
+"""
+from typing import Dict, Optional, Any, Iterable
+from collections import OrderedDict
+from dataclasses import dataclass
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
+
+import aiohttp
+
+from .http_sessions import SessionManager, session_manager as default_session_manager
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OllamaBackend:
+    """One Ollama host and its routing state."""
+    url: str
+    healthy: bool = True
+    outstanding: int = 0
+    requests: int = 0
+    failures: int = 0
+    last_error: str = ""
+
+
+class OllamaPool:
+    """
+    Routes Ollama calls across several hosts.
+
+    Each call goes to the healthy host with the fewest outstanding requests,
+    ties broken at random (each worker process only counts its own calls,
+    so idle processes would otherwise all pick the first host). With sticky routing, a conversation is placed by
+    rendezvous hashing of its ID, which every worker process computes the
+    same way, and then keeps going to that host, so Ollama's KV cache for
+    the conversation stays warm. A host whose connection fails or that
+    answers with a 5xx is marked down and the call is retried elsewhere.
+    Hosts are re-probed via ``/api/tags`` at most every
+    ``health_check_interval`` seconds; incoming calls start the probe in the
+    background and do not wait for it.
+    """
+
+    def __init__(
+        self,
+        urls: Iterable[str],
+        sticky: bool = True,
+        health_check_interval: float = 30.0,
+        health_check_timeout: float = 2.0,
+        max_affinity: int = 10000,
+        session_manager: Optional[SessionManager] = None
+    ):
+        """
+        Initialize Ollama pool.
+
+        Args:
+            urls: Base URLs of the Ollama hosts
+            sticky: Keep routing a conversation to the same host while it is healthy
+            health_check_interval: Seconds between health probes (0 disables probing)
+            health_check_timeout: Seconds a health probe may take
+            max_affinity: Maximum conversation-to-host assignments remembered (LRU)
+            session_manager: Pool providing HTTP sessions for probes
+        """
+        urls = [url.strip().rstrip('/') for url in urls if url and url.strip()]
+        if not urls:
+            raise ValueError("OllamaPool needs at least one backend URL")
+
+        self.backends = [OllamaBackend(url=url) for url in dict.fromkeys(urls)]
+        self.sticky = sticky
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.max_affinity = max_affinity
+        self.session_manager = session_manager or default_session_manager
+        self._affinity: "OrderedDict[str, str]" = OrderedDict()
+        self._last_health_check = time.monotonic()
+        self._checking = False
+        self._health_check: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> 'OllamaPool':
+        """Create a pool configured from Django settings."""
+        from django.conf import settings
+
+        urls = getattr(settings, 'OLLAMA_BASE_URLS', None) or [
+            getattr(settings, 'OLLAMA_BASE_URL', 'http://localhost:11434')
+        ]
+        return cls(
+            urls=urls,
+            sticky=getattr(settings, 'OLLAMA_STICKY_ROUTING', True),
+            health_check_interval=getattr(settings, 'OLLAMA_HEALTH_CHECK_INTERVAL', 30.0),
+        )
+
+    @property
+    def primary_url(self) -> str:
+        """URL of the first configured host."""
+        return self.backends[0].url
+
+    def choose(self, conversation_id: Optional[str] = None, exclude: Iterable[str] = ()) -> OllamaBackend:
+        """
+        Pick a host for a call and count it as outstanding.
+
+        Every call to choose() must be paired with release().
+
+        Args:
+            conversation_id: Conversation the call belongs to (for sticky routing)
+            exclude: URLs already tried for this call
+
+        Returns:
+            The chosen backend
+        """
+        exclude = set(exclude)
+
+        with self._lock:
+            candidates = [b for b in self.backends if b.url not in exclude]
+            if not candidates:
+                raise ValueError("No Ollama backends left to try")
+
+            healthy = [b for b in candidates if b.healthy]
+            # With every host marked down, still try one rather than failing outright
+            pool = healthy or candidates
+
+            backend = None
+            if self.sticky and conversation_id:
+                url = self._affinity.get(conversation_id)
+                backend = next((b for b in pool if b.url == url), None)
+                if backend is None:
+                    backend = max(pool, key=lambda b: self._rendezvous(conversation_id, b.url))
+
+            if backend is None:
+                fewest = min(b.outstanding for b in pool)
+                backend = random.choice([b for b in pool if b.outstanding == fewest])
+
+            if self.sticky and conversation_id:
+                self._affinity[conversation_id] = backend.url
+                self._affinity.move_to_end(conversation_id)
+                while len(self._affinity) > self.max_affinity:
+                    self._affinity.popitem(last=False)
+
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    @staticmethod
+    def _rendezvous(conversation_id: str, url: str) -> int:
+        """Weight of a host for a conversation; the heaviest host wins."""
+        return int.from_bytes(hashlib.blake2b(f"{conversation_id}|{url}".encode(), digest_size=8).digest(), "big")
+
+    def release(self, backend: OllamaBackend) -> None:
+        """Mark a call chosen with choose() as finished."""
+        with self._lock:
+            backend.outstanding -= 1
+
+    def mark_down(self, backend: OllamaBackend, error: BaseException) -> None:
+        """Take a host out of rotation until a health probe succeeds."""
+        with self._lock:
+            if backend.healthy:
+                logger.warning(f"Ollama backend {backend.url} marked down: {error}")
+            backend.healthy = False
+            backend.failures += 1
+            backend.last_error = str(error) or type(error).__name__
+
+    def mark_up(self, backend: OllamaBackend) -> None:
+        """Put a host back into rotation."""
+        with self._lock:
+            if not backend.healthy:
+                logger.info(f"Ollama backend {backend.url} is back up")
+            backend.healthy = True
+
+    def maybe_check_health(self) -> Optional[asyncio.Task]:
+        """
+        Start probing the hosts in the background if the check interval has passed.
+
+        Must be called from a coroutine; only one probe runs at a time.
+
+        Returns:
+            The probe task, or None if no probe was started
+        """
+        if not self.health_check_interval or (len(self.backends) < 2 and self.backends[0].healthy):
+            return None
+
+        with self._lock:
+            due = time.monotonic() - self._last_health_check >= self.health_check_interval
+            if not due or self._checking:
+                return None
+            self._checking = True
+
+        async def check() -> None:
+            try:
+                await self.check_health()
+            finally:
+                with self._lock:
+                    self._checking = False
+
+        # Keep a reference so the task is not garbage collected mid-probe
+        self._health_check = asyncio.get_running_loop().create_task(check())
+        return self._health_check
+
+    async def check_health(self) -> Dict[str, bool]:
+        """
+        Probe every host with ``GET /api/tags``.
+
+        Returns:
+            Dict mapping host URL to whether it responded
+        """
+        session = self.session_manager.get_session()
+        timeout = aiohttp.ClientTimeout(total=self.health_check_timeout)
+
+        async def probe(backend: OllamaBackend) -> bool:
+            try:
+                async with session.get(f"{backend.url}/api/tags", timeout=timeout) as response:
+                    if response.status != 200:
+                        raise Exception(f"health check returned {response.status}")
+                self.mark_up(backend)
+                return True
+            except Exception as e:
+                self.mark_down(backend, e)
+                return False
+
+        results = await asyncio.gather(*(probe(b) for b in self.backends))
+
+        with self._lock:
+            self._last_health_check = time.monotonic()
+        return {b.url: ok for b, ok in zip(self.backends, results)}
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-host routing state."""
+        with self._lock:
+            return {
+                "sticky_conversations": len(self._affinity),
+                "backends": [
+                    {
+                        "url": b.url,
+                        "healthy": b.healthy,
+                        "outstanding": b.outstanding,
+                        "requests": b.requests,
+                        "failures": b.failures,
+                        "last_error": b.last_error,
+                    }
+                    for b in self.backends
+                ],
+            }
+
+
+# Global Ollama pool
+ollama_pool = OllamaPool.from_settings()
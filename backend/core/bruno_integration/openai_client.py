@@ -0,0 +1,475 @@
+"""
+OpenAI Client - Streaming client for OpenAI-compatible chat completion servers
+"""
+from typing import Dict, List, Optional, Any, AsyncIterator, Awaitable, Callable
+import asyncio
+import json
+import logging
+import time
+
+from .deadlines import Deadline, DeadlineExceeded
+from .http_sessions import SessionManager, session_manager as default_session_manager
+from .json_stream import JsonValueScanner
+from .llm_cache import ResponseCache, make_request_key, response_cache as default_response_cache
+from .llm_scheduler import LLMScheduler, Priority
+from .single_flight import SingleFlight, single_flight as default_single_flight
+
+logger = logging.getLogger(__name__)
+
+
+class OpenAICompatibleClient:
+    """
+    Client for any server implementing ``POST /v1/chat/completions``.
+
+    Works with OpenAI itself and with self-hosted continuous-batching servers
+    (vLLM, TGI, llama.cpp server, LiteLLM, ...), which serve many more
+    concurrent users per GPU than Ollama. Calls share the pooled keep-alive
+    sessions, the response cache and single-flight group used by
+    OllamaClient, and are bounded by their own scheduler so a batching server
+    is not held to Ollama's concurrency limit. ``generate`` takes the same
+    arguments and returns the same shape as ``OllamaClient.generate``, so
+    BrunoAgent can use either.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        session_manager: Optional[SessionManager] = None,
+        response_cache: Optional[ResponseCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        scheduler: Optional[LLMScheduler] = None,
+        request_timeout: Optional[float] = None
+    ):
+        """
+        Initialize OpenAI-compatible client.
+
+        Args:
+            base_url: API root including the version, e.g. ``http://vllm:8000/v1``
+                (defaults to OPENAI_BASE_URL)
+            api_key: Bearer token (defaults to OPENAI_API_KEY; servers without
+                auth accept any value or none)
+            session_manager: Pool providing HTTP sessions (defaults to the shared pool)
+            response_cache: Cache used by ``generate(cache=True)`` (defaults to the shared cache)
+            single_flight: Group coalescing identical concurrent calls (defaults to the shared group)
+            scheduler: Scheduler bounding concurrent calls (defaults to ``openai_scheduler``)
+            request_timeout: Upper bound in seconds for a single generation (defaults
+                to OPENAI_REQUEST_TIMEOUT); a caller's deadline can only shorten it
+        """
+        from django.conf import settings
+
+        if base_url is None:
+            base_url = getattr(settings, 'OPENAI_BASE_URL', 'https://api.openai.com/v1')
+        if api_key is None:
+            api_key = getattr(settings, 'OPENAI_API_KEY', '')
+        if request_timeout is None:
+            request_timeout = getattr(settings, 'OPENAI_REQUEST_TIMEOUT', 120.0)
+
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.session_manager = session_manager or default_session_manager
+        self.response_cache = response_cache or default_response_cache
+        self.single_flight = single_flight or default_single_flight
+        self.scheduler = scheduler or openai_scheduler
+        self.request_timeout = request_timeout
+        logger.info(f"Initialized OpenAICompatibleClient for {self.base_url}")
+
+    async def generate(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        stream: bool = False,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+        conversation_id: Optional[str] = None,
+        cache: bool = False,
+        priority: Priority = Priority.INTERACTIVE,
+        user_id: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        hedge: bool = False,
+        json_mode: bool = False,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate a response with the chat completions API.
+
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            model: Model name as known to the server
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            stream: Whether to stream the response
+            on_delta: Optional coroutine called with each text delta while streaming
+                (implies stream=True)
+            conversation_id: Unused; accepted for compatibility with OllamaClient
+            cache: Serve/store the response from the response cache (low temperatures only)
+            priority: Scheduling class of the call (see LLMScheduler)
+            user_id: User the call is made for, used for fair queuing
+            deadline: Time budget of the request this call is part of
+            hedge: Unused; a single endpoint has no second host to hedge on
+            json_mode: Ask for a JSON object (``response_format``) and stream it,
+                closing the stream once the object is complete
+            tools: Function tools the model may call (AbilityManager.get_tools_schema);
+                streamed like any other call when on_delta or stream is given
+
+        Returns:
+            Dict with 'content', 'model', 'tokens_used' and 'timings'
+            (prompt and completion tokens, plus ttft_ms and decode_ms when streamed);
+            'tool_calls' lists the calls the model requested ('id', 'name',
+            'arguments'), if any
+
+        Raises:
+            DeadlineExceeded: If the deadline or request timeout passes first
+        """
+        cache_key = None
+        if cache and self.response_cache.is_cacheable(temperature):
+            cache_key = self._cache_key(messages, model, temperature, max_tokens, json_mode, tools)
+            cached = await self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"LLM cache hit for model {model}")
+                if on_delta:
+                    await on_delta(cached["content"])
+                cached = {key: value for key, value in cached.items() if key != "timings"}
+                return {**cached, "tokens_used": 0, "cached": True}
+
+        flight_key = None
+        if self.single_flight.enabled:
+            flight_key = cache_key or self._cache_key(messages, model, temperature, max_tokens, json_mode, tools)
+
+        timeout = deadline.timeout(self.request_timeout) if deadline else self.request_timeout
+        if deadline and deadline.expired:
+            raise DeadlineExceeded(f"Deadline passed before calling {model}")
+
+        try:
+            result = await asyncio.wait_for(
+                self._generate(
+                    messages, model, temperature, max_tokens,
+                    stream or bool(on_delta) or json_mode, on_delta,
+                    flight_key, priority, user_id, json_mode, tools
+                ),
+                timeout or None
+            )
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"Chat completion with {model} timed out after {timeout:.1f}s")
+
+        if cache_key:
+            await self.response_cache.set(cache_key, result)
+        return result
+
+    def _cache_key(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool = False,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> str:
+        """Key identifying a call for the response cache and single-flight."""
+        params: Dict[str, Any] = {"format": "json"} if json_mode else {}
+        if tools:
+            params["tools"] = tools
+        return make_request_key(model, messages, temperature, max_tokens, endpoint=self.base_url, **params)
+
+    async def get_cached(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Look up the cached response ``generate(..., cache=True)`` would return."""
+        if not self.response_cache.is_cacheable(temperature):
+            return None
+        return await self.response_cache.get(self._cache_key(messages, model, temperature, max_tokens, json_mode))
+
+    async def set_cached(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        result: Dict[str, Any],
+        json_mode: bool = False
+    ) -> None:
+        """Store a response obtained some other way (e.g. from a batch) for this call."""
+        if self.response_cache.is_cacheable(temperature):
+            await self.response_cache.set(
+                self._cache_key(messages, model, temperature, max_tokens, json_mode), result
+            )
+
+    async def _generate(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        stream: bool,
+        on_delta: Optional[Callable[[str], Awaitable[None]]],
+        flight_key: Optional[str],
+        priority: Priority,
+        user_id: Optional[str],
+        json_mode: bool = False,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Run a completion (no caching), sharing it when flight_key is set."""
+        try:
+            if stream:
+                def open_stream():
+                    return self.generate_stream(
+                        messages, model, temperature, max_tokens, priority, user_id, json_mode, tools
+                    )
+
+                chunks = self.single_flight.stream(f"stream:{flight_key}", open_stream) if flight_key else open_stream()
+
+                full_response = ""
+                tokens_used = 0
+                timings: Dict[str, Optional[int]] = {}
+                stopped_early = False
+                tool_calls: List[Dict[str, Any]] = []
+                started = time.monotonic()
+                first_token = None
+                async for chunk in chunks:
+                    if chunk["content"]:
+                        if first_token is None:
+                            first_token = time.monotonic()
+                        full_response += chunk["content"]
+                        if on_delta:
+                            await on_delta(chunk["content"])
+                    if chunk["done"]:
+                        tokens_used = chunk.get("tokens_used", 0)
+                        timings = dict(chunk.get("timings", {}))
+                        stopped_early = chunk.get("stopped_early", False)
+                        tool_calls = chunk.get("tool_calls", [])
+
+                if first_token is not None:
+                    timings["ttft_ms"] = round((first_token - started) * 1000)
+                    timings["decode_ms"] = round((time.monotonic() - first_token) * 1000)
+
+                result = {
+                    "content": full_response,
+                    "model": model,
+                    "tokens_used": tokens_used,
+                    "timings": timings
+                }
+                if stopped_early:
+                    result["stopped_early"] = True
+                if tool_calls:
+                    result["tool_calls"] = tool_calls
+                return result
+
+            async def call() -> Dict[str, Any]:
+                payload = self._payload(messages, model, temperature, max_tokens, stream=False, tools=tools)
+                async with self.scheduler.slot(priority, user_id):
+                    session = self.session_manager.get_session()
+                    async with session.post(
+                        f"{self.base_url}/chat/completions", json=payload, headers=self._headers()
+                    ) as response:
+                        if response.status != 200:
+                            raise Exception(f"Chat completions API error: {response.status} - {await response.text()}")
+                        data = await response.json()
+
+                choices = data.get("choices") or [{}]
+                message = choices[0].get("message") or {}
+                usage = data.get("usage") or {}
+                result = {
+                    "content": message.get("content") or "",
+                    "model": model,
+                    "tokens_used": usage.get("completion_tokens", 0),
+                    "timings": self._timings(usage)
+                }
+                tool_calls = self._tool_calls(message)
+                if tool_calls:
+                    result["tool_calls"] = tool_calls
+                return result
+
+            return await self.single_flight.do(flight_key, call) if flight_key else await call()
+
+        except Exception as e:
+            logger.error(f"Error generating response with {self.base_url}: {str(e)}", exc_info=True)
+            raise
+
+    async def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        priority: Priority = Priority.INTERACTIVE,
+        user_id: Optional[str] = None,
+        json_mode: bool = False,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a completion as server-sent events arrive.
+
+        Yields:
+            Dicts with 'content' (text delta) and 'done'; the final chunk also
+            carries 'tokens_used' and 'timings' ('stopped_early' when json_mode
+            closed the stream after the first complete JSON object, 'tool_calls'
+            when the model requested any)
+        """
+        payload = self._payload(
+            messages, model, temperature, max_tokens, stream=True, json_mode=json_mode, tools=tools
+        )
+        usage: Dict[str, Any] = {}
+        # Tool calls arrive in fragments keyed by their index
+        partial_calls: Dict[int, Dict[str, Any]] = {}
+        scanner = JsonValueScanner() if json_mode else None
+        received = 0
+        stopped_early = False
+
+        async with self.scheduler.slot(priority, user_id):
+            session = self.session_manager.get_session()
+            async with session.post(
+                f"{self.base_url}/chat/completions", json=payload, headers=self._headers()
+            ) as response:
+                if response.status != 200:
+                    raise Exception(f"Chat completions API error: {response.status} - {await response.text()}")
+
+                async for line in response.content:
+                    line = line.strip()
+                    if not line.startswith(b"data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == b"[DONE]":
+                        break
+                    event = json.loads(data.decode('utf-8'))
+                    if event.get('error'):
+                        raise Exception(f"Chat completions API error: {event['error']}")
+                    if event.get('usage'):
+                        usage = event['usage']
+                    for choice in event.get('choices') or []:
+                        delta = choice.get('delta') or {}
+                        for fragment in delta.get('tool_calls') or []:
+                            self._merge_tool_call(partial_calls, fragment)
+                        text = delta.get('content')
+                        if not text:
+                            continue
+                        received += 1
+                        end = scanner.feed(text) if scanner else None
+                        if end is not None:
+                            text = text[:end]
+                            stopped_early = True
+                        yield {"content": text, "done": False}
+                    if stopped_early:
+                        # Closing the connection makes the server stop decoding
+                        response.close()
+                        usage = {"completion_tokens": received}
+                        break
+
+        final = {
+            "content": "",
+            "done": True,
+            "tokens_used": usage.get("completion_tokens", 0),
+            "timings": self._timings(usage)
+        }
+        if stopped_early:
+            final["stopped_early"] = True
+        if partial_calls:
+            final["tool_calls"] = self._tool_calls(
+                {"tool_calls": [partial_calls[index] for index in sorted(partial_calls)]}
+            )
+        yield final
+
+    def _payload(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        stream: bool,
+        json_mode: bool = False,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "model": model,
+            "messages": [self._wire_message(m) for m in messages],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": stream
+        }
+        if stream:
+            # Ask for token counts in a final usage event
+            payload["stream_options"] = {"include_usage": True}
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        if tools:
+            payload["tools"] = tools
+        return payload
+
+    @staticmethod
+    def _wire_message(message: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a message, including tool calls and results, to the chat completions format."""
+        converted = {"role": message.get('role', 'user'), "content": message.get('content', '')}
+        if message.get('tool_calls'):
+            converted["tool_calls"] = [
+                {
+                    "id": call["id"],
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": json.dumps(call["arguments"])}
+                }
+                for call in message['tool_calls']
+            ]
+        if message.get('role') == 'tool':
+            converted["tool_call_id"] = message.get('tool_call_id')
+        return converted
+
+    @staticmethod
+    def _merge_tool_call(partial_calls: Dict[int, Dict[str, Any]], fragment: Dict[str, Any]) -> None:
+        """Add a streamed tool call fragment to the call it belongs to."""
+        call = partial_calls.setdefault(
+            fragment.get('index', len(partial_calls)), {"id": None, "function": {"name": "", "arguments": ""}}
+        )
+        call["id"] = fragment.get('id') or call["id"]
+        function = fragment.get('function') or {}
+        call["function"]["name"] += function.get('name') or ''
+        call["function"]["arguments"] += function.get('arguments') or ''
+
+    @staticmethod
+    def _tool_calls(message: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Tool calls of a response message as dicts with 'id', 'name' and 'arguments'."""
+        calls = []
+        for i, call in enumerate(message.get('tool_calls') or []):
+            function = call.get('function') or {}
+            arguments = function.get('arguments') or '{}'
+            try:
+                arguments = json.loads(arguments)
+            except (TypeError, ValueError):
+                pass
+            calls.append({"id": call.get('id') or f"call_{i}", "name": function.get('name', ''), "arguments": arguments})
+        return calls
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+    @staticmethod
+    def _timings(usage: Dict[str, Any]) -> Dict[str, Optional[int]]:
+        """Token counts from a usage object (the API reports no server-side durations)."""
+        return {
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "completion_tokens": usage.get("completion_tokens"),
+        }
+
+    async def list_models(self) -> List[str]:
+        """List models served by the endpoint."""
+        try:
+            session = self.session_manager.get_session()
+            async with session.get(f"{self.base_url}/models", headers=self._headers()) as response:
+                if response.status != 200:
+                    raise Exception(f"Failed to list models: {response.status}")
+                data = await response.json()
+                return [model['id'] for model in data.get('data', [])]
+        except Exception as e:
+            logger.error(f"Error listing models at {self.base_url}: {str(e)}", exc_info=True)
+            return []
+
+    async def close(self):
+        """Close the pooled session for the running event loop."""
+        await self.session_manager.close()
+
+
+# Global scheduler for OpenAI-compatible servers, separate from Ollama's limit
+openai_scheduler = LLMScheduler.from_settings('OPENAI_MAX_CONCURRENCY', default=32)
@@ -0,0 +1,158 @@
+"""
+Prompt Engine - Renders chat prompts with a stable, cacheable segment order
+"""
+from typing import Dict, List, Optional, Any, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
+import logging
+import threading
+
+from .context_budget import TokenEstimator
+
+logger = logging.getLogger(__name__)
+
+
+TASK_COMMAND_INSTRUCTION = (
+    "**CRITICAL INSTRUCTION: This is a TASK COMMAND (timer/reminder/note). "
+    "You MUST respond with EXACTLY ONE SHORT sentence confirming the task. "
+    "Example: 'Timer set for 4 minutes.' or '4-minute timer started.' "
+    "DO NOT add any conversational text, questions, or additional commentary. "
+    "JUST confirm the task action in 5-10 words maximum.**"
+)
+
+# Segments from most to least stable; a change in one only invalidates the
+# backend's prefix cache from that segment on
+SEGMENT_ORDER = ("system", "memories", "summary", "history", "recall", "instruction", "message")
+
+# Memory types in the order they are rendered
+MEMORY_TYPE_ORDER = ("personal", "preference", "relationship", "goal", "experience", "skill", "fact")
+
+ROLE_LABELS = {"system": "System", "user": "User", "assistant": "Assistant"}
+
+
+@dataclass
+class PromptSegment:
+    """One contiguous part of a prompt."""
+    name: str
+    messages: List[Dict[str, str]]
+    tokens: int
+
+    @property
+    def bytes(self) -> int:
+        return sum(len(m["content"].encode("utf-8")) for m in self.messages)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "messages": len(self.messages), "bytes": self.bytes, "tokens": self.tokens}
+
+
+class PromptEngine:
+    """
+    Assembles prompts so consecutive turns share the longest possible prefix.
+
+    The agent's system prompt is rendered (and its tokens counted) once per
+    agent and model and then served from an LRU cache. Every prompt is laid
+    out in ``SEGMENT_ORDER``: the static system prompt, the user's memories
+    in a fixed order, the conversation summary (which changes only when the
+    summarizer folds in more messages), the append-only history, then the
+    per-turn parts (recalled past messages, the task-command instruction and
+    the current message). Per-turn text therefore never shifts the stable
+    parts, which lets Ollama and OpenAI-compatible servers reuse their KV
+    cache for the whole prefix.
+
+    The lock guards the prefix cache and its hit counters, which every
+    request thread of a worker shares.
+    """
+
+    def __init__(self, estimator: Optional[TokenEstimator] = None, max_cached_prefixes: int = 256):
+        """
+        Initialize prompt engine.
+
+        Args:
+            estimator: Token estimator (defaults to TokenEstimator())
+            max_cached_prefixes: Rendered system prompts to keep
+        """
+        self.estimator = estimator or TokenEstimator()
+        self.max_cached_prefixes = max_cached_prefixes
+        self._prefixes: "OrderedDict[Tuple[str, str], PromptSegment]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"prefix_hits": 0, "prefix_misses": 0}
+
+    def prefix(self, system_prompt: str, model: str) -> PromptSegment:
+        """
+        The static system segment for an agent, rendered once.
+
+        Args:
+            system_prompt: The agent's configured system prompt
+            model: Model the prompt is for (selects the token ratio)
+        """
+        key = (model, system_prompt)
+        with self._lock:
+            segment = self._prefixes.get(key)
+            if segment is not None:
+                self._prefixes.move_to_end(key)
+                self._counters["prefix_hits"] += 1
+                return segment
+            self._counters["prefix_misses"] += 1
+
+        message = {"role": "system", "content": system_prompt}
+        segment = PromptSegment("system", [message], self.estimator.estimate_message(message, model))
+        with self._lock:
+            self._prefixes[key] = segment
+            while len(self._prefixes) > self.max_cached_prefixes:
+                self._prefixes.popitem(last=False)
+        return segment
+
+    @staticmethod
+    def order_memories(memories: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Put selected memories in a fixed order.
+
+        Retrieval ranks by importance and recency, and recency changes every
+        time a memory is read; rendering in type/key order instead keeps the
+        memory block byte-identical while the set of memories is unchanged.
+        """
+        def rank(memory: Dict[str, Any]) -> Tuple[int, str, str]:
+            memory_type = memory.get("type")
+            position = MEMORY_TYPE_ORDER.index(memory_type) if memory_type in MEMORY_TYPE_ORDER else len(MEMORY_TYPE_ORDER)
+            return position, str(memory.get("key", "")), str(memory.get("id", ""))
+
+        return sorted(memories, key=rank)
+
+    def instruction(self, text: str, model: str) -> PromptSegment:
+        """A per-turn system instruction placed right before the current message."""
+        message = {"role": "system", "content": text}
+        return PromptSegment("instruction", [message], self.estimator.estimate_message(message, model))
+
+    @staticmethod
+    def order(segments: List[PromptSegment]) -> List[PromptSegment]:
+        """Sort segments into SEGMENT_ORDER."""
+        return sorted(segments, key=lambda s: SEGMENT_ORDER.index(s.name))
+
+    @classmethod
+    def messages(cls, segments: List[PromptSegment]) -> List[Dict[str, str]]:
+        """Concatenate segments in SEGMENT_ORDER."""
+        return [message for segment in cls.order(segments) for message in segment.messages]
+
+    @staticmethod
+    def flatten(messages: List[Dict[str, str]]) -> str:
+        """Render messages as one completion prompt (for Ollama's /api/generate)."""
+        parts = [
+            f"{ROLE_LABELS[m.get('role', 'user')]}: {m.get('content', '')}"
+            for m in messages
+            if m.get('role', 'user') in ROLE_LABELS
+        ]
+        parts.append("Assistant:")
+        return "\n\n".join(parts)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return prefix cache counters."""
+        with self._lock:
+            return {
+                **self._counters,
+                "cached_prefixes": len(self._prefixes),
+                "max_cached_prefixes": self.max_cached_prefixes,
+            }
+
+
+# Global prompt engine
+prompt_engine = PromptEngine()
@@ -0,0 +1,58 @@
+"""
+Redis Clients - Per-event-loop asyncio Redis connections for LLM helpers
+"""
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import threading
+import weakref
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - redis ships with channels-redis
+    aioredis = None
+
+from .event_loop import close_on_shutdown
+
+logger = logging.getLogger(__name__)
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, object]]" = weakref.WeakKeyDictionary()
+_closers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, List[asyncio.Task]]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def get_redis(url: Optional[str]):
+    """
+    Get an asyncio Redis client for ``url`` bound to the running event loop.
+
+    Like the pooled HTTP sessions, Redis connections belong to the loop that
+    created them, so one client is kept per loop and URL (in practice the
+    process's long-lived loop, see event_loop.llm_loop) and closed when its
+    loop shuts down.
+
+    Args:
+        url: Redis URL, or an empty value when the Redis tier is disabled
+
+    Returns:
+        ``redis.asyncio.Redis`` instance, or None if Redis is disabled or unavailable
+    """
+    if not url or aioredis is None:
+        return None
+
+    loop = asyncio.get_running_loop()
+
+    with _lock:
+        for stale in [stale for stale in _clients if stale.is_closed()]:
+            del _clients[stale]
+            _closers.pop(stale, None)
+
+        clients = _clients.setdefault(loop, {})
+        client = clients.get(url)
+        if client is None:
+            client = aioredis.from_url(url)
+            clients[url] = client
+            _closers.setdefault(loop, []).append(close_on_shutdown(client.aclose))
+            logger.debug(f"Created Redis client for loop {id(loop)}")
+
+        return client
+
@@ -0,0 +1,598 @@
+"""
+Semantic Recall - Per-user vector index over the whole conversation history
+"""
+from typing import Awaitable, Collection, Dict, List, Optional, Any, Sequence, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+import asyncio
+import logging
+import math
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is in requirements/production.txt
+    np = None
+
+from .context_budget import TokenEstimator
+from .db_reads import parallel_read
+from .llm_scheduler import Priority
+
+logger = logging.getLogger(__name__)
+
+
+RECALL_HEADER = "Earlier messages from this conversation that may be relevant, oldest first:"
+
+
+class VectorIndex:
+    """
+    Cosine-similarity index over one user's message vectors.
+
+    Vectors are normalized and kept in one growing float32 matrix, so an
+    exact search is a single matrix-vector product. Once the index holds
+    ``ann_threshold`` vectors it also trains an inverted file: about
+    sqrt(n) centroids from spherical k-means over a sample, each owning the
+    positions of the vectors nearest to it. Searches then score only the
+    vectors of the ``nprobe`` centroids closest to the query. Vectors added
+    later are assigned to their nearest centroid, and the centroids are
+    retrained once the index has grown fourfold.
+
+    Without NumPy the index keeps ``array('f')`` rows and always searches
+    exhaustively, which is fine for small histories.
+
+    Not thread-safe; SemanticRecall guards each index with a lock.
+    """
+
+    TRAIN_ITERATIONS = 8
+    TRAIN_SAMPLES_PER_LIST = 32
+    ASSIGN_CHUNK = 16384
+
+    def __init__(
+        self,
+        dimensions: Optional[int] = None,
+        ann_threshold: int = 20000,
+        nprobe: int = 16,
+        capacity: int = 0,
+        seed: int = 0
+    ):
+        """
+        Initialize vector index.
+
+        Args:
+            dimensions: Vector size (taken from the first vectors added if None)
+            ann_threshold: Vectors from which searches are approximate (0 = always exact)
+            nprobe: Centroids whose vectors an approximate search scores
+            capacity: Rows to allocate up front (avoids regrowing a large index)
+            seed: Seed for k-means sampling
+        """
+        self.dimensions = dimensions
+        self.ann_threshold = ann_threshold
+        self.nprobe = nprobe
+        self.keys: List[Any] = []
+        self._capacity = capacity
+        self._matrix = None
+        self._rows: List[Any] = []
+        self._centroids = None
+        self._lists: List[List[Any]] = []
+        self._trained_size = 0
+        self._rng = np.random.default_rng(seed) if np is not None else None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def is_approximate(self) -> bool:
+        """Whether searches use the inverted file."""
+        return self._centroids is not None
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by vectors and centroids."""
+        if np is None:
+            return sum(row.itemsize * len(row) for row in self._rows)
+        size = self._matrix.nbytes if self._matrix is not None else 0
+        return size + (self._centroids.nbytes if self._centroids is not None else 0)
+
+    def add(self, keys: Sequence[Any], vectors: Sequence[Any]) -> None:
+        """
+        Append vectors, in the order their messages were written.
+
+        Args:
+            keys: Key returned by search() for each vector (e.g. message IDs)
+            vectors: One vector per key (sequences, arrays or a 2-D ndarray)
+
+        Raises:
+            ValueError: If the vectors do not match the index dimensions
+        """
+        if len(keys) == 0:
+            return
+        if np is None:
+            self._add_rows(keys, vectors)
+            return
+
+        batch = np.asarray(vectors, dtype=np.float32).reshape(len(keys), -1)
+        if self.dimensions is None:
+            self.dimensions = batch.shape[1]
+        elif batch.shape[1] != self.dimensions:
+            raise ValueError(f"Expected {self.dimensions}-dimensional vectors, got {batch.shape[1]}")
+
+        start = len(self.keys)
+        self._reserve(start + len(keys))
+        self._matrix[start:start + len(keys)] = _normalize(batch)
+        self.keys.extend(keys)
+
+        if self._centroids is not None:
+            if len(self.keys) >= 4 * self._trained_size:
+                self.train()
+            else:
+                self._assign(start, self._matrix[start:len(self.keys)])
+        elif 0 < self.ann_threshold <= len(self.keys):
+            self.train()
+
+    def search(
+        self,
+        query: Sequence[float],
+        k: int,
+        exclude_last: int = 0,
+        exact: bool = False,
+        exclude: Collection[Any] = ()
+    ) -> List[Tuple[Any, float]]:
+        """
+        The ``k`` vectors most similar to ``query``.
+
+        Args:
+            query: Query vector
+            k: Results to return
+            exclude_last: Leave out the most recently added vectors
+            exact: Score every vector even when the inverted file is trained
+            exclude: Keys to leave out (e.g. the turns the prompt already
+                carries verbatim)
+
+        Returns:
+            (key, cosine similarity) pairs, most similar first
+        """
+        limit = len(self.keys) - exclude_last
+        if k <= 0 or limit <= 0:
+            return []
+        if exclude:
+            # Enough candidates that k remain once the excluded keys are dropped
+            exclude = set(exclude)
+            hits = self.search(query, k + len(exclude), exclude_last, exact)
+            return [hit for hit in hits if hit[0] not in exclude][:k]
+        if np is None:
+            return self._search_rows(query, k, limit)
+
+        q = _normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        if self._centroids is None or exact:
+            positions = None
+            scores = self._matrix[:limit] @ q
+        else:
+            positions = self._candidates(q, limit)
+            scores = self._matrix[positions] @ q
+
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        hits = positions[top] if positions is not None else top
+        return [(self.keys[int(p)], float(scores[t])) for p, t in zip(hits, top)]
+
+    def train(self) -> None:
+        """(Re)build the inverted file from the vectors added so far."""
+        n = len(self.keys)
+        lists = max(1, int(math.sqrt(n)))
+        data = self._matrix[:n]
+        sample = data[np.sort(self._rng.choice(n, min(n, lists * self.TRAIN_SAMPLES_PER_LIST), replace=False))]
+        centroids = sample[self._rng.choice(len(sample), lists, replace=False)].copy()
+
+        for _ in range(self.TRAIN_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assignment, kind='stable')
+            ordered = assignment[order]
+            starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+            # Empty clusters keep their previous centroid
+            centroids[ordered[starts]] = _normalize(np.add.reduceat(sample[order], starts, axis=0))
+
+        self._centroids = centroids
+        self._lists = [[] for _ in range(lists)]
+        self._trained_size = n
+        for start in range(0, n, self.ASSIGN_CHUNK):
+            self._assign(start, data[start:start + self.ASSIGN_CHUNK])
+        logger.debug(f"Trained inverted file with {lists} lists over {n} vectors")
+
+    def _reserve(self, rows: int) -> None:
+        """Grow the matrix to hold at least ``rows`` vectors."""
+        capacity = self._matrix.shape[0] if self._matrix is not None else 0
+        if rows <= capacity:
+            return
+        grown = np.empty((max(rows, 2 * capacity, self._capacity, 1024), self.dimensions), dtype=np.float32)
+        if capacity:
+            grown[:len(self.keys)] = self._matrix[:len(self.keys)]
+        self._matrix = grown
+
+    def _assign(self, start: int, rows: Any) -> None:
+        """Add the positions of ``rows`` to the lists of their nearest centroids."""
+        assignment = np.argmax(rows @ self._centroids.T, axis=1)
+        order = np.argsort(assignment, kind='stable')
+        ordered = assignment[order]
+        bounds = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1], True])
+        for begin, end in zip(bounds[:-1], bounds[1:]):
+            self._lists[int(ordered[begin])].append(order[begin:end] + start)
+
+    def _candidates(self, q: Any, limit: int) -> Any:
+        """Positions below ``limit`` in the lists of the centroids nearest to ``q``."""
+        similarity = self._centroids @ q
+        nprobe = min(self.nprobe, len(similarity))
+        probe = np.argpartition(-similarity, nprobe - 1)[:nprobe]
+        parts = []
+        for centroid in probe:
+            chunks = self._lists[int(centroid)]
+            if len(chunks) > 1:
+                chunks[:] = [np.concatenate(chunks)]
+            if chunks:
+                parts.append(chunks[0])
+        positions = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        return positions[positions < limit]
+
+    def _add_rows(self, keys: Sequence[Any], vectors: Sequence[Any]) -> None:
+        """Pure-Python add (without NumPy)."""
+        from array import array
+
+        for key, vector in zip(keys, vectors):
+            norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+            row = array('f', (x / norm for x in vector))
+            if self.dimensions is None:
+                self.dimensions = len(row)
+            elif len(row) != self.dimensions:
+                raise ValueError(f"Expected {self.dimensions}-dimensional vectors, got {len(row)}")
+            self._rows.append(row)
+            self.keys.append(key)
+
+    def _search_rows(self, query: Sequence[float], k: int, limit: int) -> List[Tuple[Any, float]]:
+        """Pure-Python exhaustive search (without NumPy)."""
+        import heapq
+
+        norm = math.sqrt(sum(x * x for x in query)) or 1.0
+        q = [x / norm for x in query]
+        scored = ((sum(a * b for a, b in zip(row, q)), i) for i, row in enumerate(self._rows[:limit]))
+        return [(self.keys[i], score) for score, i in heapq.nlargest(k, scored)]
+
+
+def _normalize(matrix: Any) -> Any:
+    """Scale each row to unit length (zero rows stay zero)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class DjangoRecallStore:
+    """Reads a user's messages for indexing and recall."""
+
+    ROLES = ("user", "assistant")
+
+    def messages_after(self, user_id: str, after: Optional[datetime], limit: int) -> List[Dict[str, Any]]:
+        """The user's oldest messages written after ``after``."""
+        from apps.chat.models import Message
+
+        queryset = Message.objects.filter(conversation__user_id=user_id, role__in=self.ROLES)
+        if after is not None:
+            queryset = queryset.filter(created_at__gt=after)
+        return list(queryset.order_by('created_at').values('id', 'content', 'created_at')[:limit])
+
+    def fetch(self, ids: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        """Messages by ID."""
+        from apps.chat.models import Message
+
+        rows = Message.objects.filter(id__in=ids).values('id', 'role', 'content', 'created_at')
+        return {row['id']: row for row in rows}
+
+    def users(self) -> List[str]:
+        """Users who have a conversation."""
+        from apps.chat.models import Conversation
+
+        return [str(pk) for pk in Conversation.objects.values_list('user_id', flat=True)]
+
+
+@dataclass
+class _UserIndex:
+    """A user's index and the creation time of the newest message it has seen."""
+    index: VectorIndex
+    watermark: Optional[datetime] = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class SemanticRecall:
+    """
+    Finds the past turns of a user's lifelong conversation that relate to a new message.
+
+    Each user gets a VectorIndex of their messages, kept in process for the
+    ``max_users`` most recently active users. It is built incrementally:
+    ``start_indexing`` (called once a turn is saved) appends new messages in
+    a background task, and a recall embeds the few messages written since
+    (the new one, usually) in the same batched call as the query. When more
+    than ``sync_limit`` messages are missing (after a restart, an eviction
+    or without the ``index_history`` backfill) the recall starts a background
+    catch-up and returns nothing until it is done. Vectors come from the
+    embedding service, so messages embedded before, by this or another
+    process, cost no Ollama call.
+
+    Recall is best effort: it runs alongside the other context reads and
+    gives up after ``timeout`` seconds, and any failure yields no results.
+    """
+
+    # Longest a recalled message may be in the prompt
+    MAX_MESSAGE_TOKENS = 128
+
+    def __init__(
+        self,
+        embedder=None,
+        enabled: bool = False,
+        top_k: int = 4,
+        min_score: float = 0.5,
+        min_words: int = 3,
+        ann_threshold: int = 20000,
+        nprobe: int = 16,
+        max_users: int = 32,
+        sync_limit: int = 32,
+        timeout: float = 1.0,
+        store: Optional[DjangoRecallStore] = None,
+        estimator: Optional[TokenEstimator] = None
+    ):
+        """
+        Initialize semantic recall.
+
+        Args:
+            embedder: EmbeddingService (defaults to the global one)
+            enabled: When False chat turns recall nothing
+            top_k: Past messages to recall per turn
+            min_score: Lowest cosine similarity worth recalling
+            min_words: Shorter messages ("ok", "thanks!") are not indexed
+            ann_threshold: Index size from which searches are approximate
+            nprobe: Inverted lists scored by an approximate search
+            max_users: User indexes kept in memory
+            sync_limit: New messages a recall indexes itself at most
+            timeout: Seconds a recall may take before it is abandoned
+            store: Where messages are read (defaults to the database)
+            estimator: Token estimator used to shorten recalled messages
+        """
+        self._embedder = embedder
+        self.enabled = enabled
+        self.top_k = top_k
+        self.min_score = min_score
+        self.min_words = min_words
+        self.ann_threshold = ann_threshold
+        self.nprobe = nprobe
+        self.max_users = max_users
+        self.sync_limit = sync_limit
+        self.timeout = timeout
+        self.store = store or DjangoRecallStore()
+        self.estimator = estimator or TokenEstimator()
+        self._indexes: "OrderedDict[str, _UserIndex]" = OrderedDict()
+        self._indexing: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "recalls": 0,
+            "skipped": 0,
+            "approximate": 0,
+            "recalled": 0,
+            "indexed": 0,
+            "timeouts": 0,
+            "errors": 0,
+        }
+        self._latency_ms = 0.0
+
+    @classmethod
+    def from_settings(cls) -> 'SemanticRecall':
+        """Create semantic recall configured from Django settings."""
+        from django.conf import settings
+
+        return cls(
+            enabled=getattr(settings, 'CHAT_RECALL_ENABLED', False),
+            top_k=getattr(settings, 'CHAT_RECALL_TOP_K', 4),
+            min_score=getattr(settings, 'CHAT_RECALL_MIN_SCORE', 0.5),
+            ann_threshold=getattr(settings, 'CHAT_RECALL_ANN_THRESHOLD', 20000),
+            nprobe=getattr(settings, 'CHAT_RECALL_NPROBE', 16),
+            max_users=getattr(settings, 'CHAT_RECALL_MAX_USERS', 32),
+            timeout=getattr(settings, 'CHAT_RECALL_TIMEOUT', 1.0),
+        )
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from .embeddings import embedding_service
+            self._embedder = embedding_service
+        return self._embedder
+
+    async def recall(
+        self,
+        user_id: str,
+        query: str,
+        history: Optional[Awaitable[List[Dict[str, Any]]]] = None,
+        k: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Past messages of the user most similar to ``query``.
+
+        Args:
+            user_id: ID of the user
+            query: The new message
+            history: Pending read of the history the prompt carries anyway;
+                its messages (by 'id') are not recalled. It is awaited once
+                the query is embedded, so the two overlap
+            k: Messages to return (defaults to top_k)
+
+        Returns:
+            Message dicts (role, content, created_at, score), most similar
+            first; empty when disabled, while the index is catching up, on
+            timeout or on any error
+        """
+        if not self.enabled or not user_id or not query.strip():
+            return []
+        started = time.monotonic()
+        try:
+            return await asyncio.wait_for(
+                self._recall(user_id, query, history, k or self.top_k), self.timeout or None
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Recall for user {user_id} took longer than {self.timeout}s")
+            with self._lock:
+                self._counters["timeouts"] += 1
+            return []
+        except Exception as e:
+            logger.warning(f"Recall for user {user_id} failed: {e}")
+            with self._lock:
+                self._counters["errors"] += 1
+            return []
+        finally:
+            elapsed = (time.monotonic() - started) * 1000
+            with self._lock:
+                self._counters["recalls"] += 1
+                # Exponential moving average, like the other latency signals
+                self._latency_ms = elapsed if self._counters["recalls"] == 1 else 0.9 * self._latency_ms + 0.1 * elapsed
+
+    async def _recall(
+        self,
+        user_id: str,
+        query: str,
+        history: Optional[Awaitable[List[Dict[str, Any]]]],
+        k: int
+    ) -> List[Dict[str, Any]]:
+        entry = self._entry(user_id)
+        pending = await parallel_read(self.store.messages_after)(user_id, entry.watermark, self.sync_limit)
+        if len(pending) >= self.sync_limit:
+            # Too far behind to catch up within the timeout
+            await self.start_indexing(user_id)
+            with self._lock:
+                self._counters["skipped"] += 1
+            return []
+        indexable = [message for message in pending if len(message["content"].split()) >= self.min_words]
+        vectors = await self.embedder.embed(
+            [query] + [message["content"] for message in indexable],
+            priority=Priority.CLASSIFIER,
+            user_id=user_id
+        )
+
+        # Shielded: a recall timeout must not cancel the agent's history read
+        exclude = {message["id"] for message in await asyncio.shield(history) if "id" in message} if history else ()
+
+        with entry.lock:
+            self._append(entry, pending, indexable, vectors[1:])
+            hits = entry.index.search(vectors[0], k, exclude=exclude)
+            approximate = entry.index.is_approximate
+
+        hits = [(key, score) for key, score in hits if score >= self.min_score]
+        rows = await parallel_read(self.store.fetch)([key for key, _ in hits]) if hits else {}
+        recalled = [{**rows[key], "score": round(score, 3)} for key, score in hits if key in rows]
+        with self._lock:
+            self._counters["recalled"] += len(recalled)
+            self._counters["approximate"] += int(approximate)
+        return recalled
+
+    async def start_indexing(self, user_id: str) -> None:
+        """
+        Index the user's new messages in a background task on the running loop.
+
+        The task is not bound by the recall timeout. At most one runs per user.
+        """
+        if not self.enabled or not user_id:
+            return
+        with self._lock:
+            if user_id in self._indexing:
+                return
+            self._indexing[user_id] = asyncio.get_running_loop().create_task(self._index_in_background(user_id))
+
+    async def _index_in_background(self, user_id: str) -> None:
+        try:
+            indexed = await self.index_user(user_id)
+            logger.debug(f"Indexed {indexed} messages of user {user_id} for recall")
+        except Exception as e:
+            logger.warning(f"Indexing messages of user {user_id} for recall failed: {e}")
+            with self._lock:
+                self._counters["errors"] += 1
+        finally:
+            with self._lock:
+                self._indexing.pop(user_id, None)
+
+    async def index_user(self, user_id: str, batch_size: int = 512) -> int:
+        """
+        Index all of a user's messages not indexed yet (backfill).
+
+        Embeds with background priority; the vectors are also stored, so chat
+        workers index the same messages without calling Ollama.
+
+        Returns:
+            Number of messages indexed
+        """
+        entry = self._entry(user_id)
+        indexed = 0
+        while True:
+            pending = await parallel_read(self.store.messages_after)(user_id, entry.watermark, batch_size)
+            if not pending:
+                return indexed
+            indexable = [message for message in pending if len(message["content"].split()) >= self.min_words]
+            vectors = await self.embedder.embed(
+                [message["content"] for message in indexable], priority=Priority.BACKGROUND, user_id=user_id
+            ) if indexable else []
+            with entry.lock:
+                indexed += self._append(entry, pending, indexable, vectors)
+
+    def _append(self, entry: _UserIndex, pending: List[Dict[str, Any]], indexable: List[Dict[str, Any]], vectors: List[Any]) -> int:
+        """Add newly read messages to an index (under its lock); returns how many were added."""
+        if not pending:
+            return 0
+        watermark = entry.watermark
+        # A concurrent recall may have indexed some of them meanwhile
+        fresh = [
+            (message["id"], vector) for message, vector in zip(indexable, vectors)
+            if watermark is None or message["created_at"] > watermark
+        ]
+        if fresh:
+            entry.index.add([key for key, _ in fresh], [vector for _, vector in fresh])
+        if watermark is None or pending[-1]["created_at"] > watermark:
+            entry.watermark = pending[-1]["created_at"]
+        with self._lock:
+            self._counters["indexed"] += len(fresh)
+        return len(fresh)
+
+    def _entry(self, user_id: str) -> _UserIndex:
+        """The user's index, creating it and evicting the least recently used."""
+        with self._lock:
+            entry = self._indexes.get(user_id)
+            if entry is None:
+                entry = _UserIndex(VectorIndex(ann_threshold=self.ann_threshold, nprobe=self.nprobe))
+                self._indexes[user_id] = entry
+                while len(self._indexes) > self.max_users:
+                    self._indexes.popitem(last=False)
+            else:
+                self._indexes.move_to_end(user_id)
+            return entry
+
+    def format(self, recalled: List[Dict[str, Any]], model: Optional[str] = None) -> str:
+        """Render recalled messages, oldest first, as one system message body."""
+        lines = [RECALL_HEADER]
+        for message in sorted(recalled, key=lambda m: m["created_at"]):
+            content = self.estimator.truncate(message["content"], self.MAX_MESSAGE_TOKENS, model)
+            lines.append(f"- {message['created_at']:%Y-%m-%d}, {message['role']}: {content}")
+        return "\n".join(lines)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return recall counters and index sizes."""
+        with self._lock:
+            indexes = list(self._indexes.values())
+            return {
+                **self._counters,
+                "enabled": self.enabled,
+                "numpy": np is not None,
+                "avg_latency_ms": round(self._latency_ms, 1),
+                "users": len(indexes),
+                "indexing": len(self._indexing),
+                "vectors": sum(len(entry.index) for entry in indexes),
+                "approximate_indexes": sum(entry.index.is_approximate for entry in indexes),
+            }
+
+
+# Global semantic recall
+semantic_recall = SemanticRecall.from_settings()
@@ -0,0 +1,368 @@
+"""
+Single Flight - Coalesces identical concurrent LLM requests into one upstream call
+"""
+from typing import Dict, List, Optional, Any, AsyncIterator, Awaitable, Callable, Tuple
+import asyncio
+import json
+import logging
+import threading
+import uuid
+
+from .redis_clients import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a shared stream in subscriber queues
+_END = object()
+
+
+class LeaderAbandoned(Exception):
+    """The caller running a shared request went away before it finished."""
+
+
+def _deliver(future: asyncio.Future, result: Any, error: Optional[BaseException]) -> None:
+    """Resolve a waiter's future on its own loop, unless it was cancelled."""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, callback: Callable, *args: Any) -> None:
+    """Schedule a callback on another caller's loop, ignoring loops that already closed."""
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        pass
+
+
+class _Flight:
+    """State of one in-flight request and the callers waiting on it."""
+
+    def __init__(self):
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+
+class _StreamFlight:
+    """State of one in-flight stream, replayable by late subscribers."""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.driver: Optional[asyncio.Task] = None
+        self.driver_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+class SingleFlight:
+    """
+    Runs identical concurrent requests once and shares the outcome.
+
+    In process, callers with the same key wait for the first caller (the
+    leader) and receive a copy of its result, or a replay of its stream.
+    State is guarded by a thread lock and results are handed over with
+    ``call_soon_threadsafe``, so callers on different event loops (as created
+    by ``async_to_sync``) can share a flight.
+
+    Across processes, non-streaming requests can optionally be deduplicated
+    through Redis: the leader holds a short lock and publishes its result on a
+    channel that the other processes' callers subscribe to. Any Redis problem
+    falls back to running the request locally.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        redis_url: Optional[str] = None,
+        lock_ttl: float = 120.0,
+        key_prefix: str = "llm:sf:"
+    ):
+        """
+        Initialize single-flight group.
+
+        Args:
+            enabled: When False every caller runs its own request
+            redis_url: Redis URL for cross-process deduplication (disabled when empty)
+            lock_ttl: Seconds the cross-process lock (and remote wait) lasts at most
+            key_prefix: Prefix for Redis keys and channels
+        """
+        self.enabled = enabled
+        self.redis_url = redis_url
+        self.lock_ttl = lock_ttl
+        self.key_prefix = key_prefix
+        self._flights: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _StreamFlight] = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "leaders": 0,
+            "shared": 0,
+            "remote_shared": 0,
+            "stream_leaders": 0,
+            "stream_shared": 0,
+            "fallbacks": 0,
+        }
+
+    @classmethod
+    def from_settings(cls) -> 'SingleFlight':
+        """Create a single-flight group configured from Django settings."""
+        from django.conf import settings
+
+        return cls(
+            enabled=getattr(settings, 'LLM_SINGLE_FLIGHT', True),
+            redis_url=getattr(settings, 'LLM_SINGLE_FLIGHT_REDIS_URL', ''),
+            lock_ttl=getattr(settings, 'LLM_SINGLE_FLIGHT_LOCK_TTL', 120.0),
+        )
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Run ``fn`` once for all concurrent callers using ``key``.
+
+        Args:
+            key: Request key (see make_request_key)
+            fn: Coroutine factory performing the upstream call
+
+        Returns:
+            A copy of the shared result dict
+        """
+        if not self.enabled:
+            return await fn()
+
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                future = loop.create_future()
+                flight.waiters.append((loop, future))
+                self._counters["shared"] += 1
+            else:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._counters["leaders"] += 1
+                future = None
+
+        if future is not None:
+            try:
+                return dict(await future)
+            except LeaderAbandoned:
+                # The leader was cancelled; run (or join) a fresh flight instead
+                return await self.do(key, fn)
+
+        result, error = None, None
+        try:
+            result = await self._lead(key, fn)
+            return dict(result)
+        except asyncio.CancelledError:
+            error = LeaderAbandoned(key)
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                waiters = flight.waiters
+            for waiter_loop, waiter_future in waiters:
+                _call_soon(waiter_loop, _deliver, waiter_future, result, error)
+
+    async def _lead(self, key: str, fn: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Run the request, deduplicating against other processes when Redis is configured."""
+        redis = get_redis(self.redis_url)
+        if redis is None:
+            return await fn()
+
+        lock_key = f"{self.key_prefix}lock:{key}"
+        done_key = f"{self.key_prefix}done:{key}"
+        channel = f"{self.key_prefix}result:{key}"
+        token = uuid.uuid4().hex
+
+        try:
+            acquired = await redis.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+        except Exception as e:
+            logger.warning(f"Single-flight Redis lock failed, running locally: {e}")
+            self._count("fallbacks")
+            return await fn()
+
+        if not acquired:
+            remote = await self._wait_remote(redis, channel, done_key)
+            if remote is not None:
+                self._count("remote_shared")
+                return remote
+            self._count("fallbacks")
+            return await fn()
+
+        try:
+            try:
+                result = await fn()
+            except Exception:
+                await self._publish(redis, channel, None, {"ok": False})
+                raise
+            await self._publish(redis, channel, done_key, {"ok": True, "result": result})
+            return result
+        finally:
+            await self._release(redis, lock_key, token)
+
+    async def _wait_remote(self, redis, channel: str, done_key: str) -> Optional[Dict[str, Any]]:
+        """Wait for another process's leader to publish its result."""
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(channel)
+
+            # The leader may have finished between our lock attempt and subscribing
+            done = await redis.get(done_key)
+            if done is not None:
+                return json.loads(done)
+
+            async def _next_result():
+                async for message in pubsub.listen():
+                    if message.get('type') == 'message':
+                        return json.loads(message['data'])
+
+            payload = await asyncio.wait_for(_next_result(), timeout=self.lock_ttl)
+            return payload.get('result') if payload and payload.get('ok') else None
+        except Exception as e:
+            logger.warning(f"Single-flight remote wait failed, running locally: {e}")
+            return None
+        finally:
+            try:
+                await pubsub.unsubscribe(channel)
+                close = getattr(pubsub, 'aclose', None) or pubsub.close
+                await close()
+            except Exception:
+                pass
+
+    async def _publish(self, redis, channel: str, done_key: Optional[str], payload: Dict[str, Any]) -> None:
+        """Publish a leader's outcome to waiting processes."""
+        try:
+            encoded = json.dumps(payload)
+            if done_key and payload.get('ok'):
+                # Short-lived copy for waiters that subscribe just after publication
+                await redis.set(done_key, json.dumps(payload['result']), px=5000)
+            await redis.publish(channel, encoded)
+        except Exception as e:
+            logger.warning(f"Single-flight publish failed: {e}")
+
+    async def _release(self, redis, lock_key: str, token: str) -> None:
+        """Release the cross-process lock if we still own it."""
+        try:
+            if await redis.get(lock_key) == token.encode('utf-8'):
+                await redis.delete(lock_key)
+        except Exception as e:
+            logger.warning(f"Single-flight lock release failed: {e}")
+
+    async def stream(
+        self,
+        key: str,
+        factory: Callable[[], AsyncIterator[Any]]
+    ) -> AsyncIterator[Any]:
+        """
+        Share one upstream stream between all concurrent callers using ``key``.
+
+        The upstream stream is driven by a task started by the first caller;
+        every caller (including the first) replays the chunks received so far
+        and then follows live ones. The upstream is cancelled once the last
+        subscriber stops listening.
+
+        The upstream runs on the first caller's loop. If that loop shuts down
+        before any chunk arrived (e.g. its ``async_to_sync`` call timed out),
+        the other callers run (or join) a fresh stream instead, like ``do``
+        does. Callers that already received chunks get LeaderAbandoned, since
+        a new generation would not continue the text they have.
+
+        Args:
+            key: Request key (see make_request_key)
+            factory: Callable returning the upstream async iterator
+
+        Yields:
+            The upstream chunks, in order
+        """
+        if not self.enabled:
+            async for chunk in factory():
+                yield chunk
+            return
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        with self._lock:
+            flight = self._streams.get(key)
+            if flight is None or flight.finished:
+                flight = _StreamFlight()
+                self._streams[key] = flight
+                flight.driver_loop = loop
+                flight.driver = loop.create_task(self._drive(key, flight, factory))
+                self._counters["stream_leaders"] += 1
+            else:
+                self._counters["stream_shared"] += 1
+
+            for chunk in flight.chunks:
+                queue.put_nowait(chunk)
+            if flight.finished:
+                queue.put_nowait(_END)
+            subscriber = (loop, queue)
+            flight.subscribers.append(subscriber)
+
+        received = 0
+        retry = False
+        try:
+            while True:
+                item = await queue.get()
+                if item is _END:
+                    retry = isinstance(flight.error, LeaderAbandoned) and not received
+                    if flight.error is not None and not retry:
+                        raise flight.error
+                    break
+                received += 1
+                yield item
+        finally:
+            with self._lock:
+                if subscriber in flight.subscribers:
+                    flight.subscribers.remove(subscriber)
+                abandon = not flight.subscribers and not flight.finished
+            if abandon and flight.driver is not None:
+                _call_soon(flight.driver_loop, flight.driver.cancel)
+
+        if retry:
+            logger.info(f"Single-flight stream leader went away, streaming {key} again")
+            async for chunk in self.stream(key, factory):
+                yield chunk
+
+    async def _drive(self, key: str, flight: _StreamFlight, factory: Callable[[], AsyncIterator[Any]]) -> None:
+        """Pump the upstream stream into every subscriber's queue."""
+        try:
+            async for chunk in factory():
+                with self._lock:
+                    flight.chunks.append(chunk)
+                    subscribers = list(flight.subscribers)
+                for subscriber_loop, queue in subscribers:
+                    _call_soon(subscriber_loop, queue.put_nowait, chunk)
+        except asyncio.CancelledError:
+            flight.error = LeaderAbandoned(key)
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                flight.finished = True
+                if self._streams.get(key) is flight:
+                    del self._streams[key]
+                subscribers = list(flight.subscribers)
+            for subscriber_loop, queue in subscribers:
+                _call_soon(subscriber_loop, queue.put_nowait, _END)
+
+    def stats(self) -> Dict[str, int]:
+        """Return leader/shared counters and the number of requests in flight."""
+        with self._lock:
+            counters = dict(self._counters)
+            counters["in_flight"] = len(self._flights) + len(self._streams)
+        return counters
+
+
+# Global single-flight group
+single_flight = SingleFlight.from_settings()
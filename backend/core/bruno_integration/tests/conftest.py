@@ -0,0 +1,26 @@
+"""
+Shared fixtures for the Bruno integration tests.
+"""
+import pytest_asyncio
+from aiohttp.test_utils import TestServer
+
+
+@pytest_asyncio.fixture
+async def serve():
+    """
+    Start aiohttp apps (stub servers, FakeOllama) and close them after the test.
+
+    ``await serve(app, path)`` returns the server's base URL for ``path``
+    without a trailing slash.
+    """
+    servers = []
+
+    async def start(app, path=''):
+        server = TestServer(app)
+        await server.start_server()
+        servers.append(server)
+        return str(server.make_url(path)).rstrip('/')
+
+    yield start
+    for server in servers:
+        await server.close()
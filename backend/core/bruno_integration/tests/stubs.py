@@ -0,0 +1,81 @@
+"""
+Test doubles for BrunoAgent's collaborators, shared by the agent and chat service tests.
+"""
+import asyncio
+from core.bruno_integration.bruno_core import AgentConfig, BrunoAgent
+
+
+class StubLLM:
+    """
+    LLM client recording every call ({'messages': ..., **kwargs} in ``calls``).
+
+    Args:
+        reply: Reply text, or a function of (messages, kwargs) returning it
+        replies: Reply per model, used instead of ``reply`` for those models
+        failing: Models whose calls raise
+        step: Stream the reply word by word, ``step`` seconds apart (0: one delta)
+    """
+
+    def __init__(self, reply='Hello!', replies=None, failing=(), step=0):
+        self.reply = reply
+        self.replies = replies or {}
+        self.failing = failing
+        self.step = step
+        self.calls = []
+        self.cancelled = 0
+
+    @property
+    def messages(self):
+        """Messages of the latest call."""
+        return self.calls[-1]['messages'] if self.calls else None
+
+    @property
+    def models(self):
+        """Model of each call, in order."""
+        return [call.get('model') for call in self.calls]
+
+    async def generate(self, messages, on_delta=None, **kwargs):
+        self.calls.append({'messages': messages, **kwargs})
+        model = kwargs.get('model')
+        if model in self.failing:
+            raise RuntimeError(f"model '{model}' not found")
+        if model in self.replies:
+            reply = self.replies[model]
+        else:
+            reply = self.reply(messages, kwargs) if callable(self.reply) else self.reply
+
+        try:
+            if self.step:
+                for word in reply.split(' '):
+                    await asyncio.sleep(self.step)
+                    if on_delta:
+                        await on_delta(word)
+            elif on_delta and reply:
+                await on_delta(reply)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return {'content': reply, 'tokens_used': 3}
+
+
+class StubMemory:
+    """Memory manager returning a fixed history."""
+
+    def __init__(self, history=()):
+        self.history = list(history)
+
+    async def get_history(self, conversation_id, limit=50):
+        return list(self.history)
+
+
+def make_agent(llm=None, memory=None, model='mistral:7b', **kwargs):
+    """BrunoAgent named Bruno with the given collaborators (keyword arguments pass through)."""
+    return BrunoAgent(AgentConfig(name='Bruno', model=model), llm or StubLLM(), memory_manager=memory, **kwargs)
+
+
+def db_memory():
+    """Memory manager reading history from the database."""
+    from apps.chat.models import Conversation, Message
+    from core.bruno_integration.bruno_memory import DjangoMemoryBackend, MemoryManager
+
+    return MemoryManager(db_backend=DjangoMemoryBackend(Message, Conversation))
@@ -0,0 +1,196 @@
+"""
+Unit tests for concurrent ability execution and the agent's tool-calling loop.
+"""
+import asyncio
+import time
+import pytest
+from core.bruno_integration.bruno_abilities import AbilityManager, calculate, create_default_abilities
+from core.bruno_integration.tests.stubs import make_agent
+
+
+def _manager(**kwargs):
+    manager = AbilityManager(**kwargs)
+    calls = []
+
+    async def lookup(city):
+        calls.append(city)
+        await asyncio.sleep(0.2)
+        return {"city": city, "temperature": 21}
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    manager.register_function('weather', 'Weather for a city', lookup, idempotent=True)
+    manager.register_function('hang', 'Never finishes', hang, timeout=0.05)
+    return manager, calls
+
+
+class StubToolLLM:
+    """Requests the given tool calls on the first step, then answers."""
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self.requests = []
+
+    async def generate(self, messages, **kwargs):
+        self.requests.append({'messages': messages, **kwargs})
+        calls = self.steps.pop(0) if self.steps and kwargs.get('tools') else None
+        if calls:
+            if kwargs.get('on_delta'):
+                await kwargs['on_delta']('Checking. ')
+            return {'content': 'Checking. ', 'tokens_used': 3, 'tool_calls': calls}
+        if kwargs.get('on_delta'):
+            await kwargs['on_delta']('It is 21 degrees.')
+        return {'content': 'It is 21 degrees.', 'tokens_used': 5}
+
+
+@pytest.mark.asyncio
+class TestExecuteCalls:
+    """Test concurrency, timeouts, de-duplication and the result cache."""
+
+    async def test_calls_in_a_step_run_concurrently(self):
+        manager, calls = _manager()
+        started = time.monotonic()
+
+        results = await manager.execute_calls([
+            {'id': 'a', 'name': 'weather', 'arguments': {'city': 'Lisbon'}},
+            {'id': 'b', 'name': 'weather', 'arguments': {'city': 'Porto'}},
+        ])
+
+        assert time.monotonic() - started < 0.35
+        assert [r['id'] for r in results] == ['a', 'b']
+        assert '"Porto"' in results[1]['content']
+        assert sorted(calls) == ['Lisbon', 'Porto']
+
+    async def test_timeouts_and_errors_become_results(self):
+        manager, _ = _manager()
+
+        results = await manager.execute_calls([
+            {'id': 'a', 'name': 'hang', 'arguments': {}},
+            {'id': 'b', 'name': 'missing', 'arguments': {}},
+            {'id': 'c', 'name': 'weather', 'arguments': {'town': 'Lisbon'}},
+        ])
+
+        assert 'did not finish' in results[0]['content']
+        assert "unknown ability 'missing'" in results[1]['content']
+        assert results[2]['content'].startswith("Error running 'weather'")
+        assert manager.stats()['timeouts'] == 1
+        assert manager.stats()['errors'] == 2
+
+    async def test_identical_and_repeated_idempotent_calls_run_once(self):
+        manager, calls = _manager()
+        step = [
+            {'id': 'a', 'name': 'weather', 'arguments': {'city': 'Lisbon'}},
+            {'id': 'b', 'name': 'weather', 'arguments': {'city': 'Lisbon'}},
+        ]
+
+        first = await manager.execute_calls(step)
+        second = await manager.execute_calls(step[:1])
+
+        assert calls == ['Lisbon']
+        assert first[0]['content'] == first[1]['content'] == second[0]['content']
+        assert manager.stats()['deduplicated'] == 1
+        assert manager.stats()['cache_hits'] == 1
+
+    async def test_current_time_is_not_cached(self):
+        manager = create_default_abilities()
+
+        await manager.execute_calls([{'id': 'a', 'name': 'get_current_time', 'arguments': {}}])
+        await manager.execute_calls([{'id': 'a', 'name': 'calculate', 'arguments': {'expression': '6*7'}}])
+        results = await manager.execute_calls([{'id': 'a', 'name': 'calculate', 'arguments': {'expression': '6*7'}}])
+
+        assert results[0]['content'] == '42'
+        assert manager.stats()['cached_results'] == 1
+
+
+class TestSchema:
+    def test_schemas_are_built_once_per_set_of_abilities(self):
+        manager, _ = _manager()
+
+        tools = manager.get_tools_schema()
+        assert manager.get_tools_schema() is tools
+        assert manager.get_abilities_schema() is manager.get_abilities_schema()
+        assert tools[1]['function']['parameters'] == {'type': 'object', 'properties': {}}
+
+        manager.register_function('ping', 'Ping', lambda: 'pong')
+        assert len(manager.get_tools_schema()) == 3
+
+    def test_placeholder_search_is_not_offered(self):
+        names = [tool['function']['name'] for tool in create_default_abilities().get_tools_schema()]
+
+        assert names == ['get_current_time', 'calculate']
+
+
+class TestCalculate:
+    def test_arithmetic(self):
+        assert calculate('(2 + 3) * 4 - 10 / 4') == '17.5'
+        assert calculate('-2 ** 10 // 3 % 7') == str(-2 ** 10 // 3 % 7)
+
+    def test_huge_powers_are_rejected_without_evaluating(self):
+        start = time.perf_counter()
+
+        assert calculate('9**9**9**9').startswith('Error calculating')
+        assert calculate('(10**6)**100**2').startswith('Error calculating')
+        assert time.perf_counter() - start < 0.1
+
+    def test_names_and_calls_are_rejected(self):
+        assert calculate('__import__("os")').startswith('Error calculating')
+        assert calculate('x + 1').startswith('Error calculating')
+
+
+@pytest.mark.asyncio
+class TestAgentToolLoop:
+    """Test BrunoAgent feeding ability results back to the model."""
+
+    async def test_results_are_sent_back_and_answer_streamed(self):
+        manager, calls = _manager()
+        llm = StubToolLLM([[
+            {'id': 'a', 'name': 'weather', 'arguments': {'city': 'Lisbon'}},
+            {'id': 'b', 'name': 'hang', 'arguments': {}},
+        ]])
+        agent = make_agent(llm, model='llama3.1', tools=manager)
+        deltas = []
+
+        async def on_delta(text):
+            deltas.append(text)
+
+        result = await agent.process_message('Weather in Lisbon?', 'c1', on_delta=on_delta)
+
+        assert result['content'] == 'Checking. It is 21 degrees.'
+        assert deltas == ['Checking. ', 'It is 21 degrees.']
+        assert result['tools'] == ['weather', 'hang']
+        assert result['tokens_used'] == 8
+        assert 'tools_ms' in result['timings']
+        follow_up = llm.requests[1]['messages']
+        assert follow_up[-3]['tool_calls'][0]['name'] == 'weather'
+        assert [m['role'] for m in follow_up[-2:]] == ['tool', 'tool']
+        assert follow_up[-2]['tool_call_id'] == 'a'
+        assert llm.requests[0]['tools'] is llm.requests[1]['tools']
+
+    async def test_reply_without_tool_calls_takes_one_streamed_step(self):
+        manager, calls = _manager()
+        llm = StubToolLLM([])
+        agent = make_agent(llm, model='llama3.1', tools=manager)
+        deltas = []
+
+        async def on_delta(text):
+            deltas.append(text)
+
+        result = await agent.process_message('Hello!', 'c1', on_delta=on_delta)
+
+        assert len(llm.requests) == 1
+        assert llm.requests[0]['tools'] and llm.requests[0]['on_delta']
+        assert deltas == ['It is 21 degrees.']
+        assert 'tools' not in result and calls == []
+
+    async def test_answers_without_tools_after_max_steps(self):
+        manager, _ = _manager()
+        step = [{'id': 'a', 'name': 'weather', 'arguments': {'city': 'Lisbon'}}]
+        llm = StubToolLLM([step, step])
+        agent = make_agent(llm, model='llama3.1', tools=manager, max_tool_steps=2)
+
+        result = await agent.process_message('Weather in Lisbon?', 'c1')
+
+        assert result['content'] == 'Checking. Checking. It is 21 degrees.'
+        assert len(llm.requests) == 3
+        assert 'tools' not in llm.requests[-1]
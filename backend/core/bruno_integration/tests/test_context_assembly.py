@@ -0,0 +1,112 @@
+"""
+Unit tests for concurrent context assembly in BrunoAgent.
+"""
+import asyncio
+import time
+import pytest
+from core.bruno_integration import memory_extraction
+from core.bruno_integration.tests.stubs import db_memory, make_agent
+
+
+DELAY = 0.05
+
+
+class SlowMemory:
+    """History fetch that takes ``delay`` and notes whether it was cancelled."""
+
+    def __init__(self, delay=DELAY):
+        self.delay = delay
+        self.cancelled = False
+
+    async def get_history(self, conversation_id, limit=50):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return [{'role': 'user', 'content': 'earlier'}]
+
+
+class SlowTimerAbility:
+    """Timer check that takes DELAY and claims messages containing 'timer'."""
+
+    async def handle_timer_command(self, user_id, conversation_id, command):
+        await asyncio.sleep(DELAY)
+        return 'Timer set for 5 minutes.' if 'timer' in command else None
+
+
+@pytest.fixture
+def slow_memories(monkeypatch):
+    async def get_relevant_memories(user_id, limit=10):
+        await asyncio.sleep(DELAY)
+        return [{'id': '1', 'key': 'city', 'type': 'personal', 'value': 'Lives in Paris'}]
+
+    monkeypatch.setattr(memory_extraction.memory_extractor, 'get_relevant_memories', get_relevant_memories)
+
+
+def _agent(memory):
+    return make_agent(memory=memory, timer_ability=SlowTimerAbility())
+
+
+@pytest.mark.asyncio
+class TestConcurrentContext:
+    """Test that the fetches overlap and abilities short-circuit them."""
+
+    async def test_history_and_memories_overlap(self, slow_memories):
+        """Plain chat skips the abilities and fetches history and memories together."""
+        started = time.monotonic()
+
+        result = await _agent(SlowMemory()).process_message('how are you?', 'c1', user_id='u1')
+
+        elapsed = time.monotonic() - started
+        timings = result['timings']
+        assert result['success']
+        assert elapsed < DELAY * 2
+        assert timings['abilities_ms'] < DELAY * 1000 * 0.5
+        assert timings['history_ms'] >= DELAY * 1000 * 0.8
+        assert timings['memories_ms'] >= DELAY * 1000 * 0.8
+        assert timings['context_ms'] < DELAY * 1000 * 2
+
+    async def test_ability_claim_cancels_the_fetches(self, slow_memories):
+        memory = SlowMemory(delay=DELAY * 4)
+
+        started = time.monotonic()
+        result = await _agent(memory).process_message('set a timer for 5 minutes', 'c1', user_id='u1')
+
+        assert result['is_timer_response']
+        assert set(result['timings']) == {'abilities_ms'}
+        assert memory.cancelled
+        assert time.monotonic() - started < DELAY * 4
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+class TestParallelReads:
+    """Test history reads on worker threads against the database."""
+
+    @pytest.mark.parametrize('parallel', [True, False])
+    async def test_history_is_read(self, parallel, settings, test_conversation):
+        from asgiref.sync import sync_to_async
+        from apps.chat.models import Message
+
+        settings.CHAT_PARALLEL_DB_READS = parallel
+        await sync_to_async(Message.objects.create)(conversation=test_conversation, role='user', content='hi')
+        memory = db_memory()
+
+        history = await memory.get_history(str(test_conversation.id), limit=10)
+
+        assert [m['content'] for m in history] == ['hi']
+
+    async def test_worker_thread_queries_are_counted(self, settings, test_conversation):
+        from core.bruno_integration.db_reads import QueryCounter, query_counter
+
+        settings.CHAT_PARALLEL_DB_READS = True
+        memory = db_memory()
+        counter = QueryCounter()
+        token = query_counter.set(counter)
+        try:
+            await memory.get_history(str(test_conversation.id), limit=10)
+        finally:
+            query_counter.reset(token)
+
+        assert counter.count > 0
@@ -0,0 +1,141 @@
+"""
+Unit tests for token-budgeted context assembly.
+"""
+from core.bruno_integration.context_budget import ContextBuilder, TokenEstimator, TRUNCATION_MARKER
+
+
+def _format(memories):
+    return "Memories:\n" + "\n".join(f"- {m['value']}" for m in memories)
+
+
+def _history(count, words=20):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "word " * words}
+        for i in range(count)
+    ]
+
+
+class TestTokenEstimator:
+    """Test the local token estimate."""
+
+    def test_counts_words_and_punctuation(self):
+        """Short words cost one token, punctuation one each."""
+        estimator = TokenEstimator()
+
+        assert estimator.estimate("Hi there, how are you?", "llama3") == 7
+
+    def test_long_words_cost_more(self):
+        """Long words are split by the model's characters-per-token ratio."""
+        estimator = TokenEstimator()
+
+        assert estimator.estimate("internationalization", "llama3") == 5
+        assert estimator.estimate("internationalization", "mistral") == 6
+
+    def test_unknown_model_uses_default_ratio(self):
+        """Unknown and namespaced models still get an estimate."""
+        estimator = TokenEstimator()
+
+        assert estimator.chars_per_token("library/llama3:8b") == 4.0
+        assert estimator.chars_per_token("something-new") == TokenEstimator.DEFAULT_CHARS_PER_TOKEN
+
+    def test_truncate_keeps_head_and_tail(self):
+        """Over-long text is cut to the limit, keeping both ends."""
+        estimator = TokenEstimator()
+        text = "start " + "filler " * 500 + "finish"
+
+        truncated = estimator.truncate(text, 50)
+
+        assert estimator.estimate(truncated) <= 50
+        assert truncated.startswith("start")
+        assert truncated.endswith("finish")
+        assert TRUNCATION_MARKER in truncated
+        assert estimator.truncate("short", 50) == "short"
+
+
+class TestContextBuilder:
+    """Test filling the prompt budget in priority order."""
+
+    def test_everything_fits(self):
+        """With room to spare, all memories and history are kept in order."""
+        builder = ContextBuilder(max_prompt_tokens=2000)
+
+        messages, report = builder.build(
+            model="llama3",
+            system_prompt="You are Bruno.",
+            user_message="hello",
+            memories=[{"value": "Lives in Paris"}],
+            history=_history(4),
+            format_memories=_format,
+        )
+
+        assert [m["role"] for m in messages] == ["system", "system", "user", "assistant", "user", "assistant", "user"]
+        assert messages[1]["content"] == "Memories:\n- Lives in Paris"
+        assert messages[-1] == {"role": "user", "content": "hello"}
+        assert report.history_dropped == 0
+        assert report.total_tokens <= 2000
+
+    def test_oldest_history_is_dropped_first(self):
+        """When history does not fit, the most recent messages are kept."""
+        builder = ContextBuilder(max_prompt_tokens=150)
+        history = _history(10)
+
+        messages, report = builder.build("llama3", "You are Bruno.", "hello", history=history)
+
+        kept = messages[1:-1]
+        assert 0 < len(kept) < 10
+        assert kept == history[-len(kept):]
+        assert report.history_used == len(kept)
+        assert report.history_dropped == 10 - len(kept)
+        assert report.total_tokens <= 150
+
+    def test_memories_take_priority_over_history(self):
+        """Memories are placed before history is considered."""
+        builder = ContextBuilder(max_prompt_tokens=80)
+        memories = [{"value": f"fact number {i}"} for i in range(3)]
+
+        messages, report = builder.build(
+            "llama3", "You are Bruno.", "hello",
+            memories=memories, history=_history(6), format_memories=_format,
+        )
+
+        assert report.memories_used == 3
+        assert report.history_used < 6
+        assert report.total_tokens <= 80
+
+    def test_memories_that_do_not_fit_are_dropped(self):
+        """Less important memories are left out once the budget is used up."""
+        builder = ContextBuilder(max_prompt_tokens=40)
+        memories = [{"value": "word " * 10} for _ in range(5)]
+
+        messages, report = builder.build(
+            "llama3", "You are Bruno.", "hello", memories=memories, format_memories=_format,
+        )
+
+        assert 0 < report.memories_used < 5
+        assert report.memories_dropped == 5 - report.memories_used
+        assert report.total_tokens <= 40
+
+    def test_long_messages_are_truncated(self):
+        """History and current messages over the per-message limit are shortened."""
+        builder = ContextBuilder(max_prompt_tokens=4000, max_message_tokens=100)
+        long_text = "paste " * 1000
+
+        messages, report = builder.build(
+            "llama3", "You are Bruno.", long_text,
+            history=[{"role": "user", "content": long_text}],
+        )
+
+        assert TRUNCATION_MARKER in messages[1]["content"]
+        assert TRUNCATION_MARKER in messages[-1]["content"]
+        assert report.truncated == ["message", "history"]
+        assert report.message_tokens <= 100 + TokenEstimator.MESSAGE_OVERHEAD
+
+    def test_system_prompt_is_never_cut(self):
+        """An oversized system prompt is kept and everything optional is dropped."""
+        builder = ContextBuilder(max_prompt_tokens=10)
+        system_prompt = "rule " * 50
+
+        messages, report = builder.build("llama3", system_prompt, "hi", history=_history(2))
+
+        assert messages[0]["content"] == system_prompt
+        assert report.history_used == 0
@@ -0,0 +1,92 @@
+"""
+Unit tests for ConversationContextStore.
+"""
+from core.bruno_integration.context_store import ConversationContextStore
+
+
+SYSTEM = {"role": "system", "content": "You are Bruno."}
+
+
+def _turn(*contents):
+    """Build a message list: system prompt, then alternating user/assistant, ending with user."""
+    roles = ['user', 'assistant']
+    return [SYSTEM] + [
+        {"role": roles[i % 2], "content": content}
+        for i, content in enumerate(contents)
+    ]
+
+
+class TestConversationContextStore:
+    """Test when stored contexts are (and are not) reused."""
+    
+    def test_reused_when_history_continues(self):
+        """Context is returned when history ends with the stored exchange."""
+        store = ConversationContextStore()
+        store.save('c1', 'mistral:7b', _turn('hi'), 'hello', [1, 2, 3])
+        
+        assert store.lookup('c1', 'mistral:7b', _turn('hi', 'hello', 'next')).tokens == [1, 2, 3]
+    
+    def test_not_reused_for_other_model(self):
+        """A different model invalidates the context."""
+        store = ConversationContextStore()
+        store.save('c1', 'mistral:7b', _turn('hi'), 'hello', [1, 2, 3])
+        
+        assert store.lookup('c1', 'phi3', _turn('hi', 'hello', 'next')) is None
+    
+    def test_not_reused_when_system_prompt_changes(self):
+        """Changed system messages invalidate the context."""
+        store = ConversationContextStore()
+        store.save('c1', 'mistral:7b', _turn('hi'), 'hello', [1, 2, 3])
+        messages = _turn('hi', 'hello', 'next')
+        messages[0] = {"role": "system", "content": "You are Meggy."}
+        
+        assert store.lookup('c1', 'mistral:7b', messages) is None
+    
+    def test_reused_when_recall_and_summary_change(self):
+        """Per-turn system messages do not invalidate the context; the new ones come with the turn."""
+        store = ConversationContextStore()
+        summary = {"role": "system", "content": "Summary: they talked about tea."}
+        first = _turn('hi')
+        first[1:1] = [summary]
+        first.insert(-1, {"role": "system", "content": "Recalled: user likes green tea."})
+        store.save('c1', 'mistral:7b', first, 'hello', [1, 2, 3])
+        
+        recall = {"role": "system", "content": "Recalled: user visited Kyoto."}
+        second = _turn('hi', 'hello', 'next')
+        second[1:1] = [summary]
+        second.insert(-1, recall)
+        reusable = store.lookup('c1', 'mistral:7b', second)
+        
+        assert reusable.tokens == [1, 2, 3]
+        assert reusable.messages == [recall, second[-1]]
+        
+        store.save('c1', 'mistral:7b', second, 'welcome back', [1, 2, 3, 4])
+        third = _turn('hi', 'hello', 'next', 'welcome back', 'bye')
+        third[1:1] = [summary]
+        third.insert(-1, recall)
+        
+        assert store.lookup('c1', 'mistral:7b', third).messages == [third[-1]]
+    
+    def test_not_reused_when_conversation_diverged(self):
+        """A reply not produced by the stored context (e.g. a timer reply) invalidates it."""
+        store = ConversationContextStore()
+        store.save('c1', 'mistral:7b', _turn('hi'), 'hello', [1, 2, 3])
+        
+        assert store.lookup('c1', 'mistral:7b', _turn('hi', 'Timer set.', 'next')) is None
+        assert store.stats()['conversations'] == 0
+    
+    def test_oversized_context_not_stored(self):
+        """Contexts beyond max_tokens are dropped so the next turn re-prefills."""
+        store = ConversationContextStore(max_tokens=2)
+        store.save('c1', 'mistral:7b', _turn('hi'), 'hello', [1, 2, 3])
+        
+        assert store.lookup('c1', 'mistral:7b', _turn('hi', 'hello', 'next')) is None
+    
+    def test_least_recently_used_conversation_evicted(self):
+        """The store keeps at most max_conversations entries."""
+        store = ConversationContextStore(max_conversations=2)
+        for conversation_id in ('c1', 'c2', 'c3'):
+            store.save(conversation_id, 'mistral:7b', _turn('hi'), 'hello', [1])
+        
+        assert store.lookup('c1', 'mistral:7b', _turn('hi', 'hello', 'next')) is None
+        assert store.lookup('c3', 'mistral:7b', _turn('hi', 'hello', 'next')).tokens == [1]
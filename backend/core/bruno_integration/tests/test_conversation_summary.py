@@ -0,0 +1,125 @@
+"""
+Unit tests for rolling conversation summaries.
+"""
+from datetime import timedelta
+import pytest
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from core.bruno_integration.context_budget import ContextBuilder
+from core.bruno_integration.conversation_summary import RollingSummarizer, SUMMARY_HEADER
+from core.bruno_integration.tests.stubs import StubLLM, db_memory, make_agent
+
+
+def _reply(messages, kwargs):
+    """Summarize by counting the lines given; chat turns (no priority) get a greeting."""
+    if kwargs.get('priority') is None:
+        return 'Hello!'
+    return f"summary of {len(messages[-1]['content'].splitlines())} lines"
+
+
+def _add_messages(conversation, count, start=0):
+    """Create ``count`` alternating messages a minute apart."""
+    from apps.chat.models import Message
+
+    base = timezone.now() - timedelta(days=30)
+    for i in range(start, start + count):
+        message = Message.objects.create(
+            conversation=conversation, role='user' if i % 2 == 0 else 'assistant', content=f"message {i}"
+        )
+        Message.objects.filter(id=message.id).update(created_at=base + timedelta(minutes=i))
+
+
+def _summarizer(llm, **kwargs):
+    options = {'chunk_messages': 10, 'keep_recent': 10, 'fanout': 2, 'max_chunks_per_run': 100}
+    return RollingSummarizer(llm_client=llm, **{**options, **kwargs})
+
+
+class TestContextBuilder:
+    def test_summary_segment_is_capped(self):
+        builder = ContextBuilder(max_prompt_tokens=2000, max_summary_tokens=60)
+
+        messages, report = builder.build(
+            model='mistral:7b', system_prompt='You are Bruno.', user_message='hi',
+            history=[{'role': 'user', 'content': 'earlier'}], summary='The user likes tea. ' * 100
+        )
+
+        assert [m['role'] for m in messages] == ['system', 'system', 'user', 'user']
+        assert report.summary_tokens <= 60
+        assert 'summary' in report.truncated
+        assert [s.name for s in report.segments] == ['system', 'summary', 'history', 'message']
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+class TestRollingSummarizer:
+    """Test folding and merging against the database."""
+
+    async def test_folds_old_messages_hierarchically(self, test_conversation):
+        from apps.chat.models import ConversationSummary
+
+        await sync_to_async(_add_messages)(test_conversation, 55)
+        llm = StubLLM(_reply)
+
+        result = await _summarizer(llm).summarize(str(test_conversation.id))
+
+        # 45 foldable messages -> 4 chunks of 10; the third level 1 node overflows
+        # fanout 2, so the oldest two are merged into a level 2 node
+        assert result == {'messages': 40, 'chunks': 4, 'merges': 1}
+        nodes = await sync_to_async(list)(ConversationSummary.objects.filter(conversation=test_conversation))
+        assert [(n.level, n.message_count) for n in nodes] == [(2, 20), (1, 10), (1, 10)]
+        assert all(call['priority'].name == 'BACKGROUND' for call in llm.calls)
+        assert len(llm.calls) == 5
+
+    async def test_levels_stay_bounded(self, test_conversation):
+        await sync_to_async(_add_messages)(test_conversation, 90)
+        summarizer = _summarizer(StubLLM(_reply))
+
+        await summarizer.summarize(str(test_conversation.id))
+
+        summary = await summarizer.load(str(test_conversation.id))
+        levels = [node['level'] for node in summary.nodes]
+        assert summary.message_count == 80
+        assert levels == sorted(levels, reverse=True)
+        assert all(levels.count(level) <= 2 for level in set(levels))
+
+    async def test_new_messages_are_folded_incrementally(self, test_conversation):
+        await sync_to_async(_add_messages)(test_conversation, 30)
+        llm = StubLLM(_reply)
+        summarizer = _summarizer(llm, fanout=4)
+        await summarizer.summarize(str(test_conversation.id))
+        llm.calls.clear()
+
+        await sync_to_async(_add_messages)(test_conversation, 10, start=30)
+        result = await summarizer.summarize(str(test_conversation.id))
+
+        assert result['chunks'] == 1
+        assert llm.calls[0]['messages'][-1]['content'].splitlines() == [
+            f"{'User' if i % 2 == 0 else 'Assistant'}: message {i}" for i in range(20, 30)
+        ]
+        summary = await summarizer.load(str(test_conversation.id))
+        assert summary.message_count == 30
+
+    async def test_nothing_to_fold_within_the_recent_window(self, test_conversation):
+        await sync_to_async(_add_messages)(test_conversation, 19)
+        llm = StubLLM(_reply)
+        summarizer = _summarizer(llm)
+
+        assert (await summarizer.summarize(str(test_conversation.id)))['chunks'] == 0
+        assert await summarizer.load(str(test_conversation.id)) is None
+        assert llm.calls == []
+        assert await summarizer.summarize_due() == {}
+
+    async def test_prompt_carries_summary_instead_of_covered_history(self, test_conversation):
+        await sync_to_async(_add_messages)(test_conversation, 30)
+        llm = StubLLM(_reply)
+        summarizer = _summarizer(llm)
+        await summarizer.summarize_due()
+        agent = make_agent(llm, db_memory(), summarizer=summarizer)
+
+        result = await agent.process_message('how are you?', str(test_conversation.id))
+
+        prompt = llm.calls[-1]['messages']
+        assert result['success']
+        assert 'summary_ms' in result['timings']
+        assert prompt[1]['content'].startswith(SUMMARY_HEADER)
+        assert [m['content'] for m in prompt[2:-1]] == [f"message {i}" for i in range(20, 30)]
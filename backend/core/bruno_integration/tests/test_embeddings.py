@@ -0,0 +1,122 @@
+"""
+Unit tests for the batched embedding service.
+"""
+import asyncio
+from array import array
+import pytest
+import pytest_asyncio
+from core.bruno_integration.embeddings import (
+    DjangoEmbeddingStore, EmbeddingService, content_hash, from_bytes, to_bytes
+)
+from core.bruno_integration.fake_ollama import FakeOllama
+from core.bruno_integration.http_sessions import SessionManager
+from core.bruno_integration.llm_scheduler import LLMScheduler
+from core.bruno_integration.ollama_pool import OllamaPool
+
+
+@pytest_asyncio.fixture
+async def fake_server(serve):
+    fake = FakeOllama(embedding_dimensions=16)
+    return fake, await serve(fake.make_app())
+
+
+@pytest_asyncio.fixture
+async def make_service(fake_server):
+    """Build services against the fake server; their sessions are closed afterwards."""
+    fake, url = fake_server
+    sessions = SessionManager()
+
+    def make(**kwargs):
+        pool = OllamaPool([url], health_check_interval=0, session_manager=sessions)
+        return EmbeddingService(pool=pool, scheduler=LLMScheduler(max_concurrency=4), **kwargs)
+
+    yield make
+    await sessions.close()
+
+
+def test_vector_bytes_round_trip():
+    vector = array('f', [0.5, -1.25, 3.0])
+
+    data = to_bytes(vector)
+
+    assert len(data) == 12
+    assert from_bytes(data) == vector
+
+
+@pytest.mark.asyncio
+class TestEmbeddingService:
+    """Test deduplication, caching and batching against the fake server."""
+
+    async def test_duplicates_are_embedded_once(self, fake_server, make_service):
+        fake, _ = fake_server
+        service = make_service()
+
+        vectors = await service.embed(['hello', 'world', 'hello'])
+
+        assert [v.typecode for v in vectors] == ['f', 'f', 'f']
+        assert vectors[0] == vectors[2]
+        assert list(vectors[1]) == pytest.approx(fake._vector('world'), abs=1e-6)
+        stats = service.stats()
+        assert stats['requests'] == 1
+        assert stats['embedded'] == 2
+        assert stats['duplicates'] == 1
+
+    async def test_warm_cache_skips_ollama(self, make_service):
+        service = make_service()
+        await service.embed(['hello'])
+
+        await service.embed_one('hello')
+
+        assert service.stats()['requests'] == 1
+        assert service.stats()['cache_hits'] == 1
+
+    async def test_cache_is_bounded(self, make_service):
+        service = make_service(cache_size=2)
+
+        await service.embed(['a', 'b', 'c'])
+
+        assert service.stats()['cached_vectors'] == 2
+
+    async def test_large_inputs_are_chunked(self, make_service):
+        service = make_service(batch_size=2)
+
+        vectors = await service.embed([f'text {i}' for i in range(5)])
+
+        assert len(vectors) == 5
+        assert service.stats()['requests'] == 3
+
+    async def test_concurrent_callers_share_requests(self, make_service):
+        """Callers arriving while a request is running are sent together."""
+        service = make_service()
+
+        vectors = await asyncio.gather(*(service.embed_one(f'text {i}') for i in range(6)))
+
+        assert len(vectors) == 6
+        assert service.stats()['requests'] < 6
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+class TestEmbeddingStore:
+    """Test the persistent float32 store."""
+
+    async def test_other_processes_reuse_stored_vectors(self, make_service):
+        first = make_service(store=DjangoEmbeddingStore())
+        second = make_service(store=DjangoEmbeddingStore())
+
+        vector = await first.embed_one('remember me')
+        again = await second.embed_one('remember me')
+
+        assert again == vector
+        assert second.stats()['store_hits'] == 1
+        assert second.stats()['requests'] == 0
+
+    async def test_vectors_are_stored_as_float32(self, make_service):
+        from asgiref.sync import sync_to_async
+        from apps.chat.models import Embedding
+
+        await make_service(store=DjangoEmbeddingStore()).embed_one('compact')
+
+        row = await sync_to_async(Embedding.objects.get)(content_hash=content_hash('compact'))
+        assert row.dimensions == 16
+        assert len(row.vector) == 16 * 4
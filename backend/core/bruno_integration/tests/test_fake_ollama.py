@@ -0,0 +1,106 @@
+"""
+Unit tests for the fake Ollama server used by load benchmarks.
+"""
+import pytest
+from core.bruno_integration.bruno_llm import OllamaClient
+from core.bruno_integration.fake_ollama import DEFAULT_REPLY, FakeOllama
+from core.bruno_integration.http_sessions import SessionManager
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+@pytest.mark.asyncio
+class TestFakeOllama:
+    """Test the fake server against the real client."""
+
+    @pytest.mark.parametrize('api_mode', ['chat', 'generate'])
+    async def test_generates_reply(self, serve, api_mode):
+        """Both generation endpoints answer with the configured reply."""
+        sessions = SessionManager()
+        url = await serve(FakeOllama(prefill_latency=0, tokens_per_second=0).make_app())
+        client = OllamaClient(base_url=url, api_mode=api_mode, session_manager=sessions)
+
+        result = await client.generate(MESSAGES)
+
+        assert result['content'] == DEFAULT_REPLY
+        assert result['tokens_used'] == len(DEFAULT_REPLY.split(' '))
+        await sessions.close()
+
+    async def test_streams_deltas(self, serve):
+        """Streaming replies arrive as several deltas that add up to the reply."""
+        sessions = SessionManager()
+        url = await serve(FakeOllama(prefill_latency=0, tokens_per_second=1000).make_app())
+        client = OllamaClient(base_url=url, api_mode='chat', session_manager=sessions)
+        deltas = []
+
+        async def on_delta(text):
+            deltas.append(text)
+
+        result = await client.generate(MESSAGES, on_delta=on_delta)
+
+        assert len(deltas) > 1
+        assert ''.join(deltas) == result['content'] == DEFAULT_REPLY
+        await sessions.close()
+
+    async def test_json_prompts_get_json(self, serve):
+        """Classifier-style prompts asking for JSON get a JSON answer."""
+        sessions = SessionManager()
+        url = await serve(FakeOllama(prefill_latency=0, tokens_per_second=0).make_app())
+        client = OllamaClient(base_url=url, api_mode='chat', session_manager=sessions)
+
+        result = await client.generate([{"role": "user", "content": "Respond only with JSON"}])
+
+        assert result['content'].startswith('{')
+        await sessions.close()
+
+    async def test_error_rate(self, serve):
+        """With an error rate of 1 every call fails."""
+        sessions = SessionManager()
+        fake = FakeOllama(error_rate=1.0)
+        url = await serve(fake.make_app())
+        client = OllamaClient(base_url=url, api_mode='chat', session_manager=sessions)
+
+        with pytest.raises(Exception):
+            await client.generate(MESSAGES)
+
+        assert fake.counters['errors'] == 1
+        await sessions.close()
+
+    async def test_tags_and_embeddings(self, serve):
+        """Model listing works and embeddings are deterministic unit vectors."""
+        sessions = SessionManager()
+        fake = FakeOllama(models=['llama3:8b'], embedding_dimensions=16)
+        url = await serve(fake.make_app())
+        client = OllamaClient(base_url=url, session_manager=sessions)
+
+        assert await client.list_models() == ['llama3:8b']
+
+        session = sessions.get_session()
+        async with session.post(f"{url}/api/embed", json={"model": "m", "input": ["a", "b", "a"]}) as response:
+            vectors = (await response.json())['embeddings']
+        assert len(vectors) == 3 and len(vectors[0]) == 16
+        assert vectors[0] == vectors[2] != vectors[1]
+        assert abs(sum(v * v for v in vectors[0]) - 1) < 1e-9
+        await sessions.close()
+
+    @pytest.mark.parametrize('on_delta', [None, 'stream'])
+    async def test_reports_timings(self, serve, on_delta):
+        """Ollama's load, prefill and decode counters reach the client as milliseconds."""
+        sessions = SessionManager()
+        url = await serve(FakeOllama(prefill_latency=0.02, load_latency=0.05, tokens_per_second=1000).make_app())
+        client = OllamaClient(base_url=url, api_mode='chat', session_manager=sessions)
+
+        async def ignore(text):
+            pass
+
+        result = await client.generate(MESSAGES, on_delta=ignore if on_delta else None)
+
+        timings = result['timings']
+        assert timings['load_ms'] >= 50
+        assert timings['prefill_ms'] >= 20
+        assert timings['decode_ms'] > 0
+        assert timings['completion_tokens'] == result['tokens_used']
+        assert timings['prompt_tokens'] > 0
+        assert ('ttft_ms' in timings) == bool(on_delta)
+        await sessions.close()
@@ -0,0 +1,128 @@
+"""
+Unit tests for the pooled HTTP SessionManager.
+"""
+import asyncio
+import threading
+import pytest
+from aiohttp import web
+from asgiref.sync import sync_to_async
+from aiohttp.test_utils import TestServer
+from core.bruno_integration.event_loop import LoopThread
+from core.bruno_integration.http_sessions import SessionManager
+
+
+@pytest.mark.asyncio
+class TestSessionManager:
+    """Test per-loop session pooling."""
+    
+    async def test_same_session_within_loop(self):
+        """Repeated calls on one loop reuse the same session."""
+        manager = SessionManager()
+        
+        first = manager.get_session()
+        second = manager.get_session()
+        
+        assert first is second
+        assert manager.stats()['sessions'] == 1
+        await manager.close()
+    
+    async def test_connector_settings_applied(self):
+        """Connection limits and DNS cache come from the manager config."""
+        manager = SessionManager(limit=7, limit_per_host=3, dns_cache_ttl=42)
+        
+        session = manager.get_session()
+        
+        assert session.connector.limit == 7
+        assert session.connector.limit_per_host == 3
+        assert session.connector.use_dns_cache is True
+        await manager.close()
+    
+    async def test_close_removes_session(self):
+        """Closing drops the session for the running loop."""
+        manager = SessionManager()
+        session = manager.get_session()
+        
+        await manager.close()
+        
+        assert session.closed
+        assert manager.stats()['sessions'] == 0
+
+
+class TestSessionManagerAcrossLoops:
+    """Test behaviour with short-lived loops and the long-lived loop thread."""
+    
+    def test_separate_loops_get_separate_sessions(self):
+        """Each event loop gets its own session."""
+        manager = SessionManager()
+        
+        async def grab():
+            return manager.get_session()
+        
+        session_a = asyncio.run(grab())
+        session_b = asyncio.run(grab())
+        
+        assert session_a is not session_b
+        assert manager.stats()['created'] == 2
+    
+    def test_sessions_close_when_their_loop_shuts_down(self):
+        """A per-call loop closes its session instead of leaking the connections."""
+        manager = SessionManager()
+        
+        async def grab():
+            return manager.get_session()
+        
+        session = asyncio.run(grab())
+        
+        assert session.closed
+        assert manager.stats()['sessions'] == 0
+    
+    def test_bridged_calls_reuse_one_connection(self):
+        """Sync calls through the loop thread share one session and keep-alive connection."""
+        loop_thread = LoopThread(name='test-loop')
+        manager = SessionManager()
+        peers = []
+        
+        async def handler(request):
+            peers.append(request.transport.get_extra_info('peername'))
+            return web.json_response({})
+        
+        async def start():
+            app = web.Application()
+            app.router.add_get('/', handler)
+            server = TestServer(app)
+            await server.start_server()
+            return server
+        
+        async def fetch():
+            async with manager.get_session().get(server.make_url('/')) as response:
+                await response.read()
+            return manager.get_session()
+        
+        server = loop_thread.async_to_sync(start)()
+        try:
+            sessions = {loop_thread.async_to_sync(fetch)() for _ in range(5)}
+            assert len(sessions) == 1
+            assert len(set(peers)) == 1
+            assert manager.stats()['created'] == 1
+        finally:
+            loop_thread.async_to_sync(server.close)()
+            loop_thread.stop()
+        
+        assert sessions.pop().closed
+    
+    def test_bridged_calls_run_sync_work_on_the_calling_thread(self):
+        """ORM work of a bridged call stays on the caller's thread (asgiref's main_event_loop hook)."""
+        loop_thread = LoopThread(name='test-loop')
+        threads = []
+        
+        async def query():
+            threads.append(threading.get_ident())
+            await sync_to_async(lambda: threads.append(threading.get_ident()))()
+        
+        try:
+            loop_thread.async_to_sync(query)()
+        finally:
+            loop_thread.stop()
+        
+        assert threads[0] != threading.get_ident()
+        assert threads[1] == threading.get_ident()
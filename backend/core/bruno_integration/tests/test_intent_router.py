@@ -0,0 +1,141 @@
+"""
+Unit tests for the deterministic intent router.
+"""
+import time
+import pytest
+from core.bruno_integration.bruno_core import AgentConfig, BrunoAgent
+from core.bruno_integration.intent_router import IntentRouter, KeywordTrie
+from core.bruno_integration.notes_ability import NotesState
+
+
+class StubAbility:
+    """Timer/notes ability recording the commands it was asked about."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.commands = []
+
+    async def handle_timer_command(self, user_id, conversation_id, command):
+        self.commands.append(command)
+        return self.reply
+
+    async def handle_notes_command(self, user_id, conversation_id, command):
+        self.commands.append(command)
+        return self.reply
+
+
+@pytest.fixture
+def abilities():
+    return StubAbility('Timer set.'), StubAbility('Your notes: ...')
+
+
+@pytest.fixture
+def router(abilities):
+    timer, notes = abilities
+    return IntentRouter(timer, notes, state=NotesState())
+
+
+class TestKeywordTrie:
+    def test_multi_word_phrases(self):
+        trie = KeywordTrie(['jot down', 'note'])
+
+        assert trie.find('please jot down milk'.split()) == 'jot down'
+        assert trie.find('jot it down'.split()) is None
+        assert trie.find('a note'.split()) == 'note'
+
+
+class TestClassify:
+    """Test which messages skip the LLM classifier."""
+
+    @pytest.mark.parametrize('message, kind', [
+        ('set timer for 5 minutes', 'timer'),
+        ('Remind me in 10 mins', 'timer'),
+        ('cancel all timers', 'timer'),
+        ('show notes', 'notes'),
+        ('Notes', 'notes'),
+        ('how are you?', 'chat'),
+        ('tell me about Python', 'chat'),
+        ('remind me to call mom at 5pm', 'ambiguous'),
+        ('can you jot down that I need milk', 'ambiguous'),
+    ])
+    def test_kinds(self, router, message, kind):
+        assert router.classify(message, 'c1').kind == kind
+
+    def test_notes_mode_claims_every_message(self, router):
+        router.state.set_state('c1', in_notes_mode=True, view='list')
+
+        assert router.classify('1', 'c1').reason == 'notes_mode'
+        assert router.classify('1', 'c2').kind == 'chat'
+
+    def test_detection_results(self, router):
+        assert router.classify('set timer for 5 minutes').detection_result()['command_type'] == 'timer'
+        assert router.classify('hello').detection_result()['is_command'] is False
+        assert router.classify('add a reminder').detection_result() is None
+
+    def test_classification_is_fast(self, router):
+        messages = ['how are you?', 'set timer for 5 minutes', 'remind me to call mom', 'show notes'] * 2500
+
+        started = time.perf_counter()
+        for message in messages:
+            router.classify(message, 'c1')
+        per_message = (time.perf_counter() - started) / len(messages)
+
+        assert per_message < 0.0001
+        assert router.stats()['llm_avoided'] == 7500
+
+
+@pytest.mark.asyncio
+class TestDispatch:
+    """Test that only the intended ability sees a message."""
+
+    async def test_timer_goes_to_the_timer_ability(self, router, abilities):
+        timer, notes = abilities
+
+        response = await router.dispatch('set timer for 5 minutes', 'c1', 'u1')
+
+        assert response == {'content': 'Timer set.', 'is_timer_response': True}
+        assert notes.commands == []
+
+    async def test_chat_reaches_no_ability(self, router, abilities):
+        assert await router.dispatch('how are you?', 'c1', 'u1') is None
+        assert abilities[0].commands == [] and abilities[1].commands == []
+
+    async def test_anonymous_messages_are_not_dispatched(self, router):
+        assert await router.dispatch('show notes', 'c1', None) is None
+
+
+@pytest.mark.asyncio
+class TestAgentDispatch:
+    """Test that the agent reuses the classification it is given."""
+
+    async def test_message_is_classified_once(self, router, abilities, monkeypatch):
+        intent = router.classify('show notes', 'c1')
+        classified = []
+        monkeypatch.setattr(router, 'classify', lambda *args: classified.append(args) or intent)
+        agent = BrunoAgent(AgentConfig(name='Bruno', model='mistral:7b'), None, intent_router=router)
+
+        response = await agent.process_message('show notes', 'c1', 'u1', context={'intent': intent})
+
+        assert response['is_notes_response']
+        assert abilities[1].commands == ['show notes']
+        assert classified == []
+
+
+class TestDetectCommand:
+    """Test that MessageService only asks the LLM about ambiguous messages."""
+
+    def test_routed_messages_skip_the_llm(self, router, monkeypatch):
+        from core.services import chat_service
+        from core.services.message_service import MessageService
+
+        async def fail(*args, **kwargs):
+            raise AssertionError("LLM detector called")
+
+        monkeypatch.setattr(chat_service.command_detector, 'detect_command', fail)
+
+        is_command, result = MessageService().detect_command(
+            'show notes', intent=router.classify('show notes', 'c1')
+        )
+
+        assert is_command
+        assert result['source'] == 'intent_router'
@@ -0,0 +1,109 @@
+"""
+Unit tests for JSON-mode classifier calls that stop at the end of the object.
+"""
+import asyncio
+import json
+import time
+import pytest
+import pytest_asyncio
+from core.bruno_integration.bruno_llm import OllamaClient
+from core.bruno_integration.fake_ollama import FakeOllama
+from core.bruno_integration.http_sessions import SessionManager
+from core.bruno_integration.json_stream import JsonValueScanner
+from core.bruno_integration.llm_cache import ResponseCache
+from core.bruno_integration.openai_client import OpenAICompatibleClient
+from core.bruno_integration.single_flight import SingleFlight
+
+
+DETECTION = {"is_command": True, "command_type": "timer", "confidence": 0.95}
+CHATTY_REPLY = json.dumps(DETECTION) + " Sure! I classified this message as a timer because it asks for one."
+MESSAGES = [{"role": "user", "content": "set a timer for 5 minutes"}]
+
+
+class TestJsonValueScanner:
+    """Test finding the end of the first JSON value."""
+
+    def test_object_split_across_deltas(self):
+        scanner = JsonValueScanner()
+
+        assert scanner.feed('{"a": ') is None
+        assert scanner.feed('[1, 2]') is None
+        assert scanner.feed('} and more') == 1
+        assert scanner.complete
+        assert json.loads(scanner.text) == {"a": [1, 2]}
+
+    def test_braces_inside_strings_are_ignored(self):
+        scanner = JsonValueScanner()
+
+        assert scanner.feed('{"text": "a } \\" {", "n": 1}') == len('{"text": "a } \\" {", "n": 1}')
+        assert json.loads(scanner.text) == {"text": 'a } " {', "n": 1}
+
+    def test_leading_text_is_skipped(self):
+        scanner = JsonValueScanner()
+
+        assert scanner.feed('Here you go: {"ok": true}!') == len('Here you go: {"ok": true}')
+        assert scanner.text == '{"ok": true}'
+
+
+@pytest_asyncio.fixture
+async def fake_server(serve):
+    """Fake server whose JSON answers are followed by chatter, decoded slowly."""
+    fake = FakeOllama(prefill_latency=0, tokens_per_second=40, json_reply=CHATTY_REPLY)
+    return fake, await serve(fake.make_app())
+
+
+@pytest.mark.asyncio
+class TestJsonMode:
+    """Test early stream termination against the fake server."""
+
+    async def test_ollama_stops_after_the_object(self, fake_server):
+        """Only the JSON object is returned and the chatter is never waited for."""
+        fake, url = fake_server
+        sessions = SessionManager()
+        client = OllamaClient(base_url=url, api_mode='chat', session_manager=sessions,
+                              single_flight=SingleFlight(enabled=False))
+        full_decode = len(CHATTY_REPLY.split(' ')) / 40
+
+        started = time.monotonic()
+        result = await client.generate(MESSAGES, temperature=0.1, max_tokens=100, json_mode=True)
+        elapsed = time.monotonic() - started
+
+        assert json.loads(result['content']) == DETECTION
+        assert result['stopped_early']
+        assert result['tokens_used'] == len(json.dumps(DETECTION).split(' '))
+        assert elapsed < full_decode * 0.6
+        await asyncio.sleep(0.1)
+        assert fake.counters['disconnects'] == 1
+        await sessions.close()
+
+    async def test_format_is_requested(self):
+        client = OllamaClient(base_url='http://x', api_mode='chat')
+
+        request = client._build_request(MESSAGES, 'mistral:7b', 0.1, 100, True, json_mode=True)
+
+        assert request.payload['format'] == 'json'
+
+    async def test_json_mode_has_its_own_cache_entry(self, fake_server):
+        """Cached JSON-mode answers are not served to free-text calls."""
+        _, url = fake_server
+        sessions = SessionManager()
+        client = OllamaClient(base_url=url, api_mode='chat', session_manager=sessions,
+                              response_cache=ResponseCache())
+
+        await client.generate(MESSAGES, temperature=0.1, json_mode=True, cache=True)
+
+        assert await client.get_cached(MESSAGES, 'mistral:7b', 0.1, 2000, json_mode=True) is not None
+        assert await client.get_cached(MESSAGES, 'mistral:7b', 0.1, 2000) is None
+        await sessions.close()
+
+    async def test_openai_compatible_stops_after_the_object(self, fake_server):
+        _, url = fake_server
+        sessions = SessionManager()
+        client = OpenAICompatibleClient(base_url=f"{url}/v1", session_manager=sessions,
+                                        single_flight=SingleFlight(enabled=False))
+
+        result = await client.generate(MESSAGES, temperature=0.1, json_mode=True)
+
+        assert json.loads(result['content']) == DETECTION
+        assert result['stopped_early']
+        await sessions.close()
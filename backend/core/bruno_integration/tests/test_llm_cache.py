@@ -0,0 +1,117 @@
+"""
+Unit tests for the LLM response cache.
+"""
+import pytest
+from unittest.mock import AsyncMock
+from core.bruno_integration.bruno_llm import OllamaClient
+from core.bruno_integration.llm_cache import ResponseCache, make_request_key
+
+
+MESSAGES = [
+    {"role": "system", "content": "Respond only with JSON."},
+    {"role": "user", "content": "cancel all timers"},
+]
+
+
+class TestMakeRequestKey:
+    """Test request key normalization."""
+    
+    def test_whitespace_and_case_are_normalized(self):
+        """Trivially different prompts share a key."""
+        other = [
+            {"role": "system", "content": "Respond only with JSON."},
+            {"role": "user", "content": "  Cancel   all timers "},
+        ]
+        
+        assert make_request_key('mistral:7b', MESSAGES, 0.1, 100) == make_request_key('mistral:7b', other, 0.1, 100)
+    
+    def test_sampling_parameters_change_key(self):
+        """Model, temperature and max_tokens are part of the key."""
+        base = make_request_key('mistral:7b', MESSAGES, 0.1, 100)
+        
+        assert make_request_key('phi3', MESSAGES, 0.1, 100) != base
+        assert make_request_key('mistral:7b', MESSAGES, 0.0, 100) != base
+        assert make_request_key('mistral:7b', MESSAGES, 0.1, 150) != base
+
+
+@pytest.mark.asyncio
+class TestResponseCache:
+    """Test the in-process tier."""
+    
+    async def test_miss_then_hit(self):
+        """Stored values are returned and counted."""
+        cache = ResponseCache()
+        
+        assert await cache.get('k') is None
+        await cache.set('k', {'content': 'x'})
+        assert await cache.get('k') == {'content': 'x'}
+        
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+    
+    async def test_expired_entries_miss(self):
+        """Entries past their TTL are not served."""
+        cache = ResponseCache(ttl=-1)
+        await cache.set('k', {'content': 'x'})
+        
+        assert await cache.get('k') is None
+    
+    async def test_lru_eviction(self):
+        """The least recently used entry is evicted first."""
+        cache = ResponseCache(max_entries=2)
+        await cache.set('a', {'content': 'a'})
+        await cache.set('b', {'content': 'b'})
+        await cache.get('a')
+        await cache.set('c', {'content': 'c'})
+        
+        assert await cache.get('b') is None
+        assert await cache.get('a') is not None
+    
+    async def test_temperature_threshold(self):
+        """Only low-temperature calls are cacheable."""
+        cache = ResponseCache(max_temperature=0.2)
+        
+        assert cache.is_cacheable(0.1)
+        assert not cache.is_cacheable(0.7)
+
+
+@pytest.mark.asyncio
+class TestOllamaClientCaching:
+    """Test the opt-in cache around OllamaClient.generate."""
+    
+    @pytest.fixture
+    def client(self):
+        """Client whose upstream call is mocked."""
+        client = OllamaClient(response_cache=ResponseCache())
+        client._generate = AsyncMock(return_value={
+            'content': '{"is_command": true}',
+            'model': 'mistral:7b',
+            'tokens_used': 12
+        })
+        return client
+    
+    async def test_repeated_call_served_from_cache(self, client):
+        """The second identical opt-in call skips the upstream round trip."""
+        first = await client.generate(messages=MESSAGES, temperature=0.1, max_tokens=100, cache=True)
+        second = await client.generate(messages=MESSAGES, temperature=0.1, max_tokens=100, cache=True)
+        
+        assert client._generate.await_count == 1
+        assert second['content'] == first['content']
+        assert second['cached'] is True
+        assert second['tokens_used'] == 0
+    
+    async def test_cache_is_opt_in(self, client):
+        """Calls without cache=True always go upstream."""
+        await client.generate(messages=MESSAGES, temperature=0.1, max_tokens=100)
+        await client.generate(messages=MESSAGES, temperature=0.1, max_tokens=100)
+        
+        assert client._generate.await_count == 2
+    
+    async def test_high_temperature_not_cached(self, client):
+        """Creative calls are never cached even when opted in."""
+        await client.generate(messages=MESSAGES, temperature=0.7, cache=True)
+        await client.generate(messages=MESSAGES, temperature=0.7, cache=True)
+        
+        assert client._generate.await_count == 2
@@ -0,0 +1,193 @@
+"""
+Unit tests for the LLM request scheduler.
+"""
+import asyncio
+import threading
+import time
+import pytest
+from core.bruno_integration.llm_scheduler import LLMScheduler, Priority
+
+
+async def _run(scheduler, order, name, priority=Priority.INTERACTIVE, user_id=None, hold=0.01):
+    """Take a slot, record the order it was granted in, and hold it briefly."""
+    async with scheduler.slot(priority, user_id):
+        order.append(name)
+        await asyncio.sleep(hold)
+
+
+@pytest.mark.asyncio
+class TestLLMScheduler:
+    """Test concurrency limits, priorities and fairness."""
+
+    async def test_concurrency_is_capped(self):
+        """No more than max_concurrency requests hold a slot at once."""
+        scheduler = LLMScheduler(max_concurrency=2)
+        running = 0
+        peak = 0
+
+        async def request():
+            nonlocal running, peak
+            async with scheduler.slot():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.02)
+                running -= 1
+
+        await asyncio.gather(*(request() for _ in range(6)))
+
+        assert peak == 2
+        assert scheduler.stats()['active'] == 0
+
+    async def test_interactive_beats_queued_background(self):
+        """Queued interactive requests are served before queued background ones."""
+        scheduler = LLMScheduler(max_concurrency=1)
+        order = []
+
+        blocker = asyncio.create_task(_run(scheduler, order, 'blocker', hold=0.05))
+        await asyncio.sleep(0)
+        background = [
+            asyncio.create_task(_run(scheduler, order, f'bg{i}', Priority.BACKGROUND))
+            for i in range(2)
+        ]
+        await asyncio.sleep(0)
+        classifier = asyncio.create_task(_run(scheduler, order, 'cls', Priority.CLASSIFIER))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(_run(scheduler, order, 'chat', Priority.INTERACTIVE))
+
+        await asyncio.gather(blocker, classifier, interactive, *background)
+
+        assert order == ['blocker', 'chat', 'cls', 'bg0', 'bg1']
+
+    async def test_heavy_user_does_not_starve_others(self):
+        """Within a class, users take turns instead of first-come-first-served."""
+        scheduler = LLMScheduler(max_concurrency=1)
+        order = []
+
+        blocker = asyncio.create_task(_run(scheduler, order, 'blocker', user_id='x'))
+        await asyncio.sleep(0)
+        heavy = [asyncio.create_task(_run(scheduler, order, 'heavy', user_id='heavy')) for _ in range(4)]
+        await asyncio.sleep(0)
+        light = [asyncio.create_task(_run(scheduler, order, 'light', user_id='light')) for _ in range(2)]
+
+        await asyncio.gather(blocker, *heavy, *light)
+
+        assert order[1:5] == ['heavy', 'light', 'heavy', 'light']
+
+    async def test_user_weights_give_larger_share(self):
+        """A user with weight 2 is served twice as often as a user with weight 1."""
+        scheduler = LLMScheduler(max_concurrency=1, user_weights={'gold': 2.0})
+        order = []
+
+        blocker = asyncio.create_task(_run(scheduler, order, 'blocker', user_id='x'))
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(_run(scheduler, order, 'gold', user_id='gold')) for _ in range(4)]
+        tasks += [asyncio.create_task(_run(scheduler, order, 'basic', user_id='basic')) for _ in range(2)]
+
+        await asyncio.gather(blocker, *tasks)
+
+        assert order[1:4].count('gold') == 2
+        assert order[1:7].count('gold') == 4
+
+    async def test_cancelled_waiter_does_not_leak_a_slot(self):
+        """A request cancelled while queued is skipped and the slot stays usable."""
+        scheduler = LLMScheduler(max_concurrency=1)
+        order = []
+
+        blocker = asyncio.create_task(_run(scheduler, order, 'blocker', hold=0.02))
+        await asyncio.sleep(0)
+        doomed = asyncio.create_task(_run(scheduler, order, 'doomed'))
+        survivor = asyncio.create_task(_run(scheduler, order, 'survivor'))
+        await asyncio.sleep(0)
+        doomed.cancel()
+
+        await asyncio.gather(blocker, survivor)
+
+        assert order == ['blocker', 'survivor']
+        stats = scheduler.stats()
+        assert stats['active'] == 0
+        assert stats['classes']['interactive']['queued'] == 0
+
+    async def test_error_releases_slot(self):
+        """An exception inside the slot still frees it."""
+        scheduler = LLMScheduler(max_concurrency=1)
+
+        with pytest.raises(RuntimeError):
+            async with scheduler.slot():
+                raise RuntimeError('ollama down')
+
+        assert scheduler.stats()['active'] == 0
+
+    async def test_stats_report_queue_depth_and_wait(self):
+        """Stats expose queued requests and wait times per class."""
+        scheduler = LLMScheduler(max_concurrency=1)
+        order = []
+
+        blocker = asyncio.create_task(_run(scheduler, order, 'blocker', hold=0.03))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(_run(scheduler, order, 'bg', Priority.BACKGROUND))
+        await asyncio.sleep(0.01)
+
+        assert scheduler.queue_depth(Priority.BACKGROUND) == 1
+        assert scheduler.stats()['classes']['background']['queued'] == 1
+
+        await asyncio.gather(blocker, waiter)
+
+        background = scheduler.stats()['classes']['background']
+        assert background['dispatched'] == 1
+        assert background['wait_max_ms'] > 0
+
+    async def test_limit_is_shared_across_event_loops(self):
+        """Callers on another loop (as with async_to_sync) share the same slots."""
+        scheduler = LLMScheduler(max_concurrency=1)
+        order = []
+
+        blocker = asyncio.create_task(_run(scheduler, order, 'blocker', hold=0.05))
+        await asyncio.sleep(0)
+
+        thread = threading.Thread(target=lambda: asyncio.run(_run(scheduler, order, 'other-loop')))
+        thread.start()
+        await blocker
+        await asyncio.get_running_loop().run_in_executor(None, thread.join)
+
+        assert order == ['blocker', 'other-loop']
+        assert scheduler.stats()['active'] == 0
+
+
+class TestThreadedWorkers:
+    """Test queueing between the request threads of one threaded worker."""
+
+    def test_request_threads_queue_by_priority(self):
+        """Sync requests bridged onto the process loop are ordered by the scheduler."""
+        from core.bruno_integration.event_loop import LoopThread
+
+        loop_thread = LoopThread(name='test-loop')
+        scheduler = LLMScheduler(max_concurrency=1)
+        order = []
+        started = threading.Event()
+
+        async def blocker():
+            async with scheduler.slot():
+                started.set()
+                order.append('blocker')
+                while scheduler.queue_depth() < 2:
+                    await asyncio.sleep(0.01)
+
+        def request(name, priority):
+            loop_thread.async_to_sync(_run)(scheduler, order, name, priority)
+
+        threads = [threading.Thread(target=loop_thread.async_to_sync(blocker))]
+        threads[0].start()
+        started.wait()
+        threads.append(threading.Thread(target=request, args=('bg', Priority.BACKGROUND)))
+        threads[1].start()
+        while scheduler.queue_depth() < 1:
+            time.sleep(0.001)
+        threads.append(threading.Thread(target=request, args=('chat', Priority.INTERACTIVE)))
+        threads[2].start()
+        try:
+            for thread in threads:
+                thread.join(5)
+        finally:
+            loop_thread.stop()
+
+        assert order == ['blocker', 'chat', 'bg']
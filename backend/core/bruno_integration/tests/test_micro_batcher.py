@@ -0,0 +1,139 @@
+"""
+Unit tests for micro-batching of small LLM requests.
+"""
+import asyncio
+import pytest
+from core.bruno_integration.micro_batcher import BatchFailed, MicroBatcher
+
+
+class Recorder:
+    """run_batch stand-in recording the batches it was asked to run."""
+
+    def __init__(self, delay=0.02, fail=False):
+        self.batches = []
+        self.delay = delay
+        self.fail = fail
+
+    async def __call__(self, items):
+        self.batches.append(list(items))
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError('ollama down')
+        return [f"result:{item}" for item in items]
+
+
+@pytest.mark.asyncio
+class TestMicroBatcher:
+    """Test batching under load and pass-through when idle."""
+
+    async def test_idle_request_runs_immediately(self):
+        """With nothing running, a request goes out alone without waiting."""
+        batcher = MicroBatcher(window=10)
+        run = Recorder(delay=0)
+
+        result = await asyncio.wait_for(batcher.submit('k', 'a', run), timeout=1)
+
+        assert result == 'result:a'
+        assert run.batches == [['a']]
+
+    async def test_requests_during_a_call_are_batched(self):
+        """Requests arriving while a call runs are packed into the next one."""
+        batcher = MicroBatcher(window=0.05)
+        run = Recorder()
+
+        first = asyncio.ensure_future(batcher.submit('k', 'a', run))
+        await asyncio.sleep(0)
+        rest = [asyncio.ensure_future(batcher.submit('k', item, run)) for item in 'bcd']
+
+        results = await asyncio.gather(first, *rest)
+
+        assert results == ['result:a', 'result:b', 'result:c', 'result:d']
+        assert run.batches == [['a'], ['b', 'c', 'd']]
+        assert batcher.stats()['batches'] == 2
+
+    async def test_full_batch_is_sent_before_window(self):
+        """A batch reaching max_batch goes out without waiting for the window."""
+        batcher = MicroBatcher(window=10, max_batch=2)
+        run = Recorder()
+
+        first = asyncio.ensure_future(batcher.submit('k', 'a', run))
+        await asyncio.sleep(0)
+        rest = [asyncio.ensure_future(batcher.submit('k', item, run)) for item in 'bc']
+
+        results = await asyncio.wait_for(asyncio.gather(first, *rest), timeout=1)
+
+        assert results == ['result:a', 'result:b', 'result:c']
+        assert run.batches == [['a'], ['b', 'c']]
+
+    async def test_keys_are_batched_separately(self):
+        """Requests for different keys (e.g. models) never share a batch."""
+        batcher = MicroBatcher(window=0.05)
+        run = Recorder()
+
+        first = asyncio.ensure_future(batcher.submit('k', 'a', run))
+        await asyncio.sleep(0)
+        other = asyncio.ensure_future(batcher.submit('other', 'b', run))
+        same = asyncio.ensure_future(batcher.submit('k', 'c', run))
+
+        await asyncio.gather(first, other, same)
+
+        assert ['b'] in run.batches
+        assert ['c'] in run.batches
+
+    async def test_failed_batch_tells_members_to_retry(self):
+        """When a shared call fails, every member gets BatchFailed."""
+        batcher = MicroBatcher(window=0.05)
+        ok = Recorder()
+        failing = Recorder(fail=True)
+
+        first = asyncio.ensure_future(batcher.submit('k', 'a', ok))
+        await asyncio.sleep(0)
+        rest = [asyncio.ensure_future(batcher.submit('k', item, failing)) for item in 'bc']
+
+        results = await asyncio.gather(first, *rest, return_exceptions=True)
+
+        assert results[0] == 'result:a'
+        assert all(isinstance(r, BatchFailed) for r in results[1:])
+        assert batcher.stats()['failures'] == 1
+
+    async def test_wrong_result_count_fails_batch(self):
+        """A batch answered with the wrong number of results fails."""
+        batcher = MicroBatcher(window=0.05)
+        run = Recorder()
+
+        async def short(items):
+            return ['only one']
+
+        first = asyncio.ensure_future(batcher.submit('k', 'a', run))
+        await asyncio.sleep(0)
+        rest = [asyncio.ensure_future(batcher.submit('k', item, short)) for item in 'bc']
+
+        results = await asyncio.gather(first, *rest, return_exceptions=True)
+
+        assert all(isinstance(r, BatchFailed) for r in results[1:])
+
+    async def test_cancelled_owner_releases_members(self):
+        """Members of a batch whose owner is cancelled are told to retry."""
+        batcher = MicroBatcher(window=0.05)
+        run = Recorder(delay=0.1)
+
+        first = asyncio.ensure_future(batcher.submit('k', 'a', run))
+        await asyncio.sleep(0)
+        owner = asyncio.ensure_future(batcher.submit('k', 'b', run))
+        await asyncio.sleep(0)
+        member = asyncio.ensure_future(batcher.submit('k', 'c', run))
+        await asyncio.sleep(0)
+        owner.cancel()
+
+        with pytest.raises(BatchFailed):
+            await asyncio.wait_for(member, timeout=1)
+        await first
+
+    async def test_disabled_batcher_never_batches(self):
+        """When disabled every request runs alone."""
+        batcher = MicroBatcher(enabled=False)
+        run = Recorder()
+
+        await asyncio.gather(*(batcher.submit('k', item, run) for item in 'abc'))
+
+        assert run.batches == [['a'], ['b'], ['c']]
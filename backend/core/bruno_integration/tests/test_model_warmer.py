@@ -0,0 +1,144 @@
+"""
+Unit tests for warming models and keeping them resident.
+"""
+import pytest
+import pytest_asyncio
+from core.bruno_integration.bruno_llm import OllamaClient
+from core.bruno_integration.fake_ollama import FakeOllama
+from core.bruno_integration.http_sessions import SessionManager
+from core.bruno_integration.model_warmer import ModelWarmer, parse_keep_alive
+from core.bruno_integration.ollama_pool import OllamaPool
+
+
+@pytest_asyncio.fixture
+async def fakes(serve):
+    """Two fake Ollama hosts, as (fake, URL) pairs."""
+    hosts = []
+    for _ in range(2):
+        fake = FakeOllama()
+        hosts.append((fake, await serve(fake.make_app())))
+    return hosts
+
+
+def _pool(fakes, sessions):
+    return OllamaPool([url for _, url in fakes], session_manager=sessions)
+
+
+class TestParseKeepAlive:
+    """Test keep_alive duration parsing."""
+
+    def test_durations(self):
+        assert parse_keep_alive("30m") == 1800
+        assert parse_keep_alive("1h30m") == 5400
+        assert parse_keep_alive("45s") == 45
+        assert parse_keep_alive("300") == 300
+        assert parse_keep_alive(120) == 120
+
+    def test_forever(self):
+        assert parse_keep_alive("-1") is None
+        assert parse_keep_alive(-1) is None
+        assert parse_keep_alive("-1m") is None
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            parse_keep_alive("soon")
+
+    def test_refresh_interval_defaults_to_half_keep_alive(self):
+        assert ModelWarmer(pool=OllamaPool(['http://x']), keep_alive="30m").refresh_interval == 900
+        assert ModelWarmer(pool=OllamaPool(['http://x']), keep_alive=-1).refresh_interval == 600
+
+
+@pytest.mark.asyncio
+class TestModelWarmer:
+    """Test preloading and refreshing models on every host."""
+
+    async def test_loads_missing_models_on_every_host(self, fakes):
+        """Models not resident anywhere are loaded on each healthy host."""
+        sessions = SessionManager()
+        warmer = ModelWarmer(pool=_pool(fakes, sessions), keep_alive="30m", refresh_interval=60)
+
+        results = await warmer.refresh(['mistral:7b', 'llama3:8b'])
+
+        assert all(states == {'mistral:7b': 'loaded', 'llama3:8b': 'loaded'} for states in results.values())
+        resident = await warmer.resident()
+        assert all(sorted(m['name'] for m in models) == ['llama3:8b', 'mistral:7b'] for models in resident.values())
+        assert warmer.stats()['loads'] == 4
+        await sessions.close()
+
+    async def test_resident_models_are_not_reloaded(self, fakes):
+        """A model that stays loaded past the next refresh is left alone."""
+        sessions = SessionManager()
+        warmer = ModelWarmer(pool=_pool(fakes, sessions), keep_alive="30m", refresh_interval=60)
+        await warmer.refresh(['mistral:7b'])
+
+        results = await warmer.refresh(['mistral:7b'])
+
+        assert all(states == {'mistral:7b': 'resident'} for states in results.values())
+        assert warmer.stats()['loads'] == 2
+        await sessions.close()
+
+    async def test_models_expiring_before_next_refresh_are_reloaded(self, fakes):
+        """keep_alive is renewed for models that would unload before the next cycle."""
+        sessions = SessionManager()
+        warmer = ModelWarmer(pool=_pool(fakes, sessions), keep_alive="2m", refresh_interval=600)
+        await warmer.refresh(['mistral:7b'])
+
+        results = await warmer.refresh(['mistral:7b'])
+
+        assert all(states == {'mistral:7b': 'loaded'} for states in results.values())
+        await sessions.close()
+
+    async def test_unhealthy_hosts_are_skipped(self, fakes):
+        """Hosts marked down are not warmed."""
+        sessions = SessionManager()
+        pool = _pool(fakes, sessions)
+        pool.mark_down(pool.backends[1], ConnectionError('down'))
+        warmer = ModelWarmer(pool=pool, keep_alive="30m")
+
+        results = await warmer.refresh(['mistral:7b'])
+
+        assert list(results) == [pool.backends[0].url]
+        await sessions.close()
+
+    async def test_failed_load_is_reported(self, fakes):
+        """A host that fails to load a model reports the failure instead of raising."""
+        sessions = SessionManager()
+        fakes[0][0].error_rate = 1.0
+        warmer = ModelWarmer(pool=_pool(fakes, sessions), keep_alive="30m")
+
+        results = await warmer.refresh(['mistral:7b'])
+
+        states = list(results.values())
+        assert states[0]['mistral:7b'].startswith('failed')
+        assert states[1]['mistral:7b'] == 'loaded'
+        assert warmer.stats()['load_failures'] == 1
+        await sessions.close()
+
+    async def test_warm_model_skips_load_latency(self, fakes):
+        """After warming, the first real call does not pay the model load."""
+        sessions = SessionManager()
+        fake, _ = fakes[0]
+        fake.load_latency = 0.2
+        pool = _pool(fakes[:1], sessions)
+        warmer = ModelWarmer(pool=pool, keep_alive="30m")
+        await warmer.refresh(['mistral:7b'])
+
+        client = OllamaClient(api_mode='chat', session_manager=sessions, pool=pool)
+        result = await client.generate([{"role": "user", "content": "hi"}])
+
+        assert result['timings']['load_ms'] < 100
+        await sessions.close()
+
+
+@pytest.mark.django_db
+class TestWantedModels:
+    """Test which models are kept warm."""
+
+    def test_active_ollama_agents_and_extra_models(self, test_agent, test_user):
+        from apps.agents.models import Agent
+        Agent.objects.create(user=test_user, name='Other', model='llama3:8b')
+        Agent.objects.create(user=test_user, name='Retired', model='phi3', is_active=False)
+        Agent.objects.create(user=test_user, name='Cloud', model='gpt-4', llm_provider='openai')
+        warmer = ModelWarmer(pool=OllamaPool(['http://x']), extra_models=['qwen2:0.5b'])
+
+        assert warmer.wanted_models() == sorted({test_agent.model, 'llama3:8b', 'qwen2:0.5b'})
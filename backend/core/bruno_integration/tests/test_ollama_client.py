@@ -0,0 +1,285 @@
+"""
+Unit tests for OllamaClient against a local stand-in server.
+"""
+import json
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from core.bruno_integration.bruno_llm import OllamaClient
+from core.bruno_integration.context_store import ConversationContextStore
+from core.bruno_integration.http_sessions import SessionManager
+
+
+TOKENS = ["Hel", "lo", " there", "!"]
+REQUESTS_KEY = web.AppKey('requests', list)
+
+
+async def _generate(request):
+    """Minimal /api/generate implementation."""
+    body = await request.json()
+    request.app[REQUESTS_KEY].append(body)
+    
+    if not body.get('stream'):
+        return web.json_response({
+            'response': ''.join(TOKENS),
+            'done': True,
+            'eval_count': len(TOKENS),
+            'context': body.get('context', []) + [len(request.app[REQUESTS_KEY])]
+        })
+    
+    response = web.StreamResponse()
+    response.content_type = 'application/x-ndjson'
+    await response.prepare(request)
+    for token in TOKENS:
+        await response.write(json.dumps({'response': token, 'done': False}).encode() + b'\n')
+    await response.write(json.dumps({'response': '', 'done': True, 'eval_count': len(TOKENS)}).encode() + b'\n')
+    await response.write_eof()
+    return response
+
+
+async def _chat(request):
+    """Minimal /api/chat implementation calling a tool when offered one and no result came back yet."""
+    body = await request.json()
+    request.app[REQUESTS_KEY].append(body)
+    calls_tool = body.get('tools') and body['messages'][-1]['role'] != 'tool'
+    if calls_tool:
+        chunks = [{'role': 'assistant', 'content': '', 'tool_calls': [
+            {'function': {'name': 'calculate', 'arguments': {'expression': '6*7'}}}
+        ]}]
+    else:
+        chunks = [{'role': 'assistant', 'content': token} for token in TOKENS]
+    eval_count = 9 if calls_tool else len(TOKENS)
+    
+    if not body.get('stream'):
+        message = dict(chunks[0], content=''.join(c['content'] for c in chunks))
+        return web.json_response({'message': message, 'done': True, 'eval_count': eval_count})
+    
+    response = web.StreamResponse()
+    response.content_type = 'application/x-ndjson'
+    await response.prepare(request)
+    for message in chunks:
+        await response.write(json.dumps({'message': message, 'done': False}).encode() + b'\n')
+    final = {'message': {'role': 'assistant', 'content': ''}, 'done': True, 'eval_count': eval_count}
+    await response.write(json.dumps(final).encode() + b'\n')
+    await response.write_eof()
+    return response
+
+
+@pytest_asyncio.fixture
+async def ollama_server():
+    """Start a stand-in Ollama server."""
+    app = web.Application()
+    app[REQUESTS_KEY] = []
+    app.router.add_post('/api/generate', _generate)
+    app.router.add_post('/api/chat', _chat)
+    server = TestServer(app)
+    await server.start_server()
+    yield server
+    await server.close()
+
+
+@pytest_asyncio.fixture
+async def client(ollama_server):
+    """OllamaClient pointed at the stand-in server with its own session pool."""
+    client = OllamaClient(
+        base_url=str(ollama_server.make_url('')),
+        session_manager=SessionManager()
+    )
+    yield client
+    await client.close()
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+@pytest.mark.asyncio
+class TestOllamaClientGenerate:
+    """Test non-streaming and streaming generation."""
+    
+    async def test_generate_non_streaming(self, client, ollama_server):
+        """Non-streaming call returns the full response and token count."""
+        result = await client.generate(messages=MESSAGES)
+        
+        assert result['content'] == 'Hello there!'
+        assert result['tokens_used'] == 4
+        assert ollama_server.app[REQUESTS_KEY][0]['stream'] is False
+    
+    async def test_generate_stream_yields_deltas(self, client):
+        """generate_stream yields each NDJSON delta and a final done chunk."""
+        chunks = [chunk async for chunk in client.generate_stream(messages=MESSAGES)]
+        
+        assert [c['content'] for c in chunks[:-1]] == TOKENS
+        assert chunks[-1]['done'] is True
+        assert chunks[-1]['tokens_used'] == 4
+    
+    async def test_on_delta_receives_tokens(self, client, ollama_server):
+        """on_delta is awaited per delta and the result is still concatenated."""
+        received = []
+        
+        async def on_delta(text):
+            received.append(text)
+        
+        result = await client.generate(messages=MESSAGES, on_delta=on_delta)
+        
+        assert received == TOKENS
+        assert result['content'] == 'Hello there!'
+        assert result['tokens_used'] == 4
+        assert ollama_server.app[REQUESTS_KEY][0]['stream'] is True
+    
+    async def test_session_is_reused_between_calls(self, client):
+        """Consecutive calls share the pooled session."""
+        await client.generate(messages=MESSAGES)
+        first = client.session_manager.get_session()
+        await client.generate(messages=MESSAGES)
+        
+        assert client.session_manager.get_session() is first
+
+
+@pytest.mark.asyncio
+class TestOllamaClientChatMode:
+    """Test /api/chat usage and KV context reuse."""
+    
+    async def test_chat_mode_sends_native_roles(self, ollama_server):
+        """Chat mode posts role-tagged messages and keep_alive to /api/chat."""
+        client = OllamaClient(
+            base_url=str(ollama_server.make_url('')),
+            session_manager=SessionManager(),
+            api_mode='chat',
+            keep_alive='30m'
+        )
+        messages = [
+            {"role": "system", "content": "be nice"},
+            {"role": "user", "content": "hi"},
+        ]
+        
+        result = await client.generate(messages=messages)
+        await client.close()
+        
+        body = ollama_server.app[REQUESTS_KEY][0]
+        assert result['content'] == 'Hello there!'
+        assert body['messages'] == messages
+        assert body['keep_alive'] == '30m'
+        assert 'prompt' not in body
+    
+    async def test_invalid_api_mode_rejected(self):
+        """Unknown API modes raise immediately."""
+        with pytest.raises(ValueError):
+            OllamaClient(api_mode='completions')
+    
+    async def test_context_reused_on_next_turn(self, ollama_server):
+        """The second turn sends the stored context and only the new user message, formatted like the first."""
+        client = OllamaClient(
+            base_url=str(ollama_server.make_url('')),
+            session_manager=SessionManager(),
+            api_mode='chat',
+            context_store=ConversationContextStore()
+        )
+        system = {"role": "system", "content": "be nice"}
+        first_turn = [system, {"role": "user", "content": "hi"}]
+        
+        first = await client.generate(messages=first_turn, conversation_id='conv-1')
+        second_turn = [
+            system,
+            {"role": "user", "content": "hi"},
+            {"role": "assistant", "content": first['content']},
+            {"role": "user", "content": "how are you?"},
+        ]
+        await client.generate(messages=second_turn, conversation_id='conv-1')
+        await client.close()
+        
+        full, incremental = ollama_server.app[REQUESTS_KEY]
+        assert full['system'] == 'be nice'
+        assert 'context' not in full
+        assert incremental['context'] == [1]
+        assert full['prompt'] == 'User: hi\n\nAssistant:'
+        assert incremental['prompt'] == 'User: how are you?\n\nAssistant:'
+        assert 'system' not in incremental
+    
+    async def test_context_reused_with_recall_and_summary(self, ollama_server):
+        """Changing recall does not force a full prompt; it is sent with the new message."""
+        client = OllamaClient(
+            base_url=str(ollama_server.make_url('')),
+            session_manager=SessionManager(),
+            context_store=ConversationContextStore()
+        )
+        system = {"role": "system", "content": "be nice"}
+        summary = {"role": "system", "content": "Summary: greetings so far."}
+        
+        first = await client.generate(messages=[
+            system, summary,
+            {"role": "system", "content": "Recalled: user likes tea."},
+            {"role": "user", "content": "hi"},
+        ], conversation_id='conv-1')
+        await client.generate(messages=[
+            system, summary,
+            {"role": "user", "content": "hi"},
+            {"role": "assistant", "content": first['content']},
+            {"role": "system", "content": "Recalled: user lives in Porto."},
+            {"role": "user", "content": "how are you?"},
+        ], conversation_id='conv-1')
+        await client.close()
+        
+        full, incremental = ollama_server.app[REQUESTS_KEY]
+        assert 'Recalled: user likes tea.' in full['system']
+        assert incremental['context'] == [1]
+        assert incremental['prompt'] == (
+            'System: Recalled: user lives in Porto.\n\nUser: how are you?\n\nAssistant:'
+        )
+        assert 'system' not in incremental
+    
+    async def test_tool_calls_go_to_chat_endpoint(self, ollama_server):
+        """Tool-enabled calls use /api/chat even in generate mode and return the requested calls."""
+        client = OllamaClient(
+            base_url=str(ollama_server.make_url('')),
+            session_manager=SessionManager(),
+            context_store=ConversationContextStore()
+        )
+        tools = [{"type": "function", "function": {"name": "calculate", "parameters": {}}}]
+        
+        result = await client.generate(messages=MESSAGES, conversation_id='conv-1', tools=tools)
+        follow_up = [
+            *MESSAGES,
+            {"role": "assistant", "content": "", "tool_calls": result['tool_calls']},
+            {"role": "tool", "content": "42", "tool_call_id": "call_0", "name": "calculate"},
+        ]
+        answer = await client.generate(messages=follow_up, conversation_id='conv-1')
+        await client.close()
+        
+        first, second = ollama_server.app[REQUESTS_KEY]
+        assert result['tool_calls'] == [{"id": "call_0", "name": "calculate", "arguments": {"expression": "6*7"}}]
+        assert first['tools'] == tools
+        assert second['messages'][1]['tool_calls'] == [
+            {"function": {"name": "calculate", "arguments": {"expression": "6*7"}}}
+        ]
+        assert second['messages'][2] == {"role": "tool", "content": "42", "tool_name": "calculate"}
+        assert answer['content'] == 'Hello there!'
+    
+    async def test_tool_steps_are_streamed(self, ollama_server):
+        """Offering tools keeps the call streamed; tool calls arrive with the final chunk."""
+        client = OllamaClient(
+            base_url=str(ollama_server.make_url('')),
+            session_manager=SessionManager(),
+            context_store=ConversationContextStore()
+        )
+        tools = [{"type": "function", "function": {"name": "calculate", "parameters": {}}}]
+        deltas = []
+        
+        async def on_delta(text):
+            deltas.append(text)
+        
+        step = await client.generate(messages=MESSAGES, conversation_id='conv-1', tools=tools, on_delta=on_delta)
+        follow_up = [
+            *MESSAGES,
+            {"role": "assistant", "content": "", "tool_calls": step['tool_calls']},
+            {"role": "tool", "content": "42", "tool_call_id": "call_0", "name": "calculate"},
+        ]
+        answer = await client.generate(messages=follow_up, conversation_id='conv-1', tools=tools, on_delta=on_delta)
+        await client.close()
+        
+        assert step['tool_calls'] == [{"id": "call_0", "name": "calculate", "arguments": {"expression": "6*7"}}]
+        assert step['tokens_used'] == 9
+        assert deltas == TOKENS
+        assert answer['content'] == 'Hello there!'
+        assert 'tool_calls' not in answer
+        assert all(body['stream'] and body['tools'] == tools for body in ollama_server.app[REQUESTS_KEY])
@@ -0,0 +1,377 @@
+"""
+Unit tests for routing OllamaClient calls across several stand-in Ollama hosts.
+"""
+import asyncio
+import socket
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from core.bruno_integration.bruno_llm import OllamaClient
+from core.bruno_integration.deadlines import Deadline, DeadlineExceeded
+from core.bruno_integration.hedging import HedgePolicy
+from core.bruno_integration.http_sessions import SessionManager
+from core.bruno_integration.llm_scheduler import LLMScheduler
+from core.bruno_integration.ollama_pool import OllamaPool
+
+
+NAME_KEY = web.AppKey('name', str)
+HITS_KEY = web.AppKey('hits', list)
+DELAY_KEY = web.AppKey('delay', list)
+
+
+async def _chat(request):
+    """Reply with the name of the host that served the call."""
+    request.app[HITS_KEY].append(await request.json())
+    await asyncio.sleep(request.app[DELAY_KEY][0])
+    return web.json_response({
+        'message': {'role': 'assistant', 'content': request.app[NAME_KEY]},
+        'done': True,
+        'eval_count': 1
+    })
+
+
+async def _tags(request):
+    return web.json_response({'models': []})
+
+
+def _free_url():
+    """URL of a local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+@pytest_asyncio.fixture
+async def hosts():
+    """Start three stand-in Ollama hosts."""
+    servers = []
+    for name in ('a', 'b', 'c'):
+        app = web.Application()
+        app[NAME_KEY] = name
+        app[HITS_KEY] = []
+        app[DELAY_KEY] = [0.0]
+        app.router.add_post('/api/chat', _chat)
+        app.router.add_get('/api/tags', _tags)
+        server = TestServer(app)
+        await server.start_server()
+        servers.append(server)
+    yield servers
+    for server in servers:
+        await server.close()
+
+
+@pytest.fixture
+def idle_ties_pick_first(monkeypatch):
+    """Make the choice among equally loaded hosts deterministic (the first one)."""
+    monkeypatch.setattr('core.bruno_integration.ollama_pool.random.choice', lambda hosts: hosts[0])
+
+
+def _url(server):
+    return str(server.make_url('')).rstrip('/')
+
+
+def _client(pool, sessions, **kwargs):
+    return OllamaClient(api_mode='chat', session_manager=sessions, pool=pool, **kwargs)
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+@pytest.mark.asyncio
+class TestOllamaPoolRouting:
+    """Test least-loaded routing, sticky routing and failover."""
+
+    async def test_routes_to_least_outstanding_host(self, hosts):
+        """Concurrent calls spread across hosts instead of piling onto one."""
+        sessions = SessionManager()
+        pool = OllamaPool([_url(s) for s in hosts], sticky=False, session_manager=sessions)
+        client = _client(pool, sessions)
+        for server in hosts:
+            server.app[DELAY_KEY][0] = 0.05
+
+        results = await asyncio.gather(*(
+            client.generate(MESSAGES, temperature=0.7 + i / 100) for i in range(3)
+        ))
+
+        assert sorted(r['content'] for r in results) == ['a', 'b', 'c']
+        assert all(b['outstanding'] == 0 for b in pool.stats()['backends'])
+        await sessions.close()
+
+    async def test_sticky_routing_keeps_conversation_on_one_host(self, hosts):
+        """Calls for the same conversation go to the same host."""
+        sessions = SessionManager()
+        pool = OllamaPool([_url(s) for s in hosts], session_manager=sessions)
+        client = _client(pool, sessions)
+
+        first = await client.generate(MESSAGES, conversation_id='conv-1', temperature=0.71)
+        # Load another host so least-outstanding alone would pick differently
+        pool.choose()
+        later = [
+            await client.generate(MESSAGES, conversation_id='conv-1', temperature=0.72 + i / 100)
+            for i in range(3)
+        ]
+
+        assert {r['content'] for r in later} == {first['content']}
+        await sessions.close()
+
+    @pytest.mark.usefixtures('idle_ties_pick_first')
+    async def test_fails_over_when_host_is_down(self, hosts):
+        """A call to an unreachable host is retried on another and the host is marked down."""
+        sessions = SessionManager()
+        dead = _free_url()
+        pool = OllamaPool([dead, _url(hosts[0])], sticky=False, session_manager=sessions)
+        client = _client(pool, sessions)
+
+        result = await client.generate(MESSAGES)
+
+        assert result['content'] == 'a'
+        backends = {b['url']: b for b in pool.stats()['backends']}
+        assert backends[dead]['healthy'] is False
+        assert backends[dead]['failures'] == 1
+
+        # Later calls skip the dead host entirely
+        await client.generate(MESSAGES, temperature=0.8)
+        assert pool.stats()['backends'][0]['failures'] == 1
+        await sessions.close()
+
+    async def test_sticky_conversation_moves_off_dead_host(self, hosts):
+        """When a conversation's host dies, it is re-pinned to a live host."""
+        sessions = SessionManager()
+        pool = OllamaPool([_url(s) for s in hosts[:2]], session_manager=sessions)
+        client = _client(pool, sessions)
+
+        first = await client.generate(MESSAGES, conversation_id='conv-1')
+        pinned = hosts[0] if first['content'] == 'a' else hosts[1]
+        await pinned.close()
+
+        second = await client.generate(MESSAGES, conversation_id='conv-1', temperature=0.8)
+        third = await client.generate(MESSAGES, conversation_id='conv-1', temperature=0.9)
+
+        assert second['content'] != first['content']
+        assert third['content'] == second['content']
+        await sessions.close()
+
+    async def test_raises_when_every_host_is_down(self):
+        """With no reachable host the connection error reaches the caller."""
+        sessions = SessionManager()
+        pool = OllamaPool([_free_url(), _free_url()], session_manager=sessions)
+        client = _client(pool, sessions)
+
+        with pytest.raises(Exception):
+            await client.generate(MESSAGES)
+
+        assert all(not b['healthy'] for b in pool.stats()['backends'])
+        assert all(b['outstanding'] == 0 for b in pool.stats()['backends'])
+        await sessions.close()
+
+    async def test_health_check_revives_host(self, hosts):
+        """A host marked down is put back into rotation once it answers probes."""
+        sessions = SessionManager()
+        pool = OllamaPool([_url(s) for s in hosts[:2]], session_manager=sessions)
+        backend = pool.backends[0]
+        pool.mark_down(backend, ConnectionError('boom'))
+
+        results = await pool.check_health()
+
+        assert results == {_url(hosts[0]): True, _url(hosts[1]): True}
+        assert backend.healthy is True
+        await sessions.close()
+
+    async def test_periodic_health_check_runs_from_calls(self, hosts):
+        """Calls trigger a probe once the interval has passed."""
+        sessions = SessionManager()
+        dead = _free_url()
+        pool = OllamaPool([_url(hosts[0]), dead], health_check_interval=0.01, session_manager=sessions)
+        client = _client(pool, sessions)
+        await asyncio.sleep(0.02)
+
+        await client.generate(MESSAGES)
+        # The probe runs in the background rather than delaying the call
+        await pool._health_check
+
+        backends = {b['url']: b for b in pool.stats()['backends']}
+        assert backends[dead]['healthy'] is False
+        await sessions.close()
+
+    async def test_fails_over_on_server_error(self, hosts, serve):
+        """A host answering 5xx is marked down and the call retried elsewhere."""
+        sessions = SessionManager()
+        broken = web.Application()
+        async def out_of_memory(request):
+            return web.Response(status=500, text='out of memory')
+
+        broken.router.add_post('/api/chat', out_of_memory)
+        pool = OllamaPool([await serve(broken), _url(hosts[0])], sticky=False, session_manager=sessions)
+        pool.backends[1].outstanding = 1
+        client = _client(pool, sessions)
+
+        result = await client.generate(MESSAGES)
+
+        assert result['content'] == 'a'
+        assert pool.backends[0].healthy is False
+        await sessions.close()
+
+    async def test_new_conversations_spread_across_hosts(self, hosts):
+        """Sequential conversations do not all land on the first host, and every process agrees."""
+        sessions = SessionManager()
+        urls = [_url(s) for s in hosts]
+        pool = OllamaPool(urls, session_manager=sessions)
+        other_process = OllamaPool(urls, session_manager=sessions)
+
+        chosen = []
+        for i in range(100):
+            backend = pool.choose(f'conv-{i}')
+            pool.release(backend)
+            chosen.append(backend.url)
+            assert other_process.choose(f'conv-{i}').url == backend.url
+
+        assert all(chosen.count(url) > 15 for url in urls)
+
+    async def test_ties_are_broken_at_random(self, hosts):
+        """Calls without a conversation do not always go to the first idle host."""
+        pool = OllamaPool([_url(s) for s in hosts], sticky=False)
+
+        chosen = set()
+        for _ in range(50):
+            backend = pool.choose()
+            pool.release(backend)
+            chosen.add(backend.url)
+
+        assert len(chosen) == 3
+
+    async def test_empty_pool_is_rejected(self):
+        """A pool needs at least one host."""
+        with pytest.raises(ValueError):
+            OllamaPool(['', ' '])
+
+
+@pytest.mark.asyncio
+class TestDeadlines:
+    """Test per-call deadlines and timeouts."""
+
+    async def test_deadline_cancels_slow_call(self, hosts):
+        """A call still running when the deadline passes raises DeadlineExceeded."""
+        sessions = SessionManager()
+        pool = OllamaPool([_url(hosts[0])], session_manager=sessions)
+        client = _client(pool, sessions)
+        hosts[0].app[DELAY_KEY][0] = 1.0
+
+        with pytest.raises(DeadlineExceeded):
+            await client.generate(MESSAGES, deadline=Deadline.after(0.1))
+
+        assert pool.stats()['backends'][0]['outstanding'] == 0
+        await sessions.close()
+
+    async def test_expired_deadline_skips_call(self, hosts):
+        """No request is sent once the deadline has already passed."""
+        sessions = SessionManager()
+        pool = OllamaPool([_url(hosts[0])], session_manager=sessions)
+        client = _client(pool, sessions)
+
+        with pytest.raises(DeadlineExceeded):
+            await client.generate(MESSAGES, deadline=Deadline.after(0))
+
+        assert hosts[0].app[HITS_KEY] == []
+        await sessions.close()
+
+    async def test_request_timeout_applies_without_deadline(self, hosts):
+        """The client's request timeout bounds calls made without a deadline."""
+        sessions = SessionManager()
+        pool = OllamaPool([_url(hosts[0])], session_manager=sessions)
+        client = _client(pool, sessions, request_timeout=0.1)
+        hosts[0].app[DELAY_KEY][0] = 1.0
+
+        with pytest.raises(DeadlineExceeded):
+            await client.generate(MESSAGES)
+        await sessions.close()
+
+    async def test_deadline_remaining(self):
+        """Deadlines count down and cap timeouts."""
+        deadline = Deadline.after(10)
+
+        assert 9 < deadline.remaining() <= 10
+        assert deadline.timeout(cap=2) == 2
+        assert not deadline.expired
+        assert Deadline.after(-1).expired
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('idle_ties_pick_first')
+class TestHedging:
+    """Test hedged classifier calls."""
+
+    def _hedged_client(self, hosts, sessions, delay=0.05):
+        pool = OllamaPool([_url(s) for s in hosts[:2]], sticky=False, session_manager=sessions)
+        policy = HedgePolicy(enabled=True, default_delay=delay)
+        return _client(pool, sessions, hedge_policy=policy), policy
+
+    async def test_slow_primary_is_hedged_and_loses(self, hosts):
+        """A slow first host is raced by a second one, which wins."""
+        sessions = SessionManager()
+        client, policy = self._hedged_client(hosts, sessions)
+        hosts[0].app[DELAY_KEY][0] = 1.0
+
+        result = await client.generate(MESSAGES, hedge=True)
+
+        assert result['content'] == 'b'
+        assert len(hosts[0].app[HITS_KEY]) == 1
+        assert len(hosts[1].app[HITS_KEY]) == 1
+        stats = policy.stats()
+        assert stats['hedges_sent'] == 1
+        assert stats['hedges_won'] == 1
+        assert all(b['outstanding'] == 0 for b in client.pool.stats()['backends'])
+        await sessions.close()
+
+    async def test_fast_primary_is_not_hedged(self, hosts):
+        """Calls finishing within the hedge delay are not duplicated."""
+        sessions = SessionManager()
+        client, policy = self._hedged_client(hosts, sessions, delay=0.5)
+
+        result = await client.generate(MESSAGES, hedge=True)
+
+        assert result['content'] == 'a'
+        assert len(hosts[1].app[HITS_KEY]) == 0
+        assert policy.stats()['hedges_sent'] == 0
+        await sessions.close()
+
+    async def test_time_queued_for_a_slot_does_not_trigger_a_hedge(self, hosts):
+        """The hedge delay only starts once the primary has a slot and a host."""
+        sessions = SessionManager()
+        scheduler = LLMScheduler(max_concurrency=1)
+        pool = OllamaPool([_url(s) for s in hosts[:2]], sticky=False, session_manager=sessions)
+        policy = HedgePolicy(enabled=True, default_delay=0.05)
+        client = _client(pool, sessions, hedge_policy=policy, scheduler=scheduler)
+        await scheduler.acquire()
+        asyncio.get_running_loop().call_later(0.2, scheduler.release)
+
+        result = await client.generate(MESSAGES, hedge=True)
+
+        assert result['content'] == 'a'
+        assert len(hosts[1].app[HITS_KEY]) == 0
+        assert policy.stats()['hedges_sent'] == 0
+        await sessions.close()
+
+    async def test_hedging_disabled_by_policy(self, hosts):
+        """hedge=True has no effect unless the policy is enabled."""
+        sessions = SessionManager()
+        pool = OllamaPool([_url(s) for s in hosts[:2]], sticky=False, session_manager=sessions)
+        client = _client(pool, sessions, hedge_policy=HedgePolicy(enabled=False, default_delay=0.01))
+        hosts[0].app[DELAY_KEY][0] = 0.1
+
+        result = await client.generate(MESSAGES, hedge=True)
+
+        assert result['content'] == 'a'
+        assert len(hosts[1].app[HITS_KEY]) == 0
+        await sessions.close()
+
+    async def test_delay_follows_latency_percentile(self):
+        """Once enough samples exist, the hedge delay is the configured percentile."""
+        policy = HedgePolicy(enabled=True, percentile=0.95, min_samples=20, default_delay=9)
+
+        assert policy.delay('m') == 9
+        for i in range(100):
+            policy.record('m', i / 100)
+
+        assert policy.delay('m') == 0.95
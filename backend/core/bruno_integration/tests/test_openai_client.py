@@ -0,0 +1,175 @@
+"""
+Unit tests for the OpenAI-compatible chat completions client.
+"""
+import json
+import pytest
+from aiohttp import web
+from core.bruno_integration.bruno_llm import LLMFactory
+from core.bruno_integration.deadlines import Deadline, DeadlineExceeded
+from core.bruno_integration.fake_ollama import DEFAULT_REPLY, FakeOllama
+from core.bruno_integration.http_sessions import SessionManager
+from core.bruno_integration.llm_cache import ResponseCache
+from core.bruno_integration.llm_scheduler import LLMScheduler
+from core.bruno_integration.openai_client import OpenAICompatibleClient
+from core.bruno_integration.single_flight import SingleFlight
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def _client(url, sessions, **kwargs):
+    return OpenAICompatibleClient(
+        base_url=url,
+        api_key='test-key',
+        session_manager=sessions,
+        response_cache=kwargs.pop('response_cache', ResponseCache()),
+        single_flight=SingleFlight(enabled=False),
+        scheduler=LLMScheduler(max_concurrency=8),
+        **kwargs
+    )
+
+
+@pytest.mark.asyncio
+class TestOpenAICompatibleClient:
+    """Test the client against the fake server's /v1 endpoints."""
+
+    async def test_generates_reply(self, serve):
+        """A non-streamed completion returns the reply and token counts."""
+        sessions = SessionManager()
+        url = await serve(FakeOllama(prefill_latency=0, tokens_per_second=0).make_app(), '/v1')
+
+        result = await _client(url, sessions).generate(MESSAGES, model='mistral:7b')
+
+        assert result['content'] == DEFAULT_REPLY
+        assert result['tokens_used'] == len(DEFAULT_REPLY.split(' '))
+        assert result['timings']['prompt_tokens'] > 0
+        await sessions.close()
+
+    async def test_streams_deltas(self, serve):
+        """Server-sent events are relayed as deltas; usage arrives with the last event."""
+        sessions = SessionManager()
+        url = await serve(FakeOllama(prefill_latency=0.02, tokens_per_second=500).make_app(), '/v1')
+        deltas = []
+
+        async def on_delta(text):
+            deltas.append(text)
+
+        result = await _client(url, sessions).generate(MESSAGES, model='mistral:7b', on_delta=on_delta)
+
+        assert ''.join(deltas) == DEFAULT_REPLY == result['content']
+        assert len(deltas) > 1
+        assert result['timings']['completion_tokens'] == len(deltas)
+        assert result['timings']['ttft_ms'] >= 15
+        await sessions.close()
+
+    async def test_sends_api_key(self, serve):
+        """The API key is sent as a bearer token."""
+        seen = []
+
+        async def completions(request):
+            seen.append(request.headers.get('Authorization'))
+            return web.json_response({"choices": [{"message": {"content": "ok"}}], "usage": {}})
+
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', completions)
+        sessions = SessionManager()
+        url = await serve(app, '/v1')
+
+        result = await _client(url, sessions).generate(MESSAGES)
+
+        assert result['content'] == 'ok'
+        assert seen == ['Bearer test-key']
+        await sessions.close()
+
+    async def test_streamed_tool_call_fragments_are_joined(self, serve):
+        """Tool calls streamed in pieces come back whole with the final chunk."""
+        events = [
+            {"choices": [{"delta": {"tool_calls": [
+                {"index": 0, "id": "call_a", "function": {"name": "calculate", "arguments": ""}}
+            ]}}]},
+            {"choices": [{"delta": {"tool_calls": [{"index": 0, "function": {"arguments": '{"expression": '}}]}}]},
+            {"choices": [{"delta": {"tool_calls": [{"index": 0, "function": {"arguments": '"6*7"}'}}]}}]},
+            {"choices": [], "usage": {"completion_tokens": 7}},
+        ]
+        bodies = []
+
+        async def completions(request):
+            bodies.append(await request.json())
+            response = web.StreamResponse()
+            await response.prepare(request)
+            for event in events:
+                await response.write(b"data: " + json.dumps(event).encode() + b"\n\n")
+            await response.write(b"data: [DONE]\n\n")
+            return response
+
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', completions)
+        sessions = SessionManager()
+        url = await serve(app, '/v1')
+        tools = [{"type": "function", "function": {"name": "calculate", "parameters": {}}}]
+        deltas = []
+
+        async def on_delta(text):
+            deltas.append(text)
+
+        result = await _client(url, sessions).generate(MESSAGES, tools=tools, on_delta=on_delta)
+
+        assert result['tool_calls'] == [{"id": "call_a", "name": "calculate", "arguments": {"expression": "6*7"}}]
+        assert result['tokens_used'] == 7
+        assert deltas == []
+        assert bodies[0]['stream'] and bodies[0]['tools'] == tools
+        await sessions.close()
+
+    async def test_http_errors_raise(self, serve):
+        """Non-200 answers surface as errors."""
+        sessions = SessionManager()
+        url = await serve(FakeOllama(error_rate=1.0).make_app(), '/v1')
+
+        with pytest.raises(Exception, match='500'):
+            await _client(url, sessions).generate(MESSAGES)
+        await sessions.close()
+
+    async def test_cached_responses_skip_the_server(self, serve):
+        """Low-temperature calls are served from the response cache the second time."""
+        sessions = SessionManager()
+        fake = FakeOllama(prefill_latency=0, tokens_per_second=0)
+        url = await serve(fake.make_app(), '/v1')
+        client = _client(url, sessions)
+
+        await client.generate(MESSAGES, temperature=0.0, cache=True)
+        second = await client.generate(MESSAGES, temperature=0.0, cache=True)
+
+        assert second['cached']
+        assert fake.counters['requests'] == 1
+        await sessions.close()
+
+    async def test_deadline(self, serve):
+        """A slow server is abandoned when the deadline runs out."""
+        sessions = SessionManager()
+        url = await serve(FakeOllama(prefill_latency=1.0).make_app(), '/v1')
+
+        with pytest.raises(DeadlineExceeded):
+            await _client(url, sessions).generate(MESSAGES, deadline=Deadline.after(0.1))
+        await sessions.close()
+
+    async def test_lists_models(self, serve):
+        sessions = SessionManager()
+        url = await serve(FakeOllama(models=['llama3:8b', 'mistral:7b']).make_app(), '/v1')
+
+        assert await _client(url, sessions).list_models() == ['llama3:8b', 'mistral:7b']
+        await sessions.close()
+
+
+class TestLLMFactory:
+    """Test provider selection."""
+
+    @pytest.mark.parametrize('provider', ['openai', 'vllm', 'OpenAI'])
+    def test_openai_compatible_providers(self, provider):
+        client = LLMFactory.create_client(provider, openai_base_url='http://vllm:8000/v1/')
+
+        assert isinstance(client, OpenAICompatibleClient)
+        assert client.base_url == 'http://vllm:8000/v1'
+
+    def test_unknown_provider(self):
+        with pytest.raises(ValueError):
+            LLMFactory.create_client('anthropic')
@@ -0,0 +1,104 @@
+"""
+Unit tests for stable prompt assembly and the cached static prefix.
+"""
+from core.bruno_integration.context_budget import ContextBuilder
+from core.bruno_integration.prompt_engine import PromptEngine, TASK_COMMAND_INSTRUCTION
+
+
+MEMORIES = [
+    {"id": "1", "key": "city", "type": "personal", "value": "Lives in Paris"},
+    {"id": "2", "key": "coffee", "type": "preference", "value": "Drinks black coffee"},
+    {"id": "3", "key": "marathon", "type": "goal", "value": "Training for a marathon"},
+]
+
+HISTORY = [
+    {"role": "user", "content": "hi"},
+    {"role": "assistant", "content": "hello!"},
+]
+
+
+def _format(memories):
+    return "Memories:\n" + "\n".join(f"- {m['value']}" for m in memories)
+
+
+def _build(builder, memories=MEMORIES, instruction=None, user_message="what's new?"):
+    return builder.build(
+        model="mistral:7b",
+        system_prompt="You are Bruno.",
+        user_message=user_message,
+        memories=memories,
+        history=HISTORY,
+        format_memories=_format,
+        instruction=instruction,
+    )
+
+
+class TestPromptEngine:
+    """Test the engine on its own."""
+
+    def test_prefix_is_rendered_once(self):
+        """The agent's system segment is computed once per prompt and model."""
+        engine = PromptEngine()
+
+        first = engine.prefix("You are Bruno.", "mistral:7b")
+        second = engine.prefix("You are Bruno.", "mistral:7b")
+
+        assert first is second
+        assert engine.stats()["prefix_hits"] == 1
+        assert engine.prefix("You are Bruno.", "llama3") is not first
+
+    def test_prefix_cache_is_bounded(self):
+        engine = PromptEngine(max_cached_prefixes=2)
+        for prompt in ("a", "b", "c"):
+            engine.prefix(prompt, "mistral:7b")
+
+        assert engine.stats()["cached_prefixes"] == 2
+
+    def test_memory_order_ignores_retrieval_order(self):
+        """Memories render in type/key order whatever order retrieval returned."""
+        assert PromptEngine.order_memories(list(reversed(MEMORIES))) == MEMORIES
+
+    def test_flatten(self):
+        prompt = PromptEngine.flatten([
+            {"role": "system", "content": "Be brief."},
+            {"role": "user", "content": "hi"},
+        ])
+
+        assert prompt == "System: Be brief.\n\nUser: hi\n\nAssistant:"
+
+
+class TestStablePrefix:
+    """Test that consecutive prompts share their stable segments."""
+
+    def test_memory_block_is_identical_across_turns(self):
+        """Retrieval reordering does not change the rendered memories."""
+        builder = ContextBuilder(max_prompt_tokens=2000)
+
+        first, _ = _build(builder, memories=MEMORIES)
+        second, _ = _build(builder, memories=[MEMORIES[2], MEMORIES[0], MEMORIES[1]])
+
+        assert first[:2] == second[:2]
+
+    def test_task_instruction_goes_after_history(self):
+        """The per-turn instruction leaves the system prompt and history untouched."""
+        builder = ContextBuilder(max_prompt_tokens=2000)
+
+        plain, _ = _build(builder)
+        task, report = _build(builder, instruction=TASK_COMMAND_INSTRUCTION)
+
+        assert task[:len(plain) - 1] == plain[:-1]
+        assert task[-2] == {"role": "system", "content": TASK_COMMAND_INSTRUCTION}
+        assert task[-1] == plain[-1]
+        assert report.system_tokens > _build(builder)[1].system_tokens
+
+    def test_segments_report_sizes(self):
+        """Each segment's bytes and tokens are exposed in order."""
+        builder = ContextBuilder(max_prompt_tokens=2000)
+
+        _, report = _build(builder, instruction="Be brief.")
+        segments = {s["name"]: s for s in report.as_dict()["segments"]}
+
+        assert list(segments) == ["system", "memories", "history", "instruction", "message"]
+        assert segments["system"]["bytes"] == len("You are Bruno.")
+        assert segments["history"]["messages"] == 2
+        assert sum(s["tokens"] for s in segments.values()) == report.total_tokens
@@ -0,0 +1,183 @@
+"""
+Unit tests for the semantic recall index.
+"""
+from datetime import timedelta
+import zlib
+import pytest
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from core.bruno_integration import semantic_recall as recall_module
+from core.bruno_integration.context_budget import ContextBuilder
+from core.bruno_integration.semantic_recall import RECALL_HEADER, SemanticRecall, VectorIndex
+from core.bruno_integration.tests.stubs import StubLLM, db_memory, make_agent
+
+numpy_only = pytest.mark.skipif(recall_module.np is None, reason='NumPy is not installed')
+
+
+class StubEmbedder:
+    """Bag-of-words vectors, so messages sharing words are similar."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    async def embed(self, texts, priority=None, user_id=None):
+        if self.fail:
+            raise Exception('embedding model not found')
+        self.calls.append(list(texts))
+        vectors = []
+        for text in texts:
+            vector = [0.0] * 1024
+            for word in text.lower().split():
+                vector[zlib.crc32(word.strip('?.!,').encode()) % 1024] += 1.0
+            vectors.append(vector)
+        return vectors
+
+
+def _add_messages(conversation, contents):
+    from apps.chat.models import Message
+
+    base = timezone.now() - timedelta(days=200)
+    for i, content in enumerate(contents):
+        message = Message.objects.create(
+            conversation=conversation, role='user' if i % 2 == 0 else 'assistant', content=content
+        )
+        Message.objects.filter(id=message.id).update(created_at=base + timedelta(days=i))
+
+
+HISTORY = [
+    'My sister Anna lives in Lisbon now',
+    'That sounds lovely, Lisbon is beautiful',
+    'I started learning to play the cello',
+    'How are the cello lessons going so far?',
+    'We adopted a grey cat called Pixel',
+    'Pixel sounds like a great name for a cat',
+]
+
+
+class TestVectorIndex:
+    def test_exact_search_and_exclusion(self):
+        index = VectorIndex(ann_threshold=0)
+        index.add(['a', 'b', 'c'], [[1, 0, 0], [0.9, 0.1, 0], [0, 1, 0]])
+
+        assert [key for key, _ in index.search([1, 0, 0], 2)] == ['a', 'b']
+        assert [key for key, _ in index.search([1, 0, 0], 2, exclude_last=2)] == ['a']
+        assert [key for key, _ in index.search([1, 0, 0], 2, exclude={'a'})] == ['b', 'c']
+        assert index.search([1, 0, 0], 2)[0][1] == pytest.approx(1.0)
+
+    def test_dimension_mismatch(self):
+        index = VectorIndex()
+        index.add(['a'], [[1, 0, 0]])
+
+        with pytest.raises(ValueError):
+            index.add(['b'], [[1, 0]])
+
+    @numpy_only
+    def test_approximate_search_above_threshold(self):
+        np = recall_module.np
+        rng = np.random.default_rng(1)
+        topics = rng.standard_normal((50, 32), dtype=np.float32)
+        vectors = topics[rng.integers(0, 50, 3000)] + rng.standard_normal((3000, 32), dtype=np.float32) * 0.3
+        index = VectorIndex(ann_threshold=2000, nprobe=8)
+
+        index.add(list(range(2000)), vectors[:2000])
+        assert index.is_approximate
+        index.add(list(range(2000, 3000)), vectors[2000:])
+
+        found = 0
+        for query in vectors[:50]:
+            expected = {key for key, _ in index.search(query, 5, exact=True)}
+            found += len(expected & {key for key, _ in index.search(query, 5)})
+        assert found / 250 > 0.9
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+class TestSemanticRecall:
+    """Test incremental indexing and recall against the database."""
+
+    async def test_recalls_related_past_messages(self, test_user, test_conversation):
+        await sync_to_async(_add_messages)(test_conversation, HISTORY)
+        recall = SemanticRecall(embedder=StubEmbedder(), enabled=True, top_k=2, min_score=0.3)
+
+        recalled = await recall.recall(str(test_user.id), 'I have cello lessons tomorrow')
+
+        assert 'cello' in recalled[0]['content']
+        assert all(message['score'] >= 0.3 for message in recalled)
+        assert recall.stats()['vectors'] == len(HISTORY)
+
+    async def test_new_messages_are_indexed_incrementally(self, test_user, test_conversation):
+        from apps.chat.models import Message
+
+        await sync_to_async(_add_messages)(test_conversation, HISTORY)
+        embedder = StubEmbedder()
+        recall = SemanticRecall(embedder=embedder, enabled=True, min_score=0.1)
+        await recall.recall(str(test_user.id), 'hello there friend')
+
+        plant = await sync_to_async(Message.objects.create)(
+            conversation=test_conversation, role='user', content='Pixel knocked over my plant'
+        )
+
+        async def history():
+            return [{'id': plant.id, 'role': 'user', 'content': plant.content}]
+
+        recalled = await recall.recall(str(test_user.id), 'What did Pixel do today?', history=history())
+
+        assert embedder.calls[-1] == ['What did Pixel do today?', 'Pixel knocked over my plant']
+        assert 'plant' not in ' '.join(message['content'] for message in recalled)
+        assert any('Pixel' in message['content'] for message in recalled)
+
+    async def test_backlog_is_indexed_in_the_background(self, test_user, test_conversation):
+        await sync_to_async(_add_messages)(test_conversation, HISTORY)
+        embedder = StubEmbedder()
+        recall = SemanticRecall(embedder=embedder, enabled=True, min_score=0.3, sync_limit=4)
+
+        assert await recall.recall(str(test_user.id), 'cello lessons') == []
+        assert recall.stats()['skipped'] == 1
+        await recall._indexing[str(test_user.id)]
+
+        recalled = await recall.recall(str(test_user.id), 'cello lessons')
+        assert 'cello' in recalled[0]['content']
+        assert embedder.calls[-1] == ['cello lessons']
+        assert recall.stats()['indexing'] == 0
+
+    async def test_failures_recall_nothing(self, test_user, test_conversation):
+        await sync_to_async(_add_messages)(test_conversation, HISTORY)
+        recall = SemanticRecall(embedder=StubEmbedder(fail=True), enabled=True)
+
+        assert await recall.recall(str(test_user.id), 'cello') == []
+        assert recall.stats()['errors'] == 1
+
+    async def test_prompt_carries_recalled_messages(self, test_user, test_conversation):
+        await sync_to_async(_add_messages)(test_conversation, HISTORY)
+        llm = StubLLM()
+        agent = make_agent(
+            llm, context_builder=ContextBuilder(history_limit=2),
+            recall=SemanticRecall(embedder=StubEmbedder(), enabled=True, top_k=1, min_score=0.3)
+        )
+
+        result = await agent.process_message('How is my sister in Lisbon?', 'c1', user_id=str(test_user.id))
+
+        assert result['success']
+        assert 'recall_ms' in result['timings']
+        assert llm.messages[-2]['content'].startswith(RECALL_HEADER)
+        assert 'Lisbon' in llm.messages[-2]['content']
+
+    async def test_history_turns_are_not_recalled(self, test_user, test_conversation):
+        from apps.chat.models import Message
+
+        await sync_to_async(_add_messages)(test_conversation, HISTORY)
+        # Saved before the agent runs, like the message service does
+        await sync_to_async(Message.objects.create)(
+            conversation=test_conversation, role='user', content='Is Pixel a good cat?'
+        )
+        llm = StubLLM()
+        agent = make_agent(
+            llm, db_memory(), context_builder=ContextBuilder(history_limit=3),
+            recall=SemanticRecall(embedder=StubEmbedder(), enabled=True, top_k=2, min_score=0.1)
+        )
+
+        await agent.process_message('Is Pixel a good cat?', str(test_conversation.id), user_id=str(test_user.id))
+
+        recalled = next(m['content'] for m in llm.messages if m['content'].startswith(RECALL_HEADER))
+        assert 'Pixel' not in recalled
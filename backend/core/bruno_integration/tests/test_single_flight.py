@@ -0,0 +1,212 @@
+"""
+Unit tests for single-flight request coalescing.
+"""
+import asyncio
+import threading
+import pytest
+from core.bruno_integration.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+class TestSingleFlightDo:
+    """Test coalescing of non-streaming calls."""
+    
+    async def test_concurrent_calls_share_one_upstream_call(self):
+        """Identical concurrent calls run the function once."""
+        group = SingleFlight()
+        calls = 0
+        
+        async def fn():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {'content': 'hi'}
+        
+        results = await asyncio.gather(*(group.do('k', fn) for _ in range(5)))
+        
+        assert calls == 1
+        assert all(r == {'content': 'hi'} for r in results)
+        assert group.stats()['shared'] == 4
+        assert group.stats()['in_flight'] == 0
+    
+    async def test_results_are_copies(self):
+        """Callers cannot mutate each other's result."""
+        group = SingleFlight()
+        
+        async def fn():
+            await asyncio.sleep(0.01)
+            return {'content': 'hi'}
+        
+        first, second = await asyncio.gather(group.do('k', fn), group.do('k', fn))
+        first['content'] = 'changed'
+        
+        assert second['content'] == 'hi'
+    
+    async def test_errors_reach_every_waiter(self):
+        """A failing upstream call fails all callers sharing it."""
+        group = SingleFlight()
+        
+        async def fn():
+            await asyncio.sleep(0.01)
+            raise RuntimeError('ollama down')
+        
+        results = await asyncio.gather(group.do('k', fn), group.do('k', fn), return_exceptions=True)
+        
+        assert all(isinstance(r, RuntimeError) for r in results)
+    
+    async def test_waiter_retries_when_leader_cancelled(self):
+        """If the leader is cancelled, a waiter runs the call itself."""
+        group = SingleFlight()
+        calls = 0
+        
+        async def fn():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {'content': 'hi'}
+        
+        leader = asyncio.create_task(group.do('k', fn))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(group.do('k', fn))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        
+        assert await follower == {'content': 'hi'}
+        assert calls == 2
+    
+    async def test_disabled_group_never_shares(self):
+        """A disabled group runs every call."""
+        group = SingleFlight(enabled=False)
+        calls = 0
+        
+        async def fn():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {}
+        
+        await asyncio.gather(group.do('k', fn), group.do('k', fn))
+        
+        assert calls == 2
+    
+    async def test_unreachable_redis_falls_back_to_local_call(self):
+        """Redis problems never fail the request."""
+        group = SingleFlight(redis_url='redis://127.0.0.1:1/0')
+        
+        async def fn():
+            return {'content': 'hi'}
+        
+        assert await group.do('k', fn) == {'content': 'hi'}
+        assert group.stats()['fallbacks'] == 1
+
+
+class TestSingleFlightAcrossLoops:
+    """Test sharing between callers on different event loops (async_to_sync threads)."""
+    
+    def test_callers_on_different_loops_share_a_flight(self):
+        """A caller on another thread's loop receives the leader's result."""
+        group = SingleFlight()
+        calls = 0
+        leader_started = threading.Event()
+        results = {}
+        
+        async def fn():
+            nonlocal calls
+            calls += 1
+            leader_started.set()
+            await asyncio.sleep(0.1)
+            return {'content': 'hi'}
+        
+        def run(name):
+            results[name] = asyncio.run(group.do('k', fn))
+        
+        leader = threading.Thread(target=run, args=('leader',))
+        leader.start()
+        leader_started.wait(timeout=5)
+        follower = threading.Thread(target=run, args=('follower',))
+        follower.start()
+        leader.join(timeout=5)
+        follower.join(timeout=5)
+        
+        assert calls == 1
+        assert results == {'leader': {'content': 'hi'}, 'follower': {'content': 'hi'}}
+    
+    def test_stream_follower_runs_again_when_leader_loop_closes(self):
+        """A follower left without chunks by a vanished leader loop streams the call itself."""
+        group = SingleFlight()
+        opened = 0
+        leader_waiting = threading.Event()
+        follower_joined = threading.Event()
+        results = {}
+        
+        async def upstream():
+            nonlocal opened
+            opened += 1
+            if opened == 1:
+                leader_waiting.set()
+                await asyncio.sleep(10)
+            for token in ['a', 'b']:
+                yield token
+        
+        async def lead():
+            chunks = group.stream('k', upstream)
+            first = asyncio.ensure_future(chunks.__anext__())
+            await asyncio.get_running_loop().run_in_executor(None, follower_joined.wait, 5)
+            first.cancel()
+            # asyncio.run now cancels the upstream task while closing this loop
+        
+        async def follow():
+            chunks = group.stream('k', upstream)
+            first = asyncio.ensure_future(chunks.__anext__())
+            await asyncio.sleep(0.05)
+            follower_joined.set()
+            results['follower'] = [await first] + [chunk async for chunk in chunks]
+        
+        leader = threading.Thread(target=asyncio.run, args=(lead(),))
+        leader.start()
+        leader_waiting.wait(timeout=5)
+        follower = threading.Thread(target=asyncio.run, args=(follow(),))
+        follower.start()
+        leader.join(timeout=5)
+        follower.join(timeout=5)
+        
+        assert opened == 2
+        assert results == {'follower': ['a', 'b']}
+        assert group.stats()['in_flight'] == 0
+
+
+@pytest.mark.asyncio
+class TestSingleFlightStream:
+    """Test fan-out of streaming calls."""
+    
+    async def test_concurrent_streams_share_upstream(self):
+        """Late subscribers replay earlier chunks and then follow live ones."""
+        group = SingleFlight()
+        opened = 0
+        
+        async def upstream():
+            nonlocal opened
+            opened += 1
+            for token in ['a', 'b', 'c']:
+                await asyncio.sleep(0.01)
+                yield token
+        
+        async def consume(delay):
+            await asyncio.sleep(delay)
+            return [chunk async for chunk in group.stream('k', upstream)]
+        
+        results = await asyncio.gather(consume(0), consume(0.015))
+        
+        assert opened == 1
+        assert results == [['a', 'b', 'c'], ['a', 'b', 'c']]
+    
+    async def test_stream_errors_propagate(self):
+        """Upstream failures are raised to every subscriber."""
+        group = SingleFlight()
+        
+        async def upstream():
+            yield 'a'
+            raise RuntimeError('broken stream')
+        
+        with pytest.raises(RuntimeError):
+            [chunk async for chunk in group.stream('k', upstream)]
@@ -10,6 +10,13 @@ from datetime import timedelta
 
 logger = logging.getLogger(__name__)
 
+# Regex patterns for common timer commands, matched against the lowercased command
+# Supports: "set timer for X mins", "timer for X mins", "X minute timer", "remind me in X minutes"
+TIMER_CREATE_PATTERN = re.compile(r'(?:(?:set|create|start|make)\s*(?:a\s+)?timer\s+(?:for\s+)?(\d+)\s*(?:min|mins|minute|minutes)|timer\s+(?:for\s+)?(\d+)\s*(?:min|mins|minute|minutes)|(\d+)\s*(?:min|mins|minute|minutes)\s+timer|(?:remind\s+me\s+in\s+)(\d+)\s*(?:min|mins|minute|minutes))')
+TIMER_CANCEL_ALL_PATTERN = re.compile(r'(?:cancel|stop|delete|clear|remove)\s+(?:all|every)\s+(?:timers?|alarms?)')
+TIMER_CANCEL_PATTERN = re.compile(r'(?:cancel|stop|delete|clear|remove)\s+timer(?:\s+(.+))?')
+TIMER_PATTERNS = (TIMER_CREATE_PATTERN, TIMER_CANCEL_ALL_PATTERN, TIMER_CANCEL_PATTERN)
+
 
 class TimerAbility:
     """Manages timer functionality for Bruno."""
@@ -53,14 +60,8 @@ class TimerAbility:
         """Parse timer command using regex patterns with LLM fallback."""
         command_lower = command.lower().strip()
         
-        # Regex patterns for common timer commands
-        # Supports: "set timer for X mins", "timer for X mins", "X minute timer", "remind me in X minutes"
-        timer_create_pattern = r'(?:(?:set|create|start|make)\s*(?:a\s+)?timer\s+(?:for\s+)?(\d+)\s*(?:min|mins|minute|minutes)|timer\s+(?:for\s+)?(\d+)\s*(?:min|mins|minute|minutes)|(\d+)\s*(?:min|mins|minute|minutes)\s+timer|(?:remind\s+me\s+in\s+)(\d+)\s*(?:min|mins|minute|minutes))'
-        timer_cancel_all_pattern = r'(?:cancel|stop|delete|clear|remove)\s+(?:all|every)\s+(?:timers?|alarms?)'
-        timer_cancel_pattern = r'(?:cancel|stop|delete|clear|remove)\s+timer(?:\s+(.+))?'
-        
         # Check for create timer
-        create_match = re.search(timer_create_pattern, command_lower)
+        create_match = TIMER_CREATE_PATTERN.search(command_lower)
         if create_match:
             duration_minutes = int(create_match.group(1) or create_match.group(2) or create_match.group(3) or create_match.group(4))
             
@@ -76,7 +77,7 @@ class TimerAbility:
             }
         
         # Check for cancel all timers
-        cancel_all_match = re.search(timer_cancel_all_pattern, command_lower)
+        cancel_all_match = TIMER_CANCEL_ALL_PATTERN.search(command_lower)
         if cancel_all_match:
             logger.info("⏱️  Regex parsed CANCEL_ALL")
             return {
@@ -87,7 +88,7 @@ class TimerAbility:
             }
         
         # Check for cancel specific timer
-        cancel_match = re.search(timer_cancel_pattern, command_lower)
+        cancel_match = TIMER_CANCEL_PATTERN.search(command_lower)
         if cancel_match:
             timer_name = cancel_match.group(1) if cancel_match.group(1) else None
             logger.info(f"⏱️  Regex parsed CANCEL: name='{timer_name}'")
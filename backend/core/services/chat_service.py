@@ -1,9 +1,10 @@
 """
 Chat Service - Handles chat operations with Bruno integration
 """
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, Awaitable
 import logging
 from asgiref.sync import sync_to_async
+from django.conf import settings
 
 from apps.chat.models import Conversation, Message
 from apps.agents.models import Agent
@@ -15,7 +16,15 @@ from core.bruno_integration import (
     DjangoMemoryBackend,
     create_default_abilities
 )
+from core.bruno_integration.context_store import ConversationContextStore
+from core.bruno_integration.conversation_summary import conversation_summarizer
+from core.bruno_integration.deadlines import Deadline
+from core.bruno_integration.semantic_recall import semantic_recall
+from core.bruno_integration.intent_router import Intent, IntentRouter
 from core.services.command_detector import CommandDetector
+from core.services.model_router import model_router
+from core.services.stream_cancellation import GenerationCancelled, run_cancellable
+from core.services.stream_publisher import ChatStreamPublisher
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +37,12 @@ class ChatService:
         self.agent_instances: Dict[str, BrunoAgent] = {}
         self.memory_backend = DjangoMemoryBackend(Message, Conversation)
         self.memory_manager = MemoryManager(db_backend=self.memory_backend)
+        
+        # Ollama KV context per conversation, shared by all agents in this process
+        self.context_store = ConversationContextStore(
+            max_tokens=settings.OLLAMA_CONTEXT_MAX_TOKENS
+        )
+        # Abilities the model may call when CHAT_TOOLS_ENABLED is set
         self.ability_manager = create_default_abilities()
         
         # Initialize notes ability
@@ -38,9 +53,20 @@ class ChatService:
         from core.bruno_integration.timer_ability import TimerAbility
         self.timer_ability = TimerAbility()
         
-        # Initialize command detector
+        # Initialize intent router (timer/notes dispatch without the LLM) and
+        # the LLM command detector it falls back to for ambiguous messages
+        self.intent_router = IntentRouter(self.timer_ability, self.notes_ability)
         self.command_detector = CommandDetector()
         
+        # Cascade router sending easy turns to a smaller model
+        self.model_router = model_router
+        
+        # Rolling summaries of older turns, written by summarize_conversations
+        self.summarizer = conversation_summarizer
+        
+        # Past turns related to the current message, from a per-user vector index
+        self.recall = semantic_recall
+        
         logger.info("Initialized ChatService")
     
     async def get_or_create_agent(self, agent_id: str) -> BrunoAgent:
@@ -75,7 +101,9 @@ class ChatService:
         # Create LLM client
         llm_client = LLMFactory.create_client(
             provider=config.llm_provider,
-            base_url='http://localhost:11434'  # Ollama default URL
+            api_mode=settings.OLLAMA_API_MODE,
+            keep_alive=settings.OLLAMA_KEEP_ALIVE,
+            context_store=self.context_store if settings.OLLAMA_REUSE_CONTEXT else None
         )
         
         # Create Bruno agent
@@ -84,7 +112,13 @@ class ChatService:
             llm_client=llm_client,
             memory_manager=self.memory_manager,
             notes_ability=self.notes_ability,
-            timer_ability=self.timer_ability
+            timer_ability=self.timer_ability,
+            model_router=self.model_router if self.model_router.enabled else None,
+            intent_router=self.intent_router,
+            summarizer=self.summarizer if self.summarizer.enabled else None,
+            recall=self.recall if self.recall.enabled else None,
+            tools=self.ability_manager if settings.CHAT_TOOLS_ENABLED else None,
+            max_tool_steps=settings.CHAT_TOOLS_MAX_STEPS
         )
         
         # Cache the agent instance
@@ -99,7 +133,12 @@ class ChatService:
         user_message: str,
         agent_id: str,
         user_id: str = None,
-        is_task_command: bool = False
+        is_task_command: bool = False,
+        publisher: Optional[ChatStreamPublisher] = None,
+        deadline: Optional[Deadline] = None,
+        task_decision: Optional[Awaitable[bool]] = None,
+        speculate_generation: bool = False,
+        intent: Optional[Intent] = None
     ) -> Dict[str, Any]:
         """
         Process a user message and generate a response.
@@ -110,6 +149,15 @@ class ChatService:
             agent_id: ID of the agent to use
             user_id: ID of the user (for notes functionality)
             is_task_command: Whether this is a task command (timer, reminder, note)
+            publisher: Optional publisher that streams token deltas to the user's WebSocket;
+                the generation is cancelled if that WebSocket asks for it (e.g. on disconnect)
+            deadline: Time budget for the reply
+            task_decision: Pending command detection; replaces is_task_command
+                and lets the agent assemble context before it resolves
+            speculate_generation: Also start a conversational reply before the
+                decision (see BrunoAgent.process_message)
+            intent: The intent router's classification of the message, if the
+                caller already made it
             
         Returns:
             Dict with response content and metadata
@@ -119,15 +167,34 @@ class ChatService:
             agent = await self.get_or_create_agent(agent_id)
             
             # Process message through Bruno agent
-            response = await agent.process_message(
+            reply = agent.process_message(
                 user_message=user_message,
                 conversation_id=conversation_id,
                 user_id=user_id,
-                context={"is_task_command": is_task_command}
+                context={"is_task_command": is_task_command, "intent": intent},
+                on_delta=publisher.send_delta if publisher else None,
+                deadline=deadline,
+                task_decision=task_decision,
+                speculate_generation=speculate_generation
             )
             
+            if not publisher:
+                return await reply
+            
+            response = await run_cancellable(reply, publisher.user_id, publisher.stream_id)
+            
+            # Push out whatever is still buffered before the message is persisted
+            await publisher.flush()
+            
             return response
             
+        except GenerationCancelled:
+            logger.info(f"Generation cancelled by client for conversation {conversation_id}")
+            return {
+                "content": "Response cancelled.",
+                "success": False,
+                "cancelled": True
+            }
         except Exception as e:
             logger.error(f"Error processing message: {str(e)}", exc_info=True)
             return {
@@ -136,6 +203,31 @@ class ChatService:
                 "error": str(e)
             }
     
+    async def process_deterministic(
+        self,
+        conversation_id: str,
+        user_message: str,
+        user_id: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Answer a message with the timer or notes ability only, without the LLM.
+        
+        Used while the LLM is saturated, so these commands keep working.
+        
+        Args:
+            conversation_id: ID of the conversation
+            user_message: User's input message
+            user_id: ID of the user
+        
+        Returns:
+            Dict with response content and metadata, or None if the message
+            is neither a timer nor a notes command
+        """
+        response = await self.intent_router.dispatch(user_message, conversation_id, user_id)
+        if response is None:
+            return None
+        return {**response, "tokens_used": 0, "success": True}
+
     async def create_conversation(
         self,
         user_id: str,
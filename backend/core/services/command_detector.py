@@ -1,10 +1,14 @@
 """
 Command Detector Service - Uses LLM to detect if a message is a command
 """
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import logging
 import json
+from django.conf import settings
 from core.bruno_integration.bruno_llm import OllamaClient
+from core.bruno_integration.deadlines import Deadline
+from core.bruno_integration.llm_scheduler import Priority
+from core.bruno_integration.micro_batcher import BatchFailed, MicroBatcher, micro_batcher
 
 logger = logging.getLogger(__name__)
 
@@ -57,23 +61,64 @@ class CommandDetector:
 
             Respond with ONLY the JSON object, nothing else."""
 
-    def __init__(self, llm_client: Optional[OllamaClient] = None):
+    BATCH_DETECTION_PROMPT = """You are a command detector. For EACH numbered user message below, determine if it is a COMMAND or a CONVERSATION.
+
+            Commands require ACTION: timers, reminders, alarms, notes, tasks or to-do items,
+            calculations, or lookups that require tool usage.
+            Conversations are greetings, small talk, questions about concepts, explanations,
+            and follow-up discussion.
+
+            Respond with ONLY a JSON object whose "results" array contains exactly {count} objects,
+            one per message, in the same order as the messages, each in this exact format:
+            {{"is_command": true/false, "command_type": "timer|reminder|note|task|calculation|lookup|other", "confidence": 0.0-1.0}}
+
+            Example for 2 messages ("set a timer for 10 minutes", "how are you?"):
+            {{"results": [{{"is_command": true, "command_type": "timer", "confidence": 0.95}}, {{"is_command": false, "command_type": "other", "confidence": 0.95}}]}}
+
+            Messages:
+{messages}
+
+            Respond with ONLY the JSON object, nothing else."""
+
+    SYSTEM_PROMPT = "You are a precise command detector. Respond only with JSON."
+    TEMPERATURE = 0.1  # Low temperature for consistency
+    MAX_TOKENS = 100   # Upper bound; JSON mode stops reading once the object is complete
+
+    def __init__(self, llm_client: Optional[OllamaClient] = None, batcher: Optional[MicroBatcher] = None):
         """
         Initialize command detector.
         
         Args:
             llm_client: Optional LLM client. If not provided, creates a default Ollama client.
+            batcher: Batcher packing concurrent detections into one call (defaults to the shared one)
         """
-        self.llm_client = llm_client or OllamaClient(base_url="http://localhost:11434")
+        self.llm_client = llm_client or OllamaClient()
+        self.batcher = batcher or micro_batcher
+        self.model = getattr(settings, 'LLM_CLASSIFIER_MODEL', 'mistral:7b')
         logger.info("Initialized CommandDetector")
     
-    async def detect_command(self, message: str, model: str = "mistral:7b") -> Dict:
+    def _detection_messages(self, message: str) -> List[Dict[str, str]]:
+        """Build the LLM messages for detecting a single message."""
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": self.DETECTION_PROMPT.format(message=message)}
+        ]
+    
+    async def detect_command(
+        self,
+        message: str,
+        model: Optional[str] = None,
+        user_id: Optional[str] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Dict:
         """
         Detect if a message is a command using LLM.
         
         Args:
             message: User message to analyze
-            model: LLM model to use for detection
+            model: LLM model to use for detection (defaults to LLM_CLASSIFIER_MODEL)
+            user_id: User who sent the message (for fair scheduling)
+            deadline: Time budget of the request the detection is part of
             
         Returns:
             Dict with keys:
@@ -82,24 +127,20 @@ class CommandDetector:
                 - confidence: float (0.0-1.0)
                 - raw_response: str (for debugging)
         """
+        model = model or self.model
         try:
-            # Build detection prompt
-            prompt = self.DETECTION_PROMPT.format(message=message.strip())
-            
             logger.info(f"🔍 Detecting command for message: '{message}'")
             
-            # Call LLM with low temperature for consistent results
-            response = await self.llm_client.generate(
-                model=model,
-                messages=[
-                    {"role": "system", "content": "You are a precise command detector. Respond only with JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,  # Low temperature for consistency
-                max_tokens=100    # Short response expected
-            )
+            # Under load, concurrent detections share one LLM call
+            try:
+                response_text = await self.batcher.submit(
+                    f"detect:{model}",
+                    message.strip(),
+                    lambda items: self._detect_batch(items, model, user_id, deadline)
+                )
+            except BatchFailed:
+                response_text = await self._detect_one(message.strip(), model, user_id, deadline)
             
-            response_text = response['content'].strip()
             logger.info(f"📥 LLM response: {response_text}")
             
             # Try to extract JSON from response
@@ -120,6 +161,118 @@ class CommandDetector:
                 'raw_response': ''
             }
     
+    async def _detect_one(
+        self,
+        message: str,
+        model: str,
+        user_id: Optional[str] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """Run detection for one message; returns the raw LLM response text."""
+        response = await self.llm_client.generate(
+            model=model,
+            messages=self._detection_messages(message),
+            temperature=self.TEMPERATURE,
+            max_tokens=self.MAX_TOKENS,
+            cache=True,       # Same short prompts repeat constantly
+            priority=Priority.CLASSIFIER,
+            user_id=user_id,
+            deadline=deadline,
+            hedge=True,       # Short call; duplicate it if one host is slow
+            json_mode=True    # Stop as soon as the object is complete
+        )
+        return response['content'].strip()
+    
+    async def _detect_batch(
+        self,
+        messages: List[str],
+        model: str,
+        user_id: Optional[str] = None,
+        deadline: Optional[Deadline] = None
+    ) -> List[str]:
+        """
+        Run detection for several messages with a single LLM call.
+        
+        Messages whose single-message detection is already cached are answered
+        from the cache, and batch results are cached per message, so batching
+        does not lose cache hits.
+        
+        Args:
+            messages: Messages to analyze
+            model: LLM model to use
+            user_id: User whose request opened the batch
+            deadline: Time budget of that request
+            
+        Returns:
+            Raw JSON object text per message, in order
+        """
+        if len(messages) == 1:
+            return [await self._detect_one(messages[0], model, user_id, deadline)]
+        
+        results: List[Optional[str]] = [None] * len(messages)
+        for index, message in enumerate(messages):
+            cached = await self.llm_client.get_cached(
+                self._detection_messages(message), model, self.TEMPERATURE, self.MAX_TOKENS, json_mode=True
+            )
+            if cached is not None:
+                results[index] = cached['content'].strip()
+        
+        pending = [index for index, result in enumerate(results) if result is None]
+        if len(pending) == 1:
+            results[pending[0]] = await self._detect_one(messages[pending[0]], model, user_id, deadline)
+        elif pending:
+            numbered = "\n".join(
+                f"            {number}. {json.dumps(messages[index])}"
+                for number, index in enumerate(pending, start=1)
+            )
+            logger.info(f"🔍 Detecting commands for {len(pending)} messages in one call")
+            response = await self.llm_client.generate(
+                model=model,
+                messages=[
+                    {"role": "system", "content": self.SYSTEM_PROMPT},
+                    {"role": "user", "content": self.BATCH_DETECTION_PROMPT.format(
+                        count=len(pending), messages=numbered
+                    )}
+                ],
+                temperature=self.TEMPERATURE,
+                max_tokens=self.MAX_TOKENS * len(pending),
+                priority=Priority.CLASSIFIER,
+                user_id=user_id,
+                deadline=deadline,
+                json_mode=True
+            )
+            
+            items = self._parse_batch_response(response['content'], len(pending))
+            for index, item in zip(pending, items):
+                results[index] = json.dumps(item)
+                await self.llm_client.set_cached(
+                    self._detection_messages(messages[index]), model, self.TEMPERATURE, self.MAX_TOKENS,
+                    {"content": results[index], "model": model, "tokens_used": 0},
+                    json_mode=True
+                )
+        
+        return results
+    
+    def _parse_batch_response(self, response: str, count: int) -> List[Dict]:
+        """
+        Extract the detections from a batched response.
+        
+        JSON mode answers ``{"results": [...]}``; a bare array is accepted too.
+        
+        Raises:
+            ValueError: If the response does not hold an array of ``count`` objects
+        """
+        start_idx = min((i for i in (response.find('{'), response.find('[')) if i != -1), default=-1)
+        if start_idx == -1:
+            raise ValueError(f"No JSON found in batch response: {response}")
+        
+        items, _ = json.JSONDecoder().raw_decode(response[start_idx:])
+        if isinstance(items, dict):
+            items = items.get('results')
+        if not isinstance(items, list) or len(items) != count or not all(isinstance(i, dict) for i in items):
+            raise ValueError(f"Expected {count} detection objects, got: {response}")
+        return items
+    
     def _parse_detection_response(self, response: str) -> Dict:
         """
         Parse LLM response to extract command detection result.
@@ -131,14 +284,12 @@ class CommandDetector:
             Dict with is_command, command_type, and confidence
         """
         try:
-            # Try to find JSON in the response
-            # Sometimes LLM adds extra text, so we need to extract JSON
+            # The JSON object may be followed by extra text (when JSON mode
+            # was not honoured), so decode only the first value
             start_idx = response.find('{')
-            end_idx = response.rfind('}') + 1
             
-            if start_idx != -1 and end_idx > start_idx:
-                json_str = response[start_idx:end_idx]
-                data = json.loads(json_str)
+            if start_idx != -1:
+                data, _ = json.JSONDecoder().raw_decode(response[start_idx:])
                 
                 # Validate required fields
                 return {
@@ -162,7 +313,7 @@ class CommandDetector:
                 'confidence': 0.0
             }
     
-    async def is_timer_command(self, message: str, model: str = "mistral:7b") -> bool:
+    async def is_timer_command(self, message: str, model: Optional[str] = None) -> bool:
         """
         Check if a message is specifically a timer command.
         
@@ -176,7 +327,7 @@ class CommandDetector:
         result = await self.detect_command(message, model)
         return result['is_command'] and result['command_type'] == 'timer' and result['confidence'] >= 0.7
     
-    async def is_any_command(self, message: str, model: str = "mistral", confidence_threshold: float = 0.7) -> bool:
+    async def is_any_command(self, message: str, model: Optional[str] = None, confidence_threshold: float = 0.7) -> bool:
         """
         Check if a message is any type of command.
         
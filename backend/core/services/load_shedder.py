@@ -0,0 +1,261 @@
+"""
+Load Shedder - Turns away conversational turns while the LLM is saturated
+"""
+from typing import Deque, Dict, List, Optional, Any, Tuple
+from collections import deque
+from dataclasses import dataclass
+import logging
+import math
+import threading
+import time
+import uuid
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis ships with channels-redis
+    redis = None
+
+from core.bruno_integration.llm_scheduler import LLMScheduler, llm_scheduler as default_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ShedDecision:
+    """Why a turn was turned away and when to try again."""
+    reason: str
+    retry_after: int
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"reason": self.reason, "retry_after": self.retry_after}
+
+
+class LoadShedder:
+    """
+    Admission control for LLM chat turns.
+
+    A turn is shed when the LLM scheduler's queue is deeper than
+    ``max_queue_depth``, when ``max_in_flight`` turns are already being
+    answered, or when recent LLM turns took longer than ``max_latency_ms`` on
+    average. Only turns finished in the last ``window`` seconds count, so the
+    latency signal clears by itself once Ollama recovers even if no turns got
+    through meanwhile.
+
+    The scheduler queue only holds the requests of this process. With a
+    Redis URL, turns in flight and recent latencies are also kept in Redis
+    sorted sets shared by every worker process, so the in-flight limit and
+    the latency average cover the whole deployment. Without Redis (or while
+    it is unreachable) both signals are per process, and the in-flight limit
+    is not applied.
+
+    Shed turns are still answered when they are timer or notes commands,
+    which need no LLM; everything else gets a fast busy reply (or a 503 with
+    Retry-After) instead of tying up a gunicorn worker until its timeout.
+    """
+
+    def __init__(
+        self,
+        scheduler: Optional[LLMScheduler] = None,
+        enabled: bool = True,
+        max_queue_depth: int = 8,
+        max_latency_ms: int = 15000,
+        window: float = 30.0,
+        min_samples: int = 3,
+        retry_after: int = 10,
+        max_in_flight: int = 0,
+        redis_url: Optional[str] = None,
+        redis_client=None,
+        turn_ttl: float = 120.0,
+        key_prefix: str = "llm:shed:"
+    ):
+        """
+        Initialize load shedder.
+
+        Args:
+            scheduler: LLM scheduler whose queue depth is watched (defaults to the global one)
+            enabled: When False no turn is ever shed
+            max_queue_depth: Queued LLM requests above which turns are shed (0 disables)
+            max_latency_ms: Average recent turn latency above which turns are shed (0 disables)
+            window: Seconds a finished turn's latency counts for
+            min_samples: Recent turns needed before latency is trusted
+            retry_after: Seconds clients are told to wait
+            max_in_flight: Turns being answered across all processes at which
+                new turns are shed (0 disables; needs Redis)
+            redis_url: Redis URL for the shared signals (disabled when empty)
+            redis_client: Redis client to use instead of connecting to ``redis_url``
+            turn_ttl: Seconds after which a turn that never finished stops counting
+            key_prefix: Prefix for the Redis keys
+        """
+        self.scheduler = scheduler or default_scheduler
+        self.enabled = enabled
+        self.max_queue_depth = max_queue_depth
+        self.max_latency_ms = max_latency_ms
+        self.window = window
+        self.min_samples = min_samples
+        self.retry_after = retry_after
+        self.max_in_flight = max_in_flight
+        self.turn_ttl = turn_ttl
+        self.key_prefix = key_prefix
+        self._redis = redis_client
+        if self._redis is None and redis_url and redis is not None:
+            # Sync client: the shedder runs on the request thread, before any event loop
+            self._redis = redis.Redis.from_url(redis_url, socket_timeout=0.25, socket_connect_timeout=0.25)
+        self._latencies: Deque[Tuple[float, int]] = deque()
+        self._lock = threading.Lock()
+        self._counters = {"admitted": 0, "shed": 0, "served_deterministic": 0, "redis_errors": 0}
+
+    @classmethod
+    def from_settings(cls) -> 'LoadShedder':
+        """Create a load shedder configured from Django settings."""
+        from django.conf import settings
+
+        return cls(
+            enabled=getattr(settings, 'LOAD_SHEDDING_ENABLED', True),
+            max_queue_depth=getattr(settings, 'LOAD_SHEDDING_MAX_QUEUE', 8),
+            max_latency_ms=getattr(settings, 'LOAD_SHEDDING_MAX_LATENCY_MS', 15000),
+            retry_after=getattr(settings, 'LOAD_SHEDDING_RETRY_AFTER', 10),
+            max_in_flight=getattr(settings, 'LOAD_SHEDDING_MAX_IN_FLIGHT', 0),
+            redis_url=getattr(settings, 'LOAD_SHEDDING_REDIS_URL', ''),
+            turn_ttl=getattr(settings, 'CHAT_RESPONSE_DEADLINE', 60.0) * 2,
+        )
+
+    def check(self) -> Optional[ShedDecision]:
+        """
+        Decide whether the next LLM turn should be admitted.
+
+        Returns:
+            None to admit the turn, otherwise a ShedDecision
+        """
+        if not self.enabled:
+            return None
+
+        decision = None
+        depth = self.scheduler.queue_depth()
+        in_flight = self.in_flight() if self.max_in_flight else None
+        if self.max_queue_depth and depth > self.max_queue_depth:
+            decision = ShedDecision(f"queue_depth={depth}", self.retry_after)
+        elif in_flight is not None and in_flight >= self.max_in_flight:
+            decision = ShedDecision(f"in_flight={in_flight}", self.retry_after)
+        else:
+            latency = self.recent_latency_ms()
+            if self.max_latency_ms and latency is not None and latency > self.max_latency_ms:
+                # Give Ollama about as long as one slow turn to drain before retrying
+                decision = ShedDecision(
+                    f"latency_ms={latency}", max(self.retry_after, math.ceil(latency / 1000))
+                )
+
+        with self._lock:
+            self._counters["shed" if decision else "admitted"] += 1
+        if decision:
+            logger.warning(f"Shedding chat turn: {decision.reason}")
+        return decision
+
+    def start_turn(self) -> Optional[str]:
+        """
+        Count an admitted turn as in flight across processes.
+
+        Returns:
+            Token to pass to finish_turn(), or None without Redis
+        """
+        if self._redis is None:
+            return None
+        token = uuid.uuid4().hex
+        if self._shared(lambda r: r.zadd(self._key("in_flight"), {token: time.time() + self.turn_ttl})) is None:
+            return None
+        return token
+
+    def finish_turn(self, token: Optional[str]) -> None:
+        """Stop counting a turn started with start_turn() as in flight."""
+        if token is not None:
+            self._shared(lambda r: r.zrem(self._key("in_flight"), token))
+
+    def in_flight(self) -> Optional[int]:
+        """Turns being answered across all processes, or None without Redis."""
+        if self._redis is None:
+            return None
+
+        def count(r) -> int:
+            pipe = r.pipeline(transaction=False)
+            pipe.zremrangebyscore(self._key("in_flight"), 0, time.time())
+            pipe.zcard(self._key("in_flight"))
+            return pipe.execute()[1]
+
+        return self._shared(count)
+
+    def record(self, latency_ms: int) -> None:
+        """Record how long an LLM turn took."""
+        with self._lock:
+            self._latencies.append((time.monotonic(), latency_ms))
+            self._expire()
+        if self._redis is not None:
+            member = f"{uuid.uuid4().hex[:8]}:{latency_ms}"
+            self._shared(lambda r: r.zadd(self._key("latency"), {member: time.time()}))
+
+    def record_deterministic(self) -> None:
+        """Count a shed turn that was still served by the timer or notes ability."""
+        with self._lock:
+            self._counters["served_deterministic"] += 1
+
+    def recent_latency_ms(self) -> Optional[int]:
+        """Average latency of turns within the window, or None with too few samples."""
+        if self._redis is not None:
+            latencies = self._shared(self._shared_latencies)
+            if latencies is not None:
+                if len(latencies) < max(self.min_samples, 1):
+                    return None
+                return round(sum(latencies) / len(latencies))
+
+        with self._lock:
+            self._expire()
+            if len(self._latencies) < max(self.min_samples, 1):
+                return None
+            return round(sum(ms for _, ms in self._latencies) / len(self._latencies))
+
+    def _shared_latencies(self, r) -> List[int]:
+        """Latencies all processes recorded within the window."""
+        now = time.time()
+        pipe = r.pipeline(transaction=False)
+        pipe.zremrangebyscore(self._key("latency"), 0, now - self.window)
+        pipe.zrangebyscore(self._key("latency"), now - self.window, "+inf")
+        members = pipe.execute()[1]
+        return [int((m.decode() if isinstance(m, bytes) else m).rsplit(":", 1)[1]) for m in members]
+
+    def _shared(self, operation):
+        """Run a Redis operation; on any Redis problem fall back to the local signals (None)."""
+        try:
+            return operation(self._redis)
+        except Exception as e:
+            with self._lock:
+                self._counters["redis_errors"] += 1
+            logger.warning(f"Load shedding Redis unavailable, using per-process signals: {e}")
+            return None
+
+    def _key(self, name: str) -> str:
+        return f"{self.key_prefix}{name}"
+
+    def _expire(self) -> None:
+        """Drop latencies older than the window (caller holds the lock)."""
+        cutoff = time.monotonic() - self.window
+        while self._latencies and self._latencies[0][0] < cutoff:
+            self._latencies.popleft()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return admission counters and the current signals."""
+        latency = self.recent_latency_ms()
+        in_flight = self.in_flight()
+        with self._lock:
+            return {
+                **self._counters,
+                "enabled": self.enabled,
+                "queue_depth": self.scheduler.queue_depth(),
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": in_flight,
+                "max_in_flight": self.max_in_flight,
+                "shared": self._redis is not None,
+                "recent_latency_ms": latency,
+                "max_latency_ms": self.max_latency_ms,
+            }
+
+
+# Global load shedder
+load_shedder = LoadShedder.from_settings()
@@ -2,46 +2,86 @@
 Message processing service that handles business logic for chat messages.
 Separates concerns from the API views layer.
 """
+import asyncio
 import logging
+import time
 from typing import Dict, Any, Optional, Tuple
-from asgiref.sync import async_to_sync
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
-from apps.chat.models import Conversation, Message
+from apps.chat.models import Conversation, GenerationTelemetry, Message
+from core.bruno_integration.deadlines import Deadline
+from core.bruno_integration.event_loop import llm_loop
+from core.bruno_integration.intent_router import Intent
 from core.services import chat_service
+from core.services.load_shedder import ShedDecision, load_shedder
+from core.services.stream_publisher import ChatStreamPublisher
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+BUSY_REPLY = "I'm getting a lot of messages right now, so give me a moment and try again. Timers and notes still work."
+
 
 class MessageService:
     """Service for handling message processing business logic."""
     
-    def detect_command(self, content: str, override: Optional[bool] = None) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    def detect_command(
+        self,
+        content: str,
+        override: Optional[bool] = None,
+        user_id: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        intent: Optional[Intent] = None
+    ) -> Tuple[bool, Optional[Dict[str, Any]]]:
         """
-        Detect if message is a command using LLM or override.
+        Detect if message is a command using the intent router, the LLM or override.
         
         Args:
             content: Message content to analyze
             override: Optional override for command detection
+            user_id: User who sent the message (for fair scheduling)
+            deadline: Time budget of the request
+            intent: The intent router's classification; the LLM is only asked
+                when it is ambiguous
             
         Returns:
             Tuple of (is_command, detection_result)
         """
         if override is not None:
             return override, None
+        
+        routed = intent.detection_result() if intent else None
+        if routed is not None:
+            logger.info(f"🔍 Intent router: {intent.kind} ({intent.reason}) - skipping LLM detection")
+            return routed['is_command'], routed
             
         logger.info(f"🔍 Using LLM to detect command for message: '{content}'")
         
-        detection_result = async_to_sync(chat_service.command_detector.detect_command)(content)
+        detection_result = llm_loop.async_to_sync(chat_service.command_detector.detect_command)(
+            content, user_id=user_id, deadline=deadline
+        )
+        return self._is_command(detection_result), detection_result
+    
+    @staticmethod
+    def _is_command(detection_result: Dict[str, Any]) -> bool:
+        """Whether a detection result is confident enough to treat the message as a command."""
         is_command = detection_result['is_command'] and detection_result['confidence'] >= 0.7
         
         logger.info(f"📊 Command detection: is_command={is_command}, type={detection_result['command_type']}, confidence={detection_result['confidence']}")
         
-        return is_command, detection_result
+        return is_command
     
-    def process_chat_message(self, conversation: Conversation, content: str, is_task_command: bool) -> Dict[str, Any]:
+    def process_chat_message(
+        self,
+        conversation: Conversation,
+        content: str,
+        is_task_command: bool,
+        publisher: Optional[ChatStreamPublisher] = None,
+        deadline: Optional[Deadline] = None,
+        intent: Optional[Intent] = None
+    ) -> Dict[str, Any]:
         """
         Process message through Bruno chat service.
         
@@ -49,18 +89,177 @@ class MessageService:
             conversation: Conversation instance
             content: Message content
             is_task_command: Whether this is a task command
+            publisher: Optional publisher streaming token deltas to the user's WebSocket
+            deadline: Time budget of the request
+            intent: The intent router's classification, reused by the agent's dispatch
             
         Returns:
             Chat service response
         """
-        return async_to_sync(chat_service.process_message)(
+        return llm_loop.async_to_sync(chat_service.process_message)(
             conversation_id=str(conversation.id),
             user_message=content,
             agent_id=str(conversation.agent.id),
             user_id=str(conversation.user.id),
-            is_task_command=is_task_command
+            is_task_command=is_task_command,
+            publisher=publisher,
+            deadline=deadline,
+            intent=intent
         )
     
+    def process_speculatively(
+        self,
+        conversation: Conversation,
+        content: str,
+        publisher: Optional[ChatStreamPublisher] = None,
+        deadline: Optional[Deadline] = None,
+        speculate_generation: bool = False,
+        intent: Optional[Intent] = None
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[int]]:
+        """
+        Detect commands and process the message concurrently.
+        
+        The agent assembles context (and with ``speculate_generation`` starts a
+        conversational reply) while the command detector runs, then waits for
+        its decision. Detection is cancelled if the reply does not need it,
+        e.g. when the timer or notes ability answered the message.
+        
+        Args:
+            conversation: Conversation instance
+            content: Message content
+            publisher: Optional publisher streaming token deltas to the user's WebSocket
+            deadline: Time budget of the request
+            speculate_generation: Also generate before the detector decides
+            intent: The intent router's classification, reused by the agent's dispatch
+            
+        Returns:
+            Tuple of (chat service response, detection_result, detection_ms);
+            the last two are None if detection was cancelled
+        """
+        return llm_loop.async_to_sync(self._process_speculatively)(
+            conversation_id=str(conversation.id),
+            agent_id=str(conversation.agent.id),
+            user_id=str(conversation.user.id),
+            content=content,
+            publisher=publisher,
+            deadline=deadline,
+            speculate_generation=speculate_generation,
+            intent=intent
+        )
+    
+    async def _process_speculatively(
+        self,
+        conversation_id: str,
+        agent_id: str,
+        user_id: str,
+        content: str,
+        publisher: Optional[ChatStreamPublisher],
+        deadline: Optional[Deadline],
+        speculate_generation: bool,
+        intent: Optional[Intent] = None
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[int]]:
+        logger.info(f"🔍 Using LLM to detect command for message (speculative): '{content}'")
+        started = time.monotonic()
+        outcome: Dict[str, Any] = {}
+        
+        async def decide() -> bool:
+            detection_result = await chat_service.command_detector.detect_command(
+                content, user_id=user_id, deadline=deadline
+            )
+            outcome['result'] = detection_result
+            outcome['detection_ms'] = round((time.monotonic() - started) * 1000)
+            return self._is_command(detection_result)
+        
+        decision = asyncio.ensure_future(decide())
+        try:
+            response = await chat_service.process_message(
+                conversation_id=conversation_id,
+                user_message=content,
+                agent_id=agent_id,
+                user_id=user_id,
+                publisher=publisher,
+                deadline=deadline,
+                task_decision=decision,
+                speculate_generation=speculate_generation,
+                intent=intent
+            )
+        finally:
+            if not decision.done():
+                decision.cancel()
+            await asyncio.gather(decision, return_exceptions=True)
+        
+        return response, outcome.get('result'), outcome.get('detection_ms')
+    
+    def process_shed(
+        self,
+        conversation: Conversation,
+        content: str,
+        is_response_to_proactive: bool,
+        publisher: Optional[ChatStreamPublisher],
+        shed: ShedDecision
+    ) -> Dict[str, Any]:
+        """
+        Serve a turn the load shedder turned away, without calling the LLM.
+        
+        Timer and notes commands are answered as usual. Other messages get the
+        busy reply, or with LOAD_SHEDDING_RESPONSE='503' nothing is stored and
+        the caller answers 503 with Retry-After so the client can resend.
+        
+        Args:
+            conversation: Conversation instance
+            content: Message content
+            is_response_to_proactive: Whether this is response to proactive message
+            publisher: Publisher for a streamed turn
+            shed: The load shedder's decision
+            
+        Returns:
+            Same shape as process_message; 'shed' is set unless a command was served,
+            and the messages are missing when the turn was rejected outright
+        """
+        response = llm_loop.async_to_sync(chat_service.process_deterministic)(
+            str(conversation.id), content, str(conversation.user.id)
+        )
+        
+        if response is None and getattr(settings, 'LOAD_SHEDDING_RESPONSE', 'busy') == '503':
+            return {'success': False, 'shed': shed.as_dict(), 'error': 'Assistant is busy'}
+        
+        self.update_conversation_tracking(conversation, is_response_to_proactive)
+        user_message = self.create_user_message(conversation, content)
+        
+        busy = response is None
+        if busy:
+            response = {'content': BUSY_REPLY, 'tokens_used': 0, 'success': True}
+        else:
+            load_shedder.record_deterministic()
+        assistant_message = self.create_assistant_message(conversation, response)
+        
+        if publisher:
+            self.finish_stream(publisher, assistant_message)
+        
+        result = {
+            'user_message': user_message,
+            'assistant_message': assistant_message,
+            'success': True
+        }
+        if busy:
+            result['shed'] = shed.as_dict()
+        return result
+    
+    def finish_stream(self, publisher: ChatStreamPublisher, assistant_message: Message) -> None:
+        """
+        Send the terminating ``chat_delta`` event carrying the persisted message.
+        
+        Args:
+            publisher: Publisher used for the streamed turn
+            assistant_message: Persisted assistant message
+        """
+        llm_loop.async_to_sync(publisher.finish)({
+            'id': str(assistant_message.id),
+            'content': assistant_message.content,
+            'role': assistant_message.role,
+            'created_at': assistant_message.created_at.isoformat()
+        })
+    
     def extract_memories_async(self, user, content: str, message_id: str) -> None:
         """
         Extract and save long-term memories from user message (async background task).
@@ -74,6 +273,19 @@ class MessageService:
         logger.info(f"Memory extraction not yet implemented for message {message_id}")
         pass
     
+    def index_for_recall(self, user) -> None:
+        """
+        Start indexing the user's new messages for semantic recall.
+        
+        Runs on the long-lived loop without waiting for it, so the next
+        recall finds the index up to date.
+        
+        Args:
+            user: User whose messages were saved
+        """
+        if chat_service.recall.enabled:
+            llm_loop.async_to_sync(chat_service.recall.start_indexing)(str(user.id))
+    
     def create_user_message(self, conversation: Conversation, content: str) -> Message:
         """
         Create user message and update conversation title if needed.
@@ -122,6 +334,50 @@ class MessageService:
             tokens_used=response.get('tokens_used', 0)
         )
     
+    def record_telemetry(
+        self,
+        assistant_message: Message,
+        response: Dict[str, Any],
+        stages: Dict[str, int]
+    ) -> Optional[GenerationTelemetry]:
+        """
+        Store the timings of the turn that produced an assistant message.
+        
+        Args:
+            assistant_message: Persisted assistant message
+            response: Chat service response (its 'timings' come from the agent and LLM client)
+            stages: Stage durations in milliseconds measured by this service
+            
+        Returns:
+            Created GenerationTelemetry, or None if disabled or it could not be saved
+        """
+        if not getattr(settings, 'CHAT_TELEMETRY_ENABLED', True):
+            return None
+        
+        timings = {**response.get('timings', {}), **stages}
+        fields = {
+            name: max(int(value), 0)
+            for name, value in timings.items()
+            if name in GenerationTelemetry.STAGE_FIELDS and value is not None
+        }
+        
+        route = ''
+        if response.get('route'):
+            route = f"{response['route']['tier']}:{response['route']['reason']}"
+        
+        try:
+            return GenerationTelemetry.objects.create(
+                message=assistant_message,
+                model=assistant_message.model,
+                route=route,
+                escalated=bool(response.get('route', {}).get('escalated')),
+                **fields
+            )
+        except Exception as e:
+            # Telemetry must never fail the turn
+            logger.warning(f"Could not record telemetry for message {assistant_message.id}: {e}")
+            return None
+    
     def create_error_message(self, conversation: Conversation) -> Message:
         """
         Create error response message.
@@ -154,7 +410,14 @@ class MessageService:
         if is_response_to_proactive:
             conversation.record_proactive_response()
     
-    def process_message(self, conversation: Conversation, content: str, is_response_to_proactive: bool = False, is_task_command_override: Optional[bool] = None) -> Dict[str, Any]:
+    def process_message(
+        self,
+        conversation: Conversation,
+        content: str,
+        is_response_to_proactive: bool = False,
+        is_task_command_override: Optional[bool] = None,
+        stream_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Main method to process a chat message with full business logic.
         
@@ -163,29 +426,110 @@ class MessageService:
             content: Message content
             is_response_to_proactive: Whether this is response to proactive message
             is_task_command_override: Optional override for task command detection
+            stream_id: When set, token deltas are streamed to the user's WebSocket
+                as ``chat_delta`` events tagged with this ID
             
         Returns:
-            Dictionary with processing results including user_message, assistant_message, success, etc.
+            Dictionary with processing results including user_message, assistant_message, success, etc.;
+            'shed' is set when the LLM was saturated (see process_shed)
+        """
+        publisher = ChatStreamPublisher(str(conversation.user.id), stream_id) if stream_id else None
+        
+        # Under LLM saturation only timer and notes commands are processed
+        shed = load_shedder.check()
+        if shed:
+            return self.process_shed(conversation, content, is_response_to_proactive, publisher, shed)
+        
+        # Counted as in flight for every worker process until it finishes
+        turn = load_shedder.start_turn()
+        try:
+            return self.process_admitted(conversation, content, is_response_to_proactive,
+                                         is_task_command_override, publisher)
+        finally:
+            load_shedder.finish_turn(turn)
+    
+    def process_admitted(
+        self,
+        conversation: Conversation,
+        content: str,
+        is_response_to_proactive: bool,
+        is_task_command_override: Optional[bool],
+        publisher: Optional[ChatStreamPublisher]
+    ) -> Dict[str, Any]:
+        """
+        Process a message that passed load shedding (see process_message).
+        
+        Returns:
+            Dictionary with processing results
         """
+        # One budget for detection and generation, finishing before the worker timeout
+        deadline = Deadline.after(settings.CHAT_RESPONSE_DEADLINE)
+        started = time.monotonic()
+        
+        def elapsed_ms(since: float) -> int:
+            return round((time.monotonic() - since) * 1000)
+        
         try:
             # Update conversation tracking
             self.update_conversation_tracking(conversation, is_response_to_proactive)
             
-            # Detect if this is a command
-            is_task_command, detection_result = self.detect_command(content, is_task_command_override)
+            # Timer/notes commands and plain chat are recognised without the LLM
+            intent = None
+            if is_task_command_override is None:
+                intent = chat_service.intent_router.classify(content, str(conversation.id))
             
-            # Create user message
-            user_message = self.create_user_message(conversation, content)
-            
-            # Process message through Bruno chat service (which now handles timer/notes abilities)
-            response = self.process_chat_message(conversation, content, is_task_command)
+            speculation = getattr(settings, 'CHAT_SPECULATION', 'off')
+            if intent and intent.kind == 'ambiguous' and speculation in ('context', 'generate'):
+                # Detection runs alongside context assembly (and generation)
+                stage_started = time.monotonic()
+                user_message = self.create_user_message(conversation, content)
+                persistence_ms = elapsed_ms(stage_started)
+                
+                response, detection_result, detection_ms = self.process_speculatively(
+                    conversation, content, publisher, deadline,
+                    speculate_generation=speculation == 'generate', intent=intent
+                )
+            else:
+                # Detect if this is a command
+                stage_started = time.monotonic()
+                is_task_command, detection_result = self.detect_command(
+                    content, is_task_command_override, str(conversation.user.id), deadline, intent
+                )
+                detection_ms = elapsed_ms(stage_started)
+                
+                # Create user message
+                stage_started = time.monotonic()
+                user_message = self.create_user_message(conversation, content)
+                persistence_ms = elapsed_ms(stage_started)
+                
+                # Process message through Bruno chat service (which now handles timer/notes abilities)
+                response = self.process_chat_message(
+                    conversation, content, is_task_command, publisher, deadline, intent
+                )
             
-            # Create assistant message with response
+            # Create assistant message with response (persisted once, after streaming)
+            stage_started = time.monotonic()
             assistant_message = self.create_assistant_message(conversation, response)
+            persistence_ms += elapsed_ms(stage_started)
+            
+            total_ms = elapsed_ms(started)
+            self.record_telemetry(assistant_message, response, {
+                'detection_ms': detection_ms if detection_result is not None else None,
+                'persistence_ms': persistence_ms,
+                'total_ms': total_ms
+            })
+            if not (response.get('is_timer_response') or response.get('is_notes_response')):
+                load_shedder.record(total_ms)
+            
+            if publisher:
+                self.finish_stream(publisher, assistant_message)
             
             # Extract and save long-term memories (async background task)
             self.extract_memories_async(conversation.user, content, str(user_message.id))
             
+            # Add the turn to the user's recall index (background task)
+            self.index_for_recall(conversation.user)
+            
             return {
                 'user_message': user_message,
                 'assistant_message': assistant_message,
@@ -202,6 +546,9 @@ class MessageService:
             # Create error response message
             assistant_message = self.create_error_message(conversation)
             
+            if publisher:
+                self.finish_stream(publisher, assistant_message)
+            
             return {
                 'user_message': user_message,
                 'assistant_message': assistant_message,
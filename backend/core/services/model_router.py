@@ -0,0 +1,198 @@
+"""
+Model Router - Sends easy chat turns to a smaller model
+"""
+from typing import Dict, Optional, Any
+from dataclasses import dataclass
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+# Whole-message acknowledgements and greetings a small model answers as well as a large one
+SMALL_TALK_PATTERN = re.compile(
+    r"^\s*(hi|hello|hey|yo|hiya|good (morning|afternoon|evening|night)|thanks?( you)?|thank u|thx|ty|"
+    r"ok(ay)?|k|cool|nice|great|awesome|perfect|sure|yes|yeah|yep|no|nope|got it|sounds good|"
+    r"bye|goodbye|see (you|ya)|cya|lol|haha|np|no problem)"
+    r"(\s+(there|bruno|so much|a lot|again))?\b[\s!.?,:)\-]*$",
+    re.IGNORECASE
+)
+
+# Requests that need the full model however short they are
+HARD_TURN_PATTERN = re.compile(
+    r"```|\b(explain|why|how (do|does|can|would|should)|compare|analy[sz]e|summari[sz]e|"
+    r"write|code|debug|plan|translate|calculate|prove|step by step|pros and cons)\b",
+    re.IGNORECASE
+)
+
+
+@dataclass
+class RouteDecision:
+    """The model chosen for one turn and why."""
+    model: str
+    tier: str
+    reason: str
+    full_model: str
+
+    @property
+    def is_small(self) -> bool:
+        return self.tier == "small"
+
+
+class ModelRouter:
+    """
+    Cascade router that picks a model per chat turn.
+
+    Easy turns (greetings and acknowledgements, confirmations of task
+    commands, short messages early in a conversation) go to the configured
+    small model; everything else goes to the agent's own model. If the small
+    model fails or returns nothing the turn is escalated to the full model,
+    which is safe because nothing was streamed to the user yet.
+
+    Decisions and per-model latencies are counted so the thresholds can be
+    tuned; the same latencies are persisted per message in
+    GenerationTelemetry under the model that actually answered.
+    """
+
+    def __init__(
+        self,
+        small_model: Optional[str] = None,
+        max_words: int = 12,
+        max_history: int = 20,
+        escalate: bool = True
+    ):
+        """
+        Initialize model router.
+
+        Args:
+            small_model: Model for easy turns (routing is off when empty)
+            max_words: Longest message, in words, that counts as short
+            max_history: Deepest history, in messages, in which short messages
+                still go to the small model
+            escalate: Retry with the full model when the small one fails or
+                returns an empty reply
+        """
+        self.small_model = small_model or None
+        self.max_words = max_words
+        self.max_history = max_history
+        self.escalate = escalate
+        self._lock = threading.Lock()
+        self._decisions: Dict[str, int] = {}
+        self._latency: Dict[str, Dict[str, int]] = {}
+        self._counters = {"routed_small": 0, "routed_full": 0, "escalations": 0}
+
+    @classmethod
+    def from_settings(cls) -> 'ModelRouter':
+        """Create a model router configured from Django settings."""
+        from django.conf import settings
+
+        return cls(
+            small_model=getattr(settings, 'CHAT_CASCADE_SMALL_MODEL', ''),
+            max_words=getattr(settings, 'CHAT_CASCADE_MAX_WORDS', 12),
+            max_history=getattr(settings, 'CHAT_CASCADE_MAX_HISTORY', 20),
+            escalate=getattr(settings, 'CHAT_CASCADE_ESCALATE', True),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.small_model is not None
+
+    def route(
+        self,
+        user_message: str,
+        full_model: str,
+        history_depth: int = 0,
+        is_task_command: bool = False
+    ) -> RouteDecision:
+        """
+        Choose the model for a turn.
+
+        Args:
+            user_message: The user's message
+            full_model: The agent's configured model
+            history_depth: Messages of history available for the turn
+            is_task_command: Whether the reply only confirms a timer/reminder/note
+
+        Returns:
+            RouteDecision for the turn
+        """
+        decision = self._decide(user_message, full_model, history_depth, is_task_command)
+        with self._lock:
+            self._decisions[decision.reason] = self._decisions.get(decision.reason, 0) + 1
+            self._counters["routed_small" if decision.is_small else "routed_full"] += 1
+        logger.debug(f"Routed turn to {decision.model} ({decision.reason})")
+        return decision
+
+    def _decide(
+        self,
+        user_message: str,
+        full_model: str,
+        history_depth: int,
+        is_task_command: bool
+    ) -> RouteDecision:
+        def small(reason: str) -> RouteDecision:
+            return RouteDecision(self.small_model, "small", reason, full_model)
+
+        def full(reason: str) -> RouteDecision:
+            return RouteDecision(full_model, "full", reason, full_model)
+
+        if not self.enabled or self.small_model == full_model:
+            return full("disabled")
+        if is_task_command:
+            return small("task_command")
+        if SMALL_TALK_PATTERN.match(user_message):
+            return small("small_talk")
+        if HARD_TURN_PATTERN.search(user_message):
+            return full("hard_intent")
+        if len(user_message.split()) > self.max_words:
+            return full("long_message")
+        if history_depth > self.max_history:
+            return full("deep_history")
+        return small("short_message")
+
+    def should_escalate(self, decision: RouteDecision, response: Optional[Dict[str, Any]]) -> bool:
+        """
+        Whether a small-model reply should be regenerated with the full model.
+
+        Args:
+            decision: The turn's routing decision
+            response: The LLM response, or None if the call raised
+        """
+        if not (self.escalate and decision.is_small):
+            return False
+        if response is not None and response.get("content", "").strip():
+            return False
+        with self._lock:
+            self._counters["escalations"] += 1
+        logger.info(f"Escalating turn from {decision.model} to {decision.full_model}")
+        return True
+
+    def record(self, model: str, latency_ms: int) -> None:
+        """Count one generation's latency against the model that produced it."""
+        with self._lock:
+            entry = self._latency.setdefault(model, {"count": 0, "total_ms": 0, "max_ms": 0})
+            entry["count"] += 1
+            entry["total_ms"] += latency_ms
+            entry["max_ms"] = max(entry["max_ms"], latency_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return routing counters and per-model latency."""
+        with self._lock:
+            return {
+                **self._counters,
+                "small_model": self.small_model,
+                "decisions": dict(self._decisions),
+                "latency": {
+                    model: {
+                        "count": entry["count"],
+                        "avg_ms": round(entry["total_ms"] / entry["count"]),
+                        "max_ms": entry["max_ms"],
+                    }
+                    for model, entry in self._latency.items()
+                },
+            }
+
+
+# Global model router
+model_router = ModelRouter.from_settings()
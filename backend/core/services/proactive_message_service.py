@@ -4,9 +4,9 @@ Separates concerns from the API views layer.
 """
 import logging
 from typing import Dict, Any, Tuple
-from asgiref.sync import async_to_sync
 
 from apps.chat.models import Conversation, Message
+from core.bruno_integration.event_loop import llm_loop
 
 
 logger = logging.getLogger(__name__)
@@ -42,7 +42,7 @@ class ProactiveMessageService:
         """
         # Generate proactive message
         from core.bruno_integration.proactive_messages import proactive_message_generator
-        message_data = async_to_sync(proactive_message_generator.generate_proactive_message)(
+        message_data = llm_loop.async_to_sync(proactive_message_generator.generate_proactive_message)(
             user_id=str(conversation.user.id),
             conversation_id=str(conversation.id),
             proactivity_level=conversation.proactivity_level
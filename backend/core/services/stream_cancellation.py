@@ -0,0 +1,104 @@
+"""
+Stream Cancellation - Stops in-flight generations whose WebSocket went away
+"""
+from typing import Awaitable, Optional, TypeVar
+import asyncio
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class GenerationCancelled(Exception):
+    """The client watching a streamed generation asked for it to stop."""
+
+
+def stream_group_name(user_id: str, stream_id: str) -> str:
+    """Channel-layer group that a streamed generation listens on for cancellation."""
+    # Stream IDs come from the client; hash them into a valid, bounded group name
+    digest = hashlib.sha256(f"{user_id}:{stream_id}".encode('utf-8')).hexdigest()
+    return f"stream_{digest[:40]}"
+
+
+async def request_cancel(user_id: str, stream_id: str, channel_layer=None) -> None:
+    """
+    Ask the worker generating ``stream_id`` to stop.
+
+    Goes through the channel layer, so it reaches the generation even when it
+    runs in a different process from the WebSocket consumer.
+
+    Args:
+        user_id: Owner of the stream (streams are namespaced per user)
+        stream_id: Client-visible stream ID
+        channel_layer: Channel layer to use (defaults to the configured layer)
+    """
+    if channel_layer is None:
+        from channels.layers import get_channel_layer
+        channel_layer = get_channel_layer()
+
+    try:
+        await channel_layer.group_send(stream_group_name(user_id, stream_id), {'type': 'stream.cancel'})
+    except Exception as e:
+        logger.warning(f"Failed to request cancellation of stream {stream_id}: {e}")
+
+
+async def run_cancellable(
+    work: Awaitable[T],
+    user_id: str,
+    stream_id: str,
+    channel_layer=None
+) -> T:
+    """
+    Run ``work`` until it finishes or its stream is cancelled.
+
+    Args:
+        work: Coroutine producing the streamed response
+        user_id: Owner of the stream
+        stream_id: Client-visible stream ID
+        channel_layer: Channel layer to listen on (defaults to the configured layer)
+
+    Returns:
+        Result of ``work``
+
+    Raises:
+        GenerationCancelled: If a cancellation request arrived first
+    """
+    if channel_layer is None:
+        from channels.layers import get_channel_layer
+        channel_layer = get_channel_layer()
+
+    group = stream_group_name(user_id, stream_id)
+    channel: Optional[str] = None
+    try:
+        channel = await channel_layer.new_channel()
+        await channel_layer.group_add(group, channel)
+    except Exception as e:
+        # Without a channel layer the generation simply cannot be cancelled
+        logger.warning(f"Stream {stream_id} is not cancellable: {e}")
+        return await work
+
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(channel_layer.receive(channel))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if task.done():
+            return task.result()
+        if watcher.exception() is not None:
+            logger.warning(f"Stopped listening for cancellation of stream {stream_id}: {watcher.exception()}")
+            return await task
+
+        logger.info(f"Cancelling generation for stream {stream_id}")
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        raise GenerationCancelled(stream_id)
+    finally:
+        for pending in (task, watcher):
+            if not pending.done():
+                pending.cancel()
+        await asyncio.gather(task, watcher, return_exceptions=True)
+        try:
+            await channel_layer.group_discard(group, channel)
+        except Exception:
+            pass
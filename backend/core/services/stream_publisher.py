@@ -0,0 +1,95 @@
+"""
+Stream Publisher - Pushes LLM token deltas to a user's WebSocket group
+"""
+from typing import Dict, Any, Optional
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ChatStreamPublisher:
+    """
+    Publishes streamed assistant output as ``chat_delta`` events.
+
+    Deltas are coalesced for ``flush_interval`` seconds before being sent so a
+    fast model does not turn every token into a channel-layer round trip.
+    """
+
+    def __init__(
+        self,
+        user_id: str,
+        stream_id: str,
+        channel_layer=None,
+        flush_interval: float = 0.05
+    ):
+        """
+        Initialize publisher.
+
+        Args:
+            user_id: ID of the user whose ``chat_{user_id}`` group receives the events
+            stream_id: Client-visible ID correlating deltas with the final message
+            channel_layer: Channel layer to publish on (defaults to the configured layer)
+            flush_interval: Seconds to buffer deltas before sending them
+        """
+        if channel_layer is None:
+            from channels.layers import get_channel_layer
+            channel_layer = get_channel_layer()
+
+        self.channel_layer = channel_layer
+        self.user_id = user_id
+        self.group_name = f"chat_{user_id}"
+        self.stream_id = stream_id
+        self.flush_interval = flush_interval
+        self.sequence = 0
+        self._buffer = ""
+        self._last_flush = 0.0
+
+    async def send_delta(self, delta: str) -> None:
+        """Buffer a text delta, flushing it if the flush interval has elapsed."""
+        self._buffer += delta
+
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Send any buffered text as a single ``chat_delta`` event."""
+        if not self._buffer:
+            return
+
+        delta, self._buffer = self._buffer, ""
+        self._last_flush = time.monotonic()
+        await self._publish({
+            'delta': delta,
+            'done': False
+        })
+
+    async def finish(self, message: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Flush remaining text and send the terminating event.
+
+        Args:
+            message: Serialized persisted assistant message, if one was created
+        """
+        await self.flush()
+        await self._publish({
+            'delta': '',
+            'done': True,
+            'message': message
+        })
+
+    async def _publish(self, payload: Dict[str, Any]) -> None:
+        """Send an event to the user's group, never failing the chat turn."""
+        event = {
+            'type': 'chat_delta',
+            'stream_id': self.stream_id,
+            'sequence': self.sequence,
+            **payload
+        }
+        self.sequence += 1
+
+        try:
+            await self.channel_layer.group_send(self.group_name, event)
+        except Exception as e:
+            logger.warning(f"Failed to publish chat delta for stream {self.stream_id}: {e}")
@@ -0,0 +1,113 @@
+"""
+Unit tests for CommandDetector, including batched detection.
+"""
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock
+from core.bruno_integration.micro_batcher import MicroBatcher
+from core.services.command_detector import CommandDetector
+
+
+TIMER = {"is_command": True, "command_type": "timer", "confidence": 0.95}
+CHAT = {"is_command": False, "command_type": "other", "confidence": 0.9}
+
+
+def _llm_client(responses, delay=0.02):
+    """LLM client double answering generate() calls in order."""
+    client = AsyncMock()
+    queue = list(responses)
+
+    async def generate(**kwargs):
+        await asyncio.sleep(delay)
+        return {'content': queue.pop(0), 'model': kwargs['model'], 'tokens_used': 1}
+
+    client.generate = AsyncMock(side_effect=generate)
+    client.get_cached = AsyncMock(return_value=None)
+    client.set_cached = AsyncMock()
+    return client
+
+
+@pytest.mark.asyncio
+class TestCommandDetector:
+    """Test single and batched command detection."""
+
+    async def test_single_detection(self):
+        """An idle detection makes one single-message call."""
+        client = _llm_client([json.dumps(TIMER)])
+        detector = CommandDetector(llm_client=client, batcher=MicroBatcher())
+
+        result = await detector.detect_command('set a timer for 5 minutes')
+
+        assert result['is_command'] is True
+        assert result['command_type'] == 'timer'
+        assert client.generate.call_args.kwargs['cache'] is True
+
+    async def test_concurrent_detections_share_one_call(self):
+        """Detections queued behind a running call are answered by one batched call."""
+        client = _llm_client([
+            json.dumps(CHAT),
+            json.dumps([TIMER, CHAT]),
+        ])
+        detector = CommandDetector(llm_client=client, batcher=MicroBatcher(window=0.05))
+
+        first = asyncio.ensure_future(detector.detect_command('hello'))
+        await asyncio.sleep(0)
+        timer, chat = await asyncio.gather(
+            detector.detect_command('set a timer for 5 minutes'),
+            detector.detect_command('how are you?'),
+        )
+        await first
+
+        assert client.generate.call_count == 2
+        batch_prompt = client.generate.call_args.kwargs['messages'][1]['content']
+        assert '1. "set a timer for 5 minutes"' in batch_prompt
+        assert '2. "how are you?"' in batch_prompt
+        assert timer['command_type'] == 'timer'
+        assert chat['is_command'] is False
+        # Batch results are cached under each message's single-detection key
+        assert client.set_cached.call_count == 2
+
+    async def test_malformed_batch_falls_back_to_single_calls(self):
+        """If the batched answer cannot be matched to the messages, each retries alone."""
+        client = _llm_client([
+            json.dumps(CHAT),
+            json.dumps([TIMER]),  # one object for two messages
+            json.dumps(TIMER),
+            json.dumps(CHAT),
+        ])
+        detector = CommandDetector(llm_client=client, batcher=MicroBatcher(window=0.05))
+
+        first = asyncio.ensure_future(detector.detect_command('hello'))
+        await asyncio.sleep(0)
+        results = await asyncio.gather(
+            detector.detect_command('set a timer for 5 minutes'),
+            detector.detect_command('how are you?'),
+        )
+        await first
+
+        assert client.generate.call_count == 4
+        assert sorted(r['command_type'] for r in results) == ['other', 'timer']
+
+    async def test_cached_members_skip_the_batch(self):
+        """Messages with a cached detection are not sent in the batched prompt."""
+        client = _llm_client([json.dumps(CHAT), json.dumps(TIMER)])
+
+        async def get_cached(messages, *args):
+            return {'content': json.dumps(CHAT)} if 'tell me a joke' in messages[1]['content'] else None
+
+        client.get_cached = AsyncMock(side_effect=get_cached)
+        detector = CommandDetector(llm_client=client, batcher=MicroBatcher(window=0.05))
+
+        first = asyncio.ensure_future(detector.detect_command('hello'))
+        await asyncio.sleep(0)
+        timer, chat = await asyncio.gather(
+            detector.detect_command('set a timer for 5 minutes'),
+            detector.detect_command('tell me a joke'),
+        )
+        await first
+
+        assert timer['command_type'] == 'timer'
+        assert chat['is_command'] is False
+        # The remaining single uncached message went out as a normal detection
+        assert client.generate.call_args.kwargs['cache'] is True
@@ -0,0 +1,234 @@
+"""
+Unit tests for load shedding under LLM saturation.
+"""
+import time
+import pytest
+from rest_framework.test import APIClient
+from core.services import message_service as message_service_module
+from core.services.load_shedder import LoadShedder
+from core.services.message_service import BUSY_REPLY, MessageService
+
+
+class StubScheduler:
+    def __init__(self, depth=0):
+        self.depth = depth
+
+    def queue_depth(self, priority=None):
+        return self.depth
+
+
+class FakeRedis:
+    """Sorted sets shared by several shedders, standing in for one Redis server."""
+
+    def __init__(self):
+        self.sets = {}
+        self.down = False
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError('Redis is down')
+
+    def zadd(self, key, mapping):
+        self._check()
+        entries = self.sets.setdefault(key, {})
+        added = len(set(mapping) - set(entries))
+        entries.update(mapping)
+        return added
+
+    def zrem(self, key, member):
+        self._check()
+        self.sets.get(key, {}).pop(member, None)
+
+    def zremrangebyscore(self, key, low, high):
+        self._check()
+        entries = self.sets.get(key, {})
+        for member, score in list(entries.items()):
+            if low <= score <= high:
+                del entries[member]
+
+    def zcard(self, key):
+        self._check()
+        return len(self.sets.get(key, {}))
+
+    def zrangebyscore(self, key, low, high):
+        self._check()
+        high = float(high)
+        return [m.encode() for m, score in self.sets.get(key, {}).items() if low <= score <= high]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args) for name, args in self.calls]
+
+
+class TestLoadShedder:
+    """Test the admission decision."""
+
+    def test_admits_when_idle(self):
+        shedder = LoadShedder(scheduler=StubScheduler())
+
+        assert shedder.check() is None
+        assert shedder.stats()['admitted'] == 1
+
+    def test_deep_queue_sheds(self):
+        shedder = LoadShedder(scheduler=StubScheduler(depth=9), max_queue_depth=8, retry_after=7)
+
+        decision = shedder.check()
+
+        assert decision.reason == 'queue_depth=9'
+        assert decision.retry_after == 7
+
+    def test_slow_recent_turns_shed(self):
+        shedder = LoadShedder(scheduler=StubScheduler(), max_latency_ms=1000, min_samples=2, retry_after=5)
+        shedder.record(1500)
+        assert shedder.check() is None
+
+        shedder.record(30000)
+        decision = shedder.check()
+
+        assert decision.reason == 'latency_ms=15750'
+        assert decision.retry_after == 16
+
+    def test_latency_signal_expires(self):
+        """Without new turns the shedder recovers once old latencies leave the window."""
+        shedder = LoadShedder(scheduler=StubScheduler(), max_latency_ms=1000, min_samples=1, window=0.05)
+        shedder.record(5000)
+        assert shedder.check() is not None
+
+        time.sleep(0.06)
+
+        assert shedder.check() is None
+
+    def test_disabled(self):
+        shedder = LoadShedder(scheduler=StubScheduler(depth=100), enabled=False)
+
+        assert shedder.check() is None
+
+
+class TestSharedSignals:
+    """Test signals shared by worker processes through Redis."""
+
+    def _workers(self, count=2, **kwargs):
+        redis = FakeRedis()
+        return redis, [LoadShedder(scheduler=StubScheduler(), redis_client=redis, **kwargs) for _ in range(count)]
+
+    def test_turns_in_flight_in_other_processes_shed(self):
+        """Each sync worker's own queue stays empty, but the shared count does not."""
+        _, (first, second) = self._workers(max_in_flight=2)
+        turns = [first.start_turn(), first.start_turn()]
+
+        decision = second.check()
+
+        assert decision.reason == 'in_flight=2'
+        first.finish_turn(turns[0])
+        assert second.check() is None
+        assert second.stats()['in_flight'] == 1
+
+    def test_abandoned_turns_stop_counting(self):
+        _, (first, second) = self._workers(max_in_flight=1, turn_ttl=0.05)
+        first.start_turn()
+        assert second.check() is not None
+
+        time.sleep(0.06)
+
+        assert second.check() is None
+
+    def test_latency_is_averaged_across_processes(self):
+        _, (first, second) = self._workers(max_latency_ms=1000, min_samples=2)
+        first.record(1500)
+        second.record(30000)
+
+        assert first.recent_latency_ms() == second.recent_latency_ms() == 15750
+        assert second.check().reason == 'latency_ms=15750'
+
+    def test_falls_back_to_local_signals_without_redis(self):
+        redis, (shedder,) = self._workers(count=1, max_in_flight=1, max_latency_ms=1000, min_samples=1)
+        redis.down = True
+
+        assert shedder.start_turn() is None
+        shedder.record(5000)
+
+        assert shedder.check().reason == 'latency_ms=5000'
+        assert shedder.stats()['redis_errors'] >= 3
+
+
+@pytest.mark.django_db
+class TestSendMessageUnderLoad:
+    """Test send_message while the shedder turns turns away."""
+
+    @pytest.fixture
+    def client(self, test_user):
+        client = APIClient()
+        client.force_authenticate(user=test_user)
+        return client
+
+    @pytest.fixture(autouse=True)
+    def saturated(self, monkeypatch):
+        shedder = LoadShedder(scheduler=StubScheduler(depth=50), retry_after=12)
+        monkeypatch.setattr(message_service_module, 'load_shedder', shedder)
+        return shedder
+
+    def _send(self, client, conversation, content):
+        return client.post(
+            f'/api/conversations/{conversation.id}/send_message/', {'content': content}, format='json'
+        )
+
+    def test_conversational_turn_gets_busy_reply(self, client, test_conversation):
+        response = self._send(client, test_conversation, 'tell me about your day')
+
+        assert response.status_code == 200
+        assert response.data['degraded']
+        assert response.data['retry_after'] == 12
+        assert response.data['assistant_message']['content'] == BUSY_REPLY
+
+    def test_conversational_turn_gets_503(self, client, test_conversation, settings):
+        settings.LOAD_SHEDDING_RESPONSE = '503'
+
+        response = self._send(client, test_conversation, 'tell me about your day')
+
+        assert response.status_code == 503
+        assert response['Retry-After'] == '12'
+        assert not test_conversation.messages.exists()
+
+    def test_notes_commands_are_still_served(self, client, test_conversation, settings, saturated):
+        settings.LOAD_SHEDDING_RESPONSE = '503'
+
+        response = self._send(client, test_conversation, 'show notes')
+
+        assert response.status_code == 200
+        assert 'degraded' not in response.data
+        assert response.data['assistant_message']['content'] != BUSY_REPLY
+        assert saturated.stats()['served_deterministic'] == 1
+
+
+@pytest.mark.django_db
+class TestTurnsInFlight:
+    """Test process_message keeping the shared in-flight count."""
+
+    def test_turn_stops_counting_when_it_fails(self, monkeypatch, test_conversation):
+        redis = FakeRedis()
+        shedder = LoadShedder(scheduler=StubScheduler(), redis_client=redis, max_in_flight=1)
+        monkeypatch.setattr(message_service_module, 'load_shedder', shedder)
+        seen = []
+
+        def fail(*args):
+            seen.append(shedder.in_flight())
+            raise RuntimeError('worker crashed')
+
+        monkeypatch.setattr(MessageService, 'process_admitted', fail)
+
+        with pytest.raises(RuntimeError):
+            MessageService().process_message(test_conversation, 'hello')
+
+        assert seen == [1]
+        assert shedder.in_flight() == 0
@@ -0,0 +1,122 @@
+"""
+Unit tests for the cascade model router.
+"""
+import pytest
+from core.bruno_integration.tests.stubs import StubLLM, StubMemory, make_agent
+from core.services.model_router import ModelRouter
+
+
+FULL = 'mistral:7b'
+SMALL = 'llama3.2:1b'
+
+
+def _agent(llm, router, depth=2):
+    history = [{'role': 'user', 'content': f'message {i}'} for i in range(depth)]
+    return make_agent(llm, StubMemory(history), model=FULL, model_router=router)
+
+
+def _llm(**kwargs):
+    return StubLLM(reply=lambda messages, kwargs: f"reply from {kwargs.get('model')}", **kwargs)
+
+
+class TestModelRouter:
+    """Test routing heuristics."""
+
+    @pytest.mark.parametrize('message, reason', [
+        ('thanks!', 'small_talk'),
+        ('Good morning :)', 'small_talk'),
+        ('what is the capital of France?', 'short_message'),
+        ('explain recursion', 'hard_intent'),
+        ('```print(1)```', 'hard_intent'),
+        ('tell me everything you know about the history of the roman empire and its fall', 'long_message'),
+    ])
+    def test_heuristics(self, message, reason):
+        decision = ModelRouter(small_model=SMALL).route(message, FULL)
+
+        assert decision.reason == reason
+        assert decision.model == (SMALL if decision.is_small else FULL)
+
+    def test_task_commands_use_the_small_model(self):
+        decision = ModelRouter(small_model=SMALL).route('set a timer for 5 minutes', FULL, is_task_command=True)
+
+        assert decision.model == SMALL
+
+    def test_deep_history_uses_the_full_model(self):
+        router = ModelRouter(small_model=SMALL, max_history=10)
+
+        assert router.route('and then?', FULL, history_depth=4).model == SMALL
+        assert router.route('and then?', FULL, history_depth=11).reason == 'deep_history'
+        assert router.route('ok', FULL, history_depth=11).model == SMALL
+
+    def test_disabled_without_small_model(self):
+        router = ModelRouter(small_model='')
+
+        assert not router.enabled
+        assert router.route('hi', FULL).model == FULL
+
+    def test_decisions_are_counted(self):
+        router = ModelRouter(small_model=SMALL)
+        router.route('hi', FULL)
+        router.route('explain it', FULL)
+        router.record(SMALL, 100)
+        router.record(SMALL, 300)
+
+        stats = router.stats()
+        assert stats['decisions'] == {'small_talk': 1, 'hard_intent': 1}
+        assert stats['routed_small'] == 1 and stats['routed_full'] == 1
+        assert stats['latency'][SMALL] == {'count': 2, 'avg_ms': 200, 'max_ms': 300}
+
+
+@pytest.mark.asyncio
+class TestCascade:
+    """Test BrunoAgent with a model router."""
+
+    async def test_easy_turn_is_answered_by_the_small_model(self):
+        llm = _llm()
+        router = ModelRouter(small_model=SMALL)
+
+        result = await _agent(llm, router).process_message('hi there', 'c1')
+
+        assert llm.models == [SMALL]
+        assert result['model'] == SMALL
+        assert result['route'] == {'tier': 'small', 'reason': 'small_talk', 'escalated': False}
+        assert router.stats()['latency'][SMALL]['count'] == 1
+
+    async def test_hard_turn_is_answered_by_the_full_model(self):
+        llm = _llm()
+
+        result = await _agent(llm, ModelRouter(small_model=SMALL)).process_message('why is the sky blue?', 'c1')
+
+        assert llm.models == [FULL]
+        assert result['model'] == FULL
+
+    async def test_empty_small_reply_escalates(self):
+        llm = _llm(replies={SMALL: ''})
+        router = ModelRouter(small_model=SMALL)
+
+        result = await _agent(llm, router).process_message('hi', 'c1')
+
+        assert llm.models == [SMALL, FULL]
+        assert result['content'] == f'reply from {FULL}'
+        assert result['route']['escalated']
+        assert router.stats()['escalations'] == 1
+
+    async def test_failing_small_model_escalates(self):
+        llm = _llm(failing=(SMALL,))
+
+        result = await _agent(llm, ModelRouter(small_model=SMALL)).process_message('ok', 'c1', on_delta=_ignore)
+
+        assert result['success']
+        assert result['model'] == FULL
+
+    async def test_escalation_can_be_turned_off(self):
+        llm = _llm(failing=(SMALL,))
+
+        result = await _agent(llm, ModelRouter(small_model=SMALL, escalate=False)).process_message('ok', 'c1')
+
+        assert not result['success']
+        assert llm.models == [SMALL]
+
+
+async def _ignore(text):
+    pass
@@ -0,0 +1,150 @@
+"""
+Unit tests for overlapping command detection with the reply.
+"""
+import asyncio
+import pytest
+from core.bruno_integration.tests.stubs import StubLLM, StubMemory, make_agent
+from core.services import chat_service
+from core.services.message_service import MessageService
+
+
+REPLY = 'Hello there friend'
+MEMORY = StubMemory([{'role': 'user', 'content': 'earlier'}, {'role': 'assistant', 'content': 'reply'}])
+
+
+async def _decide_later(value, delay=0.05):
+    await asyncio.sleep(delay)
+    return value
+
+
+@pytest.mark.asyncio
+class TestSpeculativeAgent:
+    """Test BrunoAgent with a pending task decision."""
+
+    async def test_context_is_assembled_before_the_decision(self):
+        """History is fetched while the decision is pending; generation waits for it."""
+        llm = StubLLM(REPLY, step=0.01)
+        decision = asyncio.ensure_future(_decide_later(False))
+
+        result = await make_agent(llm, MEMORY).process_message('hi', 'c1', task_decision=decision)
+
+        assert result['success']
+        assert len(llm.calls) == 1
+        assert [m['content'] for m in llm.calls[0]['messages'][1:3]] == ['earlier', 'reply']
+
+    async def test_task_decision_selects_concise_prompt(self):
+        """A positive decision builds the task-command system prompt."""
+        llm = StubLLM(REPLY, step=0.01)
+
+        await make_agent(llm, MEMORY).process_message('set a timer', 'c1', task_decision=_decide_later(True))
+
+        assert 'TASK COMMAND' in llm.calls[0]['messages'][-2]['content']
+
+    async def test_speculative_deltas_are_held_until_the_decision(self):
+        """A conversational reply starts early, but nothing is streamed before the decision."""
+        llm = StubLLM(REPLY, step=0.005)
+        sent = []
+        decided = asyncio.Event()
+
+        async def on_delta(text):
+            sent.append((text, decided.is_set()))
+
+        async def decide():
+            await asyncio.sleep(0.03)
+            decided.set()
+            return False
+
+        result = await make_agent(llm, MEMORY).process_message(
+            'hi', 'c1', on_delta=on_delta, task_decision=decide(), speculate_generation=True
+        )
+
+        assert result['content'] == 'Hello there friend'
+        assert [text for text, _ in sent] == ['Hello', 'there', 'friend']
+        assert all(after for _, after in sent)
+        assert len(llm.calls) == 1
+
+    async def test_speculative_reply_is_discarded_for_task_commands(self):
+        """A task command cancels the speculative reply and generates a concise one."""
+        llm = StubLLM(REPLY, step=0.05)
+        sent = []
+
+        async def on_delta(text):
+            sent.append(text)
+
+        result = await make_agent(llm, MEMORY).process_message(
+            'set a timer', 'c1', on_delta=on_delta,
+            task_decision=_decide_later(True, delay=0.02), speculate_generation=True
+        )
+
+        assert result['success']
+        assert llm.cancelled == 1
+        assert len(llm.calls) == 2
+        assert not any('TASK COMMAND' in m['content'] for m in llm.calls[0]['messages'])
+        assert 'TASK COMMAND' in llm.calls[1]['messages'][-2]['content']
+        assert sent == ['Hello', 'there', 'friend']
+
+    async def test_failed_decision_waits_for_the_speculative_reply_to_stop(self):
+        """When detection fails the speculative call has finished cancelling by the time the error is reported."""
+        llm = StubLLM(REPLY, step=0.05)
+
+        async def decide():
+            await asyncio.sleep(0.02)
+            raise RuntimeError('detector crashed')
+
+        result = await make_agent(llm, MEMORY).process_message(
+            'hi', 'c1', task_decision=decide(), speculate_generation=True
+        )
+
+        assert not result['success']
+        assert result['error'] == 'detector crashed'
+        assert llm.cancelled == 1
+
+
+@pytest.mark.asyncio
+class TestProcessSpeculatively:
+    """Test MessageService running detection alongside the reply."""
+
+    async def test_detection_result_is_reported(self, monkeypatch):
+        """The detection result and its duration come back with the response."""
+        async def detect_command(content, **kwargs):
+            return {'is_command': False, 'command_type': 'other', 'confidence': 0.9}
+
+        async def process_message(task_decision=None, **kwargs):
+            return {'content': 'hi', 'is_task': await task_decision}
+
+        monkeypatch.setattr(chat_service.command_detector, 'detect_command', detect_command)
+        monkeypatch.setattr(chat_service, 'process_message', process_message)
+
+        response, detection, detection_ms = await MessageService()._process_speculatively(
+            'c1', 'a1', 'u1', 'hi', None, None, False
+        )
+
+        assert response == {'content': 'hi', 'is_task': False}
+        assert detection['command_type'] == 'other'
+        assert detection_ms is not None
+
+    async def test_detection_is_cancelled_when_not_needed(self, monkeypatch):
+        """Replies that never wait for the decision (e.g. abilities) cancel detection."""
+        cancelled = asyncio.Event()
+
+        async def detect_command(content, **kwargs):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def process_message(**kwargs):
+            await asyncio.sleep(0.01)
+            return {'content': 'Timer set.', 'is_timer_response': True}
+
+        monkeypatch.setattr(chat_service.command_detector, 'detect_command', detect_command)
+        monkeypatch.setattr(chat_service, 'process_message', process_message)
+
+        response, detection, detection_ms = await MessageService()._process_speculatively(
+            'c1', 'a1', 'u1', 'set a timer', None, None, False
+        )
+
+        assert response['is_timer_response']
+        assert detection is None and detection_ms is None
+        assert cancelled.is_set()
@@ -0,0 +1,77 @@
+"""
+Unit tests for cancelling streamed generations over the channel layer.
+"""
+import asyncio
+import pytest
+from channels.layers import InMemoryChannelLayer
+from core.services.stream_cancellation import (
+    GenerationCancelled,
+    request_cancel,
+    run_cancellable,
+    stream_group_name,
+)
+
+
+@pytest.mark.asyncio
+class TestRunCancellable:
+    """Test running a generation that a client can cancel."""
+
+    async def test_result_is_returned_when_not_cancelled(self):
+        """Work that finishes normally returns its result."""
+        layer = InMemoryChannelLayer()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            return {'content': 'hi'}
+
+        assert await run_cancellable(work(), 'user-1', '123', channel_layer=layer) == {'content': 'hi'}
+
+    async def test_cancel_request_stops_work(self):
+        """A cancel request for the stream cancels the running work."""
+        layer = InMemoryChannelLayer()
+        stopped = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            finally:
+                stopped.set()
+
+        task = asyncio.ensure_future(run_cancellable(work(), 'user-1', '123', channel_layer=layer))
+        await asyncio.sleep(0.01)
+        await request_cancel('user-1', '123', channel_layer=layer)
+
+        with pytest.raises(GenerationCancelled):
+            await asyncio.wait_for(task, timeout=1)
+        assert stopped.is_set()
+
+    async def test_cancel_for_other_user_is_ignored(self):
+        """Stream IDs are namespaced per user."""
+        layer = InMemoryChannelLayer()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return 'done'
+
+        task = asyncio.ensure_future(run_cancellable(work(), 'user-1', '123', channel_layer=layer))
+        await asyncio.sleep(0.01)
+        await request_cancel('user-2', '123', channel_layer=layer)
+
+        assert await task == 'done'
+
+    async def test_errors_from_work_propagate(self):
+        """Exceptions raised by the work reach the caller unchanged."""
+        layer = InMemoryChannelLayer()
+
+        async def work():
+            raise RuntimeError('ollama down')
+
+        with pytest.raises(RuntimeError):
+            await run_cancellable(work(), 'user-1', '123', channel_layer=layer)
+
+    async def test_group_name_is_valid_for_any_stream_id(self):
+        """Client-chosen stream IDs always map to a valid group name."""
+        name = stream_group_name('3f0c6a3e-1111-4222-8333-444455556666', 'x' * 64 + ' !/')
+
+        assert len(name) < 100
+        assert name.replace('_', '').isalnum()
@@ -0,0 +1,55 @@
+"""
+Unit tests for ChatStreamPublisher.
+"""
+import pytest
+from unittest.mock import AsyncMock
+from core.services.stream_publisher import ChatStreamPublisher
+
+
+@pytest.fixture
+def channel_layer():
+    """Channel layer double recording group_send calls."""
+    layer = AsyncMock()
+    layer.group_send = AsyncMock()
+    return layer
+
+
+@pytest.mark.asyncio
+class TestChatStreamPublisher:
+    """Test delta coalescing and stream termination."""
+    
+    async def test_deltas_are_sent_to_user_group(self, channel_layer):
+        """Events go to chat_{user_id} with type chat_delta."""
+        publisher = ChatStreamPublisher('user-1', 'stream-1', channel_layer=channel_layer, flush_interval=0)
+        
+        await publisher.send_delta('Hello')
+        
+        group, event = channel_layer.group_send.call_args.args
+        assert group == 'chat_user-1'
+        assert event['type'] == 'chat_delta'
+        assert event['stream_id'] == 'stream-1'
+        assert event['delta'] == 'Hello'
+        assert event['done'] is False
+    
+    async def test_deltas_are_coalesced_within_interval(self, channel_layer):
+        """Deltas arriving within the flush interval are batched into one event."""
+        publisher = ChatStreamPublisher('user-1', 'stream-1', channel_layer=channel_layer, flush_interval=60)
+        
+        await publisher.send_delta('a')  # first delta flushes immediately
+        await publisher.send_delta('b')
+        await publisher.send_delta('c')
+        await publisher.finish({'id': 'msg-1'})
+        
+        events = [c.args[1] for c in channel_layer.group_send.call_args_list]
+        assert [e['delta'] for e in events] == ['a', 'bc', '']
+        assert [e['sequence'] for e in events] == [0, 1, 2]
+        assert events[-1]['done'] is True
+        assert events[-1]['message'] == {'id': 'msg-1'}
+    
+    async def test_publish_errors_are_swallowed(self, channel_layer):
+        """A failing channel layer never breaks the chat turn."""
+        channel_layer.group_send.side_effect = RuntimeError('redis down')
+        publisher = ChatStreamPublisher('user-1', 'stream-1', channel_layer=channel_layer, flush_interval=0)
+        
+        await publisher.send_delta('Hello')
+        await publisher.finish()
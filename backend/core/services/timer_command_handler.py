@@ -8,6 +8,7 @@ import re
 from asgiref.sync import async_to_sync
 from apps.chat.models import Timer
 from core.bruno_integration.bruno_llm import OllamaClient
+from core.bruno_integration.llm_scheduler import Priority
 
 logger = logging.getLogger(__name__)
 
@@ -46,7 +47,7 @@ Respond with ONLY the JSON object."""
 
     def __init__(self, llm_client: Optional[OllamaClient] = None):
         """Initialize timer command handler."""
-        self.llm_client = llm_client or OllamaClient(base_url="http://localhost:11434")
+        self.llm_client = llm_client or OllamaClient()
         logger.info("Initialized TimerCommandHandler")
     
     async def parse_command(self, message: str, model: str = "mistral:7b") -> Dict:
@@ -74,7 +75,10 @@ Respond with ONLY the JSON object."""
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.1,
-                max_tokens=150
+                max_tokens=150,
+                cache=True,
+                priority=Priority.CLASSIFIER,
+                json_mode=True  # Stop as soon as the object is complete
             )
             
             response_text = response['content'].strip()
@@ -99,13 +103,11 @@ Respond with ONLY the JSON object."""
     def _parse_json_response(self, response: str) -> Dict:
         """Extract and parse JSON from LLM response."""
         try:
-            # Find JSON in response
+            # Decode the first JSON object; anything after it is ignored
             start_idx = response.find('{')
-            end_idx = response.rfind('}') + 1
             
-            if start_idx != -1 and end_idx > start_idx:
-                json_str = response[start_idx:end_idx]
-                data = json.loads(json_str)
+            if start_idx != -1:
+                data, _ = json.JSONDecoder().raw_decode(response[start_idx:])
                 
                 return {
                     'action': str(data.get('action', 'none')),
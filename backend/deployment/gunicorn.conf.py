@@ -2,7 +2,6 @@
 Gunicorn Configuration for Production Deployment
 """
 import os
-import multiprocessing
 
 # Ensure production settings are used
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.production')
@@ -12,8 +11,15 @@ bind = "0.0.0.0:8000"
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+# Threaded workers: the requests a process serves concurrently share its
+# long-lived LLM event loop, pooled connections and LLM scheduler, so the
+# scheduler's priority classes and per-user fairness (and the load shedder's
+# queue depth) only apply between requests of the same process. Few processes
+# with many threads each keep most of the queueing in one place; the Ollama
+# concurrency is at most GUNICORN_WORKERS x LLM_MAX_CONCURRENCY.
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+worker_class = "gthread"
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
 worker_connections = 1000
 timeout = 30
 keepalive = 2
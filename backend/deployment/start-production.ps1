@@ -38,6 +38,13 @@ if (-not $SkipMigrations) {
 Write-Host "🔍 Running system checks..." -ForegroundColor Yellow
 python manage.py check --deploy --settings=config.settings.production
 
+# Preload the agents' models so the first requests don't pay the model load
+Write-Host "🔥 Warming Ollama models..." -ForegroundColor Yellow
+python manage.py warm_models --settings=config.settings.production
+if ($LASTEXITCODE -ne 0) {
+    Write-Host "⚠️ Model warm-up failed, continuing" -ForegroundColor Yellow
+}
+
 # Start Gunicorn server
 Write-Host ""
 Write-Host "🌐 Starting Gunicorn server with production settings..." -ForegroundColor Green
@@ -32,6 +32,10 @@ python manage.py migrate --settings=config.settings.production
 echo "🔍 Running system checks..."
 python manage.py check --deploy --settings=config.settings.production
 
+# Preload the agents' models so the first requests don't pay the model load
+echo "🔥 Warming Ollama models..."
+python manage.py warm_models --settings=config.settings.production || echo "⚠️ Model warm-up failed, continuing"
+
 # Start Gunicorn server
 echo "🌐 Starting Gunicorn server with production settings..."
 echo "Server will be available at: http://0.0.0.0:8000"
@@ -101,6 +101,31 @@ export default function ChatPage() {
 
             // Mark next user message as response to proactive
             setIsResponseToProactive(true);
+          } else if (data.type === "chat_delta") {
+            // Streamed assistant reply: grow the placeholder as deltas arrive
+            const streamMessageId = `stream-${data.stream_id}`;
+            if (data.done && data.message) {
+              setMessages((prev) =>
+                prev.map((m) =>
+                  m.id === streamMessageId
+                    ? {
+                        id: data.message.id,
+                        content: data.message.content,
+                        role: "assistant",
+                        timestamp: data.message.created_at,
+                      }
+                    : m
+                )
+              );
+            } else if (data.delta) {
+              setMessages((prev) =>
+                prev.map((m) =>
+                  m.id === streamMessageId
+                    ? { ...m, content: m.content + data.delta }
+                    : m
+                )
+              );
+            }
           } else if (data.type === "proactivity_update") {
             console.log("Proactivity level updated:", data.proactivity_level);
           } else if (data.type === "timer_warning") {
@@ -313,7 +338,29 @@ export default function ChatPage() {
       role: "user",
       timestamp: new Date().toISOString(),
     };
-    setMessages((prev) => [...prev, tempUserMsg]);
+    // Placeholder for the assistant reply, filled in by chat_delta events
+    const streamId = wsConnected ? `${Date.now()}` : undefined;
+    const streamMessageId = `stream-${streamId}`;
+    setMessages((prev) => [
+      ...prev,
+      tempUserMsg,
+      ...(streamId
+        ? [
+            {
+              id: streamMessageId,
+              content: "",
+              role: "assistant" as const,
+              timestamp: new Date().toISOString(),
+            },
+          ]
+        : []),
+    ]);
+    if (streamId) {
+      // Lets the backend stop generating if this connection drops
+      wsRef.current?.send(
+        JSON.stringify({ type: "watch_stream", stream_id: streamId })
+      );
+    }
 
     // Timer commands are now handled by the backend via LLM
     // No need for client-side parsing
@@ -325,7 +372,8 @@ export default function ChatPage() {
       const response = await conversationsAPI.sendMessage(
         conversationId,
         userMessage,
-        isResponseToProactive
+        isResponseToProactive,
+        streamId
       );
 
       // Reset proactive flag
@@ -335,7 +383,12 @@ export default function ChatPage() {
 
       // Replace temp message with actual messages from backend
       setMessages((prev) => [
-        ...prev.filter((m) => m.id !== tempUserMsg.id),
+        ...prev.filter(
+          (m) =>
+            m.id !== tempUserMsg.id &&
+            m.id !== streamMessageId &&
+            m.id !== response.assistant_message.id
+        ),
         {
           id: response.user_message.id,
           content: response.user_message.content,
@@ -356,7 +409,9 @@ export default function ChatPage() {
       });
     } catch (error) {
       console.error("Failed to send message:", error);
-      setMessages((prev) => prev.filter((m) => m.id !== tempUserMsg.id));
+      setMessages((prev) =>
+        prev.filter((m) => m.id !== tempUserMsg.id && m.id !== streamMessageId)
+      );
     } finally {
       setIsSending(false);
       // Ensure focus returns to input
@@ -179,12 +179,15 @@ export const conversationsAPI = {
   sendMessage: async (
     id: string,
     content: string,
-    isResponseToProactive: boolean = false
+    isResponseToProactive: boolean = false,
+    streamId?: string
   ) => {
     const response = await api.post(`/conversations/${id}/send_message/`, {
       content,
       is_response_to_proactive: isResponseToProactive,
       // Command detection is now done by backend using LLM
+      // When set, the reply is streamed over the WebSocket as chat_delta events
+      ...(streamId ? { stream_id: streamId } : {}),
     });
     return response.data;
   },